@@ -0,0 +1,197 @@
+#!/usr/bin/env python3
+"""
+Benchmark de escritores concorrentes em processos separados.
+
+Simula várias janelas do Cursor, cada uma com o seu servidor MCP, escrevendo
+no mesmo banco: cada processo cria tarefas (transação com os gatilhos de
+hierarquia e progresso) e grava mensagens (INSERT avulso) durante um tempo
+fixo. Mede vazão, taxa de erro e latência por número de processos.
+
+Uso:
+    python benchmarks/bench_concurrent_writers.py [--processes 1 2 4 8] [--duration 5]
+    # sem proteção:
+    python benchmarks/bench_concurrent_writers.py --busy-timeout 0 --retries 1
+"""
+import argparse
+import logging
+import multiprocessing
+import os
+import random
+import statistics
+import sys
+import tempfile
+import time
+from typing import Any, Dict, List
+
+sys.path.insert(0, os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+
+from cortex.core import task as task_core  # noqa: E402
+from cortex.storage import database  # noqa: E402
+from cortex.storage.database import (  # noqa: E402
+    execute_update,
+    init_db,
+    is_busy_error,
+    set_busy_policy,
+)
+
+
+def setup(db_path: str, phases: int) -> None:
+    """Cria o projeto, a sessão e as fases que recebem as tarefas."""
+    database.CORTEX_DB_PATH = db_path
+    init_db()
+    execute_update(
+        "INSERT INTO projects(name, workspace_path) VALUES ('bench', '/tmp/bench')"
+    )
+    execute_update("INSERT INTO sessions(project_id, title) VALUES (1, 'bench')")
+    for i in range(phases):
+        task_core.create_task(f"fase {i}", 1, level="phase")
+    database.close_pool()
+
+
+def worker(
+    worker_id: int,
+    db_path: str,
+    policy: Dict[str, Any],
+    phases: int,
+    duration: float,
+    start_event: Any,
+    results: Any,
+) -> None:
+    """Escreve até o fim do prazo e envia as contagens e latências ao processo pai."""
+    database.CORTEX_DB_PATH = db_path
+    set_busy_policy(**policy)
+    # Esperas por lock entram no log de consultas lentas; os erros são contados aqui
+    logging.getLogger("cortex").setLevel(logging.CRITICAL)
+    rng = random.Random(worker_id)
+    latencies: List[float] = []
+    busy_errors = 0
+    other_errors = 0
+
+    start_event.wait()
+    deadline = time.perf_counter() + duration
+    while time.perf_counter() < deadline:
+        start = time.perf_counter()
+        try:
+            if rng.random() < 0.5:
+                task_core.create_task(
+                    f"tarefa {worker_id}",
+                    1,
+                    level="stage",
+                    parent_id=rng.randint(1, phases),
+                    estimated_hours=rng.randint(1, 8),
+                )
+            else:
+                execute_update(
+                    "INSERT INTO messages(session_id, role, content) "
+                    "VALUES (1, 'user', ?)",
+                    (f"mensagem do processo {worker_id}",),
+                )
+            latencies.append((time.perf_counter() - start) * 1000)
+        except Exception as e:
+            if is_busy_error(e):
+                busy_errors += 1
+            else:
+                other_errors += 1
+
+    database.close_pool()
+    results.put({"ok": latencies, "busy": busy_errors, "other": other_errors})
+
+
+def percentile(samples: List[float], fraction: float) -> float:
+    """Percentil por posição numa amostra ordenada."""
+    if not samples:
+        return 0.0
+    return samples[min(len(samples) - 1, int(fraction * len(samples)))]
+
+
+def run(processes: int, args: argparse.Namespace, policy: Dict[str, Any]) -> None:
+    with tempfile.TemporaryDirectory() as tmp:
+        db_path = os.path.join(tmp, "bench.db")
+        setup(db_path, args.phases)
+
+        ctx = multiprocessing.get_context("spawn")
+        start_event = ctx.Event()
+        results = ctx.Queue()
+        workers = [
+            ctx.Process(
+                target=worker,
+                args=(
+                    i,
+                    db_path,
+                    policy,
+                    args.phases,
+                    args.duration,
+                    start_event,
+                    results,
+                ),
+            )
+            for i in range(processes)
+        ]
+        for p in workers:
+            p.start()
+        # Dá tempo para os processos importarem o CORTEX antes da largada
+        time.sleep(1.0)
+        start_event.set()
+        reports = [results.get() for _ in workers]
+        for p in workers:
+            p.join()
+
+    latencies = sorted(ms for report in reports for ms in report["ok"])
+    busy = sum(report["busy"] for report in reports)
+    other = sum(report["other"] for report in reports)
+    attempts = len(latencies) + busy + other
+    error_rate = 100 * (busy + other) / attempts if attempts else 0.0
+    print(
+        f"{processes:>9}{len(latencies) / args.duration:>12.0f}{busy:>8}{other:>8}"
+        f"{error_rate:>9.2f}%"
+        f"{statistics.median(latencies) if latencies else 0:>10.2f}"
+        f"{percentile(latencies, 0.95):>10.2f}{percentile(latencies, 0.99):>10.2f}"
+    )
+
+
+def main() -> None:
+    parser = argparse.ArgumentParser(description=__doc__.split("\n\n")[0])
+    parser.add_argument(
+        "--processes",
+        type=int,
+        nargs="+",
+        default=[1, 2, 4, 8],
+        help="Números de processos escritores a testar",
+    )
+    parser.add_argument(
+        "--duration", type=float, default=5.0, help="Segundos por rodada"
+    )
+    parser.add_argument(
+        "--phases", type=int, default=20, help="Fases que recebem as tarefas"
+    )
+    parser.add_argument(
+        "--busy-timeout",
+        type=int,
+        default=None,
+        help="busy_timeout em ms (padrão: configuração)",
+    )
+    parser.add_argument(
+        "--retries",
+        type=int,
+        default=None,
+        help="Tentativas por escrita (padrão: configuração)",
+    )
+    args = parser.parse_args()
+
+    policy: Dict[str, Any] = {}
+    if args.busy_timeout is not None:
+        policy["busy_timeout_ms"] = args.busy_timeout
+    if args.retries is not None:
+        policy["retry_attempts"] = args.retries
+    print(f"Política: {set_busy_policy(**policy)}")
+
+    print(
+        f"{'processos':>9}{'escritas/s':>12}{'busy':>8}{'outros':>8}{'erros':>10}"
+        f"{'p50 (ms)':>10}{'p95 (ms)':>10}{'p99 (ms)':>10}"
+    )
+    for processes in args.processes:
+        run(processes, args, policy)
+
+
+if __name__ == "__main__":
+    main()
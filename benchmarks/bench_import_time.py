@@ -0,0 +1,155 @@
+#!/usr/bin/env python3
+"""
+Benchmark do tempo de importação do servidor MCP.
+
+Importa o módulo num interpretador novo com ``python -X importtime`` várias
+vezes e reporta a mediana do tempo acumulado, os módulos mais caros e os
+pacotes de terceiros carregados. Falha (código de saída 1) se a mediana
+passar do orçamento ou se algum módulo proibido for importado na partida,
+como as implementações das ferramentas, que são carregadas sob demanda.
+
+Uso:
+    python benchmarks/bench_import_time.py [--budget-ms 150] [--runs 7]
+    python benchmarks/bench_import_time.py --module cortex.cli.main --forbid ""
+"""
+import argparse
+import os
+import statistics
+import subprocess
+import sys
+import tempfile
+from collections import defaultdict
+from typing import Dict, List, Tuple
+
+ROOT = os.path.dirname(os.path.dirname(os.path.abspath(__file__)))
+
+# Orçamento padrão para importar o servidor (ms, mediana)
+DEFAULT_BUDGET_MS = 150.0
+
+# Módulos que não podem ser importados na partida do servidor
+DEFAULT_FORBIDDEN = ("cortex.mcp.tools.", "cortex.mcp.transport", "asyncio")
+
+
+def import_profile(module: str, home: str) -> Dict[str, Tuple[int, int]]:
+    """
+    Importa o módulo num processo novo.
+
+    Returns:
+        {módulo: (próprio µs, acumulado µs)}
+    """
+    env = dict(os.environ, HOME=home, PYTHONPATH=ROOT)
+    result = subprocess.run(
+        [sys.executable, "-X", "importtime", "-c", f"import {module}"],
+        env=env,
+        capture_output=True,
+        text=True,
+    )
+    if result.returncode != 0:
+        raise RuntimeError(f"Falha ao importar {module}:\n{result.stderr}")
+
+    profile: Dict[str, Tuple[int, int]] = {}
+    for line in result.stderr.splitlines():
+        if not line.startswith("import time:") or "self [us]" in line:
+            continue
+        self_us, cumulative_us, name = line[len("import time:") :].split("|")
+        profile[name.strip()] = (int(self_us), int(cumulative_us))
+    return profile
+
+
+def classify(name: str) -> str:
+    """Agrupa um módulo em cortex, biblioteca padrão ou terceiros."""
+    top = name.split(".")[0]
+    if top == "cortex":
+        return "cortex"
+    if top in sys.stdlib_module_names or top.startswith("_"):
+        return "stdlib"
+    return "terceiros"
+
+
+def main() -> None:
+    parser = argparse.ArgumentParser(description=__doc__.split("\n\n")[0])
+    parser.add_argument(
+        "--module", default="cortex.mcp.server", help="Módulo a importar"
+    )
+    parser.add_argument("--runs", type=int, default=7, help="Execuções (usa a mediana)")
+    parser.add_argument(
+        "--budget-ms",
+        type=float,
+        default=DEFAULT_BUDGET_MS,
+        help="Tempo máximo de importação (mediana, ms)",
+    )
+    parser.add_argument(
+        "--forbid",
+        nargs="*",
+        default=list(DEFAULT_FORBIDDEN),
+        help="Prefixos de módulos proibidos na partida",
+    )
+    parser.add_argument(
+        "--top", type=int, default=15, help="Módulos mais caros a listar"
+    )
+    args = parser.parse_args()
+
+    with tempfile.TemporaryDirectory() as home:
+        # A primeira importação compila os .pyc e não entra na conta
+        import_profile(args.module, home)
+        profiles = [import_profile(args.module, home) for _ in range(args.runs)]
+
+    totals = [profile[args.module][1] / 1000 for profile in profiles]
+    median_ms = statistics.median(totals)
+
+    self_times: Dict[str, List[int]] = defaultdict(list)
+    for profile in profiles:
+        for name, (self_us, _) in profile.items():
+            self_times[name].append(self_us)
+    medians = {
+        name: statistics.median(values) / 1000 for name, values in self_times.items()
+    }
+
+    by_group: Dict[str, float] = defaultdict(float)
+    for name, ms in medians.items():
+        by_group[classify(name)] += ms
+
+    print(
+        f"{args.module}: mediana {median_ms:.1f} ms "
+        f"(mín {min(totals):.1f}, máx {max(totals):.1f}; {args.runs} execuções; "
+        f"orçamento {args.budget_ms:.0f} ms)"
+    )
+    print(
+        "Por origem: "
+        + ", ".join(
+            f"{group} {ms:.1f} ms"
+            for group, ms in sorted(by_group.items(), key=lambda i: -i[1])
+        )
+    )
+    print(f"\n{'módulo':<50}{'próprio (ms)':>14}")
+    for name, ms in sorted(medians.items(), key=lambda item: -item[1])[: args.top]:
+        print(f"{name:<50}{ms:>14.2f}")
+
+    third_party = sorted(
+        name for name in medians if classify(name) == "terceiros" and "." not in name
+    )
+    if third_party:
+        print(f"\nPacotes de terceiros: {', '.join(third_party)}")
+
+    failures = []
+    if median_ms > args.budget_ms:
+        failures.append(
+            f"importação levou {median_ms:.1f} ms (orçamento {args.budget_ms:.0f} ms)"
+        )
+    forbidden = sorted(
+        name
+        for name in medians
+        for prefix in args.forbid
+        if prefix and (name == prefix or name.startswith(prefix))
+    )
+    if forbidden:
+        failures.append(f"módulos proibidos na partida: {', '.join(forbidden)}")
+
+    if failures:
+        print("\nFALHOU: " + "; ".join(failures))
+        sys.exit(1)
+    print("\nOK")
+
+
+if __name__ == "__main__":
+    main()
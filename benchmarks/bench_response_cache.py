@@ -0,0 +1,145 @@
+#!/usr/bin/env python3
+"""
+Benchmark do cache de respostas das ferramentas somente leitura.
+
+Popula um banco temporário com sessões, mensagens e tarefas e executa uma
+carga de chamadas MCP em que ``get_context`` e ``list_tasks`` se repetem com
+os mesmos argumentos entre escritas (``record_message``, ``create_task``).
+Compara a latência das leituras com o cache desligado e ligado e mostra as
+estatísticas do cache.
+
+Uso:
+    python benchmarks/bench_response_cache.py [--calls 5000] [--write-ratio 0.1]
+"""
+import argparse
+import os
+import random
+import statistics
+import sys
+import tempfile
+import time
+from typing import Dict, List
+
+sys.path.insert(0, os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+
+from cortex.mcp.server import handle_mcp_request  # noqa: E402
+from cortex.storage import cache  # noqa: E402
+from cortex.storage import database  # noqa: E402
+from cortex.storage.database import bulk_insert, execute_update, init_db  # noqa: E402
+from cortex.storage.write_behind import shutdown_write_queues  # noqa: E402
+
+READS = (
+    {"name": "get_context", "parameters": {}},
+    {"name": "get_context", "parameters": {"max_messages": 50}},
+    {"name": "list_tasks", "parameters": {"project_id": 1}},
+    {"name": "list_tasks", "parameters": {"project_id": 1, "status": "in_progress"}},
+)
+
+
+def seed(tasks: int, messages: int) -> None:
+    """Cria um projeto com uma sessão ativa, mensagens e tarefas."""
+    execute_update(
+        "INSERT INTO projects(name, workspace_path) VALUES ('bench', '/tmp/bench')"
+    )
+    session_id = execute_update(
+        "INSERT INTO sessions(project_id, title) VALUES (1, 'bench')"
+    )
+    bulk_insert(
+        "messages",
+        ["session_id", "role", "content"],
+        [(session_id, "user", f"mensagem {i} " * 20) for i in range(messages)],
+    )
+    bulk_insert(
+        "tasks",
+        ["project_id", "title", "level", "status"],
+        [
+            (1, f"tarefa {i}", "phase", random.choice(["not_started", "in_progress"]))
+            for i in range(tasks)
+        ],
+    )
+
+
+def run(calls: int, write_ratio: float, seed_value: int) -> Dict[str, List[float]]:
+    """Executa a carga e retorna as latências (ms) por ferramenta de leitura."""
+    rng = random.Random(seed_value)
+    timings: Dict[str, List[float]] = {"get_context": [], "list_tasks": []}
+    for i in range(calls):
+        if rng.random() < write_ratio:
+            if rng.random() < 0.5:
+                handle_mcp_request(
+                    {
+                        "name": "record_message",
+                        "parameters": {"role": "user", "content": f"nova {i}"},
+                    }
+                )
+            else:
+                handle_mcp_request(
+                    {
+                        "name": "create_task",
+                        "parameters": {
+                            "title": f"nova {i}",
+                            "level": "phase",
+                            "project_id": 1,
+                        },
+                    }
+                )
+            continue
+        request = rng.choice(READS)
+        start = time.perf_counter()
+        handle_mcp_request(request)
+        timings[request["name"]].append((time.perf_counter() - start) * 1000)
+    return timings
+
+
+def main() -> None:
+    parser = argparse.ArgumentParser(description=__doc__.split("\n\n")[0])
+    parser.add_argument("--calls", type=int, default=5000, help="Chamadas por execução")
+    parser.add_argument(
+        "--write-ratio", type=float, default=0.1, help="Fração de escritas"
+    )
+    parser.add_argument("--tasks", type=int, default=5000, help="Tarefas no banco")
+    parser.add_argument(
+        "--messages", type=int, default=20000, help="Mensagens no banco"
+    )
+    args = parser.parse_args()
+
+    with tempfile.TemporaryDirectory() as tmp:
+        database.CORTEX_DB_PATH = os.path.join(tmp, "bench.db")
+        init_db()
+        random.seed(1)
+        seed(args.tasks, args.messages)
+
+        results = {}
+        for label, enabled in (("sem cache", False), ("com cache", True)):
+            cache._cache = cache.ResponseCache({"enabled": enabled})
+            results[label] = run(args.calls, args.write_ratio, seed_value=7)
+            stats = cache.response_cache_stats()
+
+        shutdown_write_queues()
+        database.close_pool()
+
+    print(f"{args.calls} chamadas, {args.write_ratio:.0%} escritas")
+    # A média inclui a primeira leitura após cada escrita, que espera o flush
+    # da fila de mensagens com ou sem cache; a mediana mostra a leitura típica
+    print(
+        f"\n{'ferramenta':<14}{'':<8}{'sem cache (ms)':>16}"
+        f"{'com cache (ms)':>16}{'ganho':>8}"
+    )
+    for name in ("get_context", "list_tasks"):
+        for label, func in (("mediana", statistics.median), ("média", statistics.mean)):
+            before = func(results["sem cache"][name])
+            after = func(results["com cache"][name])
+            print(
+                f"{name:<14}{label:<8}{before:>16.3f}{after:>16.3f}"
+                f"{before / after:>7.1f}x"
+            )
+    print(
+        f"\nCache: {stats['hits']} acertos, {stats['misses']} falhas "
+        f"(taxa {stats['hit_rate']:.0%}), {stats['stale']} invalidadas, "
+        f"{stats['evictions']} descartes, {stats['entries']} entradas "
+        f"({stats['bytes'] / 1024:.0f} KB)"
+    )
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,162 @@
+#!/usr/bin/env python3
+"""
+Benchmark da fila de prioridades do servidor MCP.
+
+Simula um pool com poucas threads recebendo, ao mesmo tempo, uma rajada de
+trabalho de fundo (chamadas de 50 ms, como ``detect_context`` ou lotes de
+``create_task``) e chamadas interativas curtas (como ``get_context``) em
+intervalos regulares. Compara a espera das interativas com todas na mesma
+classe (fila por ordem de chegada) e com as classes de prioridade, e a
+divisão das threads entre dois clientes que disputam o pool.
+
+Uso:
+    python benchmarks/bench_scheduler.py [--workers 4] [--background 200]
+"""
+import argparse
+import asyncio
+import os
+import statistics
+import sys
+import time
+from concurrent.futures import ThreadPoolExecutor
+from typing import Dict, List
+
+sys.path.insert(0, os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+
+from cortex.mcp.scheduler import RequestScheduler  # noqa: E402
+
+
+async def call(
+    queue: RequestScheduler,
+    pool: ThreadPoolExecutor,
+    priority: str,
+    client: str,
+    seconds: float,
+    waits: List[float],
+) -> None:
+    """Espera a vez, executa (dorme) numa thread e anota a espera."""
+    loop = asyncio.get_running_loop()
+    received = loop.time()
+    await queue.acquire(priority, client, received=received)
+    waits.append(loop.time() - received)
+    try:
+        await loop.run_in_executor(pool, time.sleep, seconds)
+    finally:
+        queue.release()
+
+
+async def workload(args: argparse.Namespace, classes: bool) -> Dict[str, List[float]]:
+    """
+    Rajada de fundo mais chamadas interativas periódicas.
+
+    Sem ``classes``, todas as chamadas vão numa classe e num cliente só.
+    """
+    queue = RequestScheduler(args.workers, {"aging_seconds": 60}, name="bench")
+    waits: Dict[str, List[float]] = {"interactive": [], "background": []}
+    with ThreadPoolExecutor(max_workers=args.workers) as pool:
+        tasks = [
+            asyncio.ensure_future(
+                call(
+                    queue,
+                    pool,
+                    "background" if classes else "normal",
+                    "bulk",
+                    args.background_ms / 1000,
+                    waits["background"],
+                )
+            )
+            for _ in range(args.background)
+        ]
+        for _ in range(args.interactive):
+            await asyncio.sleep(args.interval_ms / 1000)
+            tasks.append(
+                asyncio.ensure_future(
+                    call(
+                        queue,
+                        pool,
+                        "interactive" if classes else "normal",
+                        "user" if classes else "bulk",
+                        0.002,
+                        waits["interactive"],
+                    )
+                )
+            )
+        await asyncio.gather(*tasks)
+    return waits
+
+
+async def fairness(args: argparse.Namespace) -> Dict[str, float]:
+    """Dois clientes na mesma classe: um com rajada de 10x mais pedidos."""
+    queue = RequestScheduler(args.workers, name="bench")
+    finished: Dict[str, float] = {}
+    loop = asyncio.get_running_loop()
+    start = loop.time()
+
+    async def client_calls(client: str, count: int) -> None:
+        waits: List[float] = []
+        await asyncio.gather(
+            *(call(queue, pool, "normal", client, 0.005, waits) for _ in range(count))
+        )
+        finished[client] = loop.time() - start
+
+    with ThreadPoolExecutor(max_workers=args.workers) as pool:
+        await asyncio.gather(client_calls("rajada", 400), client_calls("pontual", 40))
+    return finished
+
+
+def percentile(values: List[float], pct: float) -> float:
+    ordered = sorted(values)
+    return ordered[min(len(ordered) - 1, int(len(ordered) * pct))]
+
+
+def main() -> None:
+    parser = argparse.ArgumentParser(description=__doc__.split("\n\n")[0])
+    parser.add_argument("--workers", type=int, default=4, help="Threads do pool")
+    parser.add_argument(
+        "--background", type=int, default=200, help="Chamadas de fundo na rajada"
+    )
+    parser.add_argument(
+        "--background-ms",
+        type=float,
+        default=50,
+        help="Duração de cada chamada de fundo",
+    )
+    parser.add_argument(
+        "--interactive", type=int, default=50, help="Chamadas interativas"
+    )
+    parser.add_argument(
+        "--interval-ms", type=float, default=20, help="Intervalo entre interativas"
+    )
+    args = parser.parse_args()
+
+    print(
+        f"{args.workers} threads, {args.background} chamadas de fundo "
+        f"de {args.background_ms:g} ms, "
+        f"{args.interactive} interativas a cada {args.interval_ms:g} ms"
+    )
+    print(
+        f"\n{'fila':<22}{'interativas p50 (ms)':>22}{'p95 (ms)':>12}"
+        f"{'fundo p50 (ms)':>16}"
+    )
+    for label, classes in (
+        ("ordem de chegada", False),
+        ("classes de prioridade", True),
+    ):
+        waits = asyncio.run(workload(args, classes))
+        inter, back = waits["interactive"], waits["background"]
+        print(
+            f"{label:<22}{statistics.median(inter) * 1000:>22.1f}"
+            f"{percentile(inter, 0.95) * 1000:>12.1f}"
+            f"{statistics.median(back) * 1000:>16.1f}"
+        )
+
+    finished = asyncio.run(fairness(args))
+    print(
+        "\nRodízio entre clientes: 'pontual' (40 pedidos) terminou em "
+        f"{finished['pontual'] * 1000:.0f} ms, "
+        f"'rajada' (400 pedidos) em {finished['rajada'] * 1000:.0f} ms"
+    )
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,155 @@
+#!/usr/bin/env python3
+"""
+Benchmark da tabela de fechamento da hierarquia de tarefas.
+
+Cria uma árvore de ~110 mil tarefas (fase → etapa → tarefa → atividade) num
+banco temporário e compara consultas de subárvore, ancestrais e contagem de
+descendentes via ``task_closure`` com a CTE recursiva equivalente.
+
+Uso:
+    python benchmarks/bench_task_closure.py [--fanout 10 10 100 10] [--repeat 20]
+"""
+import argparse
+import os
+import statistics
+import sys
+import tempfile
+import time
+from typing import Callable, List
+
+sys.path.insert(0, os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+
+from cortex.core import task as task_core  # noqa: E402
+from cortex.storage import database  # noqa: E402
+from cortex.storage.database import (  # noqa: E402
+    bulk_insert,
+    execute_query,
+    execute_update,
+    init_db,
+)
+
+TASK_COLUMNS = ["project_id", "parent_id", "title", "level", "status"]
+
+RECURSIVE_SUBTREE = """
+    WITH RECURSIVE sub(id, depth) AS (
+        SELECT id, 0 FROM tasks WHERE id = ?
+        UNION ALL
+        SELECT t.id, s.depth + 1 FROM tasks t JOIN sub s ON t.parent_id = s.id
+    )
+    SELECT t.* FROM sub JOIN tasks t ON t.id = sub.id WHERE sub.depth > 0
+"""
+
+RECURSIVE_ANCESTORS = """
+    WITH RECURSIVE anc(id, parent_id) AS (
+        SELECT id, parent_id FROM tasks WHERE id = ?
+        UNION ALL
+        SELECT t.id, t.parent_id FROM tasks t JOIN anc a ON t.id = a.parent_id
+    )
+    SELECT t.* FROM anc JOIN tasks t ON t.id = anc.id WHERE anc.id != ?
+"""
+
+RECURSIVE_COUNT = """
+    WITH RECURSIVE sub(id) AS (
+        SELECT id FROM tasks WHERE parent_id = ?
+        UNION ALL
+        SELECT t.id FROM tasks t JOIN sub s ON t.parent_id = s.id
+    )
+    SELECT COUNT(*) AS total FROM sub
+"""
+
+
+def build_tree(fanout: List[int]) -> List[List[int]]:
+    """Cria a árvore nível a nível e retorna os IDs de cada nível."""
+    execute_update(
+        "INSERT INTO projects(name, workspace_path) VALUES ('bench', '/tmp/bench')"
+    )
+    levels: List[List[int]] = []
+    parents: List = [None]
+    for depth, count in enumerate(fanout):
+        level = task_core.TASK_LEVELS[depth]
+        rows = [
+            (1, parent, f"{level} {i}", level, "not_started")
+            for parent in parents
+            for i in range(count)
+        ]
+        parents = bulk_insert("tasks", TASK_COLUMNS, rows, return_ids=True)
+        levels.append(parents)
+    return levels
+
+
+def measure(fn: Callable[[], object], repeat: int) -> float:
+    """Mediana do tempo de execução em milissegundos."""
+    samples = []
+    for _ in range(repeat):
+        start = time.perf_counter()
+        fn()
+        samples.append((time.perf_counter() - start) * 1000)
+    return statistics.median(samples)
+
+
+def main() -> None:
+    parser = argparse.ArgumentParser(description=__doc__.split("\n\n")[0])
+    parser.add_argument(
+        "--fanout",
+        type=int,
+        nargs=4,
+        default=[10, 10, 100, 10],
+        help="Filhos por nó em cada nível",
+    )
+    parser.add_argument(
+        "--repeat", type=int, default=20, help="Repetições por consulta"
+    )
+    args = parser.parse_args()
+
+    with tempfile.TemporaryDirectory() as tmp:
+        database.CORTEX_DB_PATH = os.path.join(tmp, "bench.db")
+        init_db()
+
+        start = time.perf_counter()
+        levels = build_tree(args.fanout)
+        build_s = time.perf_counter() - start
+        total = sum(len(ids) for ids in levels)
+        closure_rows = execute_query("SELECT COUNT(*) AS n FROM task_closure")[0]["n"]
+        print(
+            f"Árvore: {total} tarefas, {closure_rows} linhas em task_closure, "
+            f"criada em {build_s:.2f} s ({total / build_s:.0f} tarefas/s)"
+        )
+
+        phase, stage, leaf = levels[0][0], levels[1][0], levels[-1][-1]
+        cases = [
+            (
+                "subárvore de uma fase",
+                lambda: task_core.get_subtree(phase),
+                lambda: execute_query(RECURSIVE_SUBTREE, (phase,)),
+            ),
+            (
+                "subárvore de uma etapa",
+                lambda: task_core.get_subtree(stage),
+                lambda: execute_query(RECURSIVE_SUBTREE, (stage,)),
+            ),
+            (
+                "ancestrais de uma atividade",
+                lambda: task_core.get_ancestors(leaf),
+                lambda: execute_query(RECURSIVE_ANCESTORS, (leaf, leaf)),
+            ),
+            (
+                "contagem de descendentes (fase)",
+                lambda: task_core.count_descendants(phase),
+                lambda: execute_query(RECURSIVE_COUNT, (phase,)),
+            ),
+        ]
+
+        print(f"{'consulta':<34}{'closure (ms)':>14}{'recursiva (ms)':>16}{'ganho':>8}")
+        for name, closure_fn, recursive_fn in cases:
+            closure_ms = measure(closure_fn, args.repeat)
+            recursive_ms = measure(recursive_fn, args.repeat)
+            print(
+                f"{name:<34}{closure_ms:>14.3f}{recursive_ms:>16.3f}"
+                f"{recursive_ms / closure_ms:>7.1f}x"
+            )
+
+        database.close_pool()
+
+
+if __name__ == "__main__":
+    main()
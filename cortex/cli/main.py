@@ -12,14 +12,34 @@ from rich.table import Table
 
 console = Console()
 
+# Comandos que abrem o banco: o esquema é migrado antes de executá-los
+# (``serve`` migra na partida do servidor e ``tune`` usa bancos próprios)
+DB_COMMANDS = {
+    "create-project",
+    "list-projects",
+    "backup",
+    "archive",
+    "search",
+    "status",
+}
+
+
 @click.group()
 @click.version_option(version="0.1.0")
-def cli():
+@click.pass_context
+def cli(ctx):
     """CORTEX - Assistente de Contexto para Cursor.
     
     Esta ferramenta gerencia sessões, tarefas e contexto para desenvolvimento com o Cursor.
     """
-    pass
+    if ctx.invoked_subcommand in DB_COMMANDS:
+        from cortex.storage.database import init_db
+
+        try:
+            init_db()
+        except Exception as e:
+            console.print(f"[red]Erro ao migrar banco de dados: {str(e)}[/red]")
+            sys.exit(1)
 
 
 @cli.command()
@@ -124,6 +144,292 @@ def list_projects():
         sys.exit(1)
 
 
+@cli.command()
+@click.option("--full", is_flag=True, help="Força um backup completo")
+@click.option("--no-verify", is_flag=True, help="Não verifica a integridade do backup")
+@click.option("--no-rotate", is_flag=True, help="Não aplica a política de retenção")
+@click.option(
+    "--list", "list_only", is_flag=True, help="Apenas lista os backups existentes"
+)
+def backup(full, no_verify, no_rotate, list_only):
+    """Cria um backup (incremental quando possível) do banco de dados."""
+    from cortex.storage.backup import create_backup, list_backups, rotate_backups
+
+    if list_only:
+        table = Table("Arquivo", "Tipo", "Base", "Tamanho", "Verificado")
+        for entry in list_backups():
+            table.add_row(
+                entry["file"],
+                entry["kind"],
+                entry.get("base") or "-",
+                f"{entry['size_bytes'] / 1024:.1f} KB",
+                {True: "✓", False: "✗"}.get(entry.get("verified"), "-"),
+            )
+        console.print(table)
+        return
+
+    console.print(Panel("Backup do banco de dados CORTEX", style="blue"))
+    try:
+        result = create_backup(force_full=full, verify=not no_verify)
+
+        table = Table("Campo", "Valor")
+        table.add_row("Arquivo", result["path"])
+        table.add_row("Tipo", "completo" if result["kind"] == "full" else "incremental")
+        table.add_row("Tamanho", f"{result['size_bytes'] / (1024 * 1024):.2f} MB")
+        table.add_row("Duração", f"{result['duration_seconds']:.3f} s")
+        table.add_row("Throughput", f"{result['throughput_mb_s'] or 0:.2f} MB/s")
+        if result["kind"] == "full":
+            table.add_row("Passos", f"{result['steps']} ({result['pages']} páginas)")
+        else:
+            table.add_row("Linhas", str(sum(result["rows"].values())))
+        if result["verified"] is not None:
+            table.add_row("Integridade", "ok" if result["verified"] else "FALHOU")
+        console.print(table)
+
+        if not no_rotate:
+            removed = rotate_backups()
+            if removed:
+                console.print(
+                    f"[yellow]Rotação removeu {len(removed)} arquivos antigos[/yellow]"
+                )
+
+        if result["verified"] is False:
+            sys.exit(1)
+    except Exception as e:
+        console.print(f"[red]Erro ao criar backup: {str(e)}[/red]")
+        sys.exit(1)
+
+
+@cli.command()
+@click.option(
+    "--older-than",
+    type=int,
+    default=None,
+    help="Idade mínima das sessões em dias (padrão da configuração)",
+)
+@click.option("--limit", type=int, default=None, help="Número máximo de sessões")
+@click.option("--dry-run", is_flag=True, help="Apenas mostra o que seria arquivado")
+def archive(older_than, limit, dry_run):
+    """Arquiva as mensagens de sessões antigas em bancos mensais comprimidos."""
+    from cortex.storage.archive import archive_old_sessions
+
+    console.print(Panel("Arquivamento de sessões antigas", style="blue"))
+    try:
+        result = archive_old_sessions(older_than, limit, dry_run)
+
+        table = Table("Campo", "Valor")
+        table.add_row("Sessões", str(result["sessions"]))
+        table.add_row("Meses", ", ".join(result["months"]) or "-")
+        if not dry_run:
+            table.add_row("Mensagens", str(result["messages"]))
+            table.add_row("Tamanho original", f"{result['raw_bytes'] / 1024:.1f} KB")
+            table.add_row(
+                "Tamanho arquivado", f"{result['stored_bytes'] / 1024:.1f} KB"
+            )
+            table.add_row("Duração", f"{result['duration_seconds']:.3f} s")
+        console.print(table)
+    except Exception as e:
+        console.print(f"[red]Erro ao arquivar sessões: {str(e)}[/red]")
+        sys.exit(1)
+
+
+@cli.command()
+@click.argument("query")
+@click.option(
+    "--scope",
+    "scopes",
+    multiple=True,
+    type=click.Choice(["messages", "contexts", "tasks"]),
+    help="Escopo da busca (pode repetir; padrão todos)",
+)
+@click.option("--project-id", type=int, help="Restringe a busca a um projeto")
+@click.option("--limit", default=20, help="Número máximo de resultados")
+def search(query, scopes, project_id, limit):
+    """Busca texto em mensagens, contextos e tarefas."""
+    from cortex.storage.search import search as fts_search
+
+    try:
+        results = fts_search(query, scopes or None, project_id, limit)
+
+        if not results:
+            console.print("[yellow]Nenhum resultado encontrado.[/yellow]")
+            return
+
+        table = Table("Escopo", "ID", "Título", "Trecho")
+        for result in results:
+            table.add_row(
+                result["scope"],
+                str(result["id"]),
+                result["title"] or "-",
+                result["snippet"],
+            )
+        console.print(table)
+    except Exception as e:
+        console.print(f"[red]Erro na busca: {str(e)}[/red]")
+        sys.exit(1)
+
+
+@cli.command()
+@click.option("--operations", default=2000, help="Operações da carga por perfil")
+@click.option(
+    "--profile",
+    "profiles",
+    multiple=True,
+    type=click.Choice(["safe", "balanced", "throughput"]),
+    help="Perfil a medir (pode repetir; padrão todos)",
+)
+@click.option(
+    "--min-gain",
+    default=0.10,
+    help="Ganho mínimo para trocar por um perfil menos durável",
+)
+@click.option(
+    "--apply",
+    "apply_profile",
+    is_flag=True,
+    help="Grava o perfil recomendado na configuração",
+)
+def tune(operations, profiles, min_gain, apply_profile):
+    """Mede os perfis de desempenho no disco local e recomenda um."""
+    from cortex.core.config import update_config
+    from cortex.storage.tuning import PROFILE_ORDER
+    from cortex.storage.tuning import tune as run_tune
+
+    console.print(Panel("Ajuste de desempenho do armazenamento", style="blue"))
+    try:
+        with console.status("Medindo perfis com a carga típica..."):
+            result = run_tune(operations, list(profiles) or None, min_gain)
+
+        table = Table(
+            "Perfil",
+            "Operações/s",
+            "Latência típica (ms)",
+            "Mensagem (ms)",
+            "Tarefa (ms)",
+            "Contexto (ms)",
+            "Busca (ms)",
+        )
+        for entry in result["results"]:
+            avg = entry["avg_ms"]
+            name = entry["profile"]
+            if name == result["recommended"]:
+                name = f"[green]{name} ✓[/green]"
+            table.add_row(
+                name,
+                f"{entry['ops_per_second']:.0f}",
+                f"{entry['score_ms']:.3f}",
+                f"{avg.get('record_message', 0):.3f}",
+                f"{avg.get('create_task', 0):.3f}",
+                f"{avg.get('get_context', 0):.3f}",
+                f"{avg.get('search', 0):.3f}",
+            )
+        console.print(table)
+        console.print(f"[bold]Perfil atual:[/bold] {result['current']}")
+        console.print(f"[bold]Perfil recomendado:[/bold] {result['recommended']}")
+
+        if apply_profile and result["recommended"] != result["current"]:
+            if update_config("storage.profile", result["recommended"]):
+                console.print(
+                    "[green]Perfil gravado; vale para os próximos servidores "
+                    "iniciados.[/green]"
+                )
+            else:
+                console.print("[red]Não foi possível gravar a configuração.[/red]")
+                sys.exit(1)
+        elif not apply_profile and result["recommended"] != result["current"]:
+            if PROFILE_ORDER.index(result["recommended"]) > PROFILE_ORDER.index(
+                result["current"]
+            ):
+                console.print(
+                    f"[yellow]O perfil {result['recommended']} não sincroniza cada "
+                    "COMMIT no disco: numa queda de energia as últimas escritas "
+                    "podem se perder.[/yellow]"
+                )
+            console.print(
+                "Use [bold]cortex tune --apply[/bold] para gravar a recomendação."
+            )
+    except Exception as e:
+        console.print(f"[red]Erro ao medir perfis: {str(e)}[/red]")
+        sys.exit(1)
+
+
+def _print_storage_details():
+    """Mostra o esquema do banco e as métricas de consultas gravadas pelo servidor."""
+    from cortex.storage.database import (
+        get_db_path,
+        get_storage_profile,
+        pooled_connection,
+    )
+    from cortex.storage.instrumentation import load_saved_stats
+    from cortex.storage.migrations import LATEST_VERSION, get_schema_version
+
+    with pooled_connection() as conn:
+        version = get_schema_version(conn)
+    db_path = get_db_path()
+    size_mb = os.path.getsize(db_path) / (1024 * 1024) if os.path.exists(db_path) else 0
+    console.print(f"[bold]Banco de dados:[/bold] {db_path} ({size_mb:.2f} MB)")
+    console.print(
+        f"[bold]Versão do esquema:[/bold] {version} (mais recente: {LATEST_VERSION})"
+    )
+    console.print(f"[bold]Perfil de desempenho:[/bold] {get_storage_profile()[0]}")
+
+    stats = load_saved_stats()
+    if not stats:
+        console.print(
+            "[yellow]Nenhuma métrica de consultas gravada pelo servidor.[/yellow]"
+        )
+        return
+
+    console.print(
+        f"[bold]Métricas de consultas:[/bold] servidor PID {stats['pid']}, "
+        f"desde {stats['started_at']}, atualizadas em {stats['updated_at']}"
+    )
+    statements = sorted(
+        stats["statements"].items(), key=lambda item: item[1]["total_ms"], reverse=True
+    )
+    table = Table(
+        "Instrução",
+        "Execuções",
+        "Média (ms)",
+        "p95 (ms)",
+        "Máx (ms)",
+        "Linhas",
+        "Erros",
+    )
+    for shape, data in statements[:15]:
+        table.add_row(
+            shape if len(shape) <= 70 else shape[:67] + "...",
+            str(data["count"]),
+            f"{data['avg_ms']:.3f}" if data["avg_ms"] is not None else "-",
+            f"≤{data['p95_ms']}" if data["p95_ms"] is not None else "-",
+            f"{data['max_ms']:.1f}",
+            str(data["rows"]),
+            str(data["errors"]),
+        )
+    console.print(table)
+
+    cache = stats.get("response_cache")
+    if cache:
+        hit_rate = f"{cache['hit_rate']:.0%}" if cache["hit_rate"] is not None else "-"
+        console.print(
+            f"[bold]Cache de respostas:[/bold] {cache['hits']} acertos, "
+            f"{cache['misses']} falhas ({hit_rate}), {cache['stale']} invalidadas, "
+            f"{cache['evictions']} descartes LRU, "
+            f"{cache['entries']} entradas ({cache['bytes'] / 1024:.0f} KB)"
+        )
+
+    slow = stats.get("slow_queries") or []
+    if slow:
+        console.print(f"[bold]Consultas lentas (≥ {stats['slow_query_ms']} ms):[/bold]")
+        for entry in slow[-5:]:
+            console.print(
+                f"  [yellow]{entry['elapsed_ms']:.1f} ms[/yellow] {entry['at']} "
+                f"{entry['shape'][:100]}"
+            )
+            for line in entry["plan"]:
+                console.print(f"      {line}")
+
+
 @cli.command()
 @click.option("--verbose", is_flag=True, help="Mostra informações detalhadas")
 def status(verbose):
@@ -162,8 +468,7 @@ def status(verbose):
             console.print("[bold]Sessão Ativa:[/bold] Nenhuma")
         
         if verbose:
-            # TODO: Adicionar mais informações detalhadas
-            pass
+            _print_storage_details()
             
     except Exception as e:
         console.print(f"[red]Erro ao obter status: {str(e)}[/red]")
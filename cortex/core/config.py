@@ -17,14 +17,76 @@ CORTEX_HOME = os.path.expanduser("~/.cortex")
 CORTEX_CONFIG_FILE = os.path.join(CORTEX_HOME, "config.json")
 CURSOR_MCP_PATH = os.path.expanduser("~/.cursor/mcp.json")
 
+# Perfis de desempenho do armazenamento (PRAGMAs aplicados a cada conexão).
+# "safe" sincroniza cada COMMIT no disco; "balanced" sincroniza só nos
+# checkpoints do WAL (um COMMIT pode se perder numa queda de energia, sem
+# corromper o banco); "throughput" tem a durabilidade de "balanced", com
+# caches maiores e checkpoints mais espaçados. Nenhum perfil usa
+# synchronous=OFF, que pode corromper um banco WAL numa queda do sistema.
+# O padrão é "safe"; os demais são uma escolha explícita do usuário
+# (``cortex tune --apply``).
+PERFORMANCE_PROFILES = {
+    "safe": {
+        "synchronous": "FULL",
+        "cache_size": -8192,  # KiB (valores negativos)
+        "mmap_size": 0,
+        "temp_store": "DEFAULT",
+        "wal_autocheckpoint": 1000,  # páginas
+    },
+    "balanced": {
+        "synchronous": "NORMAL",
+        "cache_size": -32768,
+        "mmap_size": 64 * 1024 * 1024,
+        "temp_store": "MEMORY",
+        "wal_autocheckpoint": 1000,
+    },
+    "throughput": {
+        "synchronous": "NORMAL",
+        "cache_size": -131072,
+        "mmap_size": 256 * 1024 * 1024,
+        "temp_store": "MEMORY",
+        "wal_autocheckpoint": 4000,
+    },
+}
+DEFAULT_PERFORMANCE_PROFILE = "safe"
+
 # Configurações padrão
 DEFAULT_CONFIG = {
     "version": "0.1.0",
     "log_level": "INFO",
+    "logging": {
+        "max_bytes": 10 * 1024 * 1024,
+        "backup_count": 5,
+        "queue_size": 10000,
+        "sample_rates": {
+            "cortex.mcp.calls.record_message": 0.1,
+            "cortex.mcp.calls.get_context": 0.1,
+        },
+    },
     "data_dir": os.path.join(CORTEX_HOME, "data"),
     "auto_start": False,
     "http_enabled": False,
     "http_port": 8765,
+    "http_host": "127.0.0.1",
+    "server": {
+        "max_workers": 8,
+        "ordered_responses": False,
+        "heavy_workers": 2,
+        "heavy_timeout_seconds": 120,
+        "tool_timeouts": {},
+        "progress_interval_ms": 500,
+        "scheduler": {
+            "priorities": {},
+            "aging_seconds": 5.0,
+            "bulk_batch_items": 10,
+        },
+        "cache": {
+            "enabled": True,
+            "max_entries": 512,
+            "max_bytes": 8 * 1024 * 1024,
+            "max_age_seconds": 5.0,
+        },
+    },
     "jira": {
         "enabled": False,
         "url": "",
@@ -35,6 +97,38 @@ DEFAULT_CONFIG = {
         "context_detection": True,
         "marker_scanning": True,
     },
+    "storage": {
+        "profile": DEFAULT_PERFORMANCE_PROFILE,
+        "busy": {
+            "busy_timeout_ms": 5000,
+            "retry_attempts": 5,
+            "retry_base_delay_ms": 20,
+            "retry_max_delay_ms": 1000,
+        },
+        "write_behind": {
+            "enabled": True,
+            "max_batch": 100,
+            "flush_interval_ms": 50,
+            "max_queue": 10000,
+        },
+        "instrumentation": {
+            "enabled": True,
+            "slow_query_ms": 100,
+        },
+        "analytics": {
+            "cache_size_kb": 16384,
+            "max_snapshot_seconds": 30,
+            "idle_release_seconds": 5,
+        },
+    },
+    "archive": {
+        "older_than_days": 90,
+    },
+    "maintenance": {
+        "enabled": True,
+        "idle_seconds": 60,
+        "max_slice_ms": 250,
+    },
 }
 
 
@@ -178,6 +272,8 @@ def setup_cursor_integration(force: bool = False) -> bool:
     Returns:
         True se configuração for realizada com sucesso, False caso contrário
     """
+    from cortex.mcp.registry import tool_names
+
     cursor_dir = os.path.dirname(CURSOR_MCP_PATH)
     
     # Verifica se o diretório do Cursor existe
@@ -189,22 +285,8 @@ def setup_cursor_integration(force: bool = False) -> bool:
         "tools": [
             {
                 "id": "cortex",
-                "stdio": {
-                    "command": ["python", "-m", "cortex.mcp.server"]
-                },
-                "tools": [
-                    "start_session",
-                    "end_session", 
-                    "record_message",
-                    "get_context",
-                    "create_task",
-                    "update_task_status",
-                    "list_tasks",
-                    "scan_markers",
-                    "detect_context",
-                    "add_context",
-                    "apply_rule"
-                ]
+                "stdio": {"command": ["python", "-m", "cortex.mcp.server"]},
+                "tools": tool_names(),
             }
         ]
     }
@@ -238,4 +320,26 @@ def setup_cursor_integration(force: bool = False) -> bool:
         return True
     except Exception as e:
         logger.error(f"Erro ao configurar integração com Cursor: {str(e)}")
-        return False 
\ No newline at end of file
+        return False 
+
+
+def get_performance_profile(name: Optional[str] = None) -> Dict[str, Any]:
+    """
+    Obtém os PRAGMAs de um perfil de desempenho.
+
+    Args:
+        name: Nome do perfil (padrão a chave "storage.profile" da configuração)
+
+    Returns:
+        Dicionário com synchronous, cache_size, mmap_size, temp_store e
+        wal_autocheckpoint
+    """
+    if name is None:
+        name = get_config_value("storage.profile", DEFAULT_PERFORMANCE_PROFILE)
+    if name not in PERFORMANCE_PROFILES:
+        logger.warning(
+            f"Perfil de desempenho desconhecido: {name}; "
+            f"usando {DEFAULT_PERFORMANCE_PROFILE}"
+        )
+        name = DEFAULT_PERFORMANCE_PROFILE
+    return dict(PERFORMANCE_PROFILES[name])
@@ -0,0 +1,340 @@
+#!/usr/bin/env python3
+"""
+CORTEX Log - Logs estruturados sem disco no caminho das requisições.
+
+Os loggers do processo entregam cada registro a uma fila em memória
+(``QueueHandler``); uma única thread (``QueueListener``) formata os registros
+em JSON, remove credenciais e grava em ~/.cortex/logs/server.log, com
+rotação por tamanho. Na thread que registrou só acontecem a resolução da
+mensagem, a amostragem e a inclusão do contexto da requisição; se a fila
+encher, o registro é descartado e contado em vez de bloquear.
+
+Cada linha do arquivo é um objeto JSON com ``ts``, ``level``, ``logger`` e
+``message``, mais os campos passados em ``extra`` e o contexto da requisição
+em andamento (``request_id``, ``tool``; ver ``request_context``). As
+chamadas de ferramentas são registradas pelo servidor nos loggers
+``cortex.mcp.calls.<ferramenta>``, com ``duration_ms`` e ``status``.
+
+Amostragem: "logging.sample_rates" associa um logger (e seus filhos) à
+fração dos registros abaixo de WARNING que é mantida, para eventos
+frequentes como ``record_message``; avisos e erros nunca são descartados.
+"""
+import atexit
+import contextlib
+import contextvars
+import datetime
+import json
+import logging
+import os
+import queue
+import re
+import threading
+from logging.handlers import QueueHandler, QueueListener, RotatingFileHandler
+from typing import Any, Dict, Iterator, Optional
+
+# Configuração padrão (sobrescrita pela chave "logging" da configuração)
+DEFAULT_LOGGING = {
+    "file": "server.log",  # em ~/.cortex/logs
+    "max_bytes": 10 * 1024 * 1024,  # rotação por tamanho
+    "backup_count": 5,
+    "queue_size": 10000,  # registros aguardando a gravação
+    "sample_rates": {
+        "cortex.mcp.calls.record_message": 0.1,
+        "cortex.mcp.calls.get_context": 0.1,
+    },
+}
+
+# Campos cujo valor nunca vai para o log: nomes terminados nestas palavras
+# ("api_key", "jira_api_key", "access_token", mas não "token_count")
+_SENSITIVE_WORDS = (
+    r"password|passwd|secret|token|api[_-]?key|authorization|credentials?"
+    r"|private[_-]?key"
+)
+SENSITIVE_KEYS = re.compile(rf"(?:^|[_-])(?:{_SENSITIVE_WORDS})$", re.IGNORECASE)
+_SENSITIVE_ASSIGNMENT = re.compile(
+    rf"(?P<key>\b[\w-]*?(?:{_SENSITIVE_WORDS}))(?P<sep>[\"']?\s*[:=]\s*[\"']?)"
+    r"(?P<value>[^\s\"',;}&]+)",
+    re.IGNORECASE,
+)
+_BEARER = re.compile(r"\b(Bearer|Basic)\s+[A-Za-z0-9._~+/=-]+", re.IGNORECASE)
+REDACTED = "[REDACTED]"
+
+# Atributos padrão de LogRecord (o resto veio de ``extra``)
+_RECORD_ATTRIBUTES = frozenset(
+    logging.LogRecord("", 0, "", 0, "", None, None).__dict__
+) | {"message", "asctime", "taskName"}
+
+# Requisição em andamento na thread (ver request_context)
+_request: contextvars.ContextVar[Optional[Dict[str, Any]]] = contextvars.ContextVar(
+    "cortex_request", default=None
+)
+
+_lock = threading.Lock()
+_listener: Optional[QueueListener] = None
+_handler: Optional["_NonBlockingQueueHandler"] = None
+_atexit_registered = False
+
+
+def redact(value: Any) -> Any:
+    """
+    Remove credenciais de um valor antes de gravá-lo.
+
+    Args:
+        value: Texto, dicionário, lista ou outro valor
+
+    Returns:
+        Cópia com os valores sensíveis trocados por ``[REDACTED]``
+    """
+    if isinstance(value, str):
+        value = _BEARER.sub(lambda m: f"{m.group(1)} {REDACTED}", value)
+        return _SENSITIVE_ASSIGNMENT.sub(
+            lambda m: f"{m.group('key')}{m.group('sep')}{REDACTED}", value
+        )
+    if isinstance(value, dict):
+        return {
+            key: REDACTED
+            if isinstance(key, str) and SENSITIVE_KEYS.search(key)
+            else redact(item)
+            for key, item in value.items()
+        }
+    if isinstance(value, (list, tuple)):
+        return [redact(item) for item in value]
+    return value
+
+
+@contextlib.contextmanager
+def request_context(request_id: Any, tool: str) -> Iterator[None]:
+    """
+    Marca os registros feitos na thread com a requisição em andamento.
+
+    Args:
+        request_id: ``id`` da requisição (None se o cliente não enviou)
+        tool: Nome da ferramenta
+    """
+    token = _request.set({"request_id": request_id, "tool": tool})
+    try:
+        yield
+    finally:
+        _request.reset(token)
+
+
+class ContextFilter(logging.Filter):
+    """Inclui ``request_id`` e ``tool`` da requisição em andamento no registro."""
+
+    def filter(self, record: logging.LogRecord) -> bool:
+        context = _request.get()
+        if context is not None:
+            for key, value in context.items():
+                if not hasattr(record, key):
+                    setattr(record, key, value)
+        return True
+
+
+class SamplingFilter(logging.Filter):
+    """
+    Mantém só uma fração dos registros abaixo de WARNING de alguns loggers.
+
+    A amostragem é determinística (um a cada ``1 / taxa``), por logger
+    configurado; a regra de um logger vale para os seus filhos.
+
+    Args:
+        rates: Logger → fração mantida (0 descarta tudo, 1 mantém tudo)
+    """
+
+    def __init__(self, rates: Dict[str, float]) -> None:
+        super().__init__()
+        self._every = {
+            name: (0 if rate <= 0 else max(1, round(1 / rate)))
+            for name, rate in (rates or {}).items()
+            if rate < 1
+        }
+        self._counts: Dict[str, int] = {}
+        self._rules: Dict[str, Optional[str]] = {}
+        self._lock = threading.Lock()
+        self.dropped = 0
+
+    def _rule(self, name: str) -> Optional[str]:
+        """Logger configurado mais específico que cobre ``name``."""
+        rule = self._rules.get(name, "")
+        if rule != "":
+            return rule
+        rule = None
+        candidate = name
+        while candidate:
+            if candidate in self._every:
+                rule = candidate
+                break
+            candidate = candidate.rpartition(".")[0]
+        self._rules[name] = rule
+        return rule
+
+    def filter(self, record: logging.LogRecord) -> bool:
+        if record.levelno >= logging.WARNING or not self._every:
+            return True
+        rule = self._rule(record.name)
+        if rule is None:
+            return True
+        every = self._every[rule]
+        with self._lock:
+            count = self._counts.get(rule, 0)
+            self._counts[rule] = count + 1
+            if every and count % every == 0:
+                return True
+            self.dropped += 1
+        return False
+
+
+class RedactionFilter(logging.Filter):
+    """Remove credenciais da mensagem e dos campos extras (na thread de gravação)."""
+
+    def filter(self, record: logging.LogRecord) -> bool:
+        record.msg = redact(record.getMessage())
+        record.args = None
+        for key, value in list(record.__dict__.items()):
+            if key in _RECORD_ATTRIBUTES:
+                continue
+            record.__dict__[key] = (
+                REDACTED if SENSITIVE_KEYS.search(key) else redact(value)
+            )
+        return True
+
+
+class JsonFormatter(logging.Formatter):
+    """Uma linha JSON por registro, com os campos extras."""
+
+    def format(self, record: logging.LogRecord) -> str:
+        entry: Dict[str, Any] = {
+            "ts": datetime.datetime.fromtimestamp(
+                record.created, datetime.timezone.utc
+            ).isoformat(timespec="milliseconds"),
+            "level": record.levelname,
+            "logger": record.name,
+            "message": record.getMessage(),
+            "thread": record.threadName,
+        }
+        for key, value in record.__dict__.items():
+            if key not in _RECORD_ATTRIBUTES and not key.startswith("_"):
+                entry[key] = value
+        if record.exc_info:
+            entry["exception"] = redact(self.formatException(record.exc_info))
+        return json.dumps(entry, default=str, ensure_ascii=False)
+
+
+class _NonBlockingQueueHandler(QueueHandler):
+    """
+    ``QueueHandler`` que não formata na thread de origem.
+
+    Com a fila cheia, o registro é descartado em vez de bloquear quem loga.
+    """
+
+    def __init__(self, log_queue: "queue.Queue[logging.LogRecord]") -> None:
+        super().__init__(log_queue)
+        self.dropped = 0
+
+    def prepare(self, record: logging.LogRecord) -> logging.LogRecord:
+        # A fila é local ao processo: basta fixar a mensagem (os argumentos
+        # podem mudar depois); JSON e exceções são formatados pelo listener
+        record.msg = record.getMessage()
+        record.args = None
+        return record
+
+    def enqueue(self, record: logging.LogRecord) -> None:
+        try:
+            self.queue.put_nowait(record)
+        except queue.Full:
+            self.dropped += 1
+
+
+def configure_logging(
+    debug: bool = False, config: Optional[Dict[str, Any]] = None
+) -> None:
+    """
+    Configura os logs do processo: fila em memória, gravação em JSON numa
+    thread própria e rotação de ~/.cortex/logs/server.log.
+
+    Chamada na partida do servidor, não na importação do módulo, para que
+    importar o servidor (CLI, testes, benchmarks) não crie arquivos nem
+    altere a configuração de logs do processo. Chamadas repetidas
+    reconfiguram o pipeline.
+
+    Args:
+        debug: Se True, também envia os logs para stderr (em texto)
+        config: Configuração (chaves de ``DEFAULT_LOGGING``; padrão a chave "logging")
+    """
+    global _listener, _handler, _atexit_registered
+
+    from cortex.core.config import get_config_value
+
+    if config is None:
+        config = get_config_value("logging", {}) or {}
+    config = {**DEFAULT_LOGGING, **config}
+    level = logging.getLevelName(str(get_config_value("log_level", "INFO")).upper())
+
+    log_dir = os.path.expanduser("~/.cortex/logs")
+    os.makedirs(log_dir, exist_ok=True)
+    file_handler = RotatingFileHandler(
+        os.path.join(log_dir, config["file"]),
+        maxBytes=int(config["max_bytes"]),
+        backupCount=int(config["backup_count"]),
+        encoding="utf-8",
+    )
+    file_handler.setFormatter(JsonFormatter())
+    handlers = [file_handler]
+    if debug:
+        stream_handler = logging.StreamHandler()
+        stream_handler.setFormatter(
+            logging.Formatter("%(asctime)s - %(name)s - %(levelname)s - %(message)s")
+        )
+        handlers.append(stream_handler)
+    for target in handlers:
+        target.addFilter(RedactionFilter())
+
+    handler = _NonBlockingQueueHandler(queue.Queue(maxsize=int(config["queue_size"])))
+    handler.addFilter(SamplingFilter(config["sample_rates"]))
+    handler.addFilter(ContextFilter())
+    listener = QueueListener(handler.queue, *handlers, respect_handler_level=True)
+
+    stop_logging()
+    with _lock:
+        root = logging.getLogger()
+        root.addHandler(handler)
+        root.setLevel(level if isinstance(level, int) else logging.INFO)
+        listener.start()
+        _listener, _handler = listener, handler
+        if not _atexit_registered:
+            atexit.register(stop_logging)
+            _atexit_registered = True
+
+
+def stop_logging() -> None:
+    """Grava os registros pendentes, para a thread de gravação e fecha o arquivo."""
+    global _listener, _handler
+
+    with _lock:
+        listener, handler = _listener, _handler
+        _listener = _handler = None
+    if handler is not None:
+        logging.getLogger().removeHandler(handler)
+    if listener is not None:
+        listener.stop()
+        for target in listener.handlers:
+            target.close()
+
+
+def logging_stats() -> Optional[Dict[str, Any]]:
+    """
+    Estado do pipeline de logs.
+
+    Returns:
+        Registros na fila, descartados com a fila cheia e pela amostragem, ou
+        None se ``configure_logging`` não foi chamada
+    """
+    handler = _handler
+    if handler is None:
+        return None
+    sampled = sum(f.dropped for f in handler.filters if isinstance(f, SamplingFilter))
+    return {
+        "queued": handler.queue.qsize(),
+        "dropped": handler.dropped,
+        "sampled_out": sampled,
+    }
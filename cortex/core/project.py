@@ -0,0 +1,79 @@
+#!/usr/bin/env python3
+"""
+CORTEX Project - Detecção e contexto de projetos.
+
+Este módulo identifica o projeto associado ao workspace atual.
+"""
+import logging
+import os
+from typing import Any, Dict, Optional
+
+from cortex.storage.database import execute_query
+
+logger = logging.getLogger("cortex.core.project")
+
+
+def get_project(project_id: int) -> Optional[Dict[str, Any]]:
+    """
+    Obtém um projeto pelo ID.
+
+    Args:
+        project_id: ID do projeto
+
+    Returns:
+        Dicionário com os dados do projeto ou None se não existir
+    """
+    rows = execute_query("SELECT * FROM projects WHERE id = ?", (project_id,))
+    return rows[0] if rows else None
+
+
+def get_current_project(
+    workspace_path: Optional[str] = None,
+) -> Optional[Dict[str, Any]]:
+    """
+    Obtém o projeto cujo workspace contém o diretório informado.
+
+    Args:
+        workspace_path: Diretório de trabalho (opcional, padrão o diretório atual)
+
+    Returns:
+        Projeto ativo mais específico para o diretório ou None se não houver
+    """
+    path = os.path.abspath(workspace_path or os.getcwd())
+
+    # Candidatos: o próprio diretório e todos os seus ancestrais
+    candidates = [path]
+    while True:
+        parent = os.path.dirname(candidates[-1])
+        if parent == candidates[-1]:
+            break
+        candidates.append(parent)
+
+    placeholders = ", ".join("?" for _ in candidates)
+    rows = execute_query(
+        f"""
+        SELECT * FROM projects
+        WHERE active = 1 AND workspace_path IN ({placeholders})
+        ORDER BY LENGTH(workspace_path) DESC
+        LIMIT 1
+        """,
+        tuple(candidates),
+    )
+    return rows[0] if rows else None
+
+
+def resolve_project_id(project_id: Optional[int] = None) -> Optional[int]:
+    """
+    Resolve o projeto a usar quando o ID não é informado explicitamente.
+
+    Args:
+        project_id: ID do projeto (opcional)
+
+    Returns:
+        ID informado, ID do projeto atual ou None se nenhum for encontrado
+    """
+    if project_id is not None:
+        return project_id
+
+    project = get_current_project()
+    return project["id"] if project else None
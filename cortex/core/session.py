@@ -0,0 +1,202 @@
+#!/usr/bin/env python3
+"""
+CORTEX Session - Lógica de sessões de trabalho.
+
+Este módulo gerencia o ciclo de vida das sessões e o registro de mensagens.
+"""
+import logging
+import threading
+import time
+from typing import Any, Dict, Optional
+
+from cortex.core.config import get_config_value
+from cortex.storage.database import bulk_insert, execute_query, execute_update
+from cortex.storage.write_behind import WriteBehindQueue
+
+logger = logging.getLogger("cortex.core.session")
+
+# Colunas gravadas por record_message
+MESSAGE_COLUMNS = ["session_id", "role", "content", "token_count", "timestamp"]
+
+# Espera máxima pelas mensagens enfileiradas antes de uma leitura ou do fim
+# de uma sessão, para que uma requisição não fique presa à fila (segundos)
+REQUEST_FLUSH_TIMEOUT = 5.0
+
+# Fila de escrita de mensagens (criada sob demanda)
+_message_writer: Optional[WriteBehindQueue] = None
+_message_writer_lock = threading.Lock()
+
+
+def get_message_writer() -> Optional[WriteBehindQueue]:
+    """
+    Obtém a fila de escrita de mensagens, criando-a conforme a configuração.
+
+    Returns:
+        Fila de escrita ou None se o write-behind estiver desabilitado
+    """
+    global _message_writer
+
+    if _message_writer is not None:
+        return _message_writer
+
+    with _message_writer_lock:
+        if _message_writer is None:
+            if not get_config_value("storage.write_behind.enabled", True):
+                return None
+            flush_interval_ms = get_config_value(
+                "storage.write_behind.flush_interval_ms", 50
+            )
+            _message_writer = WriteBehindQueue(
+                "messages",
+                MESSAGE_COLUMNS,
+                max_batch=get_config_value("storage.write_behind.max_batch", 100),
+                flush_interval=flush_interval_ms / 1000,
+                max_queue=get_config_value("storage.write_behind.max_queue", 10000),
+                max_retries=get_config_value("storage.write_behind.max_retries", 10),
+            )
+        return _message_writer
+
+
+def flush_messages(timeout: Optional[float] = None) -> bool:
+    """
+    Garante que as mensagens enfileiradas estão gravadas.
+
+    Args:
+        timeout: Tempo máximo de espera em segundos
+
+    Returns:
+        True se não há mensagens pendentes
+    """
+    writer = _message_writer
+    if writer is None:
+        return True
+    return writer.flush(timeout)
+
+
+def get_active_session() -> Optional[Dict[str, Any]]:
+    """
+    Obtém a sessão ativa (a mais recente ainda não finalizada).
+
+    Returns:
+        Dicionário com os dados da sessão ou None se não houver sessão ativa
+    """
+    rows = execute_query(
+        """
+        SELECT * FROM sessions
+        WHERE end_time IS NULL
+        ORDER BY start_time DESC, id DESC
+        LIMIT 1
+        """
+    )
+    return rows[0] if rows else None
+
+
+def get_active_session_id() -> Optional[int]:
+    """
+    Obtém o ID da sessão ativa.
+
+    Consultado no banco a cada chamada (pelo índice de ``end_time``): a CLI
+    e outros processos também abrem e fecham sessões.
+
+    Returns:
+        ID da sessão ativa ou None
+    """
+    rows = execute_query(
+        """
+        SELECT id FROM sessions
+        WHERE end_time IS NULL
+        ORDER BY start_time DESC, id DESC
+        LIMIT 1
+        """
+    )
+    return rows[0]["id"] if rows else None
+
+
+def create_session(
+    title: str,
+    objective: Optional[str] = None,
+    project_id: Optional[int] = None,
+) -> Dict[str, Any]:
+    """
+    Cria uma nova sessão e a torna ativa.
+
+    Args:
+        title: Título da sessão
+        objective: Objetivo da sessão (opcional)
+        project_id: ID do projeto (opcional)
+
+    Returns:
+        Dicionário com os dados da sessão criada
+    """
+    session_id = execute_update(
+        "INSERT INTO sessions (project_id, title, objective) VALUES (?, ?, ?)",
+        (project_id, title, objective),
+    )
+    return execute_query("SELECT * FROM sessions WHERE id = ?", (session_id,))[0]
+
+
+def close_session(
+    session_id: int,
+    summary: Optional[str] = None,
+    next_session_context: Optional[str] = None,
+) -> Dict[str, Any]:
+    """
+    Finaliza uma sessão, gravando antes as mensagens pendentes.
+
+    Args:
+        session_id: ID da sessão
+        summary: Resumo da sessão (opcional)
+        next_session_context: Contexto para a próxima sessão (opcional)
+
+    Returns:
+        Dicionário com os dados da sessão finalizada
+    """
+    # Durabilidade: nenhuma mensagem da sessão fica na fila após o fim
+    if not flush_messages(REQUEST_FLUSH_TIMEOUT):
+        logger.warning(f"Sessão {session_id} finalizada com mensagens ainda na fila")
+
+    execute_update(
+        """
+        UPDATE sessions
+        SET end_time = CURRENT_TIMESTAMP, summary = ?, next_session_context = ?
+        WHERE id = ?
+        """,
+        (summary, next_session_context, session_id),
+    )
+    return execute_query("SELECT * FROM sessions WHERE id = ?", (session_id,))[0]
+
+
+def add_message(
+    session_id: int,
+    role: str,
+    content: str,
+    token_count: Optional[int] = None,
+) -> Dict[str, Any]:
+    """
+    Registra uma mensagem, via fila de escrita quando habilitada.
+
+    O timestamp é capturado no momento do registro, não no da gravação.
+
+    Args:
+        session_id: ID da sessão
+        role: Papel do remetente
+        content: Conteúdo da mensagem
+        token_count: Contagem de tokens (opcional)
+
+    Returns:
+        Dicionário com o ID (None se enfileirada), timestamp e indicação
+        se a mensagem ficou enfileirada
+    """
+    timestamp = time.strftime("%Y-%m-%d %H:%M:%S", time.gmtime())
+    row = (session_id, role, content, token_count, timestamp)
+
+    writer = get_message_writer()
+    if writer is not None and writer.submit(row):
+        return {"message_id": None, "timestamp": timestamp, "queued": True}
+
+    if writer is None:
+        message_id = bulk_insert("messages", MESSAGE_COLUMNS, [row], return_ids=True)[0]
+    else:
+        # A fila gravou diretamente (transação aberta ou fila cheia)
+        message_id = None
+    return {"message_id": message_id, "timestamp": timestamp, "queued": False}
@@ -0,0 +1,521 @@
+#!/usr/bin/env python3
+"""
+CORTEX Task - Consultas sobre a hierarquia de tarefas.
+
+A hierarquia (fase → etapa → tarefa → atividade) é indexada pela tabela de
+fechamento ``task_closure``, mantida por triggers. Subárvores, ancestrais e
+contagens de descendentes são consultas indexadas únicas, sem recursão.
+
+O progresso das tarefas pai é derivado dos agregados em ``task_rollups``,
+também mantidos por triggers: cada mudança ajusta apenas o agregado do pai
+e os totais de horas dos ancestrais. A propagação recalcula os ancestrais
+afetados do mais profundo para a raiz, uma única vez cada, custando O(altura)
+por mudança.
+"""
+import heapq
+import logging
+from typing import Any, Callable, Dict, Iterable, List, Optional, Sequence
+
+from cortex.storage.database import (
+    MAX_SQL_VARIABLES,
+    after_commit,
+    execute_query,
+    execute_update,
+    transaction,
+)
+
+logger = logging.getLogger("cortex.core.task")
+
+# Hierarquia de níveis, da raiz para as folhas
+TASK_LEVELS = ("phase", "stage", "task", "activity")
+
+# Estados válidos de uma tarefa
+TASK_STATUSES = ("not_started", "in_progress", "blocked", "completed")
+
+# Observadores de mudanças em tarefas, chamados após o commit externo com
+# (evento, task_id, dados); eventos: 'created' e 'status'. Mudanças de uma
+# transação revertida não são notificadas
+_listeners: List[Callable[[str, int, Dict[str, Any]], None]] = []
+
+
+def add_task_listener(listener: Callable[[str, int, Dict[str, Any]], None]) -> None:
+    """
+    Registra um observador de mudanças em tarefas.
+
+    Args:
+        listener: Função chamada com (evento, task_id, dados)
+    """
+    if listener not in _listeners:
+        _listeners.append(listener)
+
+
+def _notify(event: str, task_id: int, data: Dict[str, Any]) -> None:
+    def deliver() -> None:
+        for listener in _listeners:
+            try:
+                listener(event, task_id, data)
+            except Exception as e:
+                logger.error(f"Erro no observador de tarefas: {str(e)}")
+
+    if _listeners:
+        after_commit(deliver)
+
+
+def get_task(task_id: int) -> Optional[Dict[str, Any]]:
+    """
+    Obtém uma tarefa pelo ID.
+
+    Args:
+        task_id: ID da tarefa
+
+    Returns:
+        Dicionário com os dados da tarefa ou None se não existir
+    """
+    rows = execute_query("SELECT * FROM tasks WHERE id = ?", (task_id,))
+    return rows[0] if rows else None
+
+
+def get_subtree(
+    task_id: int,
+    max_depth: Optional[int] = None,
+    include_self: bool = False,
+) -> List[Dict[str, Any]]:
+    """
+    Obtém os descendentes de uma tarefa.
+
+    Args:
+        task_id: ID da tarefa raiz
+        max_depth: Profundidade máxima relativa à raiz (opcional)
+        include_self: Se deve incluir a própria tarefa
+
+    Returns:
+        Tarefas da subárvore com a coluna ``depth``, ordenadas por profundidade
+    """
+    min_depth = 0 if include_self else 1
+    params: tuple = (task_id, min_depth)
+    depth_filter = ""
+    if max_depth is not None:
+        depth_filter = "AND c.depth <= ?"
+        params += (max_depth,)
+
+    return execute_query(
+        f"""
+        SELECT t.*, c.depth AS depth FROM task_closure c
+        JOIN tasks t ON t.id = c.descendant_id
+        WHERE c.ancestor_id = ? AND c.depth >= ? {depth_filter}
+        ORDER BY c.depth, t.order_index, t.id
+        """,
+        params,
+    )
+
+
+def get_ancestors(task_id: int, include_self: bool = False) -> List[Dict[str, Any]]:
+    """
+    Obtém os ancestrais de uma tarefa.
+
+    Args:
+        task_id: ID da tarefa
+        include_self: Se deve incluir a própria tarefa
+
+    Returns:
+        Ancestrais do pai até a raiz, com a coluna ``depth``
+    """
+    return execute_query(
+        """
+        SELECT t.*, c.depth AS depth FROM task_closure c
+        JOIN tasks t ON t.id = c.ancestor_id
+        WHERE c.descendant_id = ? AND c.depth >= ?
+        ORDER BY c.depth
+        """,
+        (task_id, 0 if include_self else 1),
+    )
+
+
+def get_ancestor_ids(task_id: int) -> List[int]:
+    """
+    Obtém os IDs dos ancestrais de uma tarefa, do pai até a raiz.
+
+    Args:
+        task_id: ID da tarefa
+
+    Returns:
+        Lista de IDs
+    """
+    rows = execute_query(
+        """
+        SELECT ancestor_id FROM task_closure
+        WHERE descendant_id = ? AND depth > 0
+        ORDER BY depth
+        """,
+        (task_id,),
+    )
+    return [row["ancestor_id"] for row in rows]
+
+
+def count_descendants(task_id: int, status: Optional[str] = None) -> int:
+    """
+    Conta os descendentes de uma tarefa.
+
+    Args:
+        task_id: ID da tarefa
+        status: Conta apenas descendentes neste estado (opcional)
+
+    Returns:
+        Número de descendentes
+    """
+    if status is None:
+        rows = execute_query(
+            "SELECT COUNT(*) AS total FROM task_closure "
+            "WHERE ancestor_id = ? AND depth > 0",
+            (task_id,),
+        )
+    else:
+        rows = execute_query(
+            """
+            SELECT COUNT(*) AS total FROM task_closure c
+            JOIN tasks t ON t.id = c.descendant_id
+            WHERE c.ancestor_id = ? AND c.depth > 0 AND t.status = ?
+            """,
+            (task_id, status),
+        )
+    return rows[0]["total"]
+
+
+def is_descendant(task_id: int, ancestor_id: int) -> bool:
+    """
+    Verifica se uma tarefa está na subárvore de outra.
+
+    Args:
+        task_id: ID da tarefa
+        ancestor_id: ID do possível ancestral
+
+    Returns:
+        True se ``task_id`` descende de ``ancestor_id``
+    """
+    rows = execute_query(
+        """
+        SELECT 1 FROM task_closure
+        WHERE ancestor_id = ? AND descendant_id = ? AND depth > 0
+        """,
+        (ancestor_id, task_id),
+    )
+    return bool(rows)
+
+
+def count_tasks(
+    status: Optional[str] = None,
+    level: Optional[str] = None,
+    parent_id: Optional[int] = None,
+    project_id: Optional[int] = None,
+) -> int:
+    """
+    Conta tarefas usando os contadores mantidos, sem varrer ``tasks``.
+
+    Sem ``parent_id`` a contagem vem de ``task_counts``; com ``parent_id``
+    vem dos agregados do pai quando possível, e senão de um COUNT sobre os
+    filhos diretos (limitado pelo índice do pai).
+
+    Args:
+        status: Filtrar por status (opcional)
+        level: Filtrar por nível (opcional)
+        parent_id: Filtrar por tarefa pai (opcional)
+        project_id: Filtrar por projeto (opcional)
+
+    Returns:
+        Número de tarefas que correspondem aos filtros
+    """
+    if parent_id is None:
+        conditions = []
+        params: List[Any] = []
+        for column, value in (
+            ("project_id", project_id),
+            ("status", status),
+            ("level", level),
+        ):
+            if value is not None:
+                conditions.append(f"{column} = ?")
+                params.append(value)
+        where = f"WHERE {' AND '.join(conditions)}" if conditions else ""
+        rows = execute_query(
+            f"SELECT COALESCE(SUM(task_count), 0) AS total FROM task_counts {where}",
+            tuple(params),
+        )
+        return rows[0]["total"]
+
+    if level is None and project_id is None and status in (None, "completed"):
+        rollup = get_task_rollup(parent_id)
+        if rollup is None:
+            return 0
+        return rollup["completed_count"] if status else rollup["child_count"]
+
+    conditions = ["parent_id = ?"]
+    params = [parent_id]
+    for column, value in (
+        ("project_id", project_id),
+        ("status", status),
+        ("level", level),
+    ):
+        if value is not None:
+            conditions.append(f"{column} = ?")
+            params.append(value)
+    rows = execute_query(
+        f"SELECT COUNT(*) AS total FROM tasks WHERE {' AND '.join(conditions)}",
+        tuple(params),
+    )
+    return rows[0]["total"]
+
+
+def get_task_rollup(task_id: int) -> Optional[Dict[str, Any]]:
+    """
+    Obtém os agregados de uma tarefa.
+
+    Args:
+        task_id: ID da tarefa
+
+    Returns:
+        Contagens dos filhos, progresso ponderado e totais de horas da
+        subárvore, ou None se a tarefa não existir
+    """
+    rows = execute_query("SELECT * FROM task_rollups WHERE task_id = ?", (task_id,))
+    return rows[0] if rows else None
+
+
+def _validate_status(status: str) -> None:
+    if status not in TASK_STATUSES:
+        raise ValueError(f"Status inválido: {status}")
+
+
+def _write_task_state(
+    task_id: int,
+    status: str,
+    progress: int,
+    actual_hours: Optional[float] = None,
+) -> None:
+    """Grava status e progresso, ajustando as datas de início e conclusão."""
+    execute_update(
+        """
+        UPDATE tasks SET
+            status = ?,
+            progress = ?,
+            actual_hours = COALESCE(?, actual_hours),
+            started_at = COALESCE(
+                started_at,
+                CASE WHEN ? IN ('in_progress', 'completed') THEN CURRENT_TIMESTAMP END
+            ),
+            completed_at = CASE
+                WHEN ? = 'completed' THEN COALESCE(completed_at, CURRENT_TIMESTAMP)
+            END,
+            updated_at = CURRENT_TIMESTAMP
+        WHERE id = ?
+        """,
+        (status, progress, actual_hours, status, status, task_id),
+    )
+
+
+def _derive_state(status: str, progress: int, rollup: Dict[str, Any]) -> tuple:
+    """Deriva status e progresso de uma tarefa pai a partir dos agregados."""
+    if not rollup["child_count"]:
+        return status, progress
+
+    if rollup["completed_count"] == rollup["child_count"]:
+        return "completed", 100
+
+    derived = int(round(rollup["weighted_progress"] / rollup["weight_sum"]))
+    derived = min(derived, 99)
+    if status == "completed" or (status == "not_started" and derived > 0):
+        status = "in_progress"
+    return status, derived
+
+
+def _task_depths(task_ids: Iterable[int]) -> Dict[int, int]:
+    """Profundidade (número de ancestrais) de cada tarefa."""
+    ids = list(task_ids)
+    depths: Dict[int, int] = {}
+    for start in range(0, len(ids), MAX_SQL_VARIABLES):
+        chunk = ids[start : start + MAX_SQL_VARIABLES]
+        placeholders = ", ".join("?" for _ in chunk)
+        rows = execute_query(
+            f"""
+            SELECT descendant_id, COUNT(*) - 1 AS depth FROM task_closure
+            WHERE descendant_id IN ({placeholders})
+            GROUP BY descendant_id
+            """,
+            tuple(chunk),
+        )
+        depths.update((row["descendant_id"], row["depth"]) for row in rows)
+    return depths
+
+
+def propagate_progress(parent_ids: Iterable[int]) -> List[Dict[str, Any]]:
+    """
+    Recalcula status e progresso das tarefas pai e de seus ancestrais.
+
+    Cada tarefa é recalculada uma única vez, da mais profunda para a raiz,
+    e a subida pára assim que um ancestral não muda. Deve ser chamada dentro
+    de uma transação junto com as mudanças que a motivaram.
+
+    Args:
+        parent_ids: Tarefas cujos filhos mudaram
+
+    Returns:
+        Ancestrais alterados, com o novo status e progresso
+    """
+    heap = [
+        (-depth, task_id) for task_id, depth in _task_depths(set(parent_ids)).items()
+    ]
+    heapq.heapify(heap)
+    queued = {task_id for _, task_id in heap}
+    changed: List[Dict[str, Any]] = []
+
+    while heap:
+        neg_depth, task_id = heapq.heappop(heap)
+        rows = execute_query(
+            """
+            SELECT t.status, t.progress, t.parent_id, r.* FROM tasks t
+            JOIN task_rollups r ON r.task_id = t.id
+            WHERE t.id = ?
+            """,
+            (task_id,),
+        )
+        if not rows:
+            continue
+        task = rows[0]
+
+        status, progress = _derive_state(task["status"], task["progress"], task)
+        if (status, progress) == (task["status"], task["progress"]):
+            continue
+
+        # O trigger de task_rollups repassa a diferença para o agregado do pai
+        _write_task_state(task_id, status, progress)
+        changed.append({"task_id": task_id, "status": status, "progress": progress})
+
+        parent_id = task["parent_id"]
+        if parent_id is not None and parent_id not in queued:
+            queued.add(parent_id)
+            heapq.heappush(heap, (neg_depth + 1, parent_id))
+
+    return changed
+
+
+def create_task(
+    title: str,
+    project_id: int,
+    description: Optional[str] = None,
+    level: str = "task",
+    parent_id: Optional[int] = None,
+    status: str = "not_started",
+    jira_id: Optional[str] = None,
+    estimated_hours: Optional[float] = None,
+    propagate: bool = True,
+) -> Dict[str, Any]:
+    """
+    Cria uma tarefa e atualiza o progresso dos ancestrais.
+
+    Args:
+        title: Título da tarefa
+        project_id: ID do projeto
+        description: Descrição detalhada (opcional)
+        level: Nível da tarefa ('phase', 'stage', 'task', 'activity')
+        parent_id: ID da tarefa pai (opcional)
+        status: Estado inicial
+        jira_id: ID no Jira (opcional)
+        estimated_hours: Horas estimadas (opcional)
+        propagate: Se deve recalcular os ancestrais
+
+    Returns:
+        Tarefa criada e ancestrais alterados (``ancestors_updated``)
+    """
+    if level not in TASK_LEVELS:
+        raise ValueError(f"Nível inválido: {level}")
+    _validate_status(status)
+    progress = 100 if status == "completed" else 0
+
+    with transaction():
+        if parent_id is not None and get_task(parent_id) is None:
+            raise ValueError(f"Tarefa pai não encontrada: {parent_id}")
+
+        # A nova tarefa vai para o fim da lista dos irmãos
+        task_id = execute_update(
+            """
+            INSERT INTO tasks (
+                project_id, parent_id, title, description, level, status, progress,
+                jira_id, estimated_hours, started_at, completed_at, order_index
+            )
+            VALUES (
+                ?, ?, ?, ?, ?, ?, ?, ?, ?,
+                CASE WHEN ? IN ('in_progress', 'completed') THEN CURRENT_TIMESTAMP END,
+                CASE WHEN ? = 'completed' THEN CURRENT_TIMESTAMP END,
+                (SELECT COALESCE(MAX(order_index) + 1, 0) FROM tasks
+                 WHERE project_id = ? AND parent_id IS ?)
+            )
+            """,
+            (
+                project_id,
+                parent_id,
+                title,
+                description,
+                level,
+                status,
+                progress,
+                jira_id,
+                estimated_hours,
+                status,
+                status,
+                project_id,
+                parent_id,
+            ),
+        )
+        ancestors = propagate_progress([parent_id]) if propagate and parent_id else []
+
+    task = get_task(task_id)
+    task["ancestors_updated"] = ancestors
+    _notify("created", task_id, {"project_id": project_id})
+    for ancestor in ancestors:
+        _notify("status", ancestor["task_id"], ancestor)
+    return task
+
+
+def update_task_statuses(
+    updates: Sequence[Dict[str, Any]],
+    propagate: bool = True,
+) -> Dict[str, Any]:
+    """
+    Atualiza o status de várias tarefas numa única transação.
+
+    Os ancestrais comuns às tarefas alteradas são recalculados uma só vez.
+
+    Args:
+        updates: Itens com ``task_id``, ``status`` e, opcionalmente,
+            ``progress`` e ``actual_hours``
+        propagate: Se deve recalcular os ancestrais
+
+    Returns:
+        Tarefas atualizadas (``tasks``) e ancestrais alterados (``ancestors_updated``)
+    """
+    results: List[Dict[str, Any]] = []
+    parents = set()
+
+    with transaction():
+        for update in updates:
+            task_id, status = update["task_id"], update["status"]
+            _validate_status(status)
+            task = get_task(task_id)
+            if task is None:
+                raise ValueError(f"Tarefa não encontrada: {task_id}")
+
+            progress = update.get("progress")
+            if progress is None:
+                progress = 100 if status == "completed" else task["progress"]
+            if not 0 <= progress <= 100:
+                raise ValueError(f"Progresso inválido: {progress}")
+
+            _write_task_state(task_id, status, progress, update.get("actual_hours"))
+            results.append({"task_id": task_id, "status": status, "progress": progress})
+            if task["parent_id"] is not None:
+                parents.add(task["parent_id"])
+
+        ancestors = propagate_progress(parents) if propagate else []
+
+    for change in results + ancestors:
+        _notify("status", change["task_id"], change)
+    return {"tasks": results, "ancestors_updated": ancestors}
@@ -0,0 +1,511 @@
+#!/usr/bin/env python3
+"""
+CORTEX Task Graph - Grafo de dependências entre tarefas.
+
+Este módulo mantém em memória, por projeto, o grafo de dependências formado
+pelas relações 'blocks' e 'depends_on' de ``task_relations``. O grafo é
+carregado na primeira consulta e guarda a versão do projeto em
+``task_graph_versions``, incrementada por triggers a cada escrita que o afeta
+(em qualquer processo). Cada consulta compara a versão, uma leitura pela
+chave primária, e recarrega o grafo se ela mudou. As relações criadas e
+removidas por este módulo são aplicadas no grafo depois do COMMIT externo
+(``after_commit``), sem recarga.
+
+As arestas vão do pré-requisito para a tarefa dependente: 'A blocks B' e
+'B depends_on A' produzem ambas a aresta A → B.
+"""
+import heapq
+import logging
+import threading
+from typing import Any, Callable, Dict, List, Optional, Set, Tuple
+
+from cortex.core.task import get_task
+from cortex.storage.database import (
+    after_commit,
+    execute_query,
+    execute_update,
+    in_transaction,
+    iter_query,
+    transaction,
+)
+
+logger = logging.getLogger("cortex.core.task_graph")
+
+# Tipos de relação válidos
+RELATION_TYPES = ("blocks", "depends_on", "related_to", "duplicates")
+
+# Relações que impõem ordem de execução
+ORDERING_RELATIONS = ("blocks", "depends_on")
+
+
+class DependencyCycleError(ValueError):
+    """A relação criaria um ciclo de dependências."""
+
+    def __init__(self, cycle: List[int]) -> None:
+        super().__init__(
+            "Dependency cycle: " + " -> ".join(str(task_id) for task_id in cycle)
+        )
+        self.cycle = cycle
+
+
+def _edge(source_id: int, target_id: int, relation_type: str) -> Tuple[int, int]:
+    """Converte uma relação na aresta pré-requisito → dependente."""
+    if relation_type == "depends_on":
+        return target_id, source_id
+    return source_id, target_id
+
+
+class TaskGraph:
+    """
+    Grafo de dependências de um projeto.
+
+    Guarda, por tarefa, o status e as horas estimadas, e as listas de
+    sucessores e predecessores. Arestas repetidas são contadas, para que
+    remover uma de duas relações equivalentes mantenha a dependência.
+    ``version`` é a versão do projeto em ``task_graph_versions`` refletida
+    pelo grafo.
+    """
+
+    def __init__(self, project_id: int, version: int = 0) -> None:
+        self.project_id = project_id
+        self.version = version
+        self.status: Dict[int, str] = {}
+        self.hours: Dict[int, float] = {}
+        self.successors: Dict[int, Dict[int, int]] = {}
+        self.predecessors: Dict[int, Dict[int, int]] = {}
+
+    @classmethod
+    def load(cls, project_id: int, version: Optional[int] = None) -> "TaskGraph":
+        """
+        Carrega o grafo de um projeto a partir do banco.
+
+        Args:
+            project_id: ID do projeto
+            version: Versão lida antes da carga (padrão: lida aqui)
+
+        Returns:
+            Grafo com todas as tarefas e relações de ordem do projeto
+        """
+        # A versão é lida antes dos dados: uma escrita no meio da carga deixa
+        # o grafo com versão antiga, e a próxima consulta recarrega
+        graph = cls(
+            project_id, graph_version(project_id) if version is None else version
+        )
+        for task_id, status, hours in iter_query(
+            "SELECT id, status, estimated_hours FROM tasks WHERE project_id = ?",
+            (project_id,),
+            row_format="tuple",
+        ):
+            graph.add_node(task_id, status, hours)
+
+        for source_id, target_id, relation_type in iter_query(
+            """
+            SELECT r.source_task_id, r.target_task_id, r.relation_type
+            FROM task_relations r
+            JOIN tasks s ON s.id = r.source_task_id
+            JOIN tasks t ON t.id = r.target_task_id
+            WHERE s.project_id = ? AND t.project_id = ?
+              AND r.relation_type IN ('blocks', 'depends_on')
+            """,
+            (project_id, project_id),
+            row_format="tuple",
+        ):
+            graph.add_edge(*_edge(source_id, target_id, relation_type))
+
+        logger.debug(
+            f"Grafo do projeto {project_id} carregado: "
+            f"{len(graph.status)} tarefas, {graph.edge_count()} arestas"
+        )
+        return graph
+
+    def add_node(self, task_id: int, status: str, hours: Optional[float]) -> None:
+        self.status[task_id] = status
+        self.hours[task_id] = hours or 0.0
+        self.successors.setdefault(task_id, {})
+        self.predecessors.setdefault(task_id, {})
+
+    def add_edge(self, before: int, after: int) -> None:
+        succ = self.successors[before]
+        succ[after] = succ.get(after, 0) + 1
+        pred = self.predecessors[after]
+        pred[before] = pred.get(before, 0) + 1
+
+    def remove_edge(self, before: int, after: int) -> None:
+        for adjacency, a, b in (
+            (self.successors, before, after),
+            (self.predecessors, after, before),
+        ):
+            edges = adjacency.get(a, {})
+            if edges.get(b, 0) > 1:
+                edges[b] -= 1
+            else:
+                edges.pop(b, None)
+
+    def edge_count(self) -> int:
+        return sum(len(edges) for edges in self.successors.values())
+
+    def find_path(self, start: int, goal: int) -> Optional[List[int]]:
+        """
+        Procura um caminho de ``start`` até ``goal`` seguindo as arestas.
+
+        Args:
+            start: Tarefa de origem
+            goal: Tarefa de destino
+
+        Returns:
+            Lista de tarefas do caminho, ou None se não houver
+        """
+        if start == goal:
+            return [start]
+        parent: Dict[int, int] = {start: start}
+        stack = [start]
+        while stack:
+            node = stack.pop()
+            for nxt in self.successors.get(node, ()):
+                if nxt in parent:
+                    continue
+                parent[nxt] = node
+                if nxt == goal:
+                    path = [goal]
+                    while path[-1] != start:
+                        path.append(parent[path[-1]])
+                    path.reverse()
+                    return path
+                stack.append(nxt)
+        return None
+
+    def cycle_if_added(self, before: int, after: int) -> Optional[List[int]]:
+        """
+        Verifica se a aresta ``before`` → ``after`` fecharia um ciclo.
+
+        Returns:
+            O ciclo resultante (começando e terminando em ``before``) ou None
+        """
+        path = self.find_path(after, before)
+        return [before] + path if path else None
+
+    def find_cycle(self) -> Optional[List[int]]:
+        """
+        Procura um ciclo no grafo (DFS iterativa).
+
+        Returns:
+            Tarefas de um ciclo, repetindo a primeira no fim, ou None
+        """
+        WHITE, GRAY, BLACK = 0, 1, 2
+        color = dict.fromkeys(self.successors, WHITE)
+        for root in self.successors:
+            if color[root] != WHITE:
+                continue
+            stack: List[Tuple[int, Any]] = [(root, iter(self.successors[root]))]
+            color[root] = GRAY
+            path = [root]
+            while stack:
+                node, children = stack[-1]
+                for child in children:
+                    if color.get(child, WHITE) == GRAY:
+                        return path[path.index(child) :] + [child]
+                    if color.get(child, WHITE) == WHITE:
+                        color[child] = GRAY
+                        path.append(child)
+                        stack.append((child, iter(self.successors[child])))
+                        break
+                else:
+                    color[node] = BLACK
+                    path.pop()
+                    stack.pop()
+        return None
+
+    def topological_order(self) -> List[int]:
+        """
+        Ordena as tarefas de forma que os pré-requisitos venham antes.
+
+        Entre tarefas disponíveis ao mesmo tempo, a de menor ID vem primeiro.
+
+        Returns:
+            IDs das tarefas em ordem topológica
+
+        Raises:
+            DependencyCycleError: Se o grafo tiver um ciclo
+        """
+        indegree = {node: len(pred) for node, pred in self.predecessors.items()}
+        ready = [node for node, degree in indegree.items() if degree == 0]
+        heapq.heapify(ready)
+        order: List[int] = []
+        while ready:
+            node = heapq.heappop(ready)
+            order.append(node)
+            for nxt in self.successors[node]:
+                indegree[nxt] -= 1
+                if indegree[nxt] == 0:
+                    heapq.heappush(ready, nxt)
+
+        if len(order) != len(indegree):
+            raise DependencyCycleError(self.find_cycle() or [])
+        return order
+
+    def unblocked(self) -> List[int]:
+        """
+        Lista as tarefas não concluídas cujos pré-requisitos estão concluídos.
+
+        Returns:
+            IDs das tarefas prontas para execução, em ordem crescente
+        """
+        status = self.status
+        return sorted(
+            node
+            for node, pred in self.predecessors.items()
+            if status[node] != "completed"
+            and all(status[p] == "completed" for p in pred)
+        )
+
+    def critical_path(self, remaining_only: bool = True) -> Tuple[List[int], float]:
+        """
+        Calcula o caminho mais longo, ponderado por ``estimated_hours``.
+
+        Args:
+            remaining_only: Se tarefas concluídas contam com peso zero
+
+        Returns:
+            Tupla (tarefas do caminho crítico, total de horas)
+
+        Raises:
+            DependencyCycleError: Se o grafo tiver um ciclo
+        """
+
+        def weight(node: int) -> float:
+            if remaining_only and self.status[node] == "completed":
+                return 0.0
+            return self.hours[node]
+
+        best: Dict[int, float] = {}
+        via: Dict[int, Optional[int]] = {}
+        for node in self.topological_order():
+            start, prev = 0.0, None
+            for p in self.predecessors[node]:
+                if best[p] > start:
+                    start, prev = best[p], p
+            best[node] = start + weight(node)
+            via[node] = prev
+
+        if not best:
+            return [], 0.0
+        end = max(best, key=lambda node: (best[node], -node))
+        path = [end]
+        while via[path[-1]] is not None:
+            path.append(via[path[-1]])
+        path.reverse()
+        return path, best[end]
+
+
+# Grafos carregados, por projeto
+_graphs: Dict[int, TaskGraph] = {}
+_graphs_lock = threading.RLock()
+
+
+def graph_version(project_id: int) -> int:
+    """
+    Versão atual do grafo de um projeto (ver ``task_graph_versions``).
+
+    Args:
+        project_id: ID do projeto
+
+    Returns:
+        Versão (0 se o projeto nunca teve tarefas)
+    """
+    rows = execute_query(
+        "SELECT version FROM task_graph_versions WHERE project_id = ?", (project_id,)
+    )
+    return rows[0]["version"] if rows else 0
+
+
+def get_graph(project_id: int) -> TaskGraph:
+    """
+    Obtém o grafo de dependências de um projeto, carregando-o se necessário.
+
+    O grafo em memória é usado enquanto a versão do projeto no banco não
+    mudar. Dentro de uma transação com escritas ainda não confirmadas, o
+    grafo recarregado é só da transação e não substitui o compartilhado.
+
+    Args:
+        project_id: ID do projeto
+
+    Returns:
+        Grafo do projeto
+    """
+    version = graph_version(project_id)
+    with _graphs_lock:
+        graph = _graphs.get(project_id)
+        if graph is not None and graph.version == version:
+            return graph
+    # A carga lê o banco: fora do lock, para não bloquear as outras threads
+    graph = TaskGraph.load(project_id, version)
+    if not in_transaction():
+        with _graphs_lock:
+            current = _graphs.get(project_id)
+            if current is None or current.version < version:
+                _graphs[project_id] = graph
+    return graph
+
+
+def invalidate_graph(project_id: Optional[int] = None) -> None:
+    """
+    Descarta o grafo de um projeto (ou de todos), forçando nova carga.
+
+    Args:
+        project_id: ID do projeto (opcional, padrão todos)
+    """
+    with _graphs_lock:
+        if project_id is None:
+            _graphs.clear()
+        else:
+            _graphs.pop(project_id, None)
+
+
+def _apply_after_commit(
+    project_id: int, version: int, change: Callable[[TaskGraph], None]
+) -> None:
+    """
+    Aplica no grafo compartilhado uma escrita da transação em curso.
+
+    ``version`` é a versão lida logo após a escrita, com o lock de escrita
+    tomado; a alteração só é aplicada, depois do COMMIT, se o grafo estava
+    exatamente na versão anterior. Caso contrário (outra escrita no meio, ou
+    transação revertida), a versão não bate e a próxima consulta recarrega.
+    """
+
+    def apply() -> None:
+        with _graphs_lock:
+            graph = _graphs.get(project_id)
+            if graph is not None and graph.version == version - 1:
+                change(graph)
+                graph.version = version
+
+    after_commit(apply)
+
+
+def add_relation(
+    source_task_id: int, target_task_id: int, relation_type: str
+) -> Dict[str, Any]:
+    """
+    Cria uma relação entre duas tarefas do mesmo projeto.
+
+    Relações de ordem ('blocks', 'depends_on') que fechariam um ciclo são
+    rejeitadas antes da gravação. A verificação é feita dentro da transação
+    de escrita, sobre o grafo na versão atual do banco: nenhum outro
+    processo grava uma relação entre a verificação e o INSERT.
+
+    Args:
+        source_task_id: Tarefa de origem
+        target_task_id: Tarefa de destino
+        relation_type: 'blocks', 'depends_on', 'related_to' ou 'duplicates'
+
+    Returns:
+        Relação criada
+
+    Raises:
+        ValueError: Se as tarefas ou o tipo forem inválidos
+        DependencyCycleError: Se a relação criaria um ciclo
+    """
+    if relation_type not in RELATION_TYPES:
+        raise ValueError(f"Tipo de relação inválido: {relation_type}")
+    if source_task_id == target_task_id:
+        raise ValueError("Uma tarefa não pode se relacionar consigo mesma")
+
+    source, target = get_task(source_task_id), get_task(target_task_id)
+    if source is None or target is None:
+        missing = source_task_id if source is None else target_task_id
+        raise ValueError(f"Tarefa não encontrada: {missing}")
+    if source["project_id"] != target["project_id"]:
+        raise ValueError("As tarefas pertencem a projetos diferentes")
+    project_id = source["project_id"]
+
+    with transaction():
+        edge = None
+        if relation_type in ORDERING_RELATIONS:
+            # Com o lock de escrita tomado, a versão lida por get_graph é a
+            # final até o COMMIT (um grafo defasado é recarregado)
+            edge = _edge(source_task_id, target_task_id, relation_type)
+            cycle = get_graph(project_id).cycle_if_added(*edge)
+            if cycle:
+                raise DependencyCycleError(cycle)
+
+        relation_id = execute_update(
+            """
+            INSERT INTO task_relations (source_task_id, target_task_id, relation_type)
+            VALUES (?, ?, ?)
+            """,
+            (source_task_id, target_task_id, relation_type),
+        )
+        _apply_after_commit(
+            project_id,
+            graph_version(project_id),
+            (lambda g: g.add_edge(*edge)) if edge else (lambda g: None),
+        )
+
+    return {
+        "relation_id": relation_id,
+        "source_task_id": source_task_id,
+        "target_task_id": target_task_id,
+        "relation_type": relation_type,
+        "project_id": project_id,
+    }
+
+
+def remove_relation(relation_id: int) -> bool:
+    """
+    Remove uma relação entre tarefas.
+
+    Args:
+        relation_id: ID da relação
+
+    Returns:
+        True se a relação existia
+    """
+    rows = execute_query(
+        """
+        SELECT r.source_task_id, r.target_task_id, r.relation_type, s.project_id
+        FROM task_relations r JOIN tasks s ON s.id = r.source_task_id
+        WHERE r.id = ?
+        """,
+        (relation_id,),
+    )
+    if not rows:
+        return False
+    relation = rows[0]
+
+    edge = None
+    if relation["relation_type"] in ORDERING_RELATIONS:
+        edge = _edge(
+            relation["source_task_id"],
+            relation["target_task_id"],
+            relation["relation_type"],
+        )
+    project_id = relation["project_id"]
+
+    with transaction():
+        execute_update("DELETE FROM task_relations WHERE id = ?", (relation_id,))
+        _apply_after_commit(
+            project_id,
+            graph_version(project_id),
+            (lambda g: g.remove_edge(*edge)) if edge else (lambda g: None),
+        )
+    return True
+
+
+def get_blockers(task_id: int) -> Set[int]:
+    """
+    Obtém os pré-requisitos ainda não concluídos de uma tarefa.
+
+    Args:
+        task_id: ID da tarefa
+
+    Returns:
+        IDs dos pré-requisitos pendentes
+    """
+    task = get_task(task_id)
+    if task is None:
+        return set()
+    graph = get_graph(task["project_id"])
+    return {
+        p for p in graph.predecessors.get(task_id, ()) if graph.status[p] != "completed"
+    }
@@ -0,0 +1,141 @@
+#!/usr/bin/env python3
+"""
+CORTEX MCP Admin - Servidor HTTP local de administração.
+
+Expõe ``/metrics`` (formato de exposição do Prometheus) e ``/health`` (JSON).
+Roda em threads próprias, fora do loop asyncio do transporte stdio: as
+respostas são montadas a partir de contadores em memória e de ``stat`` nos
+arquivos do banco, sem passar pelo pool de conexões nem pelos pools de
+ferramentas. Só ``/health`` abre o banco, numa conexão somente leitura
+própria e descartável.
+"""
+import json
+import logging
+import os
+import sqlite3
+import time
+from http.server import BaseHTTPRequestHandler, ThreadingHTTPServer
+from typing import Any, Dict, Optional, Tuple
+from urllib.parse import quote
+
+from cortex.mcp.metrics import get_tool_metrics, render_prometheus
+from cortex.mcp.transport import transport_stats
+from cortex.storage.cache import response_cache_stats
+from cortex.storage.database import get_db_path
+from cortex.storage.write_behind import write_queue_stats
+
+logger = logging.getLogger("cortex.mcp.admin")
+
+# Endereço padrão: apenas a máquina local
+DEFAULT_HTTP_HOST = "127.0.0.1"
+
+# Tipo de conteúdo do formato de exposição do Prometheus
+METRICS_CONTENT_TYPE = "text/plain; version=0.0.4; charset=utf-8"
+
+# Espera máxima por um lock ao verificar o banco em /health (segundos)
+HEALTH_DB_TIMEOUT = 1.0
+
+
+def collect_metrics() -> str:
+    """
+    Métricas do processo no formato de exposição do Prometheus.
+
+    Returns:
+        Texto de ``/metrics``
+    """
+    return render_prometheus(
+        transport=transport_stats(),
+        cache=response_cache_stats(),
+        write_queues=write_queue_stats(),
+        db_path=get_db_path(),
+    )
+
+
+def check_health() -> Tuple[bool, Dict[str, Any]]:
+    """
+    Verifica se o servidor consegue atender.
+
+    Returns:
+        Tupla (saudável, detalhes com o resultado de cada verificação)
+    """
+    checks: Dict[str, Any] = {}
+
+    db_path = get_db_path()
+    start = time.perf_counter()
+    try:
+        conn = sqlite3.connect(
+            f"file:{quote(db_path)}?mode=ro", uri=True, timeout=HEALTH_DB_TIMEOUT
+        )
+        try:
+            conn.execute("SELECT 1 FROM sqlite_master LIMIT 1").fetchall()
+        finally:
+            conn.close()
+        checks["database"] = {
+            "ok": True,
+            "latency_ms": round((time.perf_counter() - start) * 1000, 3),
+        }
+    except sqlite3.Error as e:
+        checks["database"] = {"ok": False, "error": str(e)}
+
+    transport = transport_stats()
+    checks["transport"] = {"ok": transport is not None}
+    if transport is not None:
+        checks["transport"]["inflight"] = transport["inflight"]
+
+    healthy = all(check["ok"] for check in checks.values())
+    return healthy, {
+        "status": "ok" if healthy else "unavailable",
+        "pid": os.getpid(),
+        "uptime_seconds": round(time.time() - get_tool_metrics().started_at, 1),
+        "checks": checks,
+    }
+
+
+class AdminRequestHandler(BaseHTTPRequestHandler):
+    """Atende ``GET /metrics`` e ``GET /health``."""
+
+    server_version = "cortex-admin"
+
+    def do_GET(self) -> None:  # noqa: N802 (nome exigido por BaseHTTPRequestHandler)
+        path = self.path.split("?", 1)[0]
+        try:
+            if path == "/metrics":
+                self._send(200, METRICS_CONTENT_TYPE, collect_metrics())
+            elif path == "/health":
+                healthy, details = check_health()
+                self._send(
+                    200 if healthy else 503, "application/json", json.dumps(details)
+                )
+            else:
+                self._send(404, "application/json", json.dumps({"error": "Not found"}))
+        except Exception as e:
+            logger.error(f"Erro ao atender {path}: {str(e)}")
+            self._send(500, "application/json", json.dumps({"error": str(e)}))
+
+    def _send(self, status: int, content_type: str, body: str) -> None:
+        data = body.encode("utf-8")
+        self.send_response(status)
+        self.send_header("Content-Type", content_type)
+        self.send_header("Content-Length", str(len(data)))
+        self.end_headers()
+        self.wfile.write(data)
+
+    def log_message(self, format: str, *args: Any) -> None:
+        # stdout é o canal MCP; o acesso vai para o log em nível debug
+        logger.debug(f"{self.address_string()} {format % args}")
+
+
+def create_admin_server(port: int, host: Optional[str] = None) -> ThreadingHTTPServer:
+    """
+    Cria o servidor HTTP de administração (ainda sem atender).
+
+    Args:
+        port: Porta (0 escolhe uma livre)
+        host: Endereço (padrão apenas a máquina local)
+
+    Returns:
+        Servidor pronto para ``serve_forever()``
+    """
+    server = ThreadingHTTPServer((host or DEFAULT_HTTP_HOST, port), AdminRequestHandler)
+    server.daemon_threads = True
+    return server
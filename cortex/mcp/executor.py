@@ -0,0 +1,199 @@
+#!/usr/bin/env python3
+"""
+CORTEX MCP Executor - Execução das ferramentas em pools leve e pesado.
+
+Ferramentas leves (``ToolSpec.heavy`` falso) seguem o caminho direto: vão
+para o pool leve sem job, prazo nem registro. Ferramentas pesadas, como
+``scan_markers``, rodam num pool pesado separado e limitado, de modo que uma
+varredura longa nunca ocupa as threads que atendem ``record_message`` e
+``get_context``. Cada chamada pesada vira um ``Job`` (ver cortex/mcp/jobs.py)
+com prazo por ferramenta, cancelamento cooperativo e avisos de progresso.
+
+Ao esgotar o prazo, o cliente recebe o erro imediatamente e o job é marcado
+como cancelado; a thread termina no próximo ``check_cancelled()`` da
+ferramenta, revertendo a transação em andamento.
+"""
+import asyncio
+import logging
+import threading
+from concurrent.futures import ThreadPoolExecutor
+from typing import Any, Callable, Dict, List, Optional
+
+from cortex.mcp.jobs import DEFAULT_PROGRESS_INTERVAL, Job
+
+logger = logging.getLogger("cortex.mcp.executor")
+
+# Configuração padrão (sobrescrita pela chave "server" da configuração)
+DEFAULT_EXECUTOR = {
+    "max_workers": 8,  # pool leve
+    "heavy_workers": 2,  # pool pesado
+    "heavy_timeout_seconds": 120,  # prazo das pesadas sem prazo próprio
+    "tool_timeouts": {},  # prazo por ferramenta, em segundos
+    "progress_interval_ms": int(DEFAULT_PROGRESS_INTERVAL * 1000),
+}
+
+
+class ToolTimeout(Exception):
+    """Ferramenta pesada que passou do prazo; ``job`` ainda pode estar terminando."""
+
+    def __init__(self, tool: str, timeout: float, job: Job) -> None:
+        super().__init__(f"Tool {tool} timed out after {timeout:g}s")
+        self.tool = tool
+        self.timeout = timeout
+        self.job = job
+
+
+class ToolExecutor:
+    """
+    Pools de execução das ferramentas MCP.
+
+    Args:
+        config: Configuração (chaves de ``DEFAULT_EXECUTOR``)
+    """
+
+    def __init__(self, config: Optional[Dict[str, Any]] = None) -> None:
+        self.config = {**DEFAULT_EXECUTOR, **(config or {})}
+        self._light = ThreadPoolExecutor(
+            max_workers=int(self.config["max_workers"]),
+            thread_name_prefix="cortex-tool",
+        )
+        self._heavy = ThreadPoolExecutor(
+            max_workers=int(self.config["heavy_workers"]),
+            thread_name_prefix="cortex-heavy",
+        )
+        self._jobs: List[Job] = []
+        self._lock = threading.Lock()
+        self.stats = {"light": 0, "heavy": 0, "timeouts": 0, "cancelled": 0}
+
+    def timeout_for(
+        self, tool: str, default: Optional[float] = None
+    ) -> Optional[float]:
+        """
+        Prazo de uma ferramenta pesada.
+
+        Args:
+            tool: Nome da ferramenta
+            default: Prazo declarado no registro (``ToolSpec.timeout``)
+
+        Returns:
+            Prazo em segundos, ou None para esperar sem limite
+        """
+        overrides = self.config["tool_timeouts"] or {}
+        if tool in overrides:
+            return overrides[tool]
+        if default is not None:
+            return default
+        return self.config["heavy_timeout_seconds"]
+
+    async def run_light(self, func: Callable[[Any], Any], arg: Any) -> Any:
+        """Executa uma ferramenta leve no pool leve."""
+        self.stats["light"] += 1
+        return await asyncio.get_running_loop().run_in_executor(self._light, func, arg)
+
+    async def run_heavy(
+        self,
+        func: Callable[[Any], Any],
+        arg: Any,
+        tool: str,
+        timeout: Optional[float] = None,
+        key: Any = None,
+        on_progress: Optional[Callable[[Job, Dict[str, Any]], None]] = None,
+    ) -> Any:
+        """
+        Executa uma ferramenta pesada no pool pesado.
+
+        Args:
+            func: Função a executar
+            arg: Argumento da função (a requisição)
+            tool: Nome da ferramenta, para logs e mensagens
+            timeout: Prazo em segundos (None para sem limite)
+            key: Identificador usado por ``cancel`` (o ``id`` da requisição)
+            on_progress: Função chamada a cada aviso de progresso
+
+        Returns:
+            Resultado da função
+
+        Raises:
+            ToolTimeout: Se o prazo acabar; o job já foi cancelado
+        """
+        self.stats["heavy"] += 1
+        job = Job(tool, key, on_progress, self.config["progress_interval_ms"] / 1000)
+        with self._lock:
+            self._jobs.append(job)
+        job.future.add_done_callback(lambda _: self._forget(job))
+        self._heavy.submit(job.run, func, arg)
+
+        result = asyncio.wrap_future(job.future)
+        try:
+            return await asyncio.wait_for(asyncio.shield(result), timeout)
+        except asyncio.TimeoutError:
+            # O resultado tardio (em geral ToolCancelled) é descartado
+            result.add_done_callback(lambda f: f.cancelled() or f.exception())
+            job.cancel("timeout")
+            self.stats["timeouts"] += 1
+            logger.warning(
+                f"Ferramenta {tool} passou do prazo de {timeout:g}s; cancelando"
+            )
+            raise ToolTimeout(tool, timeout, job) from None
+
+    async def wait_stopped(self, job: Job) -> None:
+        """Aguarda a thread de um job terminar, ignorando o resultado."""
+        try:
+            await asyncio.wrap_future(job.future)
+        except Exception:
+            pass
+
+    def _forget(self, job: Job) -> None:
+        with self._lock:
+            if job in self._jobs:
+                self._jobs.remove(job)
+
+    def jobs(self) -> List[Dict[str, Any]]:
+        """Jobs pesados em andamento ou na fila, com o último progresso."""
+        with self._lock:
+            return [
+                {
+                    "tool": job.tool,
+                    "key": job.key,
+                    "running": job.started is not None,
+                    "cancelled": job.cancelled,
+                    "progress": job.progress,
+                }
+                for job in self._jobs
+            ]
+
+    def cancel(self, key: Any, reason: str = "cancelled") -> bool:
+        """
+        Cancela os jobs pesados de uma requisição.
+
+        Args:
+            key: ``id`` da requisição
+            reason: Motivo informado à ferramenta
+
+        Returns:
+            True se algum job em andamento foi marcado
+        """
+        with self._lock:
+            jobs = [job for job in self._jobs if job.key == key]
+        found = False
+        for job in jobs:
+            if job.cancel(reason):
+                found = True
+                self.stats["cancelled"] += 1
+                logger.info(f"Cancelamento pedido para {job.tool} ({reason})")
+        return found
+
+    def shutdown(self, cancel: bool = False) -> None:
+        """
+        Encerra os pools.
+
+        Args:
+            cancel: Se True, cancela os jobs pesados antes de aguardá-los
+        """
+        if cancel:
+            with self._lock:
+                jobs = list(self._jobs)
+            for job in jobs:
+                job.cancel("shutdown")
+        self._heavy.shutdown(wait=True)
+        self._light.shutdown(wait=True)
@@ -0,0 +1,151 @@
+#!/usr/bin/env python3
+"""
+CORTEX MCP Jobs - Cancelamento cooperativo e progresso das ferramentas pesadas.
+
+Uma ferramenta pesada roda numa thread do pool pesado associada a um ``Job``.
+A ferramenta não recebe o job como parâmetro: ela chama ``check_cancelled()``
+e ``report_progress()`` nos pontos seguros do seu laço, e as duas funções
+consultam o job da thread atual. Fora de um job (CLI, chamadas leves,
+benchmarks) ambas não fazem nada.
+
+O cancelamento é cooperativo: ``Job.cancel`` apenas marca o job, e a
+ferramenta levanta ``ToolCancelled`` no próximo ``check_cancelled()``. Se ela
+estiver dentro de ``transaction()``, a exceção reverte a transação.
+"""
+import threading
+import time
+from concurrent.futures import Future
+from typing import Any, Callable, Dict, Optional
+
+# Intervalo mínimo entre dois avisos de progresso do mesmo job (segundos)
+DEFAULT_PROGRESS_INTERVAL = 0.5
+
+_current = threading.local()
+
+
+class ToolCancelled(Exception):
+    """Ferramenta interrompida por cancelamento ou tempo esgotado."""
+
+    def __init__(self, reason: str = "cancelled") -> None:
+        super().__init__(reason)
+        self.reason = reason
+
+
+class Job:
+    """
+    Execução de uma ferramenta pesada.
+
+    Args:
+        tool: Nome da ferramenta (ou "batch")
+        key: Identificador do cliente para cancelamento e progresso (opcional)
+        on_progress: Função chamada com o progresso, na thread da ferramenta
+        progress_interval: Intervalo mínimo entre avisos de progresso
+    """
+
+    def __init__(
+        self,
+        tool: str,
+        key: Any = None,
+        on_progress: Optional[Callable[["Job", Dict[str, Any]], None]] = None,
+        progress_interval: float = DEFAULT_PROGRESS_INTERVAL,
+    ) -> None:
+        self.tool = tool
+        self.key = key
+        self.future: "Future[Any]" = Future()
+        self.progress: Dict[str, Any] = {}
+        self.reason: Optional[str] = None
+        self.submitted = time.monotonic()
+        self.started: Optional[float] = None
+        self._cancelled = threading.Event()
+        self._on_progress = on_progress
+        self._progress_interval = progress_interval
+        self._last_report = 0.0
+
+    @property
+    def cancelled(self) -> bool:
+        return self._cancelled.is_set()
+
+    def cancel(self, reason: str = "cancelled") -> bool:
+        """
+        Pede a interrupção do job.
+
+        Args:
+            reason: Motivo ("cancelled", "timeout", "shutdown")
+
+        Returns:
+            False se o job já havia terminado
+        """
+        if self.future.done():
+            return False
+        if not self._cancelled.is_set():
+            self.reason = reason
+            self._cancelled.set()
+        return True
+
+    def check(self) -> None:
+        """Levanta ``ToolCancelled`` se o job foi cancelado."""
+        if self._cancelled.is_set():
+            raise ToolCancelled(self.reason or "cancelled")
+
+    def report(
+        self, done: int, total: Optional[int] = None, message: Optional[str] = None
+    ) -> None:
+        """Registra o progresso e avisa o cliente, no máximo uma vez por intervalo."""
+        self.progress = {"done": done, "total": total, "message": message}
+        now = time.monotonic()
+        final = total is not None and done >= total
+        if self._on_progress is None or (
+            not final and now - self._last_report < self._progress_interval
+        ):
+            return
+        self._last_report = now
+        elapsed_ms = round((now - (self.started or now)) * 1000)
+        self._on_progress(self, {**self.progress, "elapsed_ms": elapsed_ms})
+
+    def run(self, func: Callable[[Any], Any], arg: Any) -> None:
+        """Executa a ferramenta na thread atual, com este job como contexto."""
+        if not self.future.set_running_or_notify_cancel():
+            return
+        self.started = time.monotonic()
+        _current.job = self
+        try:
+            # Cancelado enquanto esperava na fila: nem começa
+            self.check()
+            self.future.set_result(func(arg))
+        except BaseException as e:
+            self.future.set_exception(e)
+        finally:
+            _current.job = None
+
+
+def current_job() -> Optional[Job]:
+    """Job da thread atual, ou None fora do pool pesado."""
+    return getattr(_current, "job", None)
+
+
+def check_cancelled() -> None:
+    """
+    Ponto de cancelamento para ferramentas longas.
+
+    Levanta ``ToolCancelled`` se o job da thread atual foi cancelado; fora de
+    um job não faz nada.
+    """
+    job = current_job()
+    if job is not None:
+        job.check()
+
+
+def report_progress(
+    done: int, total: Optional[int] = None, message: Optional[str] = None
+) -> None:
+    """
+    Informa o progresso da ferramenta em execução.
+
+    Args:
+        done: Unidades concluídas (arquivos, linhas...)
+        total: Total de unidades, se conhecido
+        message: Descrição curta da etapa atual
+    """
+    job = current_job()
+    if job is not None:
+        job.report(done, total, message)
@@ -0,0 +1,429 @@
+#!/usr/bin/env python3
+"""
+CORTEX MCP Metrics - Métricas das ferramentas e exposição no formato Prometheus.
+
+``ToolMetrics`` acumula chamadas, erros e o histograma de latência de cada
+ferramenta (só a execução), mais a espera na fila por classe de prioridade e
+os descartes por prazo vencido; o registro é uma soma sob um lock curto.
+``render_prometheus`` monta o texto de ``/metrics`` a partir desses
+acumuladores e dos resumos que os demais componentes já mantêm (transporte,
+cache de respostas, filas de escrita, instrumentação de consultas), mais o
+tamanho dos arquivos do banco. Nada aqui consulta o
+SQLite: gerar as métricas não disputa o banco com as ferramentas.
+"""
+import bisect
+import math
+import os
+import threading
+import time
+from typing import Any, Dict, Iterable, List, Optional, Tuple
+
+from cortex.storage.instrumentation import LATENCY_BUCKETS_MS, get_instrumentation
+
+# Limites do histograma de latência das ferramentas, em segundos
+TOOL_BUCKETS_SECONDS = tuple(ms / 1000 for ms in LATENCY_BUCKETS_MS) + (
+    5.0,
+    10.0,
+    30.0,
+    60.0,
+)
+
+
+class _ToolStats:
+    """Acumuladores de uma ferramenta."""
+
+    __slots__ = ("calls", "errors", "total_seconds", "buckets")
+
+    def __init__(self) -> None:
+        self.calls = 0
+        self.errors = 0
+        self.total_seconds = 0.0
+        self.buckets = [0] * (len(TOOL_BUCKETS_SECONDS) + 1)
+
+
+class ToolMetrics:
+    """Contadores e histogramas de latência por ferramenta."""
+
+    def __init__(self) -> None:
+        self._tools: Dict[str, _ToolStats] = {}
+        self._waits: Dict[str, _ToolStats] = {}
+        self._shed: Dict[str, int] = {}
+        self._lock = threading.Lock()
+        self.started_at = time.time()
+
+    def record(self, tool: str, seconds: float, error: bool = False) -> None:
+        """
+        Registra uma chamada.
+
+        Args:
+            tool: Nome da ferramenta
+            seconds: Duração da chamada
+            error: Se a chamada terminou em erro
+        """
+        bucket = bisect.bisect_left(TOOL_BUCKETS_SECONDS, seconds)
+        with self._lock:
+            stats = self._tools.get(tool)
+            if stats is None:
+                stats = self._tools[tool] = _ToolStats()
+            stats.calls += 1
+            stats.total_seconds += seconds
+            stats.buckets[bucket] += 1
+            if error:
+                stats.errors += 1
+
+    def record_wait(self, priority: str, seconds: float) -> None:
+        """
+        Registra a espera de uma requisição até começar a executar.
+
+        Args:
+            priority: Classe de prioridade da requisição
+            seconds: Tempo desde a chegada (dependências e fila)
+        """
+        bucket = bisect.bisect_left(TOOL_BUCKETS_SECONDS, seconds)
+        with self._lock:
+            stats = self._waits.get(priority)
+            if stats is None:
+                stats = self._waits[priority] = _ToolStats()
+            stats.calls += 1
+            stats.total_seconds += seconds
+            stats.buckets[bucket] += 1
+
+    def record_shed(self, priority: str) -> None:
+        """Registra uma requisição descartada por prazo vencido na fila."""
+        with self._lock:
+            self._shed[priority] = self._shed.get(priority, 0) + 1
+
+    def queue_snapshot(self) -> Dict[str, Dict[str, Any]]:
+        """
+        Cópia dos acumuladores de espera.
+
+        Returns:
+            {classe: {count, shed, total_seconds, buckets}}
+        """
+        with self._lock:
+            empty = _ToolStats()
+            return {
+                priority: {
+                    "count": self._waits.get(priority, empty).calls,
+                    "shed": self._shed.get(priority, 0),
+                    "total_seconds": self._waits.get(priority, empty).total_seconds,
+                    "buckets": list(self._waits.get(priority, empty).buckets),
+                }
+                for priority in sorted(set(self._waits) | set(self._shed))
+            }
+
+    def snapshot(self) -> Dict[str, Dict[str, Any]]:
+        """
+        Cópia dos acumuladores.
+
+        Returns:
+            {ferramenta: {calls, errors, total_seconds, buckets}}
+        """
+        with self._lock:
+            return {
+                tool: {
+                    "calls": s.calls,
+                    "errors": s.errors,
+                    "total_seconds": s.total_seconds,
+                    "buckets": list(s.buckets),
+                }
+                for tool, s in self._tools.items()
+            }
+
+
+_tool_metrics = ToolMetrics()
+
+
+def get_tool_metrics() -> ToolMetrics:
+    """Métricas das ferramentas do processo."""
+    return _tool_metrics
+
+
+# Formato de exposição
+
+
+def _escape(value: str) -> str:
+    return value.replace("\\", "\\\\").replace("\n", "\\n").replace('"', '\\"')
+
+
+def _number(value: float) -> str:
+    if isinstance(value, float) and math.isinf(value):
+        return "+Inf"
+    if isinstance(value, float):
+        return repr(round(value, 6))
+    return str(value)
+
+
+class _Exposition:
+    """Acumula as linhas do texto de exposição, uma família por vez."""
+
+    def __init__(self) -> None:
+        self.lines: List[str] = []
+
+    def family(
+        self,
+        name: str,
+        kind: str,
+        help_text: str,
+        samples: Iterable[Tuple[Dict[str, str], float]],
+    ) -> None:
+        samples = list(samples)
+        if not samples:
+            return
+        self.lines.append(f"# HELP {name} {help_text}")
+        self.lines.append(f"# TYPE {name} {kind}")
+        for labels, value in samples:
+            self.sample(name, labels, value)
+
+    def sample(self, name: str, labels: Dict[str, str], value: float) -> None:
+        if labels:
+            rendered = ",".join(f'{k}="{_escape(str(v))}"' for k, v in labels.items())
+            self.lines.append(f"{name}{{{rendered}}} {_number(value)}")
+        else:
+            self.lines.append(f"{name} {_number(value)}")
+
+    def histogram(
+        self,
+        name: str,
+        help_text: str,
+        bounds: Tuple[float, ...],
+        series: Iterable[Tuple[Dict[str, str], List[int], float]],
+    ) -> None:
+        """Histograma a partir de contagens por intervalo (não cumulativas)."""
+        series = list(series)
+        if not series:
+            return
+        self.lines.append(f"# HELP {name} {help_text}")
+        self.lines.append(f"# TYPE {name} histogram")
+        for labels, buckets, total in series:
+            cumulative = 0
+            for bound, count in zip(bounds + (math.inf,), buckets):
+                cumulative += count
+                self.sample(
+                    f"{name}_bucket",
+                    {**labels, "le": _number(float(bound))},
+                    cumulative,
+                )
+            self.sample(f"{name}_sum", labels, total)
+            self.sample(f"{name}_count", labels, cumulative)
+
+
+def _file_size(path: str) -> int:
+    try:
+        return os.path.getsize(path)
+    except OSError:
+        return 0
+
+
+def render_prometheus(
+    transport: Optional[Dict[str, Any]] = None,
+    cache: Optional[Dict[str, Any]] = None,
+    write_queues: Optional[List[Dict[str, Any]]] = None,
+    db_path: Optional[str] = None,
+) -> str:
+    """
+    Monta o texto de ``/metrics`` no formato de exposição do Prometheus.
+
+    Args:
+        transport: Resumo do transporte stdio (``transport_stats``)
+        cache: Estatísticas do cache de respostas (``response_cache_stats``)
+        write_queues: Estatísticas das filas de escrita (``write_queue_stats``)
+        db_path: Caminho do banco, para os tamanhos do arquivo e do WAL
+
+    Returns:
+        Texto de exposição (versão 0.0.4)
+    """
+    out = _Exposition()
+    tools = get_tool_metrics()
+
+    out.family(
+        "cortex_uptime_seconds",
+        "gauge",
+        "Tempo desde a partida do servidor.",
+        [({}, time.time() - tools.started_at)],
+    )
+
+    # Ferramentas
+    snapshot = sorted(tools.snapshot().items())
+    out.family(
+        "cortex_tool_calls_total",
+        "counter",
+        "Chamadas de ferramentas MCP.",
+        [({"tool": tool}, s["calls"]) for tool, s in snapshot],
+    )
+    out.family(
+        "cortex_tool_errors_total",
+        "counter",
+        "Chamadas de ferramentas que terminaram em erro.",
+        [({"tool": tool}, s["errors"]) for tool, s in snapshot],
+    )
+    out.histogram(
+        "cortex_tool_duration_seconds",
+        "Duração da execução das ferramentas MCP (sem a espera na fila).",
+        TOOL_BUCKETS_SECONDS,
+        [({"tool": tool}, s["buckets"], s["total_seconds"]) for tool, s in snapshot],
+    )
+
+    # Espera até a execução, por classe de prioridade
+    waits = sorted(tools.queue_snapshot().items())
+    out.histogram(
+        "cortex_request_queue_seconds",
+        "Espera das requisições entre a chegada e o início da execução.",
+        TOOL_BUCKETS_SECONDS,
+        [
+            ({"priority": p}, w["buckets"], w["total_seconds"])
+            for p, w in waits
+            if w["count"]
+        ],
+    )
+    out.family(
+        "cortex_requests_shed_total",
+        "counter",
+        "Requisições descartadas por prazo vencido antes de executar.",
+        [({"priority": p}, w["shed"]) for p, w in waits],
+    )
+
+    # Transporte e pools
+    if transport:
+        out.family(
+            "cortex_scheduler_queued",
+            "gauge",
+            "Requisições na fila de prioridades por pool e classe.",
+            [
+                ({"pool": pool, "priority": name}, state["queued"])
+                for pool, queue in transport["scheduler"].items()
+                for name, state in queue["classes"].items()
+            ],
+        )
+        out.family(
+            "cortex_requests_total",
+            "counter",
+            "Requisições recebidas pelo transporte stdio.",
+            [({}, transport["requests"])],
+        )
+        out.family(
+            "cortex_inflight_requests",
+            "gauge",
+            "Requisições em andamento ou esperando dependências.",
+            [({}, transport["inflight"])],
+        )
+        out.family(
+            "cortex_heavy_jobs",
+            "gauge",
+            "Jobs de ferramentas pesadas por estado.",
+            [
+                ({"state": "running"}, transport["heavy_running"]),
+                ({"state": "queued"}, transport["heavy_queued"]),
+            ],
+        )
+        executor = transport["executor"]
+        out.family(
+            "cortex_tool_executions_total",
+            "counter",
+            "Execuções por pool.",
+            [
+                ({"pool": "light"}, executor["light"]),
+                ({"pool": "heavy"}, executor["heavy"]),
+            ],
+        )
+        out.family(
+            "cortex_heavy_timeouts_total",
+            "counter",
+            "Ferramentas pesadas que passaram do prazo.",
+            [({}, executor["timeouts"])],
+        )
+        out.family(
+            "cortex_heavy_cancelled_total",
+            "counter",
+            "Ferramentas pesadas canceladas pelo cliente.",
+            [({}, executor["cancelled"])],
+        )
+
+    # Cache de respostas
+    if cache:
+        out.family(
+            "cortex_cache_lookups_total",
+            "counter",
+            "Consultas ao cache de respostas por resultado.",
+            [({"result": "hit"}, cache["hits"]), ({"result": "miss"}, cache["misses"])],
+        )
+        out.family(
+            "cortex_cache_stale_total",
+            "counter",
+            "Entradas invalidadas por escritas ou idade.",
+            [({}, cache["stale"])],
+        )
+        out.family(
+            "cortex_cache_evictions_total",
+            "counter",
+            "Entradas descartadas pelo limite LRU.",
+            [({}, cache["evictions"])],
+        )
+        out.family(
+            "cortex_cache_entries",
+            "gauge",
+            "Entradas no cache de respostas.",
+            [({}, cache["entries"])],
+        )
+        out.family(
+            "cortex_cache_bytes",
+            "gauge",
+            "Tamanho aproximado do cache de respostas.",
+            [({}, cache["bytes"])],
+        )
+        if cache["hit_rate"] is not None:
+            out.family(
+                "cortex_cache_hit_ratio",
+                "gauge",
+                "Fração das consultas ao cache que acertaram.",
+                [({}, cache["hit_rate"])],
+            )
+
+    # Filas de escrita
+    if write_queues:
+        out.family(
+            "cortex_write_queue_pending",
+            "gauge",
+            "Linhas na fila de escrita ainda não gravadas.",
+            [({"table": q["table"]}, q["pending"]) for q in write_queues],
+        )
+        out.family(
+            "cortex_write_queue_rows_total",
+            "counter",
+            "Linhas gravadas pela fila de escrita.",
+            [({"table": q["table"]}, q["rows"]) for q in write_queues],
+        )
+
+    # Consultas SQL (todas as formas somadas)
+    statements = get_instrumentation().snapshot()["statements"].values()
+    if statements:
+        buckets = [sum(values) for values in zip(*(s["buckets"] for s in statements))]
+        out.family(
+            "cortex_sql_errors_total",
+            "counter",
+            "Instruções SQL que falharam.",
+            [({}, sum(s["errors"] for s in statements))],
+        )
+        out.histogram(
+            "cortex_sql_duration_seconds",
+            "Duração das instruções SQL.",
+            tuple(ms / 1000 for ms in LATENCY_BUCKETS_MS),
+            [({}, buckets, sum(s["total_ms"] for s in statements) / 1000)],
+        )
+
+    # Arquivos do banco
+    if db_path:
+        out.family(
+            "cortex_db_size_bytes",
+            "gauge",
+            "Tamanho do arquivo do banco.",
+            [({}, _file_size(db_path))],
+        )
+        out.family(
+            "cortex_wal_size_bytes",
+            "gauge",
+            "Tamanho do arquivo WAL.",
+            [({}, _file_size(db_path + "-wal"))],
+        )
+
+    return "\n".join(out.lines) + "\n"
@@ -0,0 +1,299 @@
+#!/usr/bin/env python3
+"""
+CORTEX MCP Registry - Registro declarativo das ferramentas MCP.
+
+Cada ferramenta é descrita por um ``ToolSpec`` (nome, módulo, função,
+descrição, se apenas lê o banco, se é pesada, a classe de prioridade e as
+tabelas de que a resposta depende, para o cache de respostas). Os metadados
+ficam disponíveis sem importar as implementações; o módulo de uma ferramenta
+só é importado na primeira chamada a ela, mantendo curta a partida do
+servidor.
+"""
+import importlib
+import logging
+import threading
+from typing import (
+    Any,
+    Callable,
+    Dict,
+    Iterator,
+    List,
+    Mapping,
+    NamedTuple,
+    Optional,
+    Tuple,
+)
+
+logger = logging.getLogger("cortex.mcp.registry")
+
+
+class ToolSpec(NamedTuple):
+    """
+    Descrição de uma ferramenta MCP.
+
+    ``heavy`` marca ferramentas que podem levar segundos ou minutos (varrem
+    disco ou o histórico inteiro); elas rodam no pool pesado com prazo
+    ``timeout`` (em segundos; None usa "server.heavy_timeout_seconds").
+
+    ``priority`` é a classe na fila de execução (ver cortex/mcp/scheduler.py):
+    ``interactive`` para as chamadas que o usuário espera, ``background``
+    para varreduras e recálculos que podem ceder a vez.
+
+    ``cache_tables`` lista todas as tabelas que a ferramenta lê; se não for
+    vazia, a resposta vai para o cache (ver cortex/storage/cache.py) e é
+    invalidada quando alguma dessas tabelas é escrita.
+
+    ``tables`` lista as tabelas que a ferramenta lê ou escreve e ``writes``
+    as que escreve, para a ordem de execução do transporte (ver
+    cortex/mcp/transport.py): uma requisição só espera outra que escreva
+    numa tabela que ela toca, ou que toque uma tabela que ela escreve. Sem
+    ``tables`` vale ``cache_tables``; sem nenhuma das duas, ou sem ``writes``
+    numa ferramenta que escreve, conta como todas as tabelas.
+    """
+
+    name: str
+    module: str
+    function: str
+    description: str
+    read_only: bool = False
+    heavy: bool = False
+    timeout: Optional[float] = None
+    priority: str = "normal"
+    cache_tables: Tuple[str, ...] = ()
+    tables: Tuple[str, ...] = ()
+    writes: Tuple[str, ...] = ()
+
+    def footprint(self) -> Tuple[Optional[frozenset], Optional[frozenset]]:
+        """
+        Tabelas que a ferramenta toca e as que escreve (None: todas).
+
+        Returns:
+            (tabelas lidas ou escritas, tabelas escritas)
+        """
+        tables = self.tables or self.cache_tables
+        touched = frozenset(tables) | frozenset(self.writes) if tables else None
+        if self.read_only:
+            return touched, frozenset()
+        return touched, frozenset(self.writes) if self.writes else None
+
+
+_TOOLS_PACKAGE = "cortex.mcp.tools"
+
+# Ferramentas expostas ao Cursor, na ordem em que são anunciadas
+TOOL_SPECS: List[ToolSpec] = [
+    ToolSpec(
+        "start_session",
+        "session_tools",
+        "start_session",
+        "Inicia uma nova sessão de trabalho.",
+        priority="interactive",
+        tables=("sessions", "projects"),
+        writes=("sessions",),
+    ),
+    ToolSpec(
+        "end_session",
+        "session_tools",
+        "end_session",
+        "Finaliza a sessão atual de trabalho.",
+        priority="interactive",
+        tables=("sessions", "messages", "projects"),
+        writes=("sessions", "messages"),
+    ),
+    ToolSpec(
+        "record_message",
+        "session_tools",
+        "record_message",
+        "Registra uma mensagem na sessão atual.",
+        priority="interactive",
+        tables=("sessions", "messages", "projects"),
+        writes=("messages",),
+    ),
+    ToolSpec(
+        "get_context",
+        "session_tools",
+        "get_context",
+        "Obtém o contexto de uma sessão (mensagens recentes).",
+        read_only=True,
+        priority="interactive",
+        cache_tables=("sessions", "messages", "projects", "archived_sessions"),
+    ),
+    ToolSpec("create_task", "task_tools", "create_task", "Cria uma nova tarefa."),
+    ToolSpec(
+        "update_task_status",
+        "task_tools",
+        "update_task_status",
+        "Atualiza o status de uma tarefa.",
+        priority="interactive",
+    ),
+    ToolSpec(
+        "update_task_statuses",
+        "task_tools",
+        "update_task_statuses",
+        "Atualiza o status de várias tarefas numa única transação.",
+    ),
+    ToolSpec(
+        "list_tasks",
+        "task_tools",
+        "list_tasks",
+        "Lista tarefas com filtros, paginadas por cursor.",
+        read_only=True,
+        priority="interactive",
+        cache_tables=("tasks", "task_closure", "task_counts"),
+    ),
+    ToolSpec(
+        "add_task_relation",
+        "dependency_tools",
+        "add_task_relation",
+        "Cria uma relação entre duas tarefas.",
+    ),
+    ToolSpec(
+        "get_task_order",
+        "dependency_tools",
+        "get_task_order",
+        "Ordena as tarefas do projeto respeitando as dependências.",
+        read_only=True,
+    ),
+    ToolSpec(
+        "get_unblocked_tasks",
+        "dependency_tools",
+        "get_unblocked_tasks",
+        "Lista as tarefas prontas: não concluídas e sem pré-requisitos pendentes.",
+        read_only=True,
+    ),
+    ToolSpec(
+        "get_critical_path",
+        "dependency_tools",
+        "get_critical_path",
+        "Calcula o caminho crítico do projeto, ponderado pelas horas estimadas.",
+        read_only=True,
+    ),
+    ToolSpec(
+        "get_analytics",
+        "analytics_tools",
+        "get_analytics",
+        "Executa um relatório analítico.",
+        read_only=True,
+        heavy=True,
+        priority="background",
+    ),
+    ToolSpec(
+        "scan_markers",
+        "marker_tools",
+        "scan_markers",
+        "Escaneia um projeto em busca de marcadores.",
+        heavy=True,
+        timeout=300,
+        priority="background",
+        tables=("markers", "projects"),
+        writes=("markers",),
+    ),
+    ToolSpec(
+        "detect_context",
+        "context_tools",
+        "detect_context",
+        "Detecta o contexto atual com base nas atividades recentes.",
+        read_only=True,
+        priority="background",
+        cache_tables=("contexts", "rules", "projects"),
+    ),
+    ToolSpec(
+        "add_context",
+        "context_tools",
+        "add_context",
+        "Adiciona ou atualiza um contexto para projeto ou tarefa.",
+    ),
+    ToolSpec(
+        "apply_rule", "context_tools", "apply_rule", "Aplica uma regra contextual."
+    ),
+    ToolSpec(
+        "search",
+        "search_tools",
+        "search",
+        "Busca texto em mensagens, contextos e tarefas.",
+        read_only=True,
+        priority="interactive",
+        tables=(
+            "messages",
+            "sessions",
+            "archived_sessions",
+            "contexts",
+            "tasks",
+            "projects",
+        ),
+    ),
+]
+
+
+class ToolRegistry(Mapping[str, Callable[..., Dict[str, Any]]]):
+    """
+    Mapeamento nome → função que importa cada ferramenta no primeiro acesso.
+
+    Pertinência (``in``), iteração e ``len`` usam apenas os metadados; só
+    ``registry[name]`` importa o módulo da ferramenta.
+
+    Args:
+        specs: Descrições das ferramentas
+    """
+
+    def __init__(self, specs: List[ToolSpec]) -> None:
+        self.specs: Dict[str, ToolSpec] = {spec.name: spec for spec in specs}
+        self._loaded: Dict[str, Callable[..., Dict[str, Any]]] = {}
+        self._lock = threading.Lock()
+
+    def __getitem__(self, name: str) -> Callable[..., Dict[str, Any]]:
+        func = self._loaded.get(name)
+        if func is not None:
+            return func
+        spec = self.specs[name]
+        with self._lock:
+            func = self._loaded.get(name)
+            if func is None:
+                logger.debug(f"Carregando ferramenta {name} de {spec.module}")
+                module = importlib.import_module(f"{_TOOLS_PACKAGE}.{spec.module}")
+                func = self._loaded[name] = getattr(module, spec.function)
+        return func
+
+    def __contains__(self, name: object) -> bool:
+        return name in self.specs
+
+    def __iter__(self) -> Iterator[str]:
+        return iter(self.specs)
+
+    def __len__(self) -> int:
+        return len(self.specs)
+
+    def is_loaded(self, name: str) -> bool:
+        """Indica se o módulo da ferramenta já foi importado."""
+        return name in self._loaded
+
+    def read_only_tools(self) -> frozenset:
+        """Nomes das ferramentas que apenas leem o banco."""
+        return frozenset(spec.name for spec in self.specs.values() if spec.read_only)
+
+    def heavy_tools(self) -> frozenset:
+        """Nomes das ferramentas executadas no pool pesado."""
+        return frozenset(spec.name for spec in self.specs.values() if spec.heavy)
+
+    def describe(self) -> List[Dict[str, Any]]:
+        """
+        Metadados das ferramentas, sem importar as implementações.
+
+        Returns:
+            Lista com nome, descrição, se a ferramenta é somente leitura, se é
+            pesada e a classe de prioridade
+        """
+        return [
+            {
+                "name": spec.name,
+                "description": spec.description,
+                "read_only": spec.read_only,
+                "heavy": spec.heavy,
+                "priority": spec.priority,
+            }
+            for spec in self.specs.values()
+        ]
+
+
+def tool_names() -> List[str]:
+    """Nomes das ferramentas registradas, na ordem de anúncio."""
+    return [spec.name for spec in TOOL_SPECS]
@@ -0,0 +1,323 @@
+#!/usr/bin/env python3
+"""
+CORTEX MCP Scheduler - Fila de prioridades na frente dos pools de execução.
+
+O transporte só entrega uma requisição ao pool (leve ou pesado) quando há uma
+thread livre; enquanto isso ela espera aqui, e a próxima a sair é escolhida
+por:
+
+1. Classe de prioridade (``ToolSpec.priority`` ou "server.scheduler.priorities"):
+   ``interactive`` (``get_context``, ``record_message``...) antes de
+   ``normal`` antes de ``background`` (``scan_markers``, ``detect_context``,
+   lotes grandes). Para que o trabalho de fundo não espere para sempre, a
+   classe de uma requisição sobe um nível a cada ``aging_seconds`` de espera.
+2. Justiça entre clientes: dentro da classe, os clientes (campo ``client`` da
+   requisição) são atendidos em rodízio, um pedido por vez.
+3. Prazo: dentro do cliente, o prazo mais próximo primeiro (depois, ordem de
+   chegada).
+
+Uma requisição com prazo (campo ``deadline_ms``, contado a partir da
+chegada) que vence ainda na fila é descartada sem executar: o cliente recebe
+um erro e a thread fica para quem ainda pode ser atendido a tempo.
+
+A fila só reordena requisições já liberadas pelas dependências do transporte
+(ver cortex/mcp/transport.py), que não têm tabelas em conflito entre si; o
+resultado continua o de uma execução em série na ordem de chegada. Como as
+dependências seguem as tabelas tocadas, uma chamada interativa não espera
+trabalho de fundo sem relação com ela antes de entrar na fila.
+"""
+import asyncio
+import heapq
+import itertools
+import logging
+from collections import OrderedDict
+from typing import Any, Dict, List, Optional, Tuple
+
+from cortex.mcp.jobs import ToolCancelled
+
+logger = logging.getLogger("cortex.mcp.scheduler")
+
+# Classes de prioridade, da mais urgente para a menos urgente
+PRIORITY_CLASSES = ("interactive", "normal", "background")
+DEFAULT_PRIORITY = "normal"
+
+# Cliente das requisições sem o campo "client"
+DEFAULT_CLIENT = "default"
+
+# Configuração padrão (sobrescrita pela chave "server.scheduler" da configuração)
+DEFAULT_SCHEDULER = {
+    "priorities": {},  # classe por ferramenta, acima do registro
+    "aging_seconds": 5.0,  # espera que sobe a requisição uma classe
+    "bulk_batch_items": 10,  # lotes maiores que isso rodam como background
+}
+
+
+def priority_rank(priority: Optional[str]) -> int:
+    """Posição da classe em ``PRIORITY_CLASSES`` (desconhecidas contam como normal)."""
+    try:
+        return PRIORITY_CLASSES.index(priority)
+    except ValueError:
+        return PRIORITY_CLASSES.index(DEFAULT_PRIORITY)
+
+
+class DeadlineExceeded(Exception):
+    """Requisição cujo prazo venceu antes de começar a executar."""
+
+    def __init__(self, waited: float) -> None:
+        super().__init__(
+            f"Deadline exceeded after {waited * 1000:.0f} ms in queue; "
+            "request not executed"
+        )
+        self.waited = waited
+
+
+class _Ticket:
+    """Requisição esperando uma thread."""
+
+    __slots__ = (
+        "rank",
+        "client",
+        "deadline",
+        "received",
+        "seq",
+        "key",
+        "future",
+        "timer",
+        "done",
+    )
+
+    def __init__(
+        self,
+        rank: int,
+        client: str,
+        deadline: Optional[float],
+        received: float,
+        seq: int,
+        key: Any,
+        future: "asyncio.Future[None]",
+    ) -> None:
+        self.rank = rank
+        self.client = client
+        self.deadline = deadline
+        self.received = received
+        self.seq = seq
+        self.key = key
+        self.future = future
+        self.timer: Optional[asyncio.TimerHandle] = None
+        self.done = False
+
+    def __lt__(self, other: "_Ticket") -> bool:
+        # Prazo mais próximo primeiro; sem prazo, por ordem de chegada
+        mine = self.deadline if self.deadline is not None else float("inf")
+        theirs = other.deadline if other.deadline is not None else float("inf")
+        return (mine, self.seq) < (theirs, other.seq)
+
+
+class RequestScheduler:
+    """
+    Fila de prioridades de um pool, com ``capacity`` execuções simultâneas.
+
+    Usado apenas dentro do loop asyncio do transporte (sem locks).
+
+    Args:
+        capacity: Threads do pool que a fila alimenta
+        config: Configuração (chaves de ``DEFAULT_SCHEDULER``)
+        name: Nome do pool, para os logs
+    """
+
+    def __init__(
+        self, capacity: int, config: Optional[Dict[str, Any]] = None, name: str = ""
+    ) -> None:
+        self.config = {**DEFAULT_SCHEDULER, **(config or {})}
+        self.capacity = max(1, int(capacity))
+        self.name = name
+        self._running = 0
+        # Classe → cliente → heap de tickets (OrderedDict dá o rodízio)
+        self._queues: List["OrderedDict[str, List[_Ticket]]"] = [
+            OrderedDict() for _ in PRIORITY_CLASSES
+        ]
+        self._tickets: Dict[int, _Ticket] = {}
+        self._seq = itertools.count()
+        self.stats = {
+            "admitted": [0] * len(PRIORITY_CLASSES),
+            "shed": [0] * len(PRIORITY_CLASSES),
+            "cancelled": 0,
+        }
+
+    @property
+    def running(self) -> int:
+        return self._running
+
+    def queued(self) -> List[int]:
+        """Requisições na fila por classe (pode ser lido de outra thread)."""
+        counts = [0] * len(PRIORITY_CLASSES)
+        for ticket in list(self._tickets.values()):
+            counts[ticket.rank] += 1
+        return counts
+
+    async def acquire(
+        self,
+        priority: str,
+        client: str = DEFAULT_CLIENT,
+        deadline: Optional[float] = None,
+        received: Optional[float] = None,
+        key: Any = None,
+    ) -> None:
+        """
+        Espera a vez da requisição; depois dela, chame ``release``.
+
+        Args:
+            priority: Classe de prioridade
+            client: Cliente que enviou a requisição
+            deadline: Prazo para começar, no relógio do loop (None para sem prazo)
+            received: Chegada da requisição, no relógio do loop
+            key: Identificador usado por ``cancel`` (o ``id`` da requisição)
+
+        Raises:
+            DeadlineExceeded: Se o prazo vencer antes da vez chegar
+            ToolCancelled: Se o cliente cancelar a requisição na fila
+        """
+        loop = asyncio.get_running_loop()
+        now = loop.time()
+        rank = priority_rank(priority)
+        received = now if received is None else received
+        if deadline is not None and now >= deadline:
+            self.stats["shed"][rank] += 1
+            raise DeadlineExceeded(now - received)
+        if self._running < self.capacity and not self._tickets:
+            self._running += 1
+            self.stats["admitted"][rank] += 1
+            return
+
+        ticket = _Ticket(
+            rank, client, deadline, received, next(self._seq), key, loop.create_future()
+        )
+        self._tickets[ticket.seq] = ticket
+        heapq.heappush(self._queues[rank].setdefault(client, []), ticket)
+        if deadline is not None:
+            ticket.timer = loop.call_at(deadline, self._expire, ticket)
+        try:
+            await ticket.future
+        except asyncio.CancelledError:
+            future = ticket.future
+            if future.done() and not future.cancelled() and future.exception() is None:
+                # A vez chegou junto com o cancelamento da tarefa: devolve a thread
+                self.release()
+            else:
+                self._remove(ticket)
+            raise
+
+    def release(self) -> None:
+        """Devolve a thread de uma requisição que terminou e chama a próxima."""
+        self._running -= 1
+        self._wake()
+
+    def cancel(self, key: Any, reason: str = "cancelled") -> bool:
+        """
+        Retira da fila as requisições com esse ``id``.
+
+        Returns:
+            True se alguma estava na fila (nunca para ``key`` None, que
+            identificaria todas as requisições sem ``id``)
+        """
+        if key is None:
+            return False
+        found = False
+        for ticket in [t for t in self._tickets.values() if t.key == key]:
+            self._remove(ticket)
+            ticket.future.set_exception(ToolCancelled(reason))
+            self.stats["cancelled"] += 1
+            found = True
+        return found
+
+    def _expire(self, ticket: _Ticket) -> None:
+        """Descarta uma requisição cujo prazo venceu na fila."""
+        if ticket.done:
+            return
+        self._remove(ticket)
+        waited = asyncio.get_running_loop().time() - ticket.received
+        self.stats["shed"][ticket.rank] += 1
+        logger.warning(
+            f"Requisição de {ticket.client} descartada no pool {self.name}: "
+            f"prazo vencido após {waited * 1000:.0f} ms na fila"
+        )
+        ticket.future.set_exception(DeadlineExceeded(waited))
+
+    def _remove(self, ticket: _Ticket) -> None:
+        # O ticket fica no heap e é ignorado quando chegar ao topo
+        ticket.done = True
+        self._tickets.pop(ticket.seq, None)
+        if ticket.timer is not None:
+            ticket.timer.cancel()
+
+    def _head(self, rank: int) -> Tuple[Optional[_Ticket], float]:
+        """
+        Primeiro ticket válido da classe, no rodízio de clientes, e a chegada
+        mais antiga entre as cabeças dos clientes (que mede a espera da classe).
+        """
+        clients = self._queues[rank]
+        head: Optional[_Ticket] = None
+        oldest = float("inf")
+        for client in list(clients):
+            heap = clients[client]
+            while heap and heap[0].done:
+                heapq.heappop(heap)
+            if not heap:
+                del clients[client]
+                continue
+            if head is None:
+                head = heap[0]
+            oldest = min(oldest, heap[0].received)
+        return head, oldest
+
+    def _pick(self, now: float) -> Optional[_Ticket]:
+        """Escolhe a próxima requisição: classe (com envelhecimento), cliente, prazo."""
+        aging = self.config["aging_seconds"]
+        best: Optional[_Ticket] = None
+        best_rank = None
+        for rank in range(len(PRIORITY_CLASSES)):
+            head, oldest = self._head(rank)
+            if head is None:
+                continue
+            effective = rank - int((now - oldest) / aging) if aging else rank
+            if best is None or effective < best_rank:
+                best, best_rank = head, effective
+        return best
+
+    def _wake(self) -> None:
+        """Entrega threads livres às próximas da fila."""
+        loop = asyncio.get_running_loop()
+        while self._running < self.capacity and self._tickets:
+            ticket = self._pick(loop.time())
+            if ticket is None:
+                break
+            # Próximo pedido do mesmo cliente vai para o fim do rodízio
+            clients = self._queues[ticket.rank]
+            heapq.heappop(clients[ticket.client])
+            clients.move_to_end(ticket.client)
+            self._remove(ticket)
+            self._running += 1
+            self.stats["admitted"][ticket.rank] += 1
+            ticket.future.set_result(None)
+
+    def snapshot(self) -> Dict[str, Any]:
+        """
+        Estado da fila por classe.
+
+        Returns:
+            {running, capacity, classes: {classe: {queued, admitted, shed}}, cancelled}
+        """
+        queued = self.queued()
+        return {
+            "running": self._running,
+            "capacity": self.capacity,
+            "classes": {
+                name: {
+                    "queued": queued[rank],
+                    "admitted": self.stats["admitted"][rank],
+                    "shed": self.stats["shed"][rank],
+                }
+                for rank, name in enumerate(PRIORITY_CLASSES)
+            },
+            "cancelled": self.stats["cancelled"],
+        }
@@ -4,48 +4,46 @@ CORTEX MCP Server - Implementação do servidor Model Context Protocol (MCP).
 
 Este módulo gerencia a comunicação com o Cursor via stdio.
 """
-import json
 import logging
-import os
 import sys
 import threading
 import time
 from typing import Any, Dict, List, Optional, Tuple, Union
 
-# Configuração de logs
-logging.basicConfig(
-    level=logging.INFO,
-    format="%(asctime)s - %(name)s - %(levelname)s - %(message)s",
-    handlers=[
-        logging.FileHandler(os.path.expanduser("~/.cortex/logs/server.log")),
-        logging.StreamHandler() if "--debug" in sys.argv else logging.NullHandler(),
-    ],
-)
 logger = logging.getLogger("cortex.mcp")
 
-# Garantir que o diretório de logs existe
-os.makedirs(os.path.expanduser("~/.cortex/logs"), exist_ok=True)
-
-# Importa ferramentas MCP
-from cortex.mcp.tools.session_tools import start_session, end_session, get_context, record_message
-from cortex.mcp.tools.task_tools import create_task, update_task_status, list_tasks
-from cortex.mcp.tools.marker_tools import scan_markers
-from cortex.mcp.tools.context_tools import detect_context, add_context, apply_rule
-
-# Registro de ferramentas disponíveis
-AVAILABLE_TOOLS = {
-    "start_session": start_session,
-    "end_session": end_session,
-    "record_message": record_message,
-    "get_context": get_context,
-    "create_task": create_task,
-    "update_task_status": update_task_status,
-    "list_tasks": list_tasks,
-    "scan_markers": scan_markers,
-    "detect_context": detect_context,
-    "add_context": add_context,
-    "apply_rule": apply_rule,
-}
+# As ferramentas são importadas sob demanda (ver cortex/mcp/registry.py);
+# na partida só entram os módulos de armazenamento usados pelo ciclo de vida
+from cortex.core.log import (
+    configure_logging,
+    logging_stats,
+    request_context,
+    stop_logging,
+)
+from cortex.mcp.jobs import ToolCancelled
+from cortex.mcp.metrics import get_tool_metrics
+from cortex.mcp.registry import TOOL_SPECS, ToolRegistry
+from cortex.storage.database import close_pool, in_transaction, init_db, transaction
+from cortex.storage.instrumentation import get_instrumentation, get_stats_path
+from cortex.storage.maintenance import (
+    request_finished,
+    request_started,
+    start_maintenance,
+    stop_maintenance,
+)
+
+# Registro de ferramentas disponíveis (nome → função, importada no primeiro uso)
+AVAILABLE_TOOLS = ToolRegistry(TOOL_SPECS)
+
+# Número máximo de itens num lote de requisições
+MAX_BATCH_SIZE = 100
+
+# Ferramentas que não escrevem no banco (executadas em paralelo entre si)
+READ_ONLY_TOOLS = AVAILABLE_TOOLS.read_only_tools()
+
+# Ferramentas pesadas: fora de lotes com escritas, que prenderiam o lock de
+# escrita durante toda a execução
+HEAVY_TOOLS = AVAILABLE_TOOLS.heavy_tools()
 
 
 def parse_mcp_request(request_data: Dict[str, Any]) -> Tuple[str, Dict[str, Any]]:
@@ -68,6 +66,59 @@ def parse_mcp_request(request_data: Dict[str, Any]) -> Tuple[str, Dict[str, Any]
         return "", {}
 
 
+def _call_tool(request_data: Dict[str, Any]) -> Dict[str, Any]:
+    """Valida a requisição e executa a ferramenta (exceções propagam)."""
+    tool_name, parameters = parse_mcp_request(request_data)
+
+    if not tool_name:
+        return {"error": "Tool name not provided"}
+
+    if tool_name not in AVAILABLE_TOOLS:
+        return {"error": f"Unknown tool: {tool_name}"}
+
+    # Executa a ferramenta com os parâmetros
+    request_id = request_data.get("id")
+    start = time.perf_counter()
+    failed = True
+    try:
+        with request_context(request_id, tool_name):
+            result = _execute_tool(tool_name, parameters)
+        failed = isinstance(result, dict) and "error" in result
+        return result
+    finally:
+        elapsed = time.perf_counter() - start
+        get_tool_metrics().record(tool_name, elapsed, failed)
+        # Um logger por ferramenta, para amostrar as mais frequentes
+        # ("logging.sample_rates")
+        status = "error" if failed else "ok"
+        logging.getLogger(f"cortex.mcp.calls.{tool_name}").info(
+            "Ferramenta %s: %s em %.1f ms",
+            tool_name,
+            status,
+            elapsed * 1000,
+            extra={
+                "request_id": request_id,
+                "tool": tool_name,
+                "duration_ms": round(elapsed * 1000, 3),
+                "status": status,
+            },
+        )
+
+
+def _execute_tool(tool_name: str, parameters: Dict[str, Any]) -> Dict[str, Any]:
+    """Executa uma ferramenta registrada, pelo cache de respostas se ela o usa."""
+    spec = AVAILABLE_TOOLS.specs[tool_name]
+    func = AVAILABLE_TOOLS[tool_name]
+
+    # Dentro de uma transação (lote com escritas) a leitura precisa enxergar
+    # as escritas ainda não confirmadas: nada de cache
+    if spec.cache_tables and not in_transaction():
+        from cortex.storage.cache import get_response_cache
+
+        return get_response_cache().call(tool_name, func, parameters, spec.cache_tables)
+    return func(**parameters)
+
+
 def handle_mcp_request(request_data: Dict[str, Any]) -> Dict[str, Any]:
     """
     Processa uma requisição MCP chamando a ferramenta apropriada.
@@ -78,107 +129,189 @@ def handle_mcp_request(request_data: Dict[str, Any]) -> Dict[str, Any]:
     Returns:
         Resultado da execução da ferramenta ou mensagem de erro
     """
-    tool_name, parameters = parse_mcp_request(request_data)
-    
-    if not tool_name:
-        return {"error": "Tool name not provided"}
+    # Qualquer requisição interrompe a manutenção em curso
+    request_started()
+    try:
+        return _call_tool(request_data)
+    except ToolCancelled:
+        # O transporte responde ao cliente com o motivo do cancelamento
+        raise
+    except Exception as e:
+        tool_name = request_data.get("name", "")
+        logger.error(
+            f"Erro ao executar {tool_name}: {str(e)}",
+            extra={"request_id": request_data.get("id"), "tool": tool_name},
+        )
+        return {"error": f"Error executing {tool_name}: {str(e)}"}
+    finally:
+        request_finished()
+
+
+class _BatchItemFailed(Exception):
+    """Item de lote que falhou; reverte o savepoint do item."""
     
-    if tool_name not in AVAILABLE_TOOLS:
-        return {"error": f"Unknown tool: {tool_name}"}
+    def __init__(self, result: Dict[str, Any]) -> None:
+        super().__init__(result.get("error"))
+        self.result = result
+
+
+def _run_batch_item(request_data: Any) -> Dict[str, Any]:
+    """Executa um item de lote no seu próprio savepoint."""
+    if not isinstance(request_data, dict):
+        return {"error": "Invalid request"}
     
+    tool_name = request_data.get("name", "")
+    if tool_name in HEAVY_TOOLS:
+        return {
+            "error": f"{tool_name} cannot run in a batch with writes; send it alone"
+        }
     try:
-        # Executa a ferramenta com os parâmetros
-        logger.info(f"Executando ferramenta: {tool_name}")
-        result = AVAILABLE_TOOLS[tool_name](**parameters)
-        
+        with transaction():
+            result = _call_tool(request_data)
+            if isinstance(result, dict) and "error" in result:
+                raise _BatchItemFailed(result)
         return result
+    except _BatchItemFailed as e:
+        return e.result
+    except ToolCancelled:
+        # Lote cancelado ou fora do prazo: reverte o lote inteiro
+        raise
     except Exception as e:
-        logger.error(f"Erro ao executar {tool_name}: {str(e)}")
+        logger.error(
+            f"Erro ao executar {tool_name} no lote: {str(e)}",
+            extra={"request_id": request_data.get("id"), "tool": tool_name},
+        )
         return {"error": f"Error executing {tool_name}: {str(e)}"}
 
 
-def mcp_read_request() -> Optional[Dict[str, Any]]:
+def handle_mcp_batch(requests: List[Any]) -> List[Dict[str, Any]]:
     """
-    Lê uma requisição MCP da entrada padrão.
-    
+    Processa um lote de requisições MCP numa única ida e volta.
+
+    Se o lote contém escritas, todos os itens rodam numa única transação
+    (um só COMMIT e um só fsync), cada item no seu savepoint: um item que
+    falha é revertido sozinho e os demais seguem. Leituras no lote enxergam
+    as escritas dos itens anteriores. Ferramentas pesadas são recusadas
+    nesses lotes: prenderiam o lock de escrita durante toda a execução, fora
+    do prazo e do cancelamento do pool pesado.
+
+    Args:
+        requests: Lista de requisições ``{name, parameters}``
+
     Returns:
-        Dicionário com dados da requisição ou None se não conseguir ler
+        Resultados na ordem dos itens
     """
+    if not requests:
+        return [{"error": "Empty batch"}]
+
+    if len(requests) > MAX_BATCH_SIZE:
+        return [{"error": f"Batch too large (max {MAX_BATCH_SIZE} items)"}]
+
+    has_writes = any(
+        isinstance(r, dict) and not is_read_only_tool(r.get("name", ""))
+        for r in requests
+    )
+
+    request_started()
     try:
-        line = sys.stdin.readline()
-        if not line:
-            return None
-            
-        # Tenta interpretar como JSON
-        request_data = json.loads(line)
-        return request_data
-    except json.JSONDecodeError:
-        logger.error(f"Recebido JSON inválido: {line}")
-        return None
-    except Exception as e:
-        logger.error(f"Erro ao ler requisição: {str(e)}")
-        return None
+        if not has_writes:
+            return [
+                handle_mcp_request(r)
+                if isinstance(r, dict)
+                else {"error": "Invalid request"}
+                for r in requests
+            ]
+
+        logger.info(f"Executando lote de {len(requests)} requisições numa transação")
+        try:
+            with transaction():
+                return [_run_batch_item(r) for r in requests]
+        except Exception as e:
+            logger.error(f"Erro ao confirmar lote: {str(e)}")
+            return [{"error": f"Batch transaction failed: {str(e)}"} for _ in requests]
+    finally:
+        request_finished()
 
 
-def mcp_write_response(response: Dict[str, Any]) -> bool:
+def is_read_only_tool(tool_name: str) -> bool:
     """
-    Escreve uma resposta MCP na saída padrão.
+    Indica se uma ferramenta apenas lê o banco de dados.
+    
+    Ferramentas somente leitura podem rodar em paralelo entre si; as demais
+    são serializadas na ordem de chegada.
     
     Args:
-        response: Dados da resposta
+        tool_name: Nome da ferramenta
         
     Returns:
-        True se conseguir escrever, False caso contrário
+        True se a ferramenta não escreve no banco
     """
-    try:
-        # Converte resposta para JSON
-        json_response = json.dumps(response)
-        
-        # Escreve na saída padrão
-        sys.stdout.write(json_response + "\n")
-        sys.stdout.flush()
-        
-        return True
-    except Exception as e:
-        logger.error(f"Erro ao escrever resposta: {str(e)}")
-        return False
+    return tool_name in READ_ONLY_TOOLS
 
 
 def mcp_server_loop() -> None:
-    """Loop principal do servidor MCP."""
-    logger.info("Iniciando loop do servidor MCP")
+    """
+    Loop principal do servidor MCP.
     
-    while True:
-        try:
-            # Lê requisição
-            request = mcp_read_request()
-            if request is None:
-                # Se não conseguir ler, pode significar que o cliente desconectou
-                time.sleep(0.1)
-                continue
-                
-            # Processa requisição
-            response = handle_mcp_request(request)
-            
-            # Envia resposta
-            mcp_write_response(response)
-        except KeyboardInterrupt:
-            logger.info("Servidor MCP finalizado pelo usuário")
-            break
-        except Exception as e:
-            logger.error(f"Erro no loop principal: {str(e)}")
-            # Não quebra o loop para manter o servidor rodando
+    Atende as requisições de forma assíncrona até o cliente fechar a entrada
+    padrão (EOF), quando retorna após concluir as chamadas em andamento.
+    Uma linha com um array JSON é tratada como lote (``handle_mcp_batch``).
+    Ferramentas marcadas como pesadas no registro rodam num pool separado,
+    com prazo e cancelamento (ver cortex/mcp/executor.py).
+    """
+    # asyncio só é importado quando o servidor de fato começa a atender
+    from cortex.mcp.transport import serve_stdio
+
+    serve_stdio(
+        handle_mcp_request, AVAILABLE_TOOLS.specs.get, batch_handler=handle_mcp_batch
+    )
+
+
+# Servidor HTTP de administração em execução (ver start_http_server)
+_http_server = None
 
 
-def start_http_server(port: int) -> None:
+def start_http_server(port: int, host: Optional[str] = None) -> None:
     """
     Inicia um servidor HTTP simples para debugging e administração.
     
+    Atende ``/metrics`` (Prometheus) e ``/health`` até ``stop_http_server``;
+    bloqueia, por isso roda numa thread própria.
+
     Args:
         port: Porta onde o servidor vai escutar
+        host: Endereço (padrão a chave "http_host", apenas a máquina local)
     """
-    # Implementação será adicionada mais tarde
-    pass
+    global _http_server
+
+    from cortex.core.config import get_config_value
+    from cortex.mcp.admin import create_admin_server
+
+    host = host or get_config_value("http_host", None)
+    try:
+        server = create_admin_server(port, host)
+    except OSError as e:
+        logger.error(
+            f"Não foi possível iniciar o servidor HTTP na porta {port}: {str(e)}"
+        )
+        return
+    _http_server = server
+    address, bound_port = server.server_address[:2]
+    logger.info(
+        f"Servidor HTTP de administração em http://{address}:{bound_port} "
+        "(/metrics, /health)"
+    )
+    server.serve_forever()
+
+
+def stop_http_server() -> None:
+    """Encerra o servidor HTTP de administração, se estiver ativo."""
+    global _http_server
+
+    server, _http_server = _http_server, None
+    if server is not None:
+        server.shutdown()
+        server.server_close()
 
 
 def start_server(dev_mode: bool = False, http_port: Optional[int] = None) -> None:
@@ -189,12 +322,21 @@ def start_server(dev_mode: bool = False, http_port: Optional[int] = None) -> Non
         dev_mode: Se True, ativa logs de debug e outras ferramentas
         http_port: Porta para o servidor HTTP opcional
     """
+    configure_logging(debug="--debug" in sys.argv)
     logger.info(f"Iniciando servidor CORTEX (dev_mode={dev_mode})")
     
     if dev_mode:
         logger.setLevel(logging.DEBUG)
     
-    # Inicia servidor HTTP em thread separada, se solicitado
+    # Aplica as migrações pendentes antes de qualquer ferramenta abrir o banco
+    init_db()
+
+    # Inicia servidor HTTP em thread separada, se solicitado (--port ou "http_enabled")
+    if http_port is None:
+        from cortex.core.config import get_config_value
+
+        if get_config_value("http_enabled", False):
+            http_port = get_config_value("http_port", None)
     if http_port is not None:
         logger.info(f"Iniciando servidor HTTP na porta {http_port}")
         http_thread = threading.Thread(
@@ -204,6 +346,17 @@ def start_server(dev_mode: bool = False, http_port: Optional[int] = None) -> Non
         )
         http_thread.start()
     
+    # Métricas de consultas gravadas periodicamente para `cortex status --verbose`
+    instrumentation = get_instrumentation()
+    instrumentation.persist_to(get_stats_path())
+    from cortex.storage.cache import response_cache_stats
+
+    instrumentation.add_section("response_cache", response_cache_stats)
+    instrumentation.add_section("logging", logging_stats)
+
+    # Manutenção do banco (optimize, ANALYZE, checkpoint, vacuum) nos períodos ociosos
+    start_maintenance()
+
     # Inicia o loop principal
     try:
         mcp_server_loop()
@@ -212,6 +365,18 @@ def start_server(dev_mode: bool = False, http_port: Optional[int] = None) -> Non
     except Exception as e:
         logger.error(f"Erro fatal: {str(e)}")
         sys.exit(1)
+    finally:
+        # Grava as escritas pendentes e fecha as conexões com o banco de dados
+        from cortex.storage.analytics import close_analytics
+        from cortex.storage.write_behind import shutdown_write_queues
+
+        stop_http_server()
+        stop_maintenance()
+        close_analytics()
+        shutdown_write_queues()
+        instrumentation.stop_persisting()
+        close_pool()
+        stop_logging()
 
 
 if __name__ == "__main__":
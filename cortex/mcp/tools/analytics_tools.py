@@ -0,0 +1,69 @@
+#!/usr/bin/env python3
+"""
+CORTEX Analytics Tools - Ferramentas MCP para relatórios analíticos.
+
+Este módulo expõe os relatórios de produtividade e métricas, executados no
+caminho de leitura analítico (conexão somente leitura numa thread própria).
+"""
+import logging
+from concurrent.futures import TimeoutError as FutureTimeoutError
+from typing import Any, Dict, Optional
+
+from cortex.core.project import resolve_project_id
+from cortex.storage.analytics import REPORTS, run_report
+
+logger = logging.getLogger("cortex.mcp.tools.analytics")
+
+# Espera máxima por um relatório, em segundos
+REPORT_TIMEOUT = 30.0
+
+
+def get_analytics(
+    report: str,
+    project_id: Optional[int] = None,
+    days: Optional[int] = None,
+    threshold: Optional[float] = None,
+    limit: Optional[int] = None,
+) -> Dict[str, Any]:
+    """
+    Executa um relatório analítico.
+
+    Args:
+        report: 'productivity_trends', 'problem_files', 'task_progress',
+            'marker_hotspots' ou 'system_performance'
+        project_id: ID do projeto (opcional, padrão o projeto atual)
+        days: Janela em dias (relatórios por período)
+        threshold: Pontuação mínima (problem_files)
+        limit: Número máximo de linhas (marker_hotspots)
+
+    Returns:
+        Linhas do relatório
+    """
+    logger.info(f"Executando relatório analítico: {report}")
+
+    if report not in REPORTS:
+        return {"error": f"Unknown report: {report}", "reports": sorted(REPORTS)}
+
+    params: Dict[str, Any] = {"days": days, "threshold": threshold, "limit": limit}
+    if "project_id" in REPORTS[report][1]:
+        project_id = resolve_project_id(project_id)
+        if project_id is None:
+            return {"error": "No active project"}
+        params["project_id"] = project_id
+
+    try:
+        rows = run_report(report, timeout=REPORT_TIMEOUT, **params)
+    except FutureTimeoutError:
+        # No Python 3.10 é diferente do TimeoutError embutido; o relatório
+        # já foi abortado na thread analítica
+        return {"error": f"Report {report} timed out"}
+    except Exception as e:
+        logger.error(f"Erro no relatório {report}: {str(e)}")
+        return {"error": f"Error running report {report}: {str(e)}"}
+
+    return {
+        "report": report,
+        "project_id": project_id,
+        "rows": rows,
+        "total_count": len(rows),
+    }
@@ -0,0 +1,141 @@
+#!/usr/bin/env python3
+"""
+CORTEX Dependency Tools - Ferramentas MCP para dependências entre tarefas.
+
+Este módulo expõe o grafo de dependências em memória: criação de relações
+com detecção de ciclos, ordem topológica, tarefas desbloqueadas e caminho
+crítico.
+"""
+import logging
+from typing import Any, Dict, List, Optional
+
+from cortex.core.project import resolve_project_id
+from cortex.core.task_graph import DependencyCycleError, add_relation, get_graph
+from cortex.storage.database import MAX_SQL_VARIABLES, iter_query
+
+logger = logging.getLogger("cortex.mcp.tools.dependency")
+
+
+def _describe(task_ids: List[int]) -> List[Dict[str, Any]]:
+    """Obtém título, status e horas das tarefas, na ordem informada."""
+    found: Dict[int, Dict[str, Any]] = {}
+    for start in range(0, len(task_ids), MAX_SQL_VARIABLES):
+        chunk = task_ids[start : start + MAX_SQL_VARIABLES]
+        placeholders = ", ".join("?" for _ in chunk)
+        for task_id, title, status, hours in iter_query(
+            "SELECT id, title, status, estimated_hours FROM tasks "
+            f"WHERE id IN ({placeholders})",
+            tuple(chunk),
+            row_format="tuple",
+        ):
+            found[task_id] = {
+                "task_id": task_id,
+                "title": title,
+                "status": status,
+                "estimated_hours": hours,
+            }
+    return [found[task_id] for task_id in task_ids if task_id in found]
+
+
+def add_task_relation(
+    source_task_id: int, target_task_id: int, relation_type: str = "blocks"
+) -> Dict[str, Any]:
+    """
+    Cria uma relação entre duas tarefas.
+
+    Args:
+        source_task_id: Tarefa de origem
+        target_task_id: Tarefa de destino
+        relation_type: 'blocks', 'depends_on', 'related_to' ou 'duplicates'
+
+    Returns:
+        Relação criada, ou erro com o ciclo que ela criaria
+    """
+    logger.info(
+        f"Relacionando tarefas {source_task_id} -{relation_type}-> {target_task_id}"
+    )
+
+    try:
+        return add_relation(source_task_id, target_task_id, relation_type)
+    except DependencyCycleError as e:
+        return {"error": str(e), "cycle": e.cycle}
+    except ValueError as e:
+        return {"error": str(e)}
+
+
+def get_task_order(
+    project_id: Optional[int] = None, include_completed: bool = False
+) -> Dict[str, Any]:
+    """
+    Ordena as tarefas do projeto respeitando as dependências.
+
+    Args:
+        project_id: ID do projeto (opcional, padrão o projeto atual)
+        include_completed: Se deve incluir tarefas concluídas
+
+    Returns:
+        IDs das tarefas em ordem topológica
+    """
+    project_id = resolve_project_id(project_id)
+    if project_id is None:
+        return {"error": "No active project"}
+
+    graph = get_graph(project_id)
+    try:
+        order = graph.topological_order()
+    except DependencyCycleError as e:
+        return {"error": str(e), "cycle": e.cycle}
+
+    if not include_completed:
+        order = [task_id for task_id in order if graph.status[task_id] != "completed"]
+    return {"project_id": project_id, "order": order, "total_count": len(order)}
+
+
+def get_unblocked_tasks(
+    project_id: Optional[int] = None, limit: int = 50
+) -> Dict[str, Any]:
+    """
+    Lista as tarefas prontas: não concluídas e sem pré-requisitos pendentes.
+
+    Args:
+        project_id: ID do projeto (opcional, padrão o projeto atual)
+        limit: Número máximo de tarefas a retornar
+
+    Returns:
+        Tarefas desbloqueadas com título e status
+    """
+    project_id = resolve_project_id(project_id)
+    if project_id is None:
+        return {"error": "No active project"}
+
+    unblocked = get_graph(project_id).unblocked()
+    return {
+        "project_id": project_id,
+        "tasks": _describe(unblocked[:limit]),
+        "total_count": len(unblocked),
+    }
+
+
+def get_critical_path(
+    project_id: Optional[int] = None, remaining_only: bool = True
+) -> Dict[str, Any]:
+    """
+    Calcula o caminho crítico do projeto, ponderado pelas horas estimadas.
+
+    Args:
+        project_id: ID do projeto (opcional, padrão o projeto atual)
+        remaining_only: Se tarefas concluídas contam com zero horas
+
+    Returns:
+        Tarefas do caminho crítico e o total de horas
+    """
+    project_id = resolve_project_id(project_id)
+    if project_id is None:
+        return {"error": "No active project"}
+
+    try:
+        path, hours = get_graph(project_id).critical_path(remaining_only)
+    except DependencyCycleError as e:
+        return {"error": str(e), "cycle": e.cycle}
+
+    return {"project_id": project_id, "path": _describe(path), "total_hours": hours}
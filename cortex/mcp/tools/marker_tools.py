@@ -5,11 +5,209 @@ CORTEX Marker Tools - Ferramentas MCP para gestão de marcadores.
 Este módulo implementa as ferramentas MCP relacionadas a marcadores de código.
 """
 import logging
-from typing import Dict, Any, List, Optional
+import os
+import re
+from typing import Any, Dict, List, Optional, Tuple
+
+from cortex.core.project import resolve_project_id
+from cortex.mcp.jobs import check_cancelled, report_progress
+from cortex.storage.database import (
+    bulk_insert,
+    execute_many,
+    execute_query,
+    transaction,
+)
 
 logger = logging.getLogger("cortex.mcp.tools.marker")
 
-# TODO: Implementar corretamente as funções
+# Tipos de marcadores reconhecidos por padrão
+DEFAULT_MARKER_TYPES = ["TODO", "FIXME", "NOTE"]
+
+# Extensões de arquivo escaneadas por padrão
+DEFAULT_FILE_TYPES = [
+    ".py",
+    ".js",
+    ".jsx",
+    ".ts",
+    ".tsx",
+    ".java",
+    ".go",
+    ".rs",
+    ".c",
+    ".h",
+    ".cpp",
+    ".hpp",
+    ".cs",
+    ".rb",
+    ".php",
+    ".sh",
+    ".sql",
+    ".md",
+    ".yaml",
+    ".yml",
+    ".toml",
+]
+
+# Diretórios nunca escaneados
+IGNORED_DIRS = {
+    ".git",
+    ".hg",
+    ".svn",
+    "node_modules",
+    "__pycache__",
+    ".venv",
+    "venv",
+    ".mypy_cache",
+    ".pytest_cache",
+    ".tox",
+    "dist",
+    "build",
+}
+
+# Linhas de contexto antes/depois do marcador
+CONTEXT_LINES = 1
+
+
+def _iter_files(directories: List[str], file_types: List[str]):
+    """Percorre os diretórios devolvendo os arquivos com as extensões pedidas."""
+    extensions = tuple(ext if ext.startswith(".") else f".{ext}" for ext in file_types)
+    for directory in directories:
+        for root, dirs, files in os.walk(directory):
+            dirs[:] = [d for d in dirs if d not in IGNORED_DIRS]
+            for name in files:
+                if name.endswith(extensions):
+                    yield os.path.join(root, name)
+
+
+def _find_markers_in_file(
+    file_path: str, pattern: "re.Pattern[str]"
+) -> List[Dict[str, Any]]:
+    """
+    Extrai os marcadores de um arquivo.
+
+    Args:
+        file_path: Caminho do arquivo
+        pattern: Expressão regular com os grupos (tipo, conteúdo)
+
+    Returns:
+        Lista de marcadores encontrados no arquivo
+    """
+    try:
+        with open(file_path, "r", encoding="utf-8", errors="ignore") as f:
+            lines = f.read().splitlines()
+    except OSError as e:
+        logger.warning(f"Não foi possível ler {file_path}: {str(e)}")
+        return []
+
+    relative_path = os.path.relpath(file_path)
+    markers = []
+    for index, line in enumerate(lines):
+        match = pattern.search(line)
+        if not match:
+            continue
+        start = max(0, index - CONTEXT_LINES)
+        end = min(len(lines), index + CONTEXT_LINES + 1)
+        markers.append(
+            {
+                "marker_type": match.group(1),
+                "content": match.group(2).strip(),
+                "file_path": relative_path,
+                "line_number": index + 1,
+                "context": "\n".join(lines[start:end]),
+            }
+        )
+    return markers
+
+
+def _persist_markers(
+    project_id: int,
+    found: List[Dict[str, Any]],
+    scanned_files: List[str],
+) -> None:
+    """
+    Sincroniza os marcadores encontrados com o banco numa única transação.
+
+    Marcadores novos são inseridos em lote, marcadores que mudaram de linha são
+    atualizados e marcadores que desapareceram dos arquivos escaneados são
+    marcados como resolvidos.
+
+    Args:
+        project_id: ID do projeto
+        found: Marcadores encontrados (recebem o campo ``marker_id``)
+        scanned_files: Caminhos relativos dos arquivos escaneados
+    """
+    scanned = set(scanned_files)
+
+    with transaction():
+        # Um mesmo texto pode aparecer várias vezes no mesmo arquivo
+        existing: Dict[Tuple[str, str, str], List[Dict[str, Any]]] = {}
+        for row in execute_query(
+            """
+            SELECT id, marker_type, content, file_path, line_number
+            FROM markers
+            WHERE project_id = ? AND resolved_at IS NULL
+            """,
+            (project_id,),
+        ):
+            if row["file_path"] in scanned:
+                key = (row["file_path"], row["marker_type"], row["content"])
+                existing.setdefault(key, []).append(row)
+
+        new_markers = []
+        moved = []
+        for marker in found:
+            key = (marker["file_path"], marker["marker_type"], marker["content"])
+            candidates = existing.get(key)
+            if not candidates:
+                new_markers.append(marker)
+                continue
+            current = candidates.pop(0)
+            marker["marker_id"] = current["id"]
+            if current["line_number"] != marker["line_number"]:
+                moved.append((marker["line_number"], marker["context"], current["id"]))
+
+        ids = bulk_insert(
+            "markers",
+            [
+                "project_id",
+                "marker_type",
+                "content",
+                "file_path",
+                "line_number",
+                "context",
+            ],
+            [
+                (
+                    project_id,
+                    m["marker_type"],
+                    m["content"],
+                    m["file_path"],
+                    m["line_number"],
+                    m["context"],
+                )
+                for m in new_markers
+            ],
+            return_ids=True,
+        )
+        for marker, marker_id in zip(new_markers, ids):
+            marker["marker_id"] = marker_id
+
+        if moved:
+            execute_many(
+                "UPDATE markers SET line_number = ?, context = ? WHERE id = ?", moved
+            )
+        resolved = [(row["id"],) for rows in existing.values() for row in rows]
+        if resolved:
+            execute_many(
+                "UPDATE markers SET resolved_at = CURRENT_TIMESTAMP WHERE id = ?",
+                resolved,
+            )
+
+    logger.info(
+        f"Marcadores sincronizados: {len(new_markers)} novos, "
+        f"{len(moved)} movidos, {len(resolved)} resolvidos"
+    )
+
 
 def scan_markers(
     directories: Optional[List[str]] = None,
@@ -19,61 +217,57 @@ def scan_markers(
 ) -> Dict[str, Any]:
     """
     Escaneia um projeto em busca de marcadores.
-    
+
     Args:
         directories: Lista de diretórios a escanear (opcional)
         file_types: Lista de extensões de arquivo a considerar (opcional)
         marker_types: Tipos de marcadores a buscar (opcional, padrão todos)
         project_id: ID do projeto (opcional, se não fornecido usa o projeto atual)
-        
+
     Returns:
         Marcadores encontrados agrupados por tipo
     """
     logger.info(f"Escaneando marcadores em {directories or 'diretório atual'}")
-    
-    # TODO: Implementar a lógica real
+
+    directories = directories or [os.getcwd()]
+    file_types = file_types or DEFAULT_FILE_TYPES
+    marker_types = marker_types or DEFAULT_MARKER_TYPES
+
+    pattern = re.compile(
+        r"\b(" + "|".join(re.escape(t) for t in marker_types) + r")\b[:\s-]*(.*)$"
+    )
+
+    found: List[Dict[str, Any]] = []
+    scanned_files: List[str] = []
+    for file_path in _iter_files(directories, file_types):
+        # Pontos seguros: nada foi gravado ainda
+        check_cancelled()
+        scanned_files.append(os.path.relpath(file_path))
+        found.extend(_find_markers_in_file(file_path, pattern))
+        report_progress(len(scanned_files), message=f"{len(found)} marcadores")
+
+    # Só persiste se houver um projeto associado
+    check_cancelled()
+    project_id = resolve_project_id(project_id)
+    if project_id is not None:
+        _persist_markers(project_id, found, scanned_files)
+
+    markers: Dict[str, List[Dict[str, Any]]] = {t: [] for t in marker_types}
+    for marker in found:
+        markers[marker["marker_type"]].append(
+            {
+                "marker_id": marker.get("marker_id"),
+                "content": marker["content"],
+                "file_path": marker["file_path"],
+                "line_number": marker["line_number"],
+                "context": marker["context"],
+            }
+        )
+
     return {
-        "project_id": project_id or 1,
-        "markers": {
-            "TODO": [
-                {
-                    "marker_id": 1,
-                    "content": "Implementar validação de entrada",
-                    "file_path": "cortex/mcp/server.py",
-                    "line_number": 42,
-                    "context": "def parse_request(request):\n    # TODO: Implementar validação de entrada\n    return request",
-                },
-                {
-                    "marker_id": 2,
-                    "content": "Adicionar testes unitários",
-                    "file_path": "cortex/mcp/tools/session_tools.py",
-                    "line_number": 15,
-                    "context": "# TODO: Adicionar testes unitários",
-                },
-            ],
-            "FIXME": [
-                {
-                    "marker_id": 3,
-                    "content": "Corrigir bug na propagação de status",
-                    "file_path": "cortex/core/task.py",
-                    "line_number": 78,
-                    "context": "# FIXME: Corrigir bug na propagação de status",
-                },
-            ],
-            "NOTE": [
-                {
-                    "marker_id": 4,
-                    "content": "Esta função pode ser otimizada",
-                    "file_path": "cortex/storage/database.py",
-                    "line_number": 123,
-                    "context": "# NOTE: Esta função pode ser otimizada",
-                },
-            ],
-        },
-        "counts": {
-            "TODO": 2,
-            "FIXME": 1,
-            "NOTE": 1,
-        },
-        "total_count": 4,
-    } 
\ No newline at end of file
+        "project_id": project_id,
+        "markers": markers,
+        "counts": {t: len(items) for t, items in markers.items()},
+        "total_count": len(found),
+        "files_scanned": len(scanned_files),
+    }
@@ -0,0 +1,69 @@
+#!/usr/bin/env python3
+"""
+CORTEX Search Tools - Ferramentas MCP para busca no histórico.
+
+Este módulo implementa a ferramenta MCP de busca de texto completo.
+"""
+import logging
+from typing import Any, Dict, List, Optional
+
+from cortex.core.session import REQUEST_FLUSH_TIMEOUT, flush_messages
+from cortex.storage.search import SEARCH_SCOPES
+from cortex.storage.search import search as fts_search
+
+logger = logging.getLogger("cortex.mcp.tools.search")
+
+
+def search(
+    query: str,
+    scopes: Optional[List[str]] = None,
+    project_id: Optional[int] = None,
+    limit: int = 20,
+    prefix: bool = True,
+) -> Dict[str, Any]:
+    """
+    Busca texto em mensagens, contextos e tarefas.
+
+    Args:
+        query: Texto a buscar
+        scopes: Escopos ('messages', 'contexts', 'tasks'; opcional, padrão todos)
+        project_id: Restringe a busca a um projeto (opcional)
+        limit: Número máximo de resultados
+        prefix: Se a última palavra deve casar por prefixo
+
+    Returns:
+        Resultados ordenados por relevância com trechos destacados
+    """
+    logger.info(f"Buscando: {query}")
+
+    if scopes is None or "messages" in scopes:
+        # Leitura consistente com as escritas: grava as mensagens ainda na fila
+        if not flush_messages(REQUEST_FLUSH_TIMEOUT):
+            logger.warning("Mensagens ainda na fila; a leitura pode não incluí-las")
+
+    try:
+        results = fts_search(query, scopes, project_id, limit, prefix)
+    except ValueError as e:
+        return {"error": str(e)}
+
+    return {
+        "query": query,
+        "scopes": scopes or list(SEARCH_SCOPES),
+        "results": [
+            {
+                "scope": r["scope"],
+                "id": r["id"],
+                "session_id": r["session_id"],
+                "project_id": r["project_id"],
+                "title": r["title"],
+                "timestamp": r["timestamp"],
+                # bm25 sem arredondar: resultados próximos não empatam
+                # (comparável só dentro do mesmo escopo)
+                "score": -r["rank"],
+                "relevance": r["relevance"],
+                "snippet": r["snippet"],
+            }
+            for r in results
+        ],
+        "total_count": len(results),
+    }
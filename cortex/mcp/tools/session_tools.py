@@ -5,115 +5,183 @@ CORTEX Session Tools - Ferramentas MCP para gestão de sessões.
 Este módulo implementa as ferramentas MCP relacionadas a sessões de trabalho.
 """
 import logging
+from datetime import datetime
 from typing import Dict, Any, List, Optional
 
+from cortex.core.project import get_project, resolve_project_id
+from cortex.core.session import (
+    REQUEST_FLUSH_TIMEOUT,
+    add_message,
+    close_session,
+    create_session,
+    flush_messages,
+    get_active_session,
+    get_active_session_id,
+)
+from cortex.storage.archive import get_archived_messages, get_archived_session
+from cortex.storage.database import execute_query, iter_query
+
 logger = logging.getLogger("cortex.mcp.tools.session")
 
-# TODO: Implementar corretamente as funções
+
+def _duration_minutes(start_time: str, end_time: str) -> int:
+    """Calcula a duração em minutos entre dois timestamps do SQLite."""
+    fmt = "%Y-%m-%d %H:%M:%S"
+    delta = datetime.strptime(end_time, fmt) - datetime.strptime(start_time, fmt)
+    return int(delta.total_seconds() // 60)
+
 
 def start_session(title: str, objective: Optional[str] = None, project_id: Optional[int] = None) -> Dict[str, Any]:
     """
     Inicia uma nova sessão de trabalho.
-    
+
     Args:
         title: Título da sessão
         objective: Objetivo da sessão (opcional)
         project_id: ID do projeto (opcional, se não fornecido usa o projeto atual)
-        
+
     Returns:
         Informações sobre a sessão criada
     """
     logger.info(f"Iniciando sessão: {title}")
-    
-    # TODO: Implementar a lógica real
+
+    session = create_session(title, objective, resolve_project_id(project_id))
     return {
-        "session_id": 1,
-        "title": title,
-        "objective": objective,
-        "project_id": project_id or 1,
-        "start_time": "2024-07-07T15:30:00Z",
+        "session_id": session["id"],
+        "title": session["title"],
+        "objective": session["objective"],
+        "project_id": session["project_id"],
+        "start_time": session["start_time"],
     }
 
 
 def end_session(summary: Optional[str] = None, next_session_notes: Optional[str] = None) -> Dict[str, Any]:
     """
     Finaliza a sessão atual de trabalho.
-    
+
     Args:
         summary: Resumo do que foi realizado na sessão
         next_session_notes: Notas para a próxima sessão
-        
+
     Returns:
         Informações sobre a sessão finalizada
     """
     logger.info("Finalizando sessão atual")
-    
-    # TODO: Implementar a lógica real
+
+    session_id = get_active_session_id()
+    if session_id is None:
+        return {"error": "No active session"}
+
+    session = close_session(
+        session_id, summary or "Sessão finalizada", next_session_notes
+    )
     return {
-        "session_id": 1,
-        "end_time": "2024-07-07T16:30:00Z",
-        "duration_minutes": 60,
-        "summary": summary or "Sessão finalizada",
-        "next_session_context": next_session_notes,
+        "session_id": session["id"],
+        "end_time": session["end_time"],
+        "duration_minutes": _duration_minutes(
+            session["start_time"], session["end_time"]
+        ),
+        "summary": session["summary"],
+        "next_session_context": session["next_session_context"],
     }
 
 
 def record_message(role: str, content: str, token_count: Optional[int] = None) -> Dict[str, Any]:
     """
     Registra uma mensagem na sessão atual.
-    
+
+    A mensagem é enfileirada e gravada em lote em segundo plano; por isso
+    ``message_id`` pode ser None na resposta.
+
     Args:
         role: Papel do remetente ('user', 'assistant', 'system')
         content: Conteúdo da mensagem
         token_count: Contagem de tokens (opcional)
-        
+
     Returns:
         Informações sobre a mensagem registrada
     """
-    logger.info(f"Registrando mensagem de {role}")
-    
-    # TODO: Implementar a lógica real
+    # A chamada já é registrada pelo servidor (cortex.mcp.calls); aqui só em debug
+    logger.debug("Registrando mensagem de %s", role)
+
+    session_id = get_active_session_id()
+    if session_id is None:
+        return {"error": "No active session"}
+
+    token_count = token_count or len(content) // 4  # Estimativa grosseira
+    result = add_message(session_id, role, content, token_count)
     return {
-        "message_id": 1,
+        "message_id": result["message_id"],
+        "session_id": session_id,
         "role": role,
-        "timestamp": "2024-07-07T15:35:00Z",
-        "token_count": token_count or len(content) // 4,  # Estimativa grosseira
+        "timestamp": result["timestamp"],
+        "token_count": token_count,
+        "queued": result["queued"],
     }
 
 
-def get_context(max_messages: int = 20, include_system: bool = True) -> Dict[str, Any]:
+def get_context(
+    max_messages: int = 20,
+    include_system: bool = True,
+    session_id: Optional[int] = None,
+) -> Dict[str, Any]:
     """
-    Obtém o contexto atual (mensagens recentes).
-    
+    Obtém o contexto de uma sessão (mensagens recentes).
+
     Args:
         max_messages: Número máximo de mensagens a retornar
         include_system: Se deve incluir mensagens do sistema
-        
+        session_id: ID de uma sessão anterior (opcional, padrão a sessão ativa)
+
     Returns:
-        Contexto atual com mensagens recentes
+        Contexto da sessão com mensagens recentes
     """
-    logger.info(f"Obtendo contexto (max={max_messages})")
-    
-    # TODO: Implementar a lógica real
-    return {
-        "session_id": 1,
-        "title": "Sessão de exemplo",
-        "messages": [
-            {
-                "role": "system",
-                "content": "Esta é uma sessão de exemplo para o CORTEX."
-            },
-            {
-                "role": "user",
-                "content": "Olá! Esta é uma mensagem de exemplo."
-            },
-            {
-                "role": "assistant",
-                "content": "Olá! Estou aqui para ajudar com o desenvolvimento do CORTEX."
-            }
-        ],
-        "current_project": {
-            "id": 1,
-            "name": "CORTEX"
+    logger.debug("Obtendo contexto (max=%s)", max_messages)
+
+    if session_id is None:
+        session = get_active_session()
+    else:
+        rows = execute_query("SELECT * FROM sessions WHERE id = ?", (session_id,))
+        session = rows[0] if rows else None
+    if session is None:
+        return {
+            "session_id": None,
+            "title": None,
+            "messages": [],
+            "current_project": None,
         }
-    } 
\ No newline at end of file
+
+    if get_archived_session(session["id"]) is not None:
+        messages: List[Dict[str, Any]] = [
+            {"role": m["role"], "content": m["content"]}
+            for m in get_archived_messages(session["id"], max_messages, include_system)
+        ]
+    else:
+        # Leitura consistente com as escritas: grava as mensagens ainda na fila
+        if not flush_messages(REQUEST_FLUSH_TIMEOUT):
+            logger.warning("Mensagens ainda na fila; a leitura pode não incluí-las")
+
+        # Lê das mais recentes para as mais antigas, em streaming, e inverte no fim
+        role_filter = "" if include_system else "AND role != 'system'"
+        rows = iter_query(
+            f"""
+            SELECT role, content FROM messages
+            WHERE session_id = ? {role_filter}
+            ORDER BY timestamp DESC, id DESC
+            LIMIT ?
+            """,
+            (session["id"], max_messages),
+            row_format="tuple",
+        )
+        messages = [{"role": role, "content": content} for role, content in rows]
+        messages.reverse()
+
+    project = get_project(session["project_id"]) if session["project_id"] else None
+    return {
+        "session_id": session["id"],
+        "title": session["title"],
+        "messages": messages,
+        "current_project": (
+            {"id": project["id"], "name": project["name"]} if project else None
+        ),
+    }
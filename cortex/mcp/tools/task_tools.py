@@ -4,12 +4,20 @@ CORTEX Task Tools - Ferramentas MCP para gestão de tarefas.
 
 Este módulo implementa as ferramentas MCP relacionadas a tarefas.
 """
+import base64
+import json
 import logging
-from typing import Dict, Any, List, Optional
+from typing import Any, Dict, List, Optional, Tuple
+
+from cortex.core import task as task_core
+from cortex.core.project import resolve_project_id
+from cortex.core.task import get_task
+from cortex.storage.database import execute_query, iter_query
 
 logger = logging.getLogger("cortex.mcp.tools.task")
 
-# TODO: Implementar corretamente as funções
+# Maior página aceita por list_tasks
+MAX_LIST_LIMIT = 1000
 
 def create_task(
     title: str,
@@ -18,7 +26,8 @@ def create_task(
     parent_id: Optional[int] = None,
     project_id: Optional[int] = None,
     status: str = "not_started",
-    jira_id: Optional[str] = None
+    jira_id: Optional[str] = None,
+    estimated_hours: Optional[float] = None,
 ) -> Dict[str, Any]:
     """
     Cria uma nova tarefa.
@@ -31,20 +40,42 @@ def create_task(
         project_id: ID do projeto (opcional, se não fornecido usa o projeto atual)
         status: Estado inicial ('not_started', 'in_progress', 'blocked', 'completed')
         jira_id: ID no Jira (opcional)
+        estimated_hours: Horas estimadas (opcional)
         
     Returns:
         Informações sobre a tarefa criada
     """
     logger.info(f"Criando tarefa: {title}")
-    
-    # TODO: Implementar a lógica real
+
+    if project_id is None and parent_id is not None:
+        parent = get_task(parent_id)
+        project_id = parent["project_id"] if parent else None
+    project_id = resolve_project_id(project_id)
+    if project_id is None:
+        return {"error": "No active project"}
+
+    try:
+        task = task_core.create_task(
+            title,
+            project_id,
+            description=description,
+            level=level,
+            parent_id=parent_id,
+            status=status,
+            jira_id=jira_id,
+            estimated_hours=estimated_hours,
+        )
+    except ValueError as e:
+        return {"error": str(e)}
+
     return {
-        "task_id": 1,
-        "title": title,
-        "level": level,
-        "status": status,
-        "parent_id": parent_id,
-        "project_id": project_id or 1,
+        "task_id": task["id"],
+        "title": task["title"],
+        "level": task["level"],
+        "status": task["status"],
+        "parent_id": task["parent_id"],
+        "project_id": task["project_id"],
+        "ancestors_updated": task["ancestors_updated"],
     }
 
 
@@ -63,73 +94,199 @@ def update_task_status(
         status: Novo status ('not_started', 'in_progress', 'blocked', 'completed')
         progress: Percentual de progresso (0-100, opcional)
         actual_hours: Horas efetivamente gastas (opcional)
-        propagate: Se deve propagar mudanças para tarefas pai/filhas
+        propagate: Se deve propagar mudanças para as tarefas ancestrais
         
     Returns:
         Informações sobre a tarefa atualizada
     """
     logger.info(f"Atualizando status da tarefa {task_id} para {status}")
-    
-    # TODO: Implementar a lógica real
-    return {
+
+    update = {
         "task_id": task_id,
         "status": status,
-        "progress": progress or (100 if status == "completed" else 0),
+        "progress": progress,
+        "actual_hours": actual_hours,
+    }
+    try:
+        result = task_core.update_task_statuses([update], propagate)
+    except ValueError as e:
+        return {"error": str(e)}
+
+    task = result["tasks"][0]
+    return {
+        "task_id": task_id,
+        "status": task["status"],
+        "progress": task["progress"],
         "updated": True,
         "propagated": propagate,
+        "ancestors_updated": result["ancestors_updated"],
     }
 
 
+def update_task_statuses(
+    updates: List[Dict[str, Any]], propagate: bool = True
+) -> Dict[str, Any]:
+    """
+    Atualiza o status de várias tarefas numa única transação.
+
+    Os ancestrais comuns são recalculados uma única vez.
+
+    Args:
+        updates: Itens com 'task_id', 'status' e, opcionalmente, 'progress'
+            e 'actual_hours'
+        propagate: Se deve propagar mudanças para as tarefas ancestrais
+
+    Returns:
+        Tarefas atualizadas e ancestrais alterados
+    """
+    logger.info(f"Atualizando status de {len(updates)} tarefas")
+
+    try:
+        result = task_core.update_task_statuses(updates, propagate)
+    except (KeyError, ValueError) as e:
+        return {"error": f"Invalid update: {str(e)}"}
+
+    return {
+        "tasks": result["tasks"],
+        "updated_count": len(result["tasks"]),
+        "propagated": propagate,
+        "ancestors_updated": result["ancestors_updated"],
+    }
+
+
+def _encode_cursor(order_index: int, task_id: int, filters: str) -> str:
+    """Gera o cursor opaco da próxima página."""
+    payload = json.dumps([order_index, task_id, filters], separators=(",", ":"))
+    return base64.urlsafe_b64encode(payload.encode()).decode().rstrip("=")
+
+
+def _decode_cursor(cursor: str, filters: str) -> Tuple[int, int]:
+    """Lê a posição de um cursor, verificando se os filtros são os mesmos."""
+    try:
+        padded = cursor + "=" * (-len(cursor) % 4)
+        order_index, task_id, cursor_filters = json.loads(
+            base64.urlsafe_b64decode(padded)
+        )
+    except (ValueError, TypeError) as e:
+        raise ValueError("Invalid cursor") from e
+    if cursor_filters != filters:
+        raise ValueError("Cursor does not match the current filters")
+    return int(order_index), int(task_id)
+
+
 def list_tasks(
     status: Optional[str] = None,
     level: Optional[str] = None,
     parent_id: Optional[int] = None,
     project_id: Optional[int] = None,
-    limit: int = 100
+    limit: int = 100,
+    recursive: bool = False,
+    cursor: Optional[str] = None,
 ) -> Dict[str, Any]:
     """
-    Lista tarefas com filtros.
+    Lista tarefas com filtros, paginadas por cursor.
+
+    As tarefas vêm ordenadas por (order_index, id); ``next_cursor`` na
+    resposta continua a listagem de onde a página terminou.
     
     Args:
         status: Filtrar por status (opcional)
         level: Filtrar por nível (opcional)
         parent_id: Filtrar por tarefa pai (opcional)
         project_id: Filtrar por projeto (opcional)
-        limit: Número máximo de tarefas a retornar
+        limit: Número máximo de tarefas por página (1 a ``MAX_LIST_LIMIT``)
+        recursive: Com ``parent_id``, inclui toda a subárvore e não só os filhos
+        cursor: Cursor retornado pela página anterior (opcional)
         
     Returns:
-        Lista de tarefas que correspondem aos filtros
+        Página de tarefas, total de tarefas nos filtros e cursor da próxima página
     """
     logger.info(f"Listando tarefas (status={status}, level={level})")
-    
-    # TODO: Implementar a lógica real
+
+    valid_limit = isinstance(limit, int) and not isinstance(limit, bool)
+    if not valid_limit or not 1 <= limit <= MAX_LIST_LIMIT:
+        return {"error": f"limit must be an integer between 1 and {MAX_LIST_LIMIT}"}
+
+    filters = json.dumps([status, level, parent_id, project_id, recursive])
+    try:
+        after = _decode_cursor(cursor, filters) if cursor else None
+    except ValueError as e:
+        return {"error": str(e)}
+
+    conditions = []
+    params: List[Any] = []
+    if recursive and parent_id is not None:
+        conditions.append(
+            "id IN (SELECT descendant_id FROM task_closure "
+            "WHERE ancestor_id = ? AND depth > 0)"
+        )
+        params.append(parent_id)
+    for column, value in (
+        ("status", status),
+        ("level", level),
+        ("parent_id", None if recursive else parent_id),
+        ("project_id", project_id),
+    ):
+        if value is not None:
+            conditions.append(f"{column} = ?")
+            params.append(value)
+    filter_params = tuple(params)
+
+    # Keyset: continua depois da última linha da página anterior
+    if after is not None:
+        conditions.append("(order_index, id) > (?, ?)")
+        params.extend(after)
+    where = f"WHERE {' AND '.join(conditions)}" if conditions else ""
+
+    if recursive and parent_id is not None:
+        if status is None and level is None and project_id is None:
+            total_count = task_core.count_descendants(parent_id)
+        else:
+            filter_where = (
+                where if after is None else ("WHERE " + " AND ".join(conditions[:-1]))
+            )
+            total_count = execute_query(
+                f"SELECT COUNT(*) AS total FROM tasks {filter_where}", filter_params
+            )[0]["total"]
+    else:
+        total_count = task_core.count_tasks(status, level, parent_id, project_id)
+
+    # Streaming: só as linhas devolvidas são convertidas em dicionários;
+    # uma linha extra indica se existe próxima página
+    rows = list(
+        iter_query(
+            f"""
+        SELECT id, title, level, status, progress, parent_id, order_index FROM tasks
+        {where}
+        ORDER BY order_index, id
+        LIMIT ?
+        """,
+            tuple(params) + (limit + 1,),
+            row_format="row",
+        )
+    )
+    has_more = len(rows) > limit
+    rows = rows[:limit]
+
+    tasks = [
+        {
+            "task_id": row.id,
+            "title": row.title,
+            "level": row.level,
+            "status": row.status,
+            "progress": row.progress,
+            "parent_id": row.parent_id,
+        }
+        for row in rows
+    ]
+
     return {
-        "tasks": [
-            {
-                "task_id": 1,
-                "title": "Implementar MCP Server",
-                "level": "task",
-                "status": "in_progress",
-                "progress": 50,
-                "parent_id": None,
-            },
-            {
-                "task_id": 2,
-                "title": "Implementar função de parse de requisições",
-                "level": "activity",
-                "status": "completed",
-                "progress": 100,
-                "parent_id": 1,
-            },
-            {
-                "task_id": 3,
-                "title": "Implementar loop principal",
-                "level": "activity",
-                "status": "in_progress",
-                "progress": 30,
-                "parent_id": 1,
-            },
-        ],
-        "total_count": 3,
-        "filtered_count": 3,
-    } 
\ No newline at end of file
+        "tasks": tasks,
+        "total_count": total_count,
+        "filtered_count": len(tasks),
+        "next_cursor": (
+            _encode_cursor(rows[-1].order_index, rows[-1].id, filters)
+            if has_more
+            else None
+        ),
+    }
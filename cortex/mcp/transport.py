@@ -0,0 +1,579 @@
+#!/usr/bin/env python3
+"""
+CORTEX MCP Transport - Transporte stdio assíncrono do servidor MCP.
+
+Este módulo lê as requisições da entrada padrão com asyncio e despacha as
+chamadas de ferramentas para os pools de ``ToolExecutor``: as leves num pool
+de threads, as pesadas num pool separado com prazo e cancelamento, de modo
+que uma chamada lenta não bloqueia as demais.
+
+Ordem de execução: cada requisição toca um conjunto de tabelas
+(``ToolSpec.footprint``; desconhecido conta como todas). Uma leitura espera
+as escritas recebidas antes dela que tocam alguma das suas tabelas; uma
+escrita espera as leituras e escritas anteriores com tabela em comum.
+Requisições sem conflito rodam em paralelo, de modo que um ``scan_markers``
+(que só escreve em ``markers``) não atrasa ``get_context`` nem
+``record_message``. O resultado é o mesmo de uma execução em série, na
+ordem de chegada.
+
+Ordem das respostas: requisições com ``id`` são respondidas assim que
+terminam, no envelope ``{"id": ..., "result": ...}``; requisições sem ``id``
+(protocolo original) recebem a resposta crua, na ordem de chegada.
+
+Lotes: uma linha com um array JSON é entregue inteira ao ``batch_handler``
+e respondida com um array de resultados na ordem dos itens. O lote conta
+como escrita se algum item escreve, e como pesado se algum item é pesado.
+
+Agendamento: liberada das dependências, a requisição entra na fila de
+prioridades do seu pool (ver cortex/mcp/scheduler.py), que escolhe a próxima
+por classe (``interactive``, ``normal``, ``background``), rodízio entre
+clientes (campo ``client``) e prazo (campo ``deadline_ms``, contado da
+chegada; vencido na fila, a requisição é descartada sem executar). A resposta
+de uma requisição com ``id`` traz ``timing``: ``{"priority", "wait_ms",
+"queue_ms", "exec_ms"}``, separando a espera pelas dependências, a espera na
+fila de prioridades e a execução.
+
+Controle: ``{"cancel": <id>}`` cancela a requisição com esse ``id``, esperando
+as dependências, na fila ou, se pesada, em execução (resposta
+``{"cancel": <id>, "cancelled": bool}``; sem ``id`` válido, um erro). Enquanto
+uma requisição pesada com ``id`` executa, a ferramenta pode enviar avisos
+``{"id": ..., "progress": {"done", "total", "message", "elapsed_ms"}}``
+antes da resposta final.
+"""
+import asyncio
+import json
+import logging
+import sys
+from typing import Any, Callable, Dict, List, NamedTuple, Optional, Set
+
+from cortex.mcp.executor import ToolExecutor, ToolTimeout
+from cortex.mcp.jobs import Job, ToolCancelled
+from cortex.mcp.metrics import get_tool_metrics
+from cortex.mcp.scheduler import (
+    DEFAULT_CLIENT,
+    DEFAULT_PRIORITY,
+    DEFAULT_SCHEDULER,
+    PRIORITY_CLASSES,
+    DeadlineExceeded,
+    RequestScheduler,
+    priority_rank,
+)
+
+logger = logging.getLogger("cortex.mcp.transport")
+
+# Tamanho máximo de uma linha de requisição
+MAX_LINE_BYTES = 16 * 1024 * 1024
+
+# Configuração padrão (sobrescrita pela chave "server" da configuração)
+# (os pools e prazos estão em ``DEFAULT_EXECUTOR``)
+DEFAULT_TRANSPORT = {
+    "ordered_responses": False,  # True responde tudo na ordem de chegada
+}
+
+
+# Transporte em execução no processo (para as métricas)
+_active: Optional["StdioTransport"] = None
+
+
+class _Plan(NamedTuple):
+    """Como uma requisição é agendada e executada."""
+
+    heavy: bool
+    timeout: Optional[float]
+    priority: str
+    client: str
+    deadline: Optional[float]
+    received: float
+
+
+def _overlap(first: Optional[frozenset], second: Optional[frozenset]) -> bool:
+    """Indica se dois conjuntos de tabelas (None: todas) têm tabela em comum."""
+    if first == frozenset() or second == frozenset():
+        return False
+    if first is None or second is None:
+        return True
+    return not first.isdisjoint(second)
+
+
+class _Footprint(NamedTuple):
+    """Tabelas que uma requisição em andamento toca e escreve (None: todas)."""
+
+    touched: Optional[frozenset]
+    written: Optional[frozenset]
+
+    def conflicts(self, other: "_Footprint") -> bool:
+        """Indica se uma das duas requisições precisa esperar a outra."""
+        return _overlap(self.written, other.touched) or _overlap(
+            other.written, self.touched
+        )
+
+
+class StdioTransport:
+    """
+    Servidor de requisições MCP por linhas JSON em stdin/stdout.
+
+    Args:
+        handler: Função que processa uma requisição e retorna a resposta
+        tool_spec: Retorna o ``ToolSpec`` de uma ferramenta pelo nome (None se
+            desconhecida); usa ``read_only``, ``heavy`` e ``timeout``
+        config: Configuração (chaves de ``DEFAULT_TRANSPORT`` e ``DEFAULT_EXECUTOR``)
+        batch_handler: Função que processa um lote (opcional; sem ela lotes
+            são recusados)
+    """
+
+    def __init__(
+        self,
+        handler: Callable[[Dict[str, Any]], Dict[str, Any]],
+        tool_spec: Callable[[str], Any],
+        config: Optional[Dict[str, Any]] = None,
+        batch_handler: Optional[Callable[[List[Any]], List[Dict[str, Any]]]] = None,
+    ) -> None:
+        self.config = {**DEFAULT_TRANSPORT, **(config or {})}
+        self._handler = handler
+        self._batch_handler = batch_handler
+        self._tool_spec = tool_spec
+        self._executor = ToolExecutor(self.config)
+        self._scheduling = {**DEFAULT_SCHEDULER, **(self.config.get("scheduler") or {})}
+        self._light_queue = RequestScheduler(
+            self._executor.config["max_workers"], self._scheduling, name="light"
+        )
+        self._heavy_queue = RequestScheduler(
+            self._executor.config["heavy_workers"], self._scheduling, name="heavy"
+        )
+        self._inflight: Set["asyncio.Task[None]"] = set()
+        self._footprints: Dict["asyncio.Task[None]", _Footprint] = {}
+        # id → sinais de cancelamento das requisições esperando dependências
+        self._blocked: Dict[Any, List["asyncio.Future[str]"]] = {}
+        self._order_tail: Optional["asyncio.Future[None]"] = None
+        self._stdout = sys.stdout
+        self._loop: Optional[asyncio.AbstractEventLoop] = None
+        self.requests = 0
+
+    # Leitura
+
+    async def _open_reader(self) -> Optional[asyncio.StreamReader]:
+        """Conecta stdin ao loop; retorna None se stdin não for um pipe/tty."""
+        loop = asyncio.get_running_loop()
+        reader = asyncio.StreamReader(limit=MAX_LINE_BYTES)
+        try:
+            await loop.connect_read_pipe(
+                lambda: asyncio.StreamReaderProtocol(reader), sys.stdin
+            )
+        except (ValueError, OSError):
+            # Arquivos comuns não são suportados pelo loop (ex.: stdin redirecionado)
+            return None
+        return reader
+
+    async def _lines(self):
+        """Gera as linhas da entrada padrão até o EOF."""
+        reader = await self._open_reader()
+        if reader is None:
+            loop = asyncio.get_running_loop()
+            while True:
+                line = await loop.run_in_executor(None, sys.stdin.buffer.readline)
+                if not line:
+                    return
+                yield line
+        else:
+            while True:
+                try:
+                    line = await reader.readline()
+                except ValueError:
+                    # Linha acima de MAX_LINE_BYTES: o StreamReader já a descartou
+                    logger.error("Requisição acima do tamanho máximo descartada")
+                    continue
+                if not line:
+                    return
+                yield line
+
+    # Escrita
+
+    def _write(self, response: Any) -> None:
+        try:
+            self._stdout.write(json.dumps(response) + "\n")
+            self._stdout.flush()
+        except Exception as e:
+            logger.error(f"Erro ao escrever resposta: {str(e)}")
+
+    def _reserve_slot(self, ordered: bool) -> Optional[tuple]:
+        """Reserva a posição da resposta na fila ordenada."""
+        if not ordered:
+            return None
+        previous = self._order_tail
+        mine: "asyncio.Future[None]" = asyncio.get_running_loop().create_future()
+        self._order_tail = mine
+        return previous, mine
+
+    async def _respond(self, response: Any, slot: Optional[tuple]) -> None:
+        if slot is None:
+            self._write(response)
+            return
+        previous, mine = slot
+        try:
+            if previous is not None:
+                await previous
+            self._write(response)
+        finally:
+            mine.set_result(None)
+
+    # Despacho
+
+    @staticmethod
+    def _envelope(
+        request: Any, result: Any, timing: Optional[Dict[str, Any]] = None
+    ) -> Any:
+        if isinstance(request, dict) and "id" in request:
+            envelope = {"id": request["id"], "result": result}
+            if timing is not None:
+                envelope["timing"] = timing
+            return envelope
+        return result
+
+    async def _wait_dependencies(
+        self, waits_for: Set["asyncio.Task[None]"], key: Any
+    ) -> None:
+        """
+        Espera as requisições anteriores em conflito.
+
+        Raises:
+            ToolCancelled: Se o cliente cancelar a requisição durante a espera
+        """
+        if key is None:
+            await asyncio.wait(waits_for)
+            return
+        loop = asyncio.get_running_loop()
+        cancelled: "asyncio.Future[str]" = loop.create_future()
+        signals = self._blocked.setdefault(key, [])
+        signals.append(cancelled)
+        dependencies = asyncio.ensure_future(asyncio.wait(waits_for))
+        try:
+            await asyncio.wait(
+                {dependencies, cancelled}, return_when=asyncio.FIRST_COMPLETED
+            )
+        finally:
+            signals.remove(cancelled)
+            if not signals:
+                del self._blocked[key]
+            dependencies.cancel()
+        if cancelled.done():
+            raise ToolCancelled(cancelled.result())
+
+    async def _run(
+        self,
+        request: Any,
+        waits_for: Set["asyncio.Task[None]"],
+        slot: Optional[tuple],
+        plan: _Plan,
+    ) -> None:
+        loop = asyncio.get_running_loop()
+        is_batch = isinstance(request, list)
+        func = self._batch_handler if is_batch else self._handler
+        tool = "batch" if is_batch else request.get("name", "")
+        key = None if is_batch else request.get("id")
+        queue = self._heavy_queue if plan.heavy else self._light_queue
+        timed_out: Optional[Job] = None
+        ready: Optional[float] = None
+        started: Optional[float] = None
+        try:
+            if waits_for:
+                await self._wait_dependencies(waits_for, key)
+            ready = loop.time()
+            await queue.acquire(
+                plan.priority, plan.client, plan.deadline, plan.received, key
+            )
+            started = loop.time()
+            get_tool_metrics().record_wait(plan.priority, started - plan.received)
+            try:
+                if plan.heavy:
+                    result = await self._executor.run_heavy(
+                        func,
+                        request,
+                        tool=tool,
+                        timeout=plan.timeout,
+                        key=key,
+                        on_progress=self._progress if key is not None else None,
+                    )
+                else:
+                    result = await self._executor.run_light(func, request)
+            except ToolTimeout as e:
+                # A thread só volta para a fila quando a ferramenta de fato parar
+                e.job.future.add_done_callback(
+                    lambda _: loop.call_soon_threadsafe(queue.release)
+                )
+                raise
+            except BaseException:
+                queue.release()
+                raise
+            queue.release()
+        except DeadlineExceeded as e:
+            get_tool_metrics().record_shed(plan.priority)
+            error = {"error": str(e)}
+            result = [error] * len(request) if is_batch else error
+        except ToolTimeout as e:
+            timed_out = e.job
+            error = {"error": str(e)}
+            result = [error] * len(request) if is_batch else error
+        except ToolCancelled as e:
+            error = {"error": f"Tool {tool} cancelled ({e.reason})"}
+            result = [error] * len(request) if is_batch else error
+        except Exception as e:
+            logger.error(f"Erro ao processar requisição: {str(e)}")
+            error = {"error": f"Internal error: {str(e)}"}
+            result = [error] * len(request) if is_batch else error
+        finished = loop.time()
+        if is_batch:
+            # Erros do lote inteiro (vazio, grande demais) não seguem os itens
+            if len(result) == len(request):
+                result = [self._envelope(item, r) for item, r in zip(request, result)]
+        else:
+            ready = ready if ready is not None else finished
+            started_at = started if started is not None else finished
+            result = self._envelope(
+                request,
+                result,
+                {
+                    "priority": plan.priority,
+                    "wait_ms": round((ready - plan.received) * 1000, 3),
+                    "queue_ms": round((started_at - ready) * 1000, 3),
+                    "exec_ms": round((finished - started) * 1000, 3)
+                    if started is not None
+                    else None,
+                },
+            )
+        await self._respond(result, slot)
+
+        if timed_out is not None:
+            # O cliente já tem a resposta, mas as requisições que dependem
+            # desta só seguem quando a ferramenta de fato parar
+            await self._executor.wait_stopped(timed_out)
+
+    def _progress(self, job: Job, progress: Dict[str, Any]) -> None:
+        """Envia um aviso de progresso (chamado na thread da ferramenta)."""
+        self._loop.call_soon_threadsafe(
+            self._write, {"id": job.key, "progress": progress}
+        )
+
+    def _cancel(self, key: Any) -> None:
+        """
+        Atende ``{"cancel": <id>}``: cancela a requisição com esse id, esperando
+        dependências, na fila ou pesada.
+        """
+        if isinstance(key, bool) or not isinstance(key, (str, int, float)):
+            # Sem id, o cancelamento atingiria todas as requisições sem id
+            self._write({"cancel": key, "error": "cancel requires the id of a request"})
+            return
+        signals = [signal for signal in self._blocked.get(key, ()) if not signal.done()]
+        for signal in signals:
+            signal.set_result("cancelled")
+        cancelled = (
+            bool(signals)
+            or self._light_queue.cancel(key)
+            or self._heavy_queue.cancel(key)
+            or self._executor.cancel(key)
+        )
+        self._write({"cancel": key, "cancelled": cancelled})
+
+    def _plan(self, items: List[Any], specs: List[Any], is_batch: bool) -> _Plan:
+        """Pool, prazo, classe, cliente e prazo de início da requisição (ou lote)."""
+        heavy_specs = [spec for spec in specs if spec is not None and spec.heavy]
+        timeouts = [
+            self._executor.timeout_for(spec.name, spec.timeout) for spec in heavy_specs
+        ]
+        # Um lote herda o maior prazo dos seus itens pesados (None = sem limite)
+        timeout = None if None in timeouts or not timeouts else max(timeouts)
+
+        # Um lote roda na classe menos urgente dos seus itens; lotes grandes, em
+        # background
+        overrides = self._scheduling["priorities"] or {}
+        priority = max(
+            (
+                overrides.get(spec.name, spec.priority)
+                if spec is not None
+                else DEFAULT_PRIORITY
+                for spec in specs
+            ),
+            key=priority_rank,
+            default=DEFAULT_PRIORITY,
+        )
+        if priority not in PRIORITY_CLASSES:
+            priority = DEFAULT_PRIORITY
+        if is_batch and len(items) > self._scheduling["bulk_batch_items"]:
+            priority = "background"
+
+        first = items[0] if items and isinstance(items[0], dict) else {}
+        client = first.get("client")
+        received = asyncio.get_running_loop().time()
+        deadlines = [
+            item["deadline_ms"]
+            for item in items
+            if isinstance(item, dict)
+            and isinstance(item.get("deadline_ms"), (int, float))
+            and not isinstance(item.get("deadline_ms"), bool)
+        ]
+        deadline = received + min(deadlines) / 1000 if deadlines else None
+        return _Plan(
+            heavy=bool(heavy_specs),
+            timeout=timeout,
+            priority=priority,
+            client=client if isinstance(client, str) and client else DEFAULT_CLIENT,
+            deadline=deadline,
+            received=received,
+        )
+
+    def _dispatch(self, request: Any) -> None:
+        """Agenda uma requisição (ou lote) atrás das anteriores em conflito com ela."""
+        self.requests += 1
+        is_batch = isinstance(request, list) and self._batch_handler is not None
+        items = request if is_batch else [request]
+        ordered = self.config["ordered_responses"] or not all(
+            isinstance(item, dict) and "id" in item for item in items
+        )
+        slot = self._reserve_slot(ordered)
+
+        if not is_batch and not isinstance(request, dict):
+            self._track(
+                asyncio.ensure_future(self._respond({"error": "Invalid request"}, slot))
+            )
+            return
+
+        specs = [
+            self._tool_spec(item.get("name", "")) if isinstance(item, dict) else None
+            for item in items
+        ]
+        footprint = self._footprint(specs)
+        plan = self._plan(items, specs, is_batch)
+
+        waits_for = {
+            task
+            for task, other in self._footprints.items()
+            if footprint.conflicts(other)
+        }
+        task = asyncio.ensure_future(self._run(request, waits_for, slot, plan))
+        self._footprints[task] = footprint
+        self._track(task)
+
+    @staticmethod
+    def _footprint(specs: List[Any]) -> _Footprint:
+        """Tabelas de uma requisição (ou lote): a união das dos itens."""
+        touched: Optional[frozenset] = frozenset()
+        written: Optional[frozenset] = frozenset()
+        for spec in specs:
+            # Ferramenta desconhecida: resposta de erro, mas ordenada contra todas
+            item_touched, item_written = (
+                spec.footprint() if spec is not None else (None, None)
+            )
+            touched = (
+                None
+                if touched is None or item_touched is None
+                else touched | item_touched
+            )
+            written = (
+                None
+                if written is None or item_written is None
+                else written | item_written
+            )
+        return _Footprint(touched, written)
+
+    def _track(self, task: "asyncio.Task[None]") -> None:
+        self._inflight.add(task)
+        task.add_done_callback(self._finished)
+
+    def _finished(self, task: "asyncio.Task[None]") -> None:
+        self._inflight.discard(task)
+        self._footprints.pop(task, None)
+
+    def stats(self) -> Dict[str, Any]:
+        """
+        Resumo do transporte, lido sem sincronizar com o loop.
+
+        Returns:
+            Requisições recebidas, em andamento, jobs pesados, filas de
+            prioridade e contadores dos pools
+        """
+        jobs = self._executor.jobs()
+        running = sum(1 for job in jobs if job["running"])
+        return {
+            "requests": self.requests,
+            "inflight": len(self._inflight),
+            "heavy_running": running,
+            "heavy_queued": len(jobs) - running + sum(self._heavy_queue.queued()),
+            "executor": dict(self._executor.stats),
+            "scheduler": {
+                "light": self._light_queue.snapshot(),
+                "heavy": self._heavy_queue.snapshot(),
+            },
+        }
+
+    async def serve(self) -> None:
+        """Atende requisições até o EOF da entrada padrão e aguarda as pendentes."""
+        global _active
+
+        logger.info("Iniciando loop do servidor MCP")
+        self._loop = asyncio.get_running_loop()
+        _active = self
+        drained = False
+        try:
+            async for line in self._lines():
+                if not line.strip():
+                    continue
+                try:
+                    request = json.loads(line)
+                except ValueError:
+                    logger.error(f"Recebido JSON inválido: {line[:200]!r}")
+                    slot = self._reserve_slot(True)
+                    self._track(
+                        asyncio.ensure_future(
+                            self._respond({"error": "Invalid JSON"}, slot)
+                        )
+                    )
+                    continue
+                if (
+                    isinstance(request, dict)
+                    and "cancel" in request
+                    and "name" not in request
+                ):
+                    self._cancel(request["cancel"])
+                    continue
+                self._dispatch(request)
+
+            logger.info("Entrada padrão encerrada; finalizando o servidor MCP")
+            if self._inflight:
+                await asyncio.wait(set(self._inflight))
+            drained = True
+        finally:
+            # Numa interrupção, as ferramentas pesadas param no próximo ponto seguro
+            self._executor.shutdown(cancel=not drained)
+            _active = None
+
+
+def transport_stats() -> Optional[Dict[str, Any]]:
+    """
+    Resumo do transporte em execução.
+
+    Returns:
+        Resultado de ``StdioTransport.stats``, ou None fora do servidor
+    """
+    transport = _active
+    return transport.stats() if transport is not None else None
+
+
+def serve_stdio(
+    handler: Callable[[Dict[str, Any]], Dict[str, Any]],
+    tool_spec: Callable[[str], Any],
+    config: Optional[Dict[str, Any]] = None,
+    batch_handler: Optional[Callable[[List[Any]], List[Dict[str, Any]]]] = None,
+) -> None:
+    """
+    Atende requisições MCP em stdin/stdout até o cliente fechar a conexão.
+
+    Args:
+        handler: Função que processa uma requisição e retorna a resposta
+        tool_spec: Retorna o ``ToolSpec`` de uma ferramenta pelo nome
+        config: Configuração do transporte (padrão a chave "server")
+        batch_handler: Função que processa lotes (opcional)
+    """
+    if config is None:
+        from cortex.core.config import get_config_value
+
+        config = get_config_value("server", {}) or {}
+    asyncio.run(StdioTransport(handler, tool_spec, config, batch_handler).serve())
@@ -5,21 +5,42 @@ Este subpacote contém a implementação do armazenamento de dados.
 """
 
 from cortex.storage.database import (
-    init_db,
-    get_connection,
+    backup_db,
+    bulk_insert,
+    bulk_upsert,
+    close_pool,
+    execute_many,
     execute_query,
-    execute_update,
     execute_script,
-    backup_db,
+    execute_update,
+    get_connection,
+    get_pool,
+    in_transaction,
+    init_db,
+    iter_query,
+    pooled_connection,
     restore_db,
+    transaction,
 )
+from cortex.storage.migrations import LATEST_VERSION, migrate
 
 __all__ = [
     "init_db",
     "get_connection",
+    "get_pool",
+    "pooled_connection",
+    "close_pool",
     "execute_query",
+    "iter_query",
     "execute_update",
     "execute_script",
+    "execute_many",
+    "bulk_insert",
+    "bulk_upsert",
+    "transaction",
+    "in_transaction",
     "backup_db",
     "restore_db",
+    "migrate",
+    "LATEST_VERSION",
 ] 
\ No newline at end of file
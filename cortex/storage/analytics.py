@@ -0,0 +1,372 @@
+#!/usr/bin/env python3
+"""
+CORTEX Analytics - Caminho de leitura isolado para consultas analíticas.
+
+Consultas de produtividade e métricas varrem grandes intervalos de sessões,
+tarefas e marcadores. Para não disputar com as ferramentas interativas, elas
+rodam numa thread própria, com uma conexão somente leitura (URI ``mode=ro`` e
+``query_only``) e cache de páginas separado do pool interativo.
+
+A thread mantém um snapshot de leitura de longa duração: consultas próximas
+no tempo enxergam o mesmo estado do banco e não pagam a abertura de uma nova
+transação. O snapshot é renovado quando passa de ``max_snapshot_seconds`` e
+liberado após ``idle_release_seconds`` sem consultas, para não impedir que o
+checkpoint do WAL avance.
+
+Uma consulta cujo prazo (``timeout``) vence é abortada pelo progress handler
+da conexão: a thread analítica fica livre para a próxima, em vez de terminar
+uma varredura cujo resultado ninguém vai ler.
+"""
+import logging
+import queue
+import sqlite3
+import threading
+import time
+from concurrent.futures import Future
+from concurrent.futures import TimeoutError as FutureTimeoutError
+from typing import Any, Callable, Dict, List, Optional, Tuple
+from urllib.parse import quote
+
+from cortex.storage.database import get_busy_policy, get_db_path
+from cortex.storage.instrumentation import get_instrumentation
+
+logger = logging.getLogger("cortex.storage.analytics")
+
+# Configuração padrão (sobrescrita pela chave "storage.analytics")
+DEFAULT_ANALYTICS = {
+    "cache_size_kb": 16384,
+    "max_snapshot_seconds": 30,
+    "idle_release_seconds": 5,
+}
+
+# Consultas analíticas: (SQL, nomes dos parâmetros)
+REPORTS: Dict[str, Tuple[str, Tuple[str, ...]]] = {
+    "productivity_trends": (
+        """
+        SELECT DATE(recorded_at) AS date, metric_type, AVG(value) AS avg_value
+        FROM productivity
+        WHERE project_id = :project_id AND recorded_at >= DATE('now', :since)
+        GROUP BY DATE(recorded_at), metric_type
+        ORDER BY DATE(recorded_at)
+        """,
+        ("project_id", "days"),
+    ),
+    "problem_files": (
+        """
+        SELECT file_path,
+               MAX(CASE WHEN analysis_type = 'complexity' THEN score END)
+                   AS complexity_score,
+               MAX(CASE WHEN analysis_type = 'pattern' THEN score END)
+                   AS pattern_score,
+               MAX(CASE WHEN analysis_type = 'duplication' THEN score END)
+                   AS duplication_score
+        FROM code_analysis
+        WHERE project_id = :project_id AND analyzed_at >= DATE('now', :since)
+        GROUP BY file_path
+        HAVING complexity_score > :threshold OR pattern_score > :threshold
+            OR duplication_score > :threshold
+        ORDER BY (COALESCE(complexity_score, 0) + COALESCE(pattern_score, 0)
+                  + COALESCE(duplication_score, 0)) DESC
+        """,
+        ("project_id", "days", "threshold"),
+    ),
+    "task_progress": (
+        """
+        SELECT level,
+               COUNT(*) AS total_tasks,
+               SUM(CASE WHEN status = 'completed' THEN 1 ELSE 0 END) AS completed_tasks,
+               AVG(progress) AS avg_progress
+        FROM tasks
+        WHERE project_id = :project_id
+        GROUP BY level
+        """,
+        ("project_id",),
+    ),
+    "marker_hotspots": (
+        """
+        SELECT file_path, COUNT(*) AS open_markers,
+               SUM(CASE WHEN marker_type = 'FIXME' THEN 1 ELSE 0 END) AS fixme_count,
+               MIN(detected_at) AS oldest_detected_at
+        FROM markers
+        WHERE project_id = :project_id AND resolved_at IS NULL
+        GROUP BY file_path
+        ORDER BY open_markers DESC
+        LIMIT :limit
+        """,
+        ("project_id", "limit"),
+    ),
+    "system_performance": (
+        """
+        SELECT DATE(recorded_at) AS date, AVG(cpu_usage) AS avg_cpu,
+               AVG(memory_usage) AS avg_memory, MAX(db_size) AS max_db_size
+        FROM system_metrics
+        WHERE recorded_at >= DATE('now', :since)
+        GROUP BY DATE(recorded_at)
+        ORDER BY DATE(recorded_at)
+        """,
+        ("days",),
+    ),
+}
+
+# Valores padrão dos parâmetros dos relatórios
+REPORT_DEFAULTS = {"days": 30, "threshold": 70, "limit": 20}
+
+# Instruções da VM do SQLite entre verificações de cancelamento
+_PROGRESS_OPS = 1000
+
+# Trabalho da thread analítica: (função, resultado, cancelamento)
+_Job = Tuple[Callable[[sqlite3.Connection], Any], Future, threading.Event]
+
+
+class AnalyticsReader:
+    """
+    Executor de consultas analíticas numa thread com conexão somente leitura.
+
+    Args:
+        db_path: Caminho do banco (padrão o banco atual)
+        config: Configuração (chaves de ``DEFAULT_ANALYTICS``)
+    """
+
+    def __init__(
+        self, db_path: Optional[str] = None, config: Optional[Dict[str, Any]] = None
+    ) -> None:
+        self.db_path = db_path or get_db_path()
+        self.config = {**DEFAULT_ANALYTICS, **(config or {})}
+        self._jobs: "queue.Queue[Optional[_Job]]" = queue.Queue()
+        self._thread: Optional[threading.Thread] = None
+        self._start_lock = threading.Lock()
+        self._conn: Optional[sqlite3.Connection] = None
+        self._snapshot_started: Optional[float] = None
+        self.snapshots = 0
+
+    def _open(self) -> sqlite3.Connection:
+        """Abre a conexão somente leitura com cache de páginas próprio."""
+        uri = f"file:{quote(self.db_path)}?mode=ro"
+        conn = sqlite3.connect(
+            uri, uri=True, isolation_level=None, check_same_thread=False
+        )
+        conn.execute(
+            f"PRAGMA busy_timeout = {int(get_busy_policy()['busy_timeout_ms'])}"
+        )
+        conn.execute("PRAGMA query_only = ON")
+        # Cache separado: as varreduras não expulsam as páginas quentes do pool
+        conn.execute(f"PRAGMA cache_size = -{int(self.config['cache_size_kb'])}")
+        conn.execute("PRAGMA temp_store = MEMORY")
+        return conn
+
+    # Ciclo de vida
+
+    def start(self) -> None:
+        """Inicia a thread de leitura, se ainda não estiver ativa."""
+        with self._start_lock:
+            if self._thread is None:
+                self._thread = threading.Thread(
+                    target=self._run, name="cortex-analytics", daemon=True
+                )
+                self._thread.start()
+
+    def close(self, timeout: float = 5.0) -> None:
+        """Encerra a thread após as consultas pendentes."""
+        with self._start_lock:
+            thread, self._thread = self._thread, None
+        if thread is not None:
+            self._jobs.put(None)
+            thread.join(timeout)
+
+    # Snapshot
+
+    def _ensure_snapshot(self, conn: sqlite3.Connection) -> None:
+        """Abre ou renova o snapshot de leitura."""
+        now = time.monotonic()
+        if (
+            self._snapshot_started is not None
+            and now - self._snapshot_started >= self.config["max_snapshot_seconds"]
+        ):
+            self._release_snapshot(conn)
+        if self._snapshot_started is None:
+            # BEGIN é adiado: o snapshot só é fixado na primeira leitura
+            conn.execute("BEGIN")
+            conn.execute("SELECT 1 FROM sqlite_master LIMIT 1").fetchall()
+            self._snapshot_started = now
+            self.snapshots += 1
+
+    def _release_snapshot(self, conn: sqlite3.Connection) -> None:
+        if self._snapshot_started is not None:
+            self._snapshot_started = None
+            if conn.in_transaction:
+                conn.execute("COMMIT")
+
+    def snapshot_age(self) -> Optional[float]:
+        """Idade do snapshot atual em segundos, ou None se não houver."""
+        started = self._snapshot_started
+        return None if started is None else time.monotonic() - started
+
+    def _run(self) -> None:
+        conn: Optional[sqlite3.Connection] = None
+        try:
+            while True:
+                try:
+                    job = self._jobs.get(timeout=self.config["idle_release_seconds"])
+                except queue.Empty:
+                    if conn is not None:
+                        self._release_snapshot(conn)
+                    continue
+                if job is None:
+                    break
+
+                func, future, cancel = job
+                if cancel.is_set() or not future.set_running_or_notify_cancel():
+                    continue
+                try:
+                    if conn is None:
+                        conn = self._open()
+                    self._ensure_snapshot(conn)
+                    # Aborta a consulta (sqlite3.OperationalError "interrupted")
+                    # quando quem espera desiste
+                    conn.set_progress_handler(cancel.is_set, _PROGRESS_OPS)
+                    try:
+                        result = func(conn)
+                    finally:
+                        conn.set_progress_handler(None, 0)
+                    future.set_result(result)
+                except BaseException as e:
+                    if conn is not None and isinstance(e, sqlite3.Error):
+                        # Erros do SQLite podem invalidar a transação; o próximo
+                        # trabalho abre um snapshot novo
+                        self._snapshot_started = None
+                        if conn.in_transaction:
+                            conn.execute("ROLLBACK")
+                    future.set_exception(e)
+        finally:
+            if conn is not None:
+                self._release_snapshot(conn)
+                conn.close()
+
+    # Consultas
+
+    def submit(self, func: Callable[[sqlite3.Connection], Any]) -> "Future[Any]":
+        """
+        Agenda uma função que recebe a conexão analítica.
+
+        Todas as consultas feitas pela função enxergam o mesmo snapshot.
+
+        Args:
+            func: Função chamada na thread analítica com a conexão
+
+        Returns:
+            Future com o resultado da função
+        """
+        return self._submit(func)[0]
+
+    def _submit(
+        self, func: Callable[[sqlite3.Connection], Any]
+    ) -> Tuple["Future[Any]", threading.Event]:
+        """Agenda uma função; o evento devolvido aborta a sua execução."""
+        self.start()
+        future: "Future[Any]" = Future()
+        cancel = threading.Event()
+        self._jobs.put((func, future, cancel))
+        return future, cancel
+
+    def query(
+        self, sql: str, params: Any = (), timeout: Optional[float] = None
+    ) -> List[Dict[str, Any]]:
+        """
+        Executa uma consulta na thread analítica e aguarda o resultado.
+
+        Args:
+            sql: Consulta SQL (somente leitura)
+            params: Parâmetros (tupla ou dicionário)
+            timeout: Espera máxima em segundos (opcional)
+
+        Returns:
+            Lista de dicionários com os resultados
+
+        Raises:
+            concurrent.futures.TimeoutError: Se o prazo venceu (a consulta é
+                abortada ou retirada da fila)
+        """
+
+        def _execute(conn: sqlite3.Connection) -> List[Dict[str, Any]]:
+            with get_instrumentation().measure(conn, sql, params) as measurement:
+                cursor = conn.execute(sql, params)
+                columns = [d[0] for d in cursor.description or ()]
+                rows = [dict(zip(columns, values)) for values in cursor.fetchall()]
+                measurement.rows = len(rows)
+            return rows
+
+        future, cancel = self._submit(_execute)
+        try:
+            return future.result(timeout)
+        except FutureTimeoutError:
+            cancel.set()
+            future.cancel()
+            raise
+
+
+_reader: Optional[AnalyticsReader] = None
+_reader_lock = threading.Lock()
+
+
+def get_analytics() -> AnalyticsReader:
+    """
+    Obtém o leitor analítico do processo, criando-o se necessário.
+
+    Returns:
+        Instância compartilhada de ``AnalyticsReader`` para o banco atual
+    """
+    global _reader
+
+    with _reader_lock:
+        if _reader is not None and _reader.db_path != get_db_path():
+            _reader.close()
+            _reader = None
+        if _reader is None:
+            from cortex.core.config import get_config_value
+
+            _reader = AnalyticsReader(
+                config=get_config_value("storage.analytics", {}) or {}
+            )
+        return _reader
+
+
+def close_analytics() -> None:
+    """Encerra o leitor analítico do processo."""
+    global _reader
+
+    with _reader_lock:
+        if _reader is not None:
+            _reader.close()
+            _reader = None
+
+
+def run_report(
+    name: str, timeout: Optional[float] = None, **kwargs: Any
+) -> List[Dict[str, Any]]:
+    """
+    Executa um dos relatórios de ``REPORTS`` no caminho analítico.
+
+    Args:
+        name: Nome do relatório
+        timeout: Espera máxima em segundos (opcional)
+        **kwargs: Parâmetros do relatório (project_id, days, threshold, limit)
+
+    Returns:
+        Linhas do relatório
+
+    Raises:
+        concurrent.futures.TimeoutError: Se o relatório não terminou no prazo
+    """
+    if name not in REPORTS:
+        raise ValueError(f"Relatório desconhecido: {name}")
+
+    sql, param_names = REPORTS[name]
+    values = {**REPORT_DEFAULTS, **{k: v for k, v in kwargs.items() if v is not None}}
+    missing = [p for p in param_names if p not in values]
+    if missing:
+        raise ValueError(f"Parâmetros ausentes para {name}: {', '.join(missing)}")
+
+    params = {p: values[p] for p in param_names if p != "days"}
+    if "days" in param_names:
+        params["since"] = f"-{int(values['days'])} days"
+    return get_analytics().query(sql, params, timeout)
@@ -0,0 +1,408 @@
+#!/usr/bin/env python3
+"""
+CORTEX Archive - Arquivamento de mensagens de sessões antigas.
+
+Este módulo move as mensagens de sessões finalizadas há mais de N dias para
+bancos de arquivo mensais (``~/.cortex/archive/messages_YYYY_MM.db``), com o
+conteúdo comprimido. No banco principal fica apenas um stub por sessão
+(tabela ``archived_sessions``), mantendo o banco "quente" pequeno. As
+mensagens arquivadas continuam acessíveis para leitura e busca.
+"""
+import glob
+import logging
+import os
+import re
+import sqlite3
+import time
+import zlib
+from typing import Any, Dict, Iterator, List, Optional, Sequence
+
+from cortex.core.config import get_config_value
+from cortex.storage.database import (
+    execute_query,
+    execute_update,
+    iter_query,
+    pooled_connection,
+    transaction,
+)
+
+logger = logging.getLogger("cortex.storage.archive")
+
+# Diretório dos bancos de arquivo
+ARCHIVE_DIR = os.path.expanduser("~/.cortex/archive")
+
+# Idade mínima (dias desde o fim da sessão) para arquivar, se não configurada
+DEFAULT_OLDER_THAN_DAYS = 90
+
+# Nível de compressão zlib do conteúdo das mensagens
+COMPRESSION_LEVEL = 6
+
+# Mensagens copiadas por transação no banco de arquivo
+COPY_CHUNK = 1000
+
+_ARCHIVE_SCHEMA = """
+CREATE TABLE IF NOT EXISTS messages (
+    id INTEGER PRIMARY KEY,
+    session_id INTEGER NOT NULL,
+    role TEXT NOT NULL,
+    content BLOB NOT NULL, -- zlib
+    token_count INTEGER,
+    timestamp TIMESTAMP NOT NULL
+);
+CREATE INDEX IF NOT EXISTS idx_messages_session_time
+    ON messages(session_id, timestamp, id);
+-- Índice sem conteúdo: o texto só existe comprimido na tabela messages
+CREATE VIRTUAL TABLE IF NOT EXISTS messages_fts USING fts5(
+    content, content='', tokenize='unicode61 remove_diacritics 2', prefix='2 3'
+);
+"""
+
+_TERM_PATTERN = re.compile(r"\w+", re.UNICODE)
+
+
+def _archive_path(month: str) -> str:
+    """Caminho do banco de arquivo de um mês ('YYYY_MM')."""
+    return os.path.join(ARCHIVE_DIR, f"messages_{month}.db")
+
+
+def _open_archive(month: str) -> sqlite3.Connection:
+    """Abre (criando se necessário) o banco de arquivo de um mês para escrita."""
+    os.makedirs(ARCHIVE_DIR, exist_ok=True)
+    conn = sqlite3.connect(_archive_path(month), isolation_level=None)
+    conn.executescript(_ARCHIVE_SCHEMA)
+    return conn
+
+
+def _open_archive_readonly(month: str) -> Optional[sqlite3.Connection]:
+    """Abre o banco de arquivo de um mês só para leitura, se existir."""
+    path = _archive_path(month)
+    if not os.path.exists(path):
+        return None
+    return sqlite3.connect(f"file:{path}?mode=ro", uri=True)
+
+
+def _list_months() -> List[str]:
+    """Meses com banco de arquivo, do mais recente para o mais antigo."""
+    paths = glob.glob(os.path.join(ARCHIVE_DIR, "messages_*.db"))
+    months = [os.path.basename(p)[len("messages_") : -len(".db")] for p in paths]
+    return sorted(months, reverse=True)
+
+
+def _compress(text: str) -> bytes:
+    return zlib.compress(text.encode("utf-8"), COMPRESSION_LEVEL)
+
+
+def _decompress(data: bytes) -> str:
+    return zlib.decompress(data).decode("utf-8")
+
+
+def get_archived_session(session_id: int) -> Optional[Dict[str, Any]]:
+    """
+    Obtém o stub de uma sessão arquivada.
+
+    Args:
+        session_id: ID da sessão
+
+    Returns:
+        Stub com mês do arquivo e contagens, ou None se não estiver arquivada
+    """
+    rows = execute_query(
+        "SELECT * FROM archived_sessions WHERE session_id = ?", (session_id,)
+    )
+    return rows[0] if rows else None
+
+
+def find_archivable_sessions(
+    older_than_days: Optional[int] = None,
+) -> List[Dict[str, Any]]:
+    """
+    Lista as sessões finalizadas há mais de N dias e ainda não arquivadas.
+
+    Args:
+        older_than_days: Idade mínima em dias (padrão da configuração)
+
+    Returns:
+        Lista de sessões com ``session_id`` e ``month``
+    """
+    if older_than_days is None:
+        older_than_days = get_config_value(
+            "archive.older_than_days", DEFAULT_OLDER_THAN_DAYS
+        )
+
+    return execute_query(
+        """
+        SELECT s.id AS session_id, strftime('%Y_%m', s.end_time) AS month
+        FROM sessions s
+        LEFT JOIN archived_sessions a ON a.session_id = s.id
+        WHERE s.end_time IS NOT NULL
+          AND s.end_time < datetime('now', ?)
+          AND a.session_id IS NULL
+        ORDER BY s.end_time
+        """,
+        (f"-{int(older_than_days)} days",),
+    )
+
+
+def archive_session(session_id: int, month: str) -> Dict[str, Any]:
+    """
+    Move as mensagens de uma sessão para o banco de arquivo do mês.
+
+    A cópia para o arquivo é confirmada antes da remoção no banco principal;
+    repetir a operação após uma falha é seguro (a cópia é idempotente).
+
+    Args:
+        session_id: ID da sessão
+        month: Mês do arquivo ('YYYY_MM')
+
+    Returns:
+        Estatísticas da sessão arquivada
+    """
+    archive = _open_archive(month)
+    count, raw_bytes, stored_bytes = 0, 0, 0
+    first_at, last_at, max_id = None, None, 0
+    try:
+        # Mensagens já copiadas numa execução anterior interrompida
+        copied = {
+            row[0]
+            for row in archive.execute(
+                "SELECT id FROM messages WHERE session_id = ?", (session_id,)
+            )
+        }
+
+        def _flush(batch: List[Sequence[Any]]) -> None:
+            archive.execute("BEGIN")
+            archive.executemany(
+                "INSERT INTO messages VALUES (?, ?, ?, ?, ?, ?)",
+                [row[:6] for row in batch],
+            )
+            archive.executemany(
+                "INSERT INTO messages_fts(rowid, content) VALUES (?, ?)",
+                [(row[0], row[6]) for row in batch],
+            )
+            archive.execute("COMMIT")
+
+        rows = iter_query(
+            """
+            SELECT id, session_id, role, content, token_count, timestamp
+            FROM messages WHERE session_id = ? ORDER BY id
+            """,
+            (session_id,),
+            row_format="tuple",
+        )
+        pending: List[Sequence[Any]] = []
+        for message_id, sid, role, content, token_count, timestamp in rows:
+            compressed = _compress(content)
+            count += 1
+            raw_bytes += len(content.encode("utf-8"))
+            stored_bytes += len(compressed)
+            first_at = first_at or timestamp
+            last_at = timestamp
+            max_id = message_id
+            if message_id in copied:
+                continue
+            pending.append(
+                (message_id, sid, role, compressed, token_count, timestamp, content)
+            )
+            if len(pending) >= COPY_CHUNK:
+                _flush(pending)
+                pending = []
+        if pending:
+            _flush(pending)
+    except BaseException:
+        if archive.in_transaction:
+            archive.execute("ROLLBACK")
+        raise
+    finally:
+        archive.close()
+
+    with transaction():
+        execute_update(
+            """
+            INSERT OR REPLACE INTO archived_sessions
+                (session_id, archive_month, message_count,
+                 first_message_at, last_message_at)
+            VALUES (?, ?, ?, ?, ?)
+            """,
+            (session_id, month, count, first_at, last_at),
+        )
+        execute_update(
+            "DELETE FROM messages WHERE session_id = ? AND id <= ?",
+            (session_id, max_id),
+        )
+
+    return {
+        "session_id": session_id,
+        "month": month,
+        "messages": count,
+        "raw_bytes": raw_bytes,
+        "stored_bytes": stored_bytes,
+    }
+
+
+def archive_old_sessions(
+    older_than_days: Optional[int] = None,
+    limit: Optional[int] = None,
+    dry_run: bool = False,
+) -> Dict[str, Any]:
+    """
+    Arquiva as mensagens de todas as sessões elegíveis.
+
+    Args:
+        older_than_days: Idade mínima em dias (padrão da configuração)
+        limit: Número máximo de sessões a arquivar nesta execução (opcional)
+        dry_run: Se True, apenas lista o que seria arquivado
+
+    Returns:
+        Resumo com sessões, mensagens, bytes e duração
+    """
+    start = time.perf_counter()
+    sessions = find_archivable_sessions(older_than_days)
+    if limit is not None:
+        sessions = sessions[:limit]
+
+    summary: Dict[str, Any] = {
+        "sessions": len(sessions),
+        "messages": 0,
+        "raw_bytes": 0,
+        "stored_bytes": 0,
+        "months": sorted({s["month"] for s in sessions}),
+        "dry_run": dry_run,
+    }
+    if dry_run:
+        return summary
+
+    for session in sessions:
+        result = archive_session(session["session_id"], session["month"])
+        summary["messages"] += result["messages"]
+        summary["raw_bytes"] += result["raw_bytes"]
+        summary["stored_bytes"] += result["stored_bytes"]
+
+    # Devolve ao sistema as páginas liberadas (só tem efeito com auto_vacuum)
+    if summary["messages"]:
+        with pooled_connection() as conn:
+            conn.execute("PRAGMA incremental_vacuum").fetchall()
+
+    summary["duration_seconds"] = round(time.perf_counter() - start, 3)
+    logger.info(
+        f"Arquivadas {summary['messages']} mensagens de {summary['sessions']} sessões"
+    )
+    return summary
+
+
+def get_archived_messages(
+    session_id: int,
+    limit: Optional[int] = None,
+    include_system: bool = True,
+) -> List[Dict[str, Any]]:
+    """
+    Lê as mensagens arquivadas de uma sessão, em ordem cronológica.
+
+    Args:
+        session_id: ID da sessão
+        limit: Número máximo de mensagens (as mais recentes; opcional)
+        include_system: Se deve incluir mensagens do sistema
+
+    Returns:
+        Lista de mensagens com conteúdo descomprimido
+    """
+    stub = get_archived_session(session_id)
+    if stub is None:
+        return []
+    conn = _open_archive_readonly(stub["archive_month"])
+    if conn is None:
+        logger.error(f"Arquivo do mês {stub['archive_month']} não encontrado")
+        return []
+
+    role_filter = "" if include_system else "AND role != 'system'"
+    try:
+        rows = conn.execute(
+            f"""
+            SELECT id, role, content, token_count, timestamp FROM messages
+            WHERE session_id = ? {role_filter}
+            ORDER BY timestamp DESC, id DESC
+            LIMIT ?
+            """,
+            (session_id, -1 if limit is None else limit),
+        ).fetchall()
+    finally:
+        conn.close()
+
+    messages = [
+        {
+            "id": message_id,
+            "role": role,
+            "content": _decompress(content),
+            "token_count": token_count,
+            "timestamp": timestamp,
+        }
+        for message_id, role, content, token_count, timestamp in rows
+    ]
+    messages.reverse()
+    return messages
+
+
+def _make_snippet(text: str, terms: List[str], width: int = 12) -> str:
+    """Gera um trecho com os termos destacados em torno da primeira ocorrência."""
+    words = text.split()
+    lowered = [w.lower() for w in words]
+    prefixes = [t.lower() for t in terms]
+    hit = next((i for i, w in enumerate(lowered) if any(p in w for p in prefixes)), 0)
+    start = max(0, hit - width // 2)
+    window = words[start : start + width]
+    highlighted = [
+        f"[{w}]" if any(p in w.lower() for p in prefixes) else w for w in window
+    ]
+    prefix = "…" if start > 0 else ""
+    suffix = "…" if start + width < len(words) else ""
+    return prefix + " ".join(highlighted) + suffix
+
+
+def iter_archive_search(match: str, limit: int) -> Iterator[Dict[str, Any]]:
+    """
+    Busca nos bancos de arquivo, do mês mais recente para o mais antigo.
+
+    Args:
+        match: Expressão MATCH do FTS5
+        limit: Número máximo de resultados por mês
+
+    Yields:
+        Resultados no formato da busca principal (escopo 'messages')
+    """
+    terms = [
+        t for t in _TERM_PATTERN.findall(match) if t.upper() not in ("AND", "OR", "NOT")
+    ]
+    for month in _list_months():
+        conn = _open_archive_readonly(month)
+        if conn is None:
+            continue
+        try:
+            rows = conn.execute(
+                """
+                SELECT m.id, m.session_id, m.role, m.content, m.timestamp, f.rank
+                FROM (
+                    SELECT rowid, bm25(messages_fts) AS rank FROM messages_fts
+                    WHERE messages_fts MATCH ? ORDER BY rank LIMIT ?
+                ) f
+                JOIN messages m ON m.id = f.rowid
+                ORDER BY f.rank
+                """,
+                (match, limit),
+            ).fetchall()
+        except sqlite3.Error as e:
+            logger.error(f"Erro ao buscar no arquivo {month}: {str(e)}")
+            rows = []
+        finally:
+            conn.close()
+
+        for message_id, session_id, role, content, timestamp, rank in rows:
+            yield {
+                "scope": "messages",
+                "id": message_id,
+                "session_id": session_id,
+                "project_id": None,
+                "title": role,
+                "timestamp": timestamp,
+                "rank": rank,
+                "snippet": _make_snippet(_decompress(content), terms),
+                "archived": True,
+            }
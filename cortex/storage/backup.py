@@ -0,0 +1,573 @@
+#!/usr/bin/env python3
+"""
+CORTEX Backup - Backups incrementais, verificação e rotação.
+
+Este módulo mantém cadeias de backup em ``~/.cortex/backups``: um backup
+completo (cópia paginada e com pausas via ``backup_db``) seguido de deltas
+com as linhas inseridas ou alteradas desde o backup anterior. Cada arquivo é
+verificado e registado num manifesto, e cadeias antigas são removidas
+conforme a política de retenção.
+
+Os deltas capturam inserções (por ID acima da marca d'água) e alterações que
+atualizam colunas de data. Cada delta guarda também os intervalos de chaves
+presentes em cada tabela no momento do backup; ao aplicá-lo, as linhas fora
+desses intervalos são removidas, o que reproduz exclusões e as mensagens
+movidas para o arquivo. Alterações sem data só entram no próximo backup
+completo, que é forçado a cada ``max_deltas_per_chain`` deltas.
+"""
+import hashlib
+import json
+import logging
+import os
+import sqlite3
+import time
+from typing import Any, Dict, List, Optional
+
+from cortex.core.config import get_config_value
+from cortex.storage import generations
+from cortex.storage.database import (
+    _quote_identifier,
+    _restore_full,
+    backup_db,
+    get_connection,
+)
+
+logger = logging.getLogger("cortex.storage.backup")
+
+# Diretório e manifesto dos backups
+BACKUP_DIR = os.path.expanduser("~/.cortex/backups")
+MANIFEST_FILE = os.path.join(BACKUP_DIR, "manifest.json")
+
+# Política padrão (sobreposta pela chave "backup" da configuração)
+DEFAULT_POLICY = {
+    "keep_chains": 3,
+    "max_deltas_per_chain": 6,
+    "full_interval_hours": 168,
+    "max_age_days": 30,
+    "pages_per_step": 256,
+    "step_sleep_ms": 10,
+    "delta_chunk_rows": 5000,
+    "max_restarts": 3,
+}
+
+# Tabelas incluídas nos deltas, pais antes de filhas, e a condição que
+# identifica linhas novas ou alteradas (:hwm = maior chave no backup
+# anterior, :since = início do anterior)
+DELTA_TABLES = {
+    "projects": "id > :hwm OR updated_at >= :since",
+    "sessions": "id > :hwm OR end_time >= :since",
+    "archived_sessions": "session_id > :hwm OR archived_at >= :since",
+    "messages": "id > :hwm",
+    "tasks": "id > :hwm OR updated_at >= :since",
+    "task_relations": "id > :hwm",
+    "markers": "id > :hwm OR resolved_at >= :since",
+    "contexts": "id > :hwm OR updated_at >= :since",
+    "rules": "id > :hwm OR updated_at >= :since",
+    "markdown_sync": "id > :hwm OR last_sync_time >= :since",
+    "automation_rules": (
+        "id > :hwm OR updated_at >= :since OR last_triggered_at >= :since"
+    ),
+    "code_analysis": "id > :hwm",
+    "suggestions": "id > :hwm OR applied_at >= :since",
+    "productivity": "id > :hwm",
+    "system_metrics": "id > :hwm",
+}
+
+# Chave (INTEGER PRIMARY KEY) das tabelas dos deltas que não usam ``id``
+DELTA_KEYS = {"archived_sessions": "session_id"}
+
+# Tabela do delta com os intervalos de chaves presentes em cada tabela
+KEY_RANGES_TABLE = "delta_key_ranges"
+
+
+def get_policy() -> Dict[str, Any]:
+    """
+    Obtém a política de backup, combinando a configuração com os padrões.
+
+    Returns:
+        Dicionário com os parâmetros de retenção e throttling
+    """
+    configured = get_config_value("backup", {}) or {}
+    return {key: configured.get(key, value) for key, value in DEFAULT_POLICY.items()}
+
+
+def _utc_now() -> str:
+    """Data/hora atual no formato de CURRENT_TIMESTAMP do SQLite."""
+    return time.strftime("%Y-%m-%d %H:%M:%S", time.gmtime())
+
+
+def _backup_path(kind: str) -> str:
+    """Gera um nome de arquivo único para um backup."""
+    os.makedirs(BACKUP_DIR, exist_ok=True)
+    prefix = "cortex_backup" if kind == "full" else "cortex_delta"
+    stamp = time.strftime("%Y%m%d_%H%M%S")
+    millis = int(time.time() * 1000) % 1000
+    return os.path.join(BACKUP_DIR, f"{prefix}_{stamp}_{millis:03d}.db")
+
+
+def load_manifest() -> Dict[str, Any]:
+    """
+    Lê o manifesto de backups.
+
+    Returns:
+        Manifesto com a lista de backups registados
+    """
+    if not os.path.exists(MANIFEST_FILE):
+        return {"version": 1, "force_full": False, "backups": []}
+    try:
+        with open(MANIFEST_FILE, "r") as f:
+            return json.load(f)
+    except (OSError, ValueError) as e:
+        logger.error(f"Manifesto de backups inválido, iniciando um novo: {str(e)}")
+        return {"version": 1, "force_full": True, "backups": []}
+
+
+def save_manifest(manifest: Dict[str, Any]) -> None:
+    """
+    Grava o manifesto de backups de forma atômica.
+
+    Args:
+        manifest: Manifesto a gravar
+    """
+    os.makedirs(BACKUP_DIR, exist_ok=True)
+    tmp_path = MANIFEST_FILE + ".tmp"
+    with open(tmp_path, "w") as f:
+        json.dump(manifest, f, indent=2)
+    os.replace(tmp_path, MANIFEST_FILE)
+
+
+def _file_sha256(path: str) -> str:
+    """Calcula o SHA-256 de um arquivo em blocos."""
+    digest = hashlib.sha256()
+    with open(path, "rb") as f:
+        for block in iter(lambda: f.read(1024 * 1024), b""):
+            digest.update(block)
+    return digest.hexdigest()
+
+
+def _tables(conn: sqlite3.Connection, schema: str = "main") -> List[str]:
+    """Lista as tabelas comuns (não virtuais nem internas) de um esquema."""
+    rows = conn.execute(
+        f"SELECT name FROM {schema}.sqlite_master "
+        "WHERE type = 'table' AND name NOT LIKE 'sqlite_%' "
+        "AND sql NOT LIKE 'CREATE VIRTUAL%'"
+    ).fetchall()
+    return [row[0] for row in rows]
+
+
+def _key(table: str) -> str:
+    """Coluna de chave de uma tabela dos deltas, já entre aspas."""
+    return _quote_identifier(DELTA_KEYS.get(table, "id"))
+
+
+def _high_water_marks(path: str) -> Dict[str, int]:
+    """Lê a maior chave de cada tabela rastreada num arquivo de backup."""
+    conn = sqlite3.connect(f"file:{path}?mode=ro", uri=True)
+    try:
+        existing = set(_tables(conn))
+        return {
+            table: conn.execute(
+                f"SELECT COALESCE(MAX({_key(table)}), 0) "
+                f"FROM {_quote_identifier(table)}"
+            ).fetchone()[0]
+            for table in DELTA_TABLES
+            if table in existing
+        }
+    finally:
+        conn.close()
+
+
+def verify_backup(path: str, expected_sha256: Optional[str] = None) -> Dict[str, Any]:
+    """
+    Verifica a integridade de um arquivo de backup.
+
+    Args:
+        path: Caminho do backup
+        expected_sha256: Hash registado no manifesto (opcional)
+
+    Returns:
+        Dicionário com ``ok``, o resultado do integrity_check e o hash atual
+    """
+    sha256 = _file_sha256(path)
+    conn = sqlite3.connect(f"file:{path}?mode=ro", uri=True)
+    try:
+        result = conn.execute("PRAGMA integrity_check").fetchone()[0]
+    except sqlite3.DatabaseError as e:
+        result = str(e)
+    finally:
+        conn.close()
+
+    ok = result == "ok" and (expected_sha256 is None or expected_sha256 == sha256)
+    if not ok:
+        logger.error(f"Backup inválido: {path} ({result})")
+    return {"ok": ok, "integrity": result, "sha256": sha256}
+
+
+def _current_chain(manifest: Dict[str, Any]) -> List[Dict[str, Any]]:
+    """Retorna o backup completo mais recente seguido dos seus deltas."""
+    backups = manifest["backups"]
+    for index in range(len(backups) - 1, -1, -1):
+        if backups[index]["kind"] == "full":
+            base = backups[index]["file"]
+            return [backups[index]] + [
+                b for b in backups[index + 1 :] if b.get("base") == base
+            ]
+    return []
+
+
+def _schema_version() -> int:
+    """Lê a versão do esquema do banco atual."""
+    conn = get_connection()
+    try:
+        return conn.execute("PRAGMA user_version").fetchone()[0]
+    finally:
+        conn.close()
+
+
+def _needs_full(manifest: Dict[str, Any], policy: Dict[str, Any]) -> bool:
+    """Decide se o próximo backup deve ser completo."""
+    chain = _current_chain(manifest)
+    if manifest.get("force_full") or not chain:
+        return True
+    base = chain[0]
+    if not os.path.exists(os.path.join(BACKUP_DIR, base["file"])):
+        return True
+    if len(chain) - 1 >= policy["max_deltas_per_chain"]:
+        return True
+    if time.time() - base["created_ts"] > policy["full_interval_hours"] * 3600:
+        return True
+    # Uma migração de esquema invalida a cadeia
+    return base.get("schema_version") != _schema_version()
+
+
+def _create_full(policy: Dict[str, Any]) -> Dict[str, Any]:
+    """Cria um backup completo paginado e devolve a entrada do manifesto."""
+    path = _backup_path("full")
+    started_at = _utc_now()
+    steps = {"count": 0, "pages": 0}
+
+    def _progress(status: int, remaining: int, total: int) -> None:
+        steps["count"] += 1
+        steps["pages"] = total
+
+    backup_db(
+        path,
+        pages=policy["pages_per_step"],
+        sleep=policy["step_sleep_ms"] / 1000,
+        progress=_progress,
+        max_restarts=policy["max_restarts"],
+    )
+    return {
+        "file": os.path.basename(path),
+        "kind": "full",
+        "base": None,
+        "started_at": started_at,
+        "high_water": _high_water_marks(path),
+        "pages": steps["pages"],
+        "steps": steps["count"],
+    }
+
+
+def _create_delta(
+    chain: List[Dict[str, Any]], policy: Dict[str, Any]
+) -> Dict[str, Any]:
+    """Cria um delta com as mudanças desde o último backup da cadeia."""
+    previous = chain[-1]
+    path = _backup_path("delta")
+    started_at = _utc_now()
+    chunk_rows = policy["delta_chunk_rows"]
+    sleep = policy["step_sleep_ms"] / 1000
+
+    conn = get_connection()
+    rows_copied: Dict[str, int] = {}
+    high_water = dict(previous["high_water"])
+    try:
+        conn.execute("ATTACH DATABASE ? AS delta", (path,))
+        existing = set(_tables(conn))
+        conn.execute(
+            f"CREATE TABLE delta.{KEY_RANGES_TABLE} "
+            "(tbl TEXT NOT NULL, first_key INTEGER NOT NULL, "
+            "last_key INTEGER NOT NULL, PRIMARY KEY (tbl, first_key))"
+        )
+        # Snapshot de leitura único: o delta é consistente sem bloquear escritores
+        conn.execute("BEGIN")
+        for table, condition in DELTA_TABLES.items():
+            if table not in existing:
+                continue
+            quoted = _quote_identifier(table)
+            key = _key(table)
+
+            # Intervalos contíguos de chaves presentes (lacunas = linhas removidas)
+            conn.execute(
+                f"""
+                INSERT INTO delta.{KEY_RANGES_TABLE} (tbl, first_key, last_key)
+                SELECT ?, MIN(k), MAX(k) FROM (
+                    SELECT {key} AS k, {key} - ROW_NUMBER() OVER (ORDER BY {key}) AS run
+                    FROM main.{quoted}
+                )
+                GROUP BY run
+                """,
+                (table,),
+            )
+            params = {
+                "hwm": previous["high_water"].get(table, 0),
+                "since": previous["started_at"],
+            }
+            conn.execute(
+                f"CREATE TABLE delta.{quoted} AS SELECT * FROM main.{quoted} WHERE 0"
+            )
+
+            # Cópia em blocos por ID, com pausas entre blocos
+            last_id, copied = 0, 0
+            while True:
+                cursor = conn.execute(
+                    f"""
+                    INSERT INTO delta.{quoted}
+                    SELECT * FROM main.{quoted}
+                    WHERE ({condition}) AND {key} > :last_id
+                    ORDER BY {key} LIMIT :chunk
+                    """,
+                    {**params, "last_id": last_id, "chunk": chunk_rows},
+                )
+                if cursor.rowcount <= 0:
+                    break
+                copied += cursor.rowcount
+                last_id = conn.execute(
+                    f"SELECT MAX({key}) FROM delta.{quoted}"
+                ).fetchone()[0]
+                if cursor.rowcount < chunk_rows:
+                    break
+                if sleep > 0:
+                    time.sleep(sleep)
+
+            rows_copied[table] = copied
+            if copied:
+                high_water[table] = max(high_water.get(table, 0), last_id)
+        conn.execute("COMMIT")
+    except BaseException:
+        if conn.in_transaction:
+            conn.execute("ROLLBACK")
+        conn.close()
+        if os.path.exists(path):
+            os.remove(path)
+        raise
+    conn.execute("DETACH DATABASE delta")
+    conn.close()
+
+    return {
+        "file": os.path.basename(path),
+        "kind": "delta",
+        "base": chain[0]["file"],
+        "started_at": started_at,
+        "high_water": high_water,
+        "rows": rows_copied,
+    }
+
+
+def create_backup(force_full: bool = False, verify: bool = True) -> Dict[str, Any]:
+    """
+    Cria um backup incremental (ou completo, quando a política exige).
+
+    Args:
+        force_full: Se True, sempre cria um backup completo
+        verify: Se deve verificar a integridade do arquivo gerado
+
+    Returns:
+        Entrada do manifesto com caminho, tipo, tamanho, duração e throughput
+    """
+    policy = get_policy()
+    manifest = load_manifest()
+
+    start = time.perf_counter()
+    if force_full or _needs_full(manifest, policy):
+        entry = _create_full(policy)
+        manifest["force_full"] = False
+    else:
+        entry = _create_delta(_current_chain(manifest), policy)
+    duration = time.perf_counter() - start
+
+    path = os.path.join(BACKUP_DIR, entry["file"])
+    size = os.path.getsize(path)
+    entry.update(
+        {
+            "created_ts": time.time(),
+            "schema_version": _schema_version(),
+            "size_bytes": size,
+            "duration_seconds": round(duration, 3),
+            "throughput_mb_s": round(size / duration / (1024 * 1024), 2)
+            if duration > 0
+            else None,
+            "sha256": _file_sha256(path),
+            "verified": None,
+        }
+    )
+
+    if verify:
+        entry["verified"] = verify_backup(path, entry["sha256"])["ok"]
+
+    manifest["backups"].append(entry)
+    save_manifest(manifest)
+
+    logger.info(
+        f"Backup {entry['kind']} criado em {path} "
+        f"({size} bytes, {entry['duration_seconds']}s)"
+    )
+    return {**entry, "path": path}
+
+
+def _apply_delta(conn: sqlite3.Connection, path: str) -> None:
+    """
+    Aplica um delta sobre o banco atual, disparando os triggers: remove as
+    linhas fora dos intervalos de chaves do delta (filhas antes das pais) e
+    faz UPSERT das linhas copiadas (pais antes das filhas).
+    """
+    conn.execute("ATTACH DATABASE ? AS delta", (path,))
+    try:
+        main_tables = set(_tables(conn))
+        delta_tables = set(_tables(conn, "delta"))
+        tables = [t for t in DELTA_TABLES if t in main_tables and t in delta_tables]
+        conn.execute("BEGIN IMMEDIATE")
+        # Deltas antigos, sem intervalos de chaves, não reproduzem exclusões
+        if KEY_RANGES_TABLE in delta_tables:
+            for table in reversed(tables):
+                key = _key(table)
+                conn.execute(
+                    f"""
+                    DELETE FROM main.{_quote_identifier(table)}
+                    WHERE {key} > IFNULL((
+                        SELECT r.last_key FROM delta.{KEY_RANGES_TABLE} r
+                        WHERE r.tbl = ? AND r.first_key <= {key}
+                        ORDER BY r.first_key DESC LIMIT 1
+                    ), -1)
+                    """,
+                    (table,),
+                )
+        for table in tables:
+            quoted = _quote_identifier(table)
+            key = _key(table)
+            main_columns = [
+                r[1] for r in conn.execute(f"PRAGMA main.table_info({quoted})")
+            ]
+            delta_columns = [
+                r[1] for r in conn.execute(f"PRAGMA delta.table_info({quoted})")
+            ]
+            columns = [c for c in delta_columns if c in main_columns]
+            column_list = ", ".join(_quote_identifier(c) for c in columns)
+            assignments = ", ".join(
+                f"{_quote_identifier(c)} = excluded.{_quote_identifier(c)}"
+                for c in columns
+                if _quote_identifier(c) != key
+            )
+            conn.execute(
+                f"""
+                INSERT INTO main.{quoted} ({column_list})
+                SELECT {column_list} FROM delta.{quoted} WHERE true
+                ON CONFLICT({key}) DO UPDATE SET {assignments}
+                """
+            )
+        conn.execute("COMMIT")
+    except BaseException:
+        if conn.in_transaction:
+            conn.execute("ROLLBACK")
+        raise
+    finally:
+        conn.execute("DETACH DATABASE delta")
+
+
+def restore_backup(path: str) -> None:
+    """
+    Restaura um backup completo ou uma cadeia até o delta informado.
+
+    Args:
+        path: Caminho do backup a restaurar
+    """
+    manifest = load_manifest()
+    name = os.path.basename(path)
+    entry = next((b for b in manifest["backups"] if b["file"] == name), None)
+
+    if entry is None or entry["kind"] == "full":
+        if entry is not None and entry.get("sha256"):
+            check = verify_backup(path, entry["sha256"])
+            if not check["ok"]:
+                raise ValueError(f"Backup corrompido: {path}")
+        _restore_full(path)
+    else:
+        base = entry["base"]
+        chain = [
+            b for b in manifest["backups"] if b["file"] == base or b.get("base") == base
+        ]
+        chain = chain[: chain.index(entry) + 1]
+        for item in chain:
+            item_path = os.path.join(BACKUP_DIR, item["file"])
+            if not verify_backup(item_path, item.get("sha256"))["ok"]:
+                raise ValueError(f"Backup corrompido na cadeia: {item_path}")
+
+        _restore_full(os.path.join(BACKUP_DIR, base))
+        conn = get_connection()
+        try:
+            for item in chain[1:]:
+                _apply_delta(conn, os.path.join(BACKUP_DIR, item["file"]))
+        finally:
+            conn.close()
+
+    # Nada do que foi lido antes da restauração continua válido
+    generations.bump()
+
+    # O banco restaurado não corresponde mais às marcas d'água da cadeia atual
+    manifest["force_full"] = True
+    save_manifest(manifest)
+
+
+def rotate_backups() -> List[str]:
+    """
+    Remove cadeias de backup antigas conforme a política de retenção.
+
+    Mantém as ``keep_chains`` cadeias mais recentes e remove as que têm base
+    mais antiga que ``max_age_days`` (a cadeia mais recente nunca é removida).
+
+    Returns:
+        Lista de arquivos removidos
+    """
+    policy = get_policy()
+    manifest = load_manifest()
+    backups = manifest["backups"]
+
+    bases = [b for b in backups if b["kind"] == "full"]
+    cutoff = time.time() - policy["max_age_days"] * 86400
+    keep = {
+        b["file"]
+        for b in bases[-policy["keep_chains"] :]
+        if b["created_ts"] >= cutoff or b is bases[-1]
+    }
+
+    removed = []
+    remaining = []
+    for entry in backups:
+        chain_base = entry["file"] if entry["kind"] == "full" else entry.get("base")
+        if chain_base in keep:
+            remaining.append(entry)
+            continue
+        path = os.path.join(BACKUP_DIR, entry["file"])
+        try:
+            if os.path.exists(path):
+                os.remove(path)
+            removed.append(entry["file"])
+        except OSError as e:
+            logger.error(f"Erro ao remover backup {path}: {str(e)}")
+            remaining.append(entry)
+
+    manifest["backups"] = remaining
+    save_manifest(manifest)
+    if removed:
+        logger.info(f"Rotação de backups removeu {len(removed)} arquivos")
+    return removed
+
+
+def list_backups() -> List[Dict[str, Any]]:
+    """
+    Lista os backups registados no manifesto.
+
+    Returns:
+        Entradas do manifesto, da mais antiga para a mais recente
+    """
+    return load_manifest()["backups"]
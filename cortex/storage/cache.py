@@ -0,0 +1,228 @@
+#!/usr/bin/env python3
+"""
+CORTEX Cache - Cache de respostas das ferramentas somente leitura.
+
+Ferramentas com ``ToolSpec.cache_tables`` têm a resposta guardada pela chave
+(ferramenta, parâmetros normalizados). Cada entrada leva as gerações das
+tabelas que a ferramenta lê (ver cortex/storage/generations.py), tomadas
+antes da execução; um acerto exige que nenhuma delas tenha mudado desde
+então, e nesse caso o SQLite nem é consultado.
+
+A memória é limitada por número de entradas e por tamanho aproximado (JSON
+da resposta), descartando as menos usadas (LRU). Escritas feitas por outros
+processos (como a CLI) não passam pelos contadores de geração deste processo:
+antes de cada consulta ao cache o ``PRAGMA data_version`` do banco é
+conferido (``generations.check_external_writes``), e uma mudança invalida
+todas as entradas. ``max_age_seconds`` continua limitando a vida delas.
+"""
+import json
+import logging
+import threading
+import time
+from collections import OrderedDict
+from typing import Any, Callable, Dict, NamedTuple, Optional, Sequence, Tuple
+
+from cortex.storage import generations
+from cortex.storage.database import get_db_path
+
+logger = logging.getLogger("cortex.storage.cache")
+
+# Configuração padrão (sobrescrita pela chave "server.cache")
+DEFAULT_CACHE = {
+    "enabled": True,
+    "max_entries": 512,
+    "max_bytes": 8 * 1024 * 1024,
+    "max_age_seconds": 5.0,
+}
+
+
+class _Entry(NamedTuple):
+    tag: Tuple[int, ...]
+    expires_at: float
+    payload: str  # resposta em JSON
+
+
+class ResponseCache:
+    """
+    Cache LRU de respostas invalidado pelas gerações das tabelas.
+
+    A resposta é guardada em JSON e cada acerto devolve uma cópia nova,
+    decodificada (mais barato que ``copy.deepcopy``): quem a recebe pode
+    modificá-la sem afetar as próximas chamadas.
+
+    Args:
+        config: Configuração (chaves de ``DEFAULT_CACHE``)
+    """
+
+    def __init__(self, config: Optional[Dict[str, Any]] = None) -> None:
+        self.config = {**DEFAULT_CACHE, **(config or {})}
+        self.enabled = bool(self.config["enabled"])
+        self._entries: "OrderedDict[str, _Entry]" = OrderedDict()
+        self._bytes = 0
+        self._lock = threading.Lock()
+        self._signatures: Dict[Callable[..., Any], Any] = {}
+        self._stats = {
+            "hits": 0,
+            "misses": 0,
+            "stale": 0,
+            "evictions": 0,
+            "uncacheable": 0,
+        }
+
+    def _key(
+        self, tool: str, func: Callable[..., Any], parameters: Dict[str, Any]
+    ) -> Optional[str]:
+        """
+        Chave da chamada: parâmetros com os valores padrão preenchidos, em JSON.
+
+        ``get_context()`` e ``get_context(max_messages=20)`` caem na mesma
+        chave. Retorna None se os parâmetros não casam com a assinatura (a
+        chamada segue sem cache e a própria ferramenta acusa o erro).
+        """
+        signature = self._signatures.get(func)
+        if signature is None:
+            import inspect
+
+            signature = self._signatures[func] = inspect.signature(func)
+        try:
+            bound = signature.bind(**parameters)
+        except TypeError:
+            return None
+        bound.apply_defaults()
+        try:
+            return tool + ":" + json.dumps(bound.arguments, sort_keys=True)
+        except (TypeError, ValueError):
+            return None
+
+    def call(
+        self,
+        tool: str,
+        func: Callable[..., Dict[str, Any]],
+        parameters: Dict[str, Any],
+        tables: Sequence[str],
+    ) -> Dict[str, Any]:
+        """
+        Executa a ferramenta ou devolve a resposta em cache.
+
+        Args:
+            tool: Nome da ferramenta
+            func: Função da ferramenta
+            parameters: Parâmetros da chamada
+            tables: Tabelas lidas pela ferramenta
+
+        Returns:
+            Resposta da ferramenta
+        """
+        key = self._key(tool, func, parameters) if self.enabled else None
+        if key is None:
+            with self._lock:
+                self._stats["uncacheable"] += 1
+            return func(**parameters)
+
+        # Escritas de outros processos avançam a época antes do snapshot
+        generations.check_external_writes(get_db_path())
+        # Gerações tomadas antes da leitura: um COMMIT concorrente deixa a
+        # entrada já vencida em vez de guardar um resultado anterior a ele
+        tag = generations.snapshot(tables)
+        now = time.monotonic()
+        payload = None
+        with self._lock:
+            entry = self._entries.get(key)
+            if entry is not None:
+                if entry.tag == tag and entry.expires_at > now:
+                    self._entries.move_to_end(key)
+                    self._stats["hits"] += 1
+                    payload = entry.payload
+                else:
+                    self._drop(key)
+                    self._stats["stale"] += 1
+            if payload is None:
+                self._stats["misses"] += 1
+        if payload is not None:
+            return json.loads(payload)
+
+        result = func(**parameters)
+        if isinstance(result, dict) and "error" not in result:
+            self._store(key, tag, now, result)
+        return result
+
+    def _store(
+        self, key: str, tag: Tuple[int, ...], now: float, value: Dict[str, Any]
+    ) -> None:
+        try:
+            payload = json.dumps(value, default=str)
+        except (TypeError, ValueError):
+            return
+        if len(payload) > self.config["max_bytes"]:
+            return
+        with self._lock:
+            if key in self._entries:
+                self._drop(key)
+            self._entries[key] = _Entry(
+                tag, now + self.config["max_age_seconds"], payload
+            )
+            self._bytes += len(payload)
+            while (
+                len(self._entries) > self.config["max_entries"]
+                or self._bytes > self.config["max_bytes"]
+            ):
+                oldest = next(iter(self._entries))
+                self._drop(oldest)
+                self._stats["evictions"] += 1
+
+    def _drop(self, key: str) -> None:
+        self._bytes -= len(self._entries.pop(key).payload)
+
+    def clear(self) -> None:
+        """Descarta todas as entradas."""
+        with self._lock:
+            self._entries.clear()
+            self._bytes = 0
+
+    def stats(self) -> Dict[str, Any]:
+        """
+        Estatísticas do cache.
+
+        Returns:
+            Acertos, falhas, entradas vencidas, descartes por LRU, chamadas
+            sem cache, ocupação e taxa de acerto
+        """
+        with self._lock:
+            stats = dict(self._stats)
+            stats["entries"] = len(self._entries)
+            stats["bytes"] = self._bytes
+        lookups = stats["hits"] + stats["misses"]
+        stats["hit_rate"] = round(stats["hits"] / lookups, 4) if lookups else None
+        return stats
+
+
+_cache: Optional[ResponseCache] = None
+_cache_lock = threading.Lock()
+
+
+def get_response_cache() -> ResponseCache:
+    """
+    Obtém o cache de respostas do processo, criando-o a partir da configuração.
+
+    Returns:
+        Instância compartilhada de ``ResponseCache``
+    """
+    global _cache
+
+    if _cache is None:
+        with _cache_lock:
+            if _cache is None:
+                from cortex.core.config import get_config_value
+
+                _cache = ResponseCache(get_config_value("server.cache", {}) or {})
+    return _cache
+
+
+def response_cache_stats() -> Optional[Dict[str, Any]]:
+    """
+    Estatísticas do cache de respostas do processo.
+
+    Returns:
+        Estatísticas de ``ResponseCache.stats``, ou None se o cache não foi criado
+    """
+    return _cache.stats() if _cache is not None else None
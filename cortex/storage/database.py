@@ -4,12 +4,31 @@ CORTEX Database - Gerenciamento do banco de dados SQLite.
 
 Este módulo gerencia conexões e esquema do banco de dados.
 """
+import logging
 import os
+import random
 import sqlite3
+import threading
 import time
+from contextlib import contextmanager
 from pathlib import Path
-from typing import Optional, Dict, List, Any, Tuple
-import logging
+from typing import (
+    Any,
+    Callable,
+    Dict,
+    Iterable,
+    Iterator,
+    List,
+    Optional,
+    Sequence,
+    Tuple,
+    TypeVar,
+)
+
+from cortex.storage import generations
+from cortex.storage.instrumentation import get_instrumentation
+from cortex.storage.pool import ConnectionPool
+from cortex.storage.rows import row_type
 
 logger = logging.getLogger("cortex.storage")
 
@@ -20,6 +39,207 @@ CORTEX_DB_PATH = os.path.join(CORTEX_DATA_DIR, "cortex.db")
 # Garantir que o diretório de dados existe
 os.makedirs(CORTEX_DATA_DIR, exist_ok=True)
 
+# Pool de conexões persistentes (criado sob demanda)
+_pool: Optional[ConnectionPool] = None
+_pool_lock = threading.Lock()
+
+# Limite conservador de parâmetros por instrução (SQLITE_MAX_VARIABLE_NUMBER
+# antigo); usado para dividir INSERTs com múltiplas linhas
+MAX_SQL_VARIABLES = 999
+
+# Linhas lidas do cursor por vez em iter_query
+DEFAULT_FETCH_BATCH = 256
+
+# Formatos de linha aceitos por iter_query
+ROW_FORMATS = ("dict", "tuple", "row")
+
+# Backup em passos: páginas por passo e pausa (segundos) entre passos
+DEFAULT_BACKUP_PAGES = 256
+DEFAULT_BACKUP_SLEEP = 0.01
+# Recomeços tolerados (escritas de outras conexões) antes da cópia num passo só
+DEFAULT_BACKUP_MAX_RESTARTS = 3
+
+# RETURNING está disponível a partir do SQLite 3.35
+SUPPORTS_RETURNING = sqlite3.sqlite_version_info >= (3, 35, 0)
+
+# Profundidade de transações aninhadas (savepoints) por thread
+_tx_state = threading.local()
+
+# Concorrência entre processos: vários servidores MCP (um por janela do
+# Cursor) escrevem no mesmo arquivo. busy_timeout faz o SQLite esperar pelo
+# lock; acima disso as escritas são repetidas com backoff exponencial e jitter
+DEFAULT_BUSY_POLICY = {
+    "busy_timeout_ms": 5000,
+    "retry_attempts": 5,
+    "retry_base_delay_ms": 20,
+    "retry_max_delay_ms": 1000,
+}
+
+_busy_policy: Optional[Dict[str, Any]] = None
+
+# Perfil de desempenho (PRAGMAs) aplicado às novas conexões
+_storage_profile: Optional[Tuple[str, Dict[str, Any]]] = None
+
+# Códigos primários SQLITE_BUSY e SQLITE_LOCKED
+_BUSY_ERROR_CODES = (5, 6)
+
+# Funções chamadas antes de abrir uma transação externa (ver before_transaction)
+_before_transaction_hooks: List[Callable[[], None]] = []
+
+T = TypeVar("T")
+
+
+def get_busy_policy() -> Dict[str, Any]:
+    """
+    Obtém a política de espera e retentativa para SQLITE_BUSY.
+
+    Lida uma única vez da chave "storage.busy" da configuração.
+
+    Returns:
+        Dicionário com as chaves de ``DEFAULT_BUSY_POLICY``
+    """
+    global _busy_policy
+
+    if _busy_policy is None:
+        from cortex.core.config import get_config_value
+
+        configured = get_config_value("storage.busy", {}) or {}
+        _busy_policy = {**DEFAULT_BUSY_POLICY, **configured}
+    return _busy_policy
+
+
+def set_busy_policy(**overrides: Any) -> Dict[str, Any]:
+    """
+    Sobrescreve a política de SQLITE_BUSY do processo.
+
+    O novo ``busy_timeout_ms`` vale para conexões abertas a partir daqui.
+
+    Args:
+        **overrides: Chaves de ``DEFAULT_BUSY_POLICY`` a alterar
+
+    Returns:
+        Política resultante
+    """
+    global _busy_policy
+
+    unknown = set(overrides) - set(DEFAULT_BUSY_POLICY)
+    if unknown:
+        raise ValueError(f"Chaves desconhecidas: {', '.join(sorted(unknown))}")
+    _busy_policy = {**get_busy_policy(), **overrides}
+    return _busy_policy
+
+
+def get_storage_profile() -> Tuple[str, Dict[str, Any]]:
+    """
+    Obtém o perfil de desempenho aplicado às conexões.
+
+    Lido uma única vez da chave "storage.profile" da configuração.
+
+    Returns:
+        Tupla (nome do perfil, PRAGMAs do perfil)
+    """
+    global _storage_profile
+
+    if _storage_profile is None:
+        from cortex.core.config import (
+            DEFAULT_PERFORMANCE_PROFILE,
+            PERFORMANCE_PROFILES,
+            get_config_value,
+            get_performance_profile,
+        )
+
+        name = get_config_value("storage.profile", DEFAULT_PERFORMANCE_PROFILE)
+        if name not in PERFORMANCE_PROFILES:
+            name = DEFAULT_PERFORMANCE_PROFILE
+        _storage_profile = (name, get_performance_profile(name))
+    return _storage_profile
+
+
+def set_storage_profile(name: str) -> Dict[str, Any]:
+    """
+    Troca o perfil de desempenho do processo.
+
+    As conexões persistentes são fechadas para que as próximas sejam abertas
+    com os novos PRAGMAs.
+
+    Args:
+        name: Nome do perfil (ver ``PERFORMANCE_PROFILES``)
+
+    Returns:
+        PRAGMAs do perfil
+    """
+    global _storage_profile
+
+    from cortex.core.config import PERFORMANCE_PROFILES
+
+    if name not in PERFORMANCE_PROFILES:
+        raise ValueError(f"Perfil de desempenho desconhecido: {name}")
+    _storage_profile = (name, dict(PERFORMANCE_PROFILES[name]))
+    close_pool()
+    return _storage_profile[1]
+
+
+def is_busy_error(error: BaseException) -> bool:
+    """
+    Indica se o erro é SQLITE_BUSY/SQLITE_LOCKED ("database is locked").
+
+    Args:
+        error: Exceção capturada
+
+    Returns:
+        True se a operação pode ser repetida depois
+    """
+    if not isinstance(error, sqlite3.OperationalError):
+        return False
+    code = getattr(error, "sqlite_errorcode", None)
+    if code is not None:
+        # Códigos estendidos preservam o primário nos 8 bits inferiores
+        return code & 0xFF in _BUSY_ERROR_CODES
+    message = str(error).lower()
+    return "locked" in message or "busy" in message
+
+
+def retry_on_busy(operation: Callable[[], T], description: str = "escrita") -> T:
+    """
+    Executa uma operação repetindo-a enquanto o banco estiver ocupado.
+
+    A espera entre tentativas cresce exponencialmente, com jitter completo
+    para que processos concorrentes não tentem de novo em sincronia. A
+    operação precisa ser segura para repetir: nada dela pode ter sido
+    confirmado quando o erro ocorre.
+
+    Args:
+        operation: Função sem argumentos a executar
+        description: Descrição usada nos logs
+
+    Returns:
+        Resultado da operação
+    """
+    policy = get_busy_policy()
+    attempts = max(1, int(policy["retry_attempts"]))
+    base = policy["retry_base_delay_ms"] / 1000
+    cap = policy["retry_max_delay_ms"] / 1000
+
+    attempt = 0
+    while True:
+        try:
+            return operation()
+        except sqlite3.OperationalError as e:
+            if not is_busy_error(e):
+                raise
+            attempt += 1
+            if attempt >= attempts:
+                logger.warning(
+                    f"Banco ocupado; {description} falhou após {attempts} tentativas"
+                )
+                raise
+            delay = random.uniform(0, min(cap, base * 2 ** (attempt - 1)))
+            logger.debug(
+                f"Banco ocupado; repetindo {description} em {delay * 1000:.0f} ms "
+                f"(tentativa {attempt + 1}/{attempts})"
+            )
+            time.sleep(delay)
+
 
 def get_db_path() -> str:
     """
@@ -31,25 +251,115 @@ def get_db_path() -> str:
     return CORTEX_DB_PATH
 
 
-def get_connection() -> sqlite3.Connection:
+def _create_connection(
+    db_path: str, profile: Optional[str] = None
+) -> sqlite3.Connection:
     """
-    Obtém uma conexão com o banco de dados SQLite.
+    Abre e configura uma conexão SQLite.
     
+    Args:
+        db_path: Caminho para o arquivo do banco de dados
+        profile: Perfil de desempenho (padrão o do processo)
+
     Returns:
         Conexão SQLite configurada
     """
-    conn = sqlite3.connect(get_db_path(), isolation_level=None)
+    # check_same_thread=False: o pool garante uso por uma única thread,
+    # mas precisa fechar as conexões a partir da thread de encerramento
+    conn = sqlite3.connect(db_path, isolation_level=None, check_same_thread=False)
     conn.row_factory = sqlite3.Row
     
+    # Esperar por locks de outros processos em vez de falhar na hora
+    conn.execute(f"PRAGMA busy_timeout = {int(get_busy_policy()['busy_timeout_ms'])}")
+    
     # Habilitar foreign keys
     conn.execute("PRAGMA foreign_keys = ON")
     
     # Habilitar WAL para melhor performance
     conn.execute("PRAGMA journal_mode = WAL")
     
+    # Sincronização, caches e checkpoint conforme o perfil de desempenho
+    if profile is None:
+        _, pragmas = get_storage_profile()
+    else:
+        from cortex.core.config import get_performance_profile
+
+        pragmas = get_performance_profile(profile)
+    conn.execute(f"PRAGMA synchronous = {pragmas['synchronous']}")
+    conn.execute(f"PRAGMA cache_size = {int(pragmas['cache_size'])}")
+    conn.execute(f"PRAGMA mmap_size = {int(pragmas['mmap_size'])}")
+    conn.execute(f"PRAGMA temp_store = {pragmas['temp_store']}")
+    conn.execute(f"PRAGMA wal_autocheckpoint = {int(pragmas['wal_autocheckpoint'])}")
+
     return conn
 
 
+def get_connection(
+    db_path: Optional[str] = None, profile: Optional[str] = None
+) -> sqlite3.Connection:
+    """
+    Obtém uma conexão avulsa com o banco de dados SQLite.
+
+    A conexão não pertence ao pool e deve ser fechada por quem a obteve.
+    Para consultas comuns use ``pooled_connection``.
+
+    Args:
+        db_path: Caminho do banco (padrão o banco do CORTEX)
+        profile: Perfil de desempenho (padrão o do processo)
+
+    Returns:
+        Conexão SQLite configurada
+    """
+    return _create_connection(db_path or get_db_path(), profile)
+
+
+def get_pool() -> ConnectionPool:
+    """
+    Obtém o pool de conexões persistentes, criando-o se necessário.
+
+    Returns:
+        Pool de conexões do banco de dados atual
+    """
+    global _pool
+
+    pool = _pool
+    if pool is not None and pool.db_path == get_db_path():
+        return pool
+
+    with _pool_lock:
+        if _pool is not None and _pool.db_path != get_db_path():
+            _pool.shutdown()
+            _pool = None
+        if _pool is None:
+            _pool = ConnectionPool(get_db_path(), _create_connection)
+        return _pool
+
+
+@contextmanager
+def pooled_connection() -> Iterator[sqlite3.Connection]:
+    """
+    Empresta a conexão persistente da thread atual.
+
+    Yields:
+        Conexão SQLite configurada (não deve ser fechada por quem a usa)
+    """
+    with get_pool().connection() as conn:
+        yield conn
+
+
+def close_pool() -> None:
+    """
+    Fecha todas as conexões persistentes do pool.
+    """
+    global _pool
+
+    with _pool_lock:
+        if _pool is not None:
+            _pool.shutdown()
+            _pool = None
+    generations.close_watch()
+
+
 def execute_query(query: str, params: tuple = ()) -> List[Dict[str, Any]]:
     """
     Executa uma consulta SELECT e retorna os resultados.
@@ -61,15 +371,87 @@ def execute_query(query: str, params: tuple = ()) -> List[Dict[str, Any]]:
     Returns:
         Lista de dicionários com os resultados
     """
-    conn = get_connection()
-    cursor = conn.cursor()
-    
-    try:
-        cursor.execute(query, params)
-        return [dict(row) for row in cursor.fetchall()]
-    finally:
-        cursor.close()
-        conn.close()
+    with pooled_connection() as conn:
+        cursor = conn.cursor()
+        try:
+            with get_instrumentation().measure(conn, query, params) as measurement:
+                cursor.execute(query, params)
+                rows = [dict(row) for row in cursor.fetchall()]
+                measurement.rows = len(rows)
+            return rows
+        finally:
+            cursor.close()
+
+
+def iter_query(
+    query: str,
+    params: tuple = (),
+    batch_size: int = DEFAULT_FETCH_BATCH,
+    row_format: str = "dict",
+) -> Iterator[Any]:
+    """
+    Executa uma consulta SELECT e devolve as linhas sob demanda.
+
+    As linhas são lidas do cursor em blocos de ``batch_size``, sem materializar
+    o resultado inteiro. A conexão da thread fica emprestada enquanto o gerador
+    estiver ativo; feche-o (ou consuma-o) antes de usar a conexão para escrita.
+
+    Args:
+        query: Consulta SQL
+        params: Parâmetros para a consulta
+        batch_size: Número de linhas lidas do cursor por vez
+        row_format: 'dict', 'tuple' ou 'row' (objeto leve com ``__slots__``)
+
+    Yields:
+        Cada linha no formato pedido
+    """
+    if row_format not in ROW_FORMATS:
+        raise ValueError(f"Formato de linha inválido: {row_format}")
+
+    instrumentation = get_instrumentation()
+    with pooled_connection() as conn:
+        cursor = conn.cursor()
+        # Tuplas simples são mais baratas do que sqlite3.Row
+        cursor.row_factory = None
+        # Só o tempo gasto no SQLite é medido, não o do consumidor do gerador
+        elapsed = 0.0
+        row_count = 0
+        error = False
+        try:
+            start = time.perf_counter()
+            cursor.execute(query, params)
+            elapsed += time.perf_counter() - start
+            columns = tuple(d[0] for d in cursor.description or ())
+            make_row = row_type(columns) if row_format == "row" else None
+
+            while True:
+                start = time.perf_counter()
+                batch = cursor.fetchmany(batch_size)
+                elapsed += time.perf_counter() - start
+                if not batch:
+                    break
+                row_count += len(batch)
+                if row_format == "tuple":
+                    yield from batch
+                elif make_row is not None:
+                    yield from map(make_row, batch)
+                else:
+                    for values in batch:
+                        yield dict(zip(columns, values))
+        except sqlite3.Error:
+            error = True
+            raise
+        finally:
+            cursor.close()
+            if instrumentation.enabled:
+                instrumentation.record(
+                    query,
+                    elapsed * 1000,
+                    row_count,
+                    error=error,
+                    conn=conn,
+                    params=params,
+                )
 
 
 def execute_update(query: str, params: tuple = ()) -> int:
@@ -83,21 +465,31 @@ def execute_update(query: str, params: tuple = ()) -> int:
     Returns:
         ID do último registro inserido ou número de linhas afetadas
     """
-    conn = get_connection()
-    cursor = conn.cursor()
-    
-    try:
-        cursor.execute(query, params)
+    with pooled_connection() as conn:
+        cursor = conn.cursor()
         
-        # Para INSERT, retorna o último ID
-        if query.strip().upper().startswith("INSERT"):
-            return cursor.lastrowid
+        def _execute() -> None:
+            with get_instrumentation().measure(conn, query, params) as measurement:
+                cursor.execute(query, params)
+                measurement.rows = cursor.rowcount
         
-        # Para UPDATE/DELETE, retorna o número de linhas afetadas
-        return cursor.rowcount
-    finally:
-        cursor.close()
-        conn.close()
+        try:
+            # Fora de uma transação a instrução é atômica e pode ser repetida;
+            # dentro dela o lock de escrita já foi obtido no BEGIN IMMEDIATE
+            if in_transaction():
+                _execute()
+            else:
+                retry_on_busy(_execute, "atualização")
+            generations.record_write(conn, query, deferred=in_transaction())
+
+            # Para INSERT, retorna o último ID
+            if query.strip().upper().startswith("INSERT"):
+                return cursor.lastrowid
+
+            # Para UPDATE/DELETE, retorna o número de linhas afetadas
+            return cursor.rowcount
+        finally:
+            cursor.close()
 
 
 def execute_script(script: str) -> None:
@@ -107,157 +499,345 @@ def execute_script(script: str) -> None:
     Args:
         script: Script SQL com múltiplas consultas
     """
-    conn = get_connection()
-    
-    try:
-        conn.executescript(script)
-    finally:
-        conn.close()
+    with pooled_connection() as conn:
+        # executescript faz COMMIT implícito, o que quebraria uma transação aberta
+        if conn.in_transaction:
+            raise sqlite3.ProgrammingError(
+                "execute_script não pode ser usado dentro de uma transação"
+            )
+        with get_instrumentation().measure(conn, script):
+            conn.executescript(script)
+        generations.record_write(conn, script)
 
 
-def init_db() -> None:
+def before_transaction(hook: Callable[[], None]) -> None:
     """
-    Inicializa o banco de dados com o esquema inicial.
+    Registra uma função chamada antes de cada BEGIN IMMEDIATE externo.
+
+    Usado pela fila de escrita (cortex/storage/write_behind.py) para gravar
+    as linhas enfileiradas antes que a transação tome o lock de escrita: com
+    o lock tomado, a thread de escrita não conseguiria gravá-las até o COMMIT.
+
+    Args:
+        hook: Função sem argumentos, chamada fora de transação
     """
-    logger.info("Inicializando banco de dados SQLite")
-    
-    # Criar tabelas apenas se não existirem
-    schema_script = """
-    -- Tabela de projetos
-    CREATE TABLE IF NOT EXISTS projects (
-        id INTEGER PRIMARY KEY AUTOINCREMENT,
-        name TEXT NOT NULL,
-        workspace_path TEXT UNIQUE,
-        description TEXT,
-        jira_project_key TEXT,
-        created_at TIMESTAMP NOT NULL DEFAULT CURRENT_TIMESTAMP,
-        updated_at TIMESTAMP NOT NULL DEFAULT CURRENT_TIMESTAMP,
-        active BOOLEAN NOT NULL DEFAULT 1
-    );
-    
-    -- Tabela de sessões
-    CREATE TABLE IF NOT EXISTS sessions (
-        id INTEGER PRIMARY KEY AUTOINCREMENT,
-        project_id INTEGER,
-        title TEXT NOT NULL,
-        objective TEXT,
-        start_time TIMESTAMP NOT NULL DEFAULT CURRENT_TIMESTAMP,
-        end_time TIMESTAMP,
-        summary TEXT,
-        next_session_context TEXT,
-        FOREIGN KEY (project_id) REFERENCES projects(id)
-    );
-    
-    -- Tabela de mensagens
-    CREATE TABLE IF NOT EXISTS messages (
-        id INTEGER PRIMARY KEY AUTOINCREMENT,
-        session_id INTEGER NOT NULL,
-        role TEXT NOT NULL, -- 'user', 'assistant', 'system', 'summary'
-        content TEXT NOT NULL,
-        token_count INTEGER,
-        timestamp TIMESTAMP NOT NULL DEFAULT CURRENT_TIMESTAMP,
-        FOREIGN KEY (session_id) REFERENCES sessions(id)
-    );
-    
-    -- Tabela de tarefas
-    CREATE TABLE IF NOT EXISTS tasks (
-        id INTEGER PRIMARY KEY AUTOINCREMENT,
-        project_id INTEGER NOT NULL,
-        parent_id INTEGER,
-        title TEXT NOT NULL,
-        description TEXT,
-        level TEXT NOT NULL, -- 'phase', 'stage', 'task', 'activity'
-        status TEXT NOT NULL, -- 'not_started', 'in_progress', 'blocked', 'completed'
-        progress INTEGER NOT NULL DEFAULT 0, -- 0-100
-        jira_id TEXT,
-        created_at TIMESTAMP NOT NULL DEFAULT CURRENT_TIMESTAMP,
-        updated_at TIMESTAMP NOT NULL DEFAULT CURRENT_TIMESTAMP,
-        started_at TIMESTAMP,
-        completed_at TIMESTAMP,
-        estimated_hours REAL,
-        actual_hours REAL,
-        order_index INTEGER NOT NULL DEFAULT 0,
-        FOREIGN KEY (project_id) REFERENCES projects(id),
-        FOREIGN KEY (parent_id) REFERENCES tasks(id)
-    );
-    
-    -- Tabela de relações entre tarefas
-    CREATE TABLE IF NOT EXISTS task_relations (
-        id INTEGER PRIMARY KEY AUTOINCREMENT,
-        source_task_id INTEGER NOT NULL,
-        target_task_id INTEGER NOT NULL,
-        relation_type TEXT NOT NULL, -- 'blocks', 'depends_on', 'related_to', 'duplicates'
-        created_at TIMESTAMP NOT NULL DEFAULT CURRENT_TIMESTAMP,
-        FOREIGN KEY (source_task_id) REFERENCES tasks(id),
-        FOREIGN KEY (target_task_id) REFERENCES tasks(id)
-    );
-    
-    -- Tabela de marcadores
-    CREATE TABLE IF NOT EXISTS markers (
-        id INTEGER PRIMARY KEY AUTOINCREMENT,
-        project_id INTEGER NOT NULL,
-        task_id INTEGER,
-        marker_type TEXT NOT NULL, -- 'TODO', 'FIXME', 'NOTE'
-        content TEXT NOT NULL,
-        file_path TEXT NOT NULL,
-        line_number INTEGER NOT NULL,
-        context TEXT,
-        detected_at TIMESTAMP NOT NULL DEFAULT CURRENT_TIMESTAMP,
-        resolved_at TIMESTAMP,
-        FOREIGN KEY (project_id) REFERENCES projects(id),
-        FOREIGN KEY (task_id) REFERENCES tasks(id)
-    );
-    
-    -- Tabela de contextos
-    CREATE TABLE IF NOT EXISTS contexts (
-        id INTEGER PRIMARY KEY AUTOINCREMENT,
-        project_id INTEGER,
-        task_id INTEGER,
-        name TEXT NOT NULL,
-        content TEXT NOT NULL,
-        created_at TIMESTAMP NOT NULL DEFAULT CURRENT_TIMESTAMP,
-        updated_at TIMESTAMP NOT NULL DEFAULT CURRENT_TIMESTAMP,
-        FOREIGN KEY (project_id) REFERENCES projects(id),
-        FOREIGN KEY (task_id) REFERENCES tasks(id)
-    );
-    
-    -- Tabela de regras
-    CREATE TABLE IF NOT EXISTS rules (
-        id INTEGER PRIMARY KEY AUTOINCREMENT,
-        project_id INTEGER,
-        name TEXT NOT NULL,
-        description TEXT,
-        condition TEXT NOT NULL, -- JSON condition
-        action TEXT NOT NULL, -- JSON action
-        priority INTEGER NOT NULL DEFAULT 0,
-        is_active BOOLEAN NOT NULL DEFAULT 1,
-        created_at TIMESTAMP NOT NULL DEFAULT CURRENT_TIMESTAMP,
-        updated_at TIMESTAMP NOT NULL DEFAULT CURRENT_TIMESTAMP,
-        FOREIGN KEY (project_id) REFERENCES projects(id)
-    );
-    
-    -- Índices para performance
-    CREATE INDEX IF NOT EXISTS idx_sessions_project ON sessions(project_id);
-    CREATE INDEX IF NOT EXISTS idx_messages_session ON messages(session_id);
-    CREATE INDEX IF NOT EXISTS idx_tasks_project ON tasks(project_id);
-    CREATE INDEX IF NOT EXISTS idx_tasks_parent ON tasks(parent_id);
-    CREATE INDEX IF NOT EXISTS idx_tasks_status ON tasks(status);
-    CREATE INDEX IF NOT EXISTS idx_markers_project ON markers(project_id);
-    CREATE INDEX IF NOT EXISTS idx_markers_task ON markers(task_id);
-    CREATE INDEX IF NOT EXISTS idx_contexts_project ON contexts(project_id);
-    CREATE INDEX IF NOT EXISTS idx_contexts_task ON contexts(task_id);
+    if hook not in _before_transaction_hooks:
+        _before_transaction_hooks.append(hook)
+
+
+def after_commit(callback: Callable[[], None]) -> None:
+    """
+    Executa uma função depois do COMMIT da transação externa em curso.
+
+    Fora de transação, a função é executada na hora. Dentro, fica pendente
+    na thread: é descartada se a transação externa (ou o savepoint em que
+    foi registrada) for revertida. Serve para atualizar estruturas em
+    memória só com o que de fato foi confirmado.
+
+    Args:
+        callback: Função sem argumentos
+    """
+    depth = getattr(_tx_state, "depth", 0)
+    if depth == 0:
+        callback()
+        return
+    if not hasattr(_tx_state, "callbacks"):
+        _tx_state.callbacks = []
+    _tx_state.callbacks.append((depth, callback))
+
+
+def _run_after_commit() -> None:
+    """Executa as funções de ``after_commit`` registradas na transação confirmada."""
+    callbacks = getattr(_tx_state, "callbacks", None)
+    if not callbacks:
+        return
+    _tx_state.callbacks = []
+    for _, callback in callbacks:
+        try:
+            callback()
+        except Exception as e:
+            logger.error(f"Erro após o commit: {str(e)}")
+
+
+def _discard_after_commit(depth: int) -> None:
+    """Descarta as funções registradas dentro de um nível revertido."""
+    callbacks = getattr(_tx_state, "callbacks", None)
+    if callbacks:
+        _tx_state.callbacks = [(d, cb) for d, cb in callbacks if d <= depth]
+
+
+def in_transaction() -> bool:
+    """
+    Indica se a thread atual tem uma transação aberta no pool.
+
+    Returns:
+        True se houver uma transação em curso
+    """
+    return getattr(_tx_state, "depth", 0) > 0
+
+
+@contextmanager
+def transaction() -> Iterator[sqlite3.Connection]:
+    """
+    Abre uma transação (unidade de trabalho) na conexão da thread atual.
+
+    Todas as escritas feitas dentro do bloco, inclusive via ``execute_update``
+    e os helpers de escrita em lote, são confirmadas num único COMMIT. Em caso
+    de exceção tudo é revertido. Transações aninhadas usam SAVEPOINTs.
+
+    A transação externa começa com BEGIN IMMEDIATE: o lock de escrita é obtido
+    logo no início, repetido com backoff se outro processo o detém. Com BEGIN
+    adiado, a promoção de leitura para escrita no meio do bloco falharia com
+    SQLITE_BUSY sem passar pelo busy_timeout. Antes do BEGIN externo rodam
+    as funções de ``before_transaction`` (gravação das filas de escrita) e,
+    depois do COMMIT externo, as de ``after_commit``.
+
+    Yields:
+        Conexão SQLite com a transação aberta
+    """
+    with pooled_connection() as conn:
+        depth = getattr(_tx_state, "depth", 0)
+
+        if depth == 0:
+            for hook in _before_transaction_hooks:
+                hook()
+            retry_on_busy(
+                lambda: conn.execute("BEGIN IMMEDIATE"), "início de transação"
+            )
+            # Com o lock de escrita tomado, mudanças no data_version vêm de fora
+            generations.check_external_writes(get_db_path())
+            begin, commit, rollback = None, "COMMIT", "ROLLBACK"
+        else:
+            savepoint = f"cortex_sp_{depth}"
+            begin = f"SAVEPOINT {savepoint}"
+            commit = f"RELEASE SAVEPOINT {savepoint}"
+            rollback = f"ROLLBACK TO SAVEPOINT {savepoint}"
+            conn.execute(begin)
+
+        _tx_state.depth = depth + 1
+        try:
+            yield conn
+        except BaseException:
+            _tx_state.depth = depth
+            # Alguns erros (ex.: SQLITE_FULL) já revertem a transação inteira
+            if conn.in_transaction:
+                conn.execute(rollback)
+                if begin is not None:
+                    # ROLLBACK TO mantém o savepoint aberto; é preciso liberá-lo
+                    conn.execute(commit)
+            _discard_after_commit(depth)
+            if depth == 0:
+                generations.discard_writes()
+            raise
+        else:
+            _tx_state.depth = depth
+            conn.execute(commit)
+            if depth == 0:
+                # As gerações das tabelas escritas só avançam após o COMMIT
+                generations.check_external_writes(get_db_path(), own_commit=True)
+                generations.commit_writes()
+                _run_after_commit()
+
+
+def _quote_identifier(name: str) -> str:
+    """
+    Cita um identificador SQL (tabela ou coluna).
+
+    Args:
+        name: Nome do identificador
+
+    Returns:
+        Identificador entre aspas duplas
+    """
+    return '"' + name.replace('"', '""') + '"'
+
+
+def _chunks(
+    rows: Sequence[Sequence[Any]], size: int
+) -> Iterator[Sequence[Sequence[Any]]]:
+    """Divide uma sequência de linhas em blocos de até ``size`` linhas."""
+    for start in range(0, len(rows), size):
+        yield rows[start : start + size]
+
+
+def execute_many(query: str, params_seq: Iterable[Sequence[Any]]) -> int:
+    """
+    Executa a mesma instrução para vários conjuntos de parâmetros numa transação.
+
+    Args:
+        query: Consulta SQL (INSERT, UPDATE ou DELETE)
+        params_seq: Sequência de tuplas de parâmetros
+
+    Returns:
+        Número total de linhas afetadas
+    """
+    with transaction() as conn:
+        with get_instrumentation().measure(conn, query) as measurement:
+            cursor = conn.executemany(query, params_seq)
+            measurement.rows = cursor.rowcount
+        generations.record_write(conn, query, deferred=True)
+        try:
+            return cursor.rowcount
+        finally:
+            cursor.close()
+
+
+def bulk_insert(
+    table: str,
+    columns: Sequence[str],
+    rows: Sequence[Sequence[Any]],
+    chunk_size: Optional[int] = None,
+    return_ids: bool = False,
+) -> List[int]:
+    """
+    Insere várias linhas numa única transação, com INSERTs de múltiplas linhas.
+
+    Args:
+        table: Nome da tabela
+        columns: Colunas a preencher
+        rows: Valores de cada linha, na ordem de ``columns``
+        chunk_size: Linhas por instrução (padrão: máximo permitido pelos parâmetros)
+        return_ids: Se deve retornar os IDs gerados
+
+    Returns:
+        IDs gerados na ordem das linhas, se ``return_ids``; caso contrário lista vazia
+    """
+    if not rows:
+        return []
+
+    max_rows = max(1, MAX_SQL_VARIABLES // len(columns))
+    chunk_size = min(chunk_size or max_rows, max_rows)
+
+    column_list = ", ".join(_quote_identifier(c) for c in columns)
+    row_placeholder = "(" + ", ".join("?" for _ in columns) + ")"
+    insert_prefix = f"INSERT INTO {_quote_identifier(table)} ({column_list}) VALUES "
+
+    ids: List[int] = []
+    with transaction() as conn:
+        generations.record_write(conn, insert_prefix, deferred=True)
+        for chunk in _chunks(rows, chunk_size):
+            params = [value for row in chunk for value in row]
+            sql = insert_prefix + ", ".join(row_placeholder for _ in chunk)
+
+            if return_ids and SUPPORTS_RETURNING:
+                # A ordem das linhas de RETURNING não é garantida, mas os IDs
+                # de uma única instrução são atribuídos em ordem crescente
+                cursor = conn.execute(sql + " RETURNING rowid", params)
+                ids.extend(sorted(row[0] for row in cursor.fetchall()))
+            elif return_ids:
+                # Sem RETURNING, insere linha a linha para obter cada ID
+                for row in chunk:
+                    cursor = conn.execute(insert_prefix + row_placeholder, tuple(row))
+                    ids.append(cursor.lastrowid)
+            else:
+                conn.execute(sql, params)
+
+    return ids
+
+
+def bulk_upsert(
+    table: str,
+    columns: Sequence[str],
+    rows: Sequence[Sequence[Any]],
+    conflict_columns: Sequence[str],
+    update_columns: Optional[Sequence[str]] = None,
+    chunk_size: Optional[int] = None,
+) -> int:
+    """
+    Insere ou atualiza várias linhas numa única transação (ON CONFLICT DO UPDATE).
+
+    Args:
+        table: Nome da tabela
+        columns: Colunas a preencher
+        rows: Valores de cada linha, na ordem de ``columns``
+        conflict_columns: Colunas da restrição UNIQUE que identifica conflitos
+        update_columns: Colunas atualizadas em conflito (padrão: as demais colunas)
+        chunk_size: Linhas por instrução (padrão: máximo permitido pelos parâmetros)
+
+    Returns:
+        Número de linhas inseridas ou atualizadas
+    """
+    if not rows:
+        return 0
+
+    if update_columns is None:
+        update_columns = [c for c in columns if c not in conflict_columns]
+
+    max_rows = max(1, MAX_SQL_VARIABLES // len(columns))
+    chunk_size = min(chunk_size or max_rows, max_rows)
+
+    column_list = ", ".join(_quote_identifier(c) for c in columns)
+    row_placeholder = "(" + ", ".join("?" for _ in columns) + ")"
+    conflict_list = ", ".join(_quote_identifier(c) for c in conflict_columns)
+    if update_columns:
+        assignments = ", ".join(
+            f"{_quote_identifier(c)} = excluded.{_quote_identifier(c)}"
+            for c in update_columns
+        )
+        on_conflict = f" ON CONFLICT ({conflict_list}) DO UPDATE SET {assignments}"
+    else:
+        on_conflict = f" ON CONFLICT ({conflict_list}) DO NOTHING"
+
+    affected = 0
+    with transaction() as conn:
+        generations.record_write(
+            conn, f"INSERT INTO {_quote_identifier(table)}", deferred=True
+        )
+        for chunk in _chunks(rows, chunk_size):
+            params = [value for row in chunk for value in row]
+            # "WHERE true" evita a ambiguidade do parser entre VALUES e ON CONFLICT
+            sql = (
+                f"INSERT INTO {_quote_identifier(table)} ({column_list}) "
+                f"SELECT * FROM (VALUES {', '.join(row_placeholder for _ in chunk)}) "
+                f"WHERE true{on_conflict}"
+            )
+            cursor = conn.execute(sql, params)
+            affected += cursor.rowcount
+
+    return affected
+
+
+def init_db() -> None:
     """
+    Inicializa o banco de dados, aplicando as migrações de esquema pendentes.
+    """
+    from cortex.storage.migrations import migrate
     
-    execute_script(schema_script)
-    logger.info("Esquema do banco de dados inicializado")
+    logger.info("Inicializando banco de dados SQLite")
+    version = migrate()
+    generations.bump()
+    logger.info(f"Esquema do banco de dados inicializado (versão {version})")
+
+
+class _BackupRestarted(Exception):
+    """Interrompe um backup em passos que recomeçou vezes demais."""
 
 
-def backup_db(backup_path: Optional[str] = None) -> str:
+def backup_db(
+    backup_path: Optional[str] = None,
+    pages: int = DEFAULT_BACKUP_PAGES,
+    sleep: float = DEFAULT_BACKUP_SLEEP,
+    progress: Optional[Callable[[int, int, int], None]] = None,
+    max_restarts: int = DEFAULT_BACKUP_MAX_RESTARTS,
+) -> str:
     """
     Cria um backup do banco de dados.
     
+    A cópia é feita em passos de ``pages`` páginas com uma pausa de ``sleep``
+    segundos entre passos, liberando o banco de origem para outras conexões
+    durante a cópia.
+
+    Uma escrita de outra conexão entre dois passos faz o SQLite recomeçar a
+    cópia do início. Depois de ``max_restarts`` recomeços, a cópia é refeita
+    num passo só (no WAL, sem bloquear os escritores), para que um banco com
+    escritas frequentes não impeça o backup de terminar.
+
     Args:
         backup_path: Caminho opcional para o arquivo de backup
+        pages: Páginas copiadas por passo (-1 ou 0 copia tudo de uma vez)
+        sleep: Pausa em segundos entre passos
+        progress: Função chamada após cada passo com (status, restantes, total)
+        max_restarts: Recomeços tolerados antes da cópia num passo só
         
     Returns:
         Caminho absoluto para o arquivo de backup
@@ -274,51 +854,95 @@ def backup_db(backup_path: Optional[str] = None) -> str:
     # Conexão com o arquivo de backup
     dest_conn = sqlite3.connect(backup_path)
     
-    # Fazer backup
-    source_conn.backup(dest_conn)
+    state = {"remaining": None, "restarts": 0}
     
-    # Fechar conexões
-    source_conn.close()
-    dest_conn.close()
+    def _step(status: int, remaining: int, total: int) -> None:
+        # Sem avanço desde o passo anterior: a cópia recomeçou do início
+        previous = state["remaining"]
+        if remaining and previous is not None and remaining >= previous:
+            state["restarts"] += 1
+            if state["restarts"] > max_restarts:
+                raise _BackupRestarted()
+        state["remaining"] = remaining
+        if progress is not None:
+            progress(status, remaining, total)
+        # O parâmetro sleep de Connection.backup só atua em SQLITE_BUSY/LOCKED;
+        # a pausa entre passos é feita aqui para ceder o banco a outras conexões
+        if remaining and sleep > 0:
+            time.sleep(sleep)
+    
+    try:
+        # Fazer backup em passos, com pausas entre eles
+        try:
+            source_conn.backup(dest_conn, pages=pages, progress=_step)
+        except _BackupRestarted:
+            logger.warning(
+                f"Backup recomeçou {state['restarts']} vezes por escritas "
+                "concorrentes; copiando num passo só"
+            )
+            source_conn.backup(dest_conn, pages=-1, progress=progress)
+    finally:
+        # Fechar conexões
+        source_conn.close()
+        dest_conn.close()
     
     logger.info(f"Backup do banco de dados criado em {backup_path}")
     return backup_path
 
 
-def restore_db(backup_path: str) -> bool:
+def _restore_full(backup_path: str) -> None:
+    """
+    Copia um backup completo sobre o banco de dados atual.
+
+    Args:
+        backup_path: Caminho para o arquivo de backup completo
+    """
+    # Conexão com o arquivo de backup
+    source_conn = sqlite3.connect(backup_path)
+
+    # Conexão com banco de dados atual
+    dest_conn = get_connection()
+
+    try:
+        # Fazer restauração
+        source_conn.backup(dest_conn)
+    finally:
+        # Fechar conexões
+        source_conn.close()
+        dest_conn.close()
+
+
+def restore_db(backup_path: str, safety_backup: bool = True) -> bool:
     """
     Restaura o banco de dados a partir de um backup.
     
+    Backups incrementais (delta) são restaurados aplicando o backup completo
+    de base e os deltas da cadeia até o arquivo pedido.
+
     Args:
         backup_path: Caminho para o arquivo de backup
+        safety_backup: Se deve salvar o estado atual antes da restauração
+            (incremental quando possível)
         
     Returns:
         True se a restauração for bem-sucedida, False caso contrário
     """
+    from cortex.storage.backup import create_backup, restore_backup
+
     if not os.path.exists(backup_path):
         logger.error(f"Arquivo de backup não encontrado: {backup_path}")
         return False
     
     # Criar backup do banco atual antes da restauração
-    current_backup = backup_db()
+    current_backup = create_backup(verify=False)["path"] if safety_backup else None
     
     try:
-        # Conexão com o arquivo de backup
-        source_conn = sqlite3.connect(backup_path)
-        
-        # Conexão com banco de dados atual
-        dest_conn = get_connection()
-        
-        # Fazer restauração
-        source_conn.backup(dest_conn)
-        
-        # Fechar conexões
-        source_conn.close()
-        dest_conn.close()
+        restore_backup(backup_path)
         
         logger.info(f"Banco de dados restaurado a partir de {backup_path}")
         return True
     except Exception as e:
         logger.error(f"Erro ao restaurar banco de dados: {str(e)}")
-        logger.info(f"Backup realizado em: {current_backup}")
-        return False 
\ No newline at end of file
+        if current_backup:
+            logger.info(f"Backup realizado em: {current_backup}")
+        return False
@@ -0,0 +1,231 @@
+#!/usr/bin/env python3
+"""
+CORTEX Generations - Contadores de geração por tabela.
+
+Cada escrita confirmada no banco incrementa a geração das tabelas que ela
+alterou, inclusive as alteradas pelos gatilhos (``task_closure``,
+``task_rollups``, ``task_counts``, índices FTS). Um valor derivado de
+leituras (como a resposta em cache de uma ferramenta) guarda as gerações das
+tabelas lidas, tomadas antes da leitura, e continua válido enquanto elas não
+mudarem.
+
+As gerações só avançam depois do COMMIT: dentro de ``transaction()`` as
+tabelas escritas ficam pendentes na thread e são publicadas no COMMIT
+externo (ou descartadas no ROLLBACK). Escritas que não dá para analisar
+(DDL, restauração de backup, migrações) avançam a época, que invalida tudo.
+
+Escritas de outros processos (CLI) não passam por aqui: são percebidas por
+``check_external_writes``, que compara o ``PRAGMA data_version`` de uma
+conexão própria e, se ele mudou fora dos COMMITs deste processo, avança a
+época.
+"""
+import re
+import sqlite3
+import threading
+from functools import lru_cache
+from typing import Dict, FrozenSet, Iterable, Optional, Set, Tuple
+
+_lock = threading.Lock()
+_generations: Dict[str, int] = {}
+_epoch = 0
+
+# Tabelas escritas dentro da transação aberta na thread (None = todas)
+_pending = threading.local()
+
+# Tabela → tabelas escritas pelos seus gatilhos (fecho transitivo)
+_trigger_targets: Optional[Dict[str, FrozenSet[str]]] = None
+
+_STRING_LITERAL = re.compile(r"'(?:[^']|'')*'")
+_WRITE_TARGET = re.compile(
+    r"\b(?:INSERT(?:\s+OR\s+\w+)?\s+INTO|REPLACE\s+INTO"
+    r"|UPDATE(?:\s+OR\s+\w+)?|DELETE\s+FROM)"
+    r"\s+(?!SET\b)(?:main\.)?[\"`\[]?(\w+)",
+    re.IGNORECASE,
+)
+_SCHEMA_CHANGE = re.compile(r"\b(?:CREATE|DROP|ALTER|ATTACH|VACUUM)\b", re.IGNORECASE)
+_TRIGGER_BODY = re.compile(r"\bBEGIN\b", re.IGNORECASE)
+
+# Conexão que observa o banco (caminho, conexão) e o último data_version visto
+_watch_lock = threading.Lock()
+_watch: Optional[Tuple[str, sqlite3.Connection]] = None
+_watch_version: Optional[int] = None
+
+
+@lru_cache(maxsize=1024)
+def written_tables(sql: str) -> Optional[FrozenSet[str]]:
+    """
+    Tabelas escritas diretamente por uma instrução (ou script) SQL.
+
+    Args:
+        sql: Instrução SQL
+
+    Returns:
+        Nomes das tabelas (vazio para leituras e PRAGMAs), ou None se a
+        instrução altera o esquema e o efeito não pode ser delimitado
+    """
+    shape = _STRING_LITERAL.sub("''", sql)
+    if _SCHEMA_CHANGE.search(shape):
+        return None
+    return frozenset(name.lower() for name in _WRITE_TARGET.findall(shape))
+
+
+def _load_trigger_targets(conn: sqlite3.Connection) -> Dict[str, FrozenSet[str]]:
+    """Lê os gatilhos do esquema e calcula o que uma escrita em cada tabela alcança."""
+    direct: Dict[str, Set[str]] = {}
+    for tbl_name, sql in conn.execute(
+        "SELECT tbl_name, sql FROM sqlite_master WHERE type = 'trigger'"
+    ).fetchall():
+        match = _TRIGGER_BODY.search(sql or "")
+        body = _STRING_LITERAL.sub("''", sql[match.start() :]) if match else ""
+        direct.setdefault(tbl_name.lower(), set()).update(
+            name.lower() for name in _WRITE_TARGET.findall(body)
+        )
+
+    closure: Dict[str, FrozenSet[str]] = {}
+    for table in direct:
+        reached: Set[str] = set()
+        stack = [table]
+        while stack:
+            for target in direct.get(stack.pop(), ()):
+                if target not in reached:
+                    reached.add(target)
+                    stack.append(target)
+        closure[table] = frozenset(reached)
+    return closure
+
+
+def _expand(conn: sqlite3.Connection, tables: FrozenSet[str]) -> FrozenSet[str]:
+    """Acrescenta às tabelas escritas as alteradas pelos gatilhos."""
+    global _trigger_targets
+
+    if not tables:
+        return tables
+    targets = _trigger_targets
+    if targets is None:
+        targets = _trigger_targets = _load_trigger_targets(conn)
+    expanded = set(tables)
+    for table in tables:
+        expanded |= targets.get(table, frozenset())
+    return frozenset(expanded)
+
+
+def bump(tables: Optional[Iterable[str]] = None) -> None:
+    """
+    Avança a geração das tabelas.
+
+    Args:
+        tables: Tabelas alteradas (None invalida todas e relê os gatilhos)
+    """
+    global _epoch, _trigger_targets
+
+    with _lock:
+        if tables is None:
+            _epoch += 1
+            _trigger_targets = None
+            return
+        for table in tables:
+            _generations[table] = _generations.get(table, 0) + 1
+
+
+def record_write(conn: sqlite3.Connection, sql: str, deferred: bool = False) -> None:
+    """
+    Registra uma escrita feita pelo caminho de escrita do banco.
+
+    Args:
+        conn: Conexão onde a instrução rodou (para ler os gatilhos)
+        sql: Instrução ou script executado
+        deferred: True se a escrita está numa transação ainda não confirmada
+    """
+    tables = written_tables(sql)
+    if tables is not None:
+        tables = _expand(conn, tables)
+        if not tables:
+            return
+
+    if not deferred:
+        bump(tables)
+        return
+
+    pending = getattr(_pending, "tables", frozenset())
+    if pending is not None:
+        _pending.tables = None if tables is None else pending | tables
+
+
+def commit_writes() -> None:
+    """Publica as escritas pendentes da thread (após o COMMIT externo)."""
+    pending = getattr(_pending, "tables", frozenset())
+    _pending.tables = frozenset()
+    if pending is None or pending:
+        bump(pending)
+
+
+def discard_writes() -> None:
+    """Descarta as escritas pendentes da thread (após o ROLLBACK externo)."""
+    _pending.tables = frozenset()
+
+
+def snapshot(tables: Iterable[str]) -> Tuple[int, ...]:
+    """
+    Gerações atuais das tabelas, precedidas da época.
+
+    Tome o snapshot antes de ler: se uma escrita for confirmada durante a
+    leitura, o snapshot já estará desatualizado e o valor será descartado.
+
+    Args:
+        tables: Tabelas lidas
+
+    Returns:
+        Tupla comparável com um snapshot posterior das mesmas tabelas
+    """
+    with _lock:
+        return (_epoch,) + tuple(_generations.get(table, 0) for table in tables)
+
+
+def check_external_writes(db_path: str, own_commit: bool = False) -> bool:
+    """
+    Avança a época se outro processo confirmou escritas desde a última verificação.
+
+    ``PRAGMA data_version`` muda a cada COMMIT de outra conexão, inclusive as
+    deste processo; por isso a conexão observadora fica à parte do pool e
+    ``transaction()`` a consulta com o lock de escrita tomado (nenhum COMMIT
+    alheio pode acontecer até o seu) e de novo logo após o COMMIT, com
+    ``own_commit``. Escritas fora de ``transaction()`` não são sincronizadas
+    e aparecem como externas, o que só descarta valores a mais.
+
+    Args:
+        db_path: Caminho do banco observado
+        own_commit: True logo após um COMMIT deste processo, cuja mudança
+            não é escrita externa
+
+    Returns:
+        True se houve escrita de outro processo (a época avançou)
+    """
+    global _watch, _watch_version
+
+    with _watch_lock:
+        if _watch is None or _watch[0] != db_path:
+            if _watch is not None:
+                _watch[1].close()
+            conn = sqlite3.connect(
+                db_path, isolation_level=None, check_same_thread=False
+            )
+            _watch = (db_path, conn)
+            _watch_version = None
+        version = _watch[1].execute("PRAGMA data_version").fetchone()[0]
+        changed = _watch_version is not None and version != _watch_version
+        _watch_version = version
+    if changed and not own_commit:
+        bump()
+        return True
+    return False
+
+
+def close_watch() -> None:
+    """Fecha a conexão observadora de ``check_external_writes``."""
+    global _watch, _watch_version
+
+    with _watch_lock:
+        if _watch is not None:
+            _watch[1].close()
+        _watch = None
+        _watch_version = None
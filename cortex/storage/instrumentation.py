@@ -0,0 +1,430 @@
+#!/usr/bin/env python3
+"""
+CORTEX Instrumentation - Métricas de consultas SQL.
+
+Este módulo mede as instruções executadas pela camada de armazenamento,
+agrupadas por "forma" (o SQL normalizado, sem literais e com listas de
+parâmetros colapsadas). Para cada forma guarda contagem, erros, linhas e um
+histograma de latência. Instruções acima do limite configurado vão para o
+log de consultas lentas junto com o ``EXPLAIN QUERY PLAN``.
+
+O servidor grava periodicamente um resumo em ``query_stats.json``, lido por
+``cortex status --verbose``, numa thread própria: o registro das medições
+nunca espera pelo disco.
+"""
+import bisect
+import json
+import logging
+import os
+import re
+import sqlite3
+import tempfile
+import threading
+import time
+from collections import deque
+from datetime import datetime
+from functools import lru_cache
+from typing import Any, Callable, Deque, Dict, List, Optional
+
+logger = logging.getLogger("cortex.storage.instrumentation")
+slow_logger = logging.getLogger("cortex.storage.slow")
+
+# Limites superiores (ms) dos intervalos do histograma; o último é aberto
+LATENCY_BUCKETS_MS = (0.1, 0.25, 0.5, 1, 2.5, 5, 10, 25, 50, 100, 250, 500, 1000, 2500)
+
+# Limite padrão para o log de consultas lentas
+DEFAULT_SLOW_QUERY_MS = 100.0
+
+# Consultas lentas mantidas no resumo
+MAX_SLOW_QUERIES = 20
+
+# Intervalo mínimo entre gravações do resumo em disco
+DEFAULT_SAVE_INTERVAL = 30.0
+
+STATS_FILE_NAME = "query_stats.json"
+
+_STRING_LITERAL = re.compile(r"'(?:[^']|'')*'")
+_NUMBER_LITERAL = re.compile(r"(?<![\w.])-?\d+(?:\.\d+)?\b")
+_PARAM_LIST = re.compile(r"\(\s*\?(?:\s*,\s*\?)+\s*\)")
+_VALUES_LIST = re.compile(r"(\(\?\.\.\.\))(?:\s*,\s*\(\?\.\.\.\))+")
+_WHITESPACE = re.compile(r"\s+")
+_COMMENT = re.compile(r"--[^\n]*")
+
+
+@lru_cache(maxsize=1024)
+def normalize_sql(sql: str) -> str:
+    """
+    Reduz uma instrução SQL à sua forma.
+
+    Remove comentários e literais e colapsa listas de parâmetros, de modo
+    que ``IN (?, ?, ?)`` e INSERTs com várias linhas caiam na mesma forma.
+
+    Args:
+        sql: Instrução SQL
+
+    Returns:
+        Forma normalizada
+    """
+    shape = _COMMENT.sub(" ", sql)
+    shape = _STRING_LITERAL.sub("?", shape)
+    shape = _NUMBER_LITERAL.sub("?", shape)
+    shape = _WHITESPACE.sub(" ", shape).strip()
+    shape = _PARAM_LIST.sub("(?...)", shape)
+    shape = _VALUES_LIST.sub(r"\1...", shape)
+    return shape
+
+
+class _ShapeStats:
+    """Acumuladores de uma forma de instrução."""
+
+    __slots__ = ("count", "errors", "rows", "total_ms", "max_ms", "buckets")
+
+    def __init__(self) -> None:
+        self.count = 0
+        self.errors = 0
+        self.rows = 0
+        self.total_ms = 0.0
+        self.max_ms = 0.0
+        self.buckets = [0] * (len(LATENCY_BUCKETS_MS) + 1)
+
+    def percentile(self, fraction: float) -> Optional[float]:
+        """Estimativa do percentil: limite superior do intervalo que o contém."""
+        if not self.count:
+            return None
+        threshold = fraction * self.count
+        seen = 0
+        for i, n in enumerate(self.buckets):
+            seen += n
+            if seen >= threshold:
+                return (
+                    LATENCY_BUCKETS_MS[i]
+                    if i < len(LATENCY_BUCKETS_MS)
+                    else self.max_ms
+                )
+        return self.max_ms
+
+    def as_dict(self) -> Dict[str, Any]:
+        return {
+            "count": self.count,
+            "errors": self.errors,
+            "rows": self.rows,
+            "total_ms": round(self.total_ms, 3),
+            "avg_ms": round(self.total_ms / self.count, 4) if self.count else None,
+            "max_ms": round(self.max_ms, 3),
+            "p50_ms": self.percentile(0.50),
+            "p95_ms": self.percentile(0.95),
+            "p99_ms": self.percentile(0.99),
+            "buckets": list(self.buckets),
+        }
+
+
+class _Measurement:
+    """Medição de uma instrução; quem executa preenche ``rows``."""
+
+    __slots__ = ("instrumentation", "conn", "sql", "params", "rows", "start")
+
+    def __init__(
+        self, instrumentation: "Instrumentation", conn: Any, sql: str, params: Any
+    ) -> None:
+        self.instrumentation = instrumentation
+        self.conn = conn
+        self.sql = sql
+        self.params = params
+        self.rows = 0
+        self.start = 0.0
+
+    def __enter__(self) -> "_Measurement":
+        self.start = time.perf_counter()
+        return self
+
+    def __exit__(self, exc_type: Any, exc: Any, tb: Any) -> None:
+        elapsed_ms = (time.perf_counter() - self.start) * 1000
+        self.instrumentation.record(
+            self.sql,
+            elapsed_ms,
+            self.rows,
+            error=exc_type is not None,
+            conn=self.conn,
+            params=self.params,
+        )
+
+
+class _NullMeasurement:
+    """Medição vazia usada quando a instrumentação está desligada."""
+
+    __slots__ = ("rows",)
+
+    def __init__(self) -> None:
+        self.rows = 0
+
+    def __enter__(self) -> "_NullMeasurement":
+        return self
+
+    def __exit__(self, exc_type: Any, exc: Any, tb: Any) -> None:
+        pass
+
+
+class Instrumentation:
+    """
+    Coletor de métricas de instruções SQL.
+
+    Args:
+        enabled: Se as medições estão ativas
+        slow_query_ms: Limite (ms) para o log de consultas lentas
+    """
+
+    def __init__(
+        self, enabled: bool = True, slow_query_ms: float = DEFAULT_SLOW_QUERY_MS
+    ) -> None:
+        self.enabled = enabled
+        self.slow_query_ms = slow_query_ms
+        self.started_at = datetime.now().isoformat(timespec="seconds")
+        self._shapes: Dict[str, _ShapeStats] = {}
+        self._slow: Deque[Dict[str, Any]] = deque(maxlen=MAX_SLOW_QUERIES)
+        self._sections: Dict[str, Callable[[], Optional[Dict[str, Any]]]] = {}
+        self._lock = threading.Lock()
+        self._stats_path: Optional[str] = None
+        self._save_interval = DEFAULT_SAVE_INTERVAL
+        self._save_lock = threading.Lock()
+        self._saver: Optional[threading.Thread] = None
+        self._stop_saver = threading.Event()
+
+    def measure(self, conn: Any, sql: str, params: Any = None) -> Any:
+        """
+        Cria o contexto de medição de uma instrução.
+
+        Args:
+            conn: Conexão usada (para o EXPLAIN de consultas lentas)
+            sql: Instrução SQL
+            params: Parâmetros (None para scripts, que não têm plano)
+
+        Returns:
+            Gerenciador de contexto com o atributo ``rows``
+        """
+        if not self.enabled:
+            return _NullMeasurement()
+        return _Measurement(self, conn, sql, params)
+
+    def record(
+        self,
+        sql: str,
+        elapsed_ms: float,
+        rows: int = 0,
+        error: bool = False,
+        conn: Any = None,
+        params: Any = None,
+    ) -> None:
+        """
+        Registra a execução de uma instrução.
+
+        Args:
+            sql: Instrução SQL
+            elapsed_ms: Duração em milissegundos
+            rows: Linhas retornadas ou afetadas
+            error: Se a execução falhou
+            conn: Conexão (opcional, para o EXPLAIN de consultas lentas)
+            params: Parâmetros da instrução (opcional)
+        """
+        shape = normalize_sql(sql)
+        bucket = bisect.bisect_left(LATENCY_BUCKETS_MS, elapsed_ms)
+        with self._lock:
+            stats = self._shapes.get(shape)
+            if stats is None:
+                stats = self._shapes[shape] = _ShapeStats()
+            stats.count += 1
+            stats.errors += error
+            stats.rows += max(rows, 0)
+            stats.total_ms += elapsed_ms
+            if elapsed_ms > stats.max_ms:
+                stats.max_ms = elapsed_ms
+            stats.buckets[bucket] += 1
+
+        if elapsed_ms >= self.slow_query_ms and not error:
+            self._log_slow(shape, sql, elapsed_ms, rows, conn, params)
+
+    def _log_slow(
+        self, shape: str, sql: str, elapsed_ms: float, rows: int, conn: Any, params: Any
+    ) -> None:
+        """Registra uma consulta lenta com o seu plano de execução."""
+        plan: List[str] = []
+        if conn is not None and params is not None:
+            try:
+                plan = [
+                    row[-1] for row in conn.execute("EXPLAIN QUERY PLAN " + sql, params)
+                ]
+            except sqlite3.Error as e:
+                plan = [f"(plano indisponível: {str(e)})"]
+
+        slow_logger.warning(
+            f"Consulta lenta ({elapsed_ms:.1f} ms, {rows} linhas): {shape}"
+            + "".join(f"\n    {line}" for line in plan)
+        )
+        with self._lock:
+            self._slow.append(
+                {
+                    "shape": shape,
+                    "elapsed_ms": round(elapsed_ms, 3),
+                    "rows": rows,
+                    "plan": plan,
+                    "at": datetime.now().isoformat(timespec="seconds"),
+                }
+            )
+
+    def snapshot(self) -> Dict[str, Any]:
+        """
+        Retorna um resumo das métricas coletadas.
+
+        Returns:
+            Dicionário com as estatísticas por forma e as consultas lentas
+        """
+        with self._lock:
+            statements = {
+                shape: stats.as_dict() for shape, stats in self._shapes.items()
+            }
+            slow = list(self._slow)
+            sections = dict(self._sections)
+        snapshot = {
+            "pid": os.getpid(),
+            "started_at": self.started_at,
+            "updated_at": datetime.now().isoformat(timespec="seconds"),
+            "slow_query_ms": self.slow_query_ms,
+            "latency_buckets_ms": list(LATENCY_BUCKETS_MS),
+            "statements": statements,
+            "slow_queries": slow,
+        }
+        for name, provider in sections.items():
+            try:
+                data = provider()
+            except Exception as e:
+                logger.error(f"Erro ao coletar a seção {name} das métricas: {str(e)}")
+                continue
+            if data is not None:
+                snapshot[name] = data
+        return snapshot
+
+    def add_section(
+        self, name: str, provider: Callable[[], Optional[Dict[str, Any]]]
+    ) -> None:
+        """
+        Inclui no resumo uma seção de métricas de outro componente.
+
+        Args:
+            name: Chave da seção no resumo
+            provider: Função que retorna as métricas (ou None para omitir)
+        """
+        with self._lock:
+            self._sections[name] = provider
+
+    def reset(self) -> None:
+        """Descarta as métricas coletadas."""
+        with self._lock:
+            self._shapes.clear()
+            self._slow.clear()
+
+    def persist_to(self, path: str, interval: float = DEFAULT_SAVE_INTERVAL) -> None:
+        """
+        Ativa a gravação periódica do resumo em disco, numa thread própria.
+
+        Args:
+            path: Arquivo JSON de destino
+            interval: Intervalo entre gravações, em segundos
+        """
+        self._stats_path = path
+        self._save_interval = interval
+        if self._saver is None:
+            self._stop_saver.clear()
+            self._saver = threading.Thread(
+                target=self._save_loop, name="cortex-stats-writer", daemon=True
+            )
+            self._saver.start()
+
+    def stop_persisting(self, timeout: float = 5.0) -> None:
+        """Para a gravação periódica e grava o resumo uma última vez."""
+        saver = self._saver
+        if saver is not None:
+            self._stop_saver.set()
+            saver.join(timeout)
+            self._saver = None
+        self.save()
+
+    def _save_loop(self) -> None:
+        while not self._stop_saver.wait(self._save_interval):
+            self.save()
+
+    def save(self) -> None:
+        """Grava o resumo no arquivo configurado (escrita atômica)."""
+        path = self._stats_path
+        if not path:
+            return
+        directory = os.path.dirname(path)
+        # Uma gravação por vez; o temporário é único e fica no mesmo
+        # diretório, para que o os.replace seja atômico
+        with self._save_lock:
+            tmp_path = None
+            try:
+                os.makedirs(directory, exist_ok=True)
+                with tempfile.NamedTemporaryFile(
+                    "w",
+                    dir=directory,
+                    prefix=f".{os.path.basename(path)}.",
+                    suffix=".tmp",
+                    delete=False,
+                ) as f:
+                    tmp_path = f.name
+                    json.dump(self.snapshot(), f, indent=2)
+                os.replace(tmp_path, path)
+            except OSError as e:
+                logger.error(f"Erro ao gravar métricas de consultas: {str(e)}")
+                if tmp_path is not None:
+                    try:
+                        os.unlink(tmp_path)
+                    except OSError:
+                        pass
+
+
+_instrumentation: Optional[Instrumentation] = None
+_instrumentation_lock = threading.Lock()
+
+
+def get_instrumentation() -> Instrumentation:
+    """
+    Obtém o coletor de métricas do processo, criando-o a partir da configuração.
+
+    Returns:
+        Instância compartilhada de ``Instrumentation``
+    """
+    global _instrumentation
+
+    if _instrumentation is None:
+        with _instrumentation_lock:
+            if _instrumentation is None:
+                from cortex.core.config import get_config_value
+
+                _instrumentation = Instrumentation(
+                    enabled=get_config_value("storage.instrumentation.enabled", True),
+                    slow_query_ms=get_config_value(
+                        "storage.instrumentation.slow_query_ms", DEFAULT_SLOW_QUERY_MS
+                    ),
+                )
+    return _instrumentation
+
+
+def get_stats_path() -> str:
+    """Caminho do resumo de métricas gravado pelo servidor."""
+    from cortex.storage.database import CORTEX_DATA_DIR
+
+    return os.path.join(CORTEX_DATA_DIR, STATS_FILE_NAME)
+
+
+def load_saved_stats() -> Optional[Dict[str, Any]]:
+    """
+    Lê o último resumo de métricas gravado pelo servidor.
+
+    Returns:
+        Resumo gravado ou None se não existir
+    """
+    try:
+        with open(get_stats_path()) as f:
+            return json.load(f)
+    except (OSError, ValueError):
+        return None
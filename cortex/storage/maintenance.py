@@ -0,0 +1,443 @@
+#!/usr/bin/env python3
+"""
+CORTEX Maintenance - Manutenção do banco em períodos ociosos.
+
+Este módulo executa, numa thread do servidor, as rotinas que mantêm o banco
+saudável: ``PRAGMA optimize``, ``ANALYZE``, checkpoint do WAL com
+``TRUNCATE`` e ``incremental_vacuum``. As rotinas só rodam quando nenhuma
+requisição MCP chega há algum tempo, em fatias curtas (uma instrução de
+custo limitado por vez), e são interrompidas assim que chega uma requisição.
+
+Uma fatia que passa de ``max_slice_ms`` ou encontra o banco ocupado não conta
+como atividade: a rotina é adiada (com espera crescente, até o seu intervalo)
+e as seguintes continuam. Rotinas com várias fatias (``ANALYZE`` tabela por
+tabela) retomam de onde pararam.
+"""
+import logging
+import os
+import sqlite3
+import threading
+import time
+from typing import Any, Callable, Dict, Iterator, List, Optional
+
+from cortex.storage.database import get_connection, get_db_path
+
+logger = logging.getLogger("cortex.storage.maintenance")
+
+# Configuração padrão (sobrescrita pela chave "maintenance" da configuração)
+DEFAULT_MAINTENANCE = {
+    "enabled": True,
+    "idle_seconds": 60,  # inatividade necessária para começar
+    "check_interval_seconds": 5,
+    "max_slice_ms": 250,  # teto de duração de uma fatia
+    "pause_ms": 20,  # pausa entre fatias
+    "optimize_interval_minutes": 60,
+    "analyze_interval_hours": 24,
+    "analysis_limit": 1000,  # linhas amostradas por índice no ANALYZE
+    "checkpoint_interval_minutes": 10,
+    "checkpoint_min_wal_mb": 4,  # checkpoint antecipado quando o WAL passa disso
+    "vacuum_interval_minutes": 30,
+    "vacuum_pages_per_slice": 256,
+}
+
+# Instruções da VM do SQLite entre chamadas do progress handler
+_PROGRESS_OPS = 1000
+
+
+class MaintenanceInterrupted(Exception):
+    """A manutenção foi interrompida por uma requisição (ou pela parada)."""
+
+
+class MaintenanceDeferred(MaintenanceInterrupted):
+    """Uma fatia passou de ``max_slice_ms`` ou encontrou o banco ocupado."""
+
+
+class MaintenanceScheduler:
+    """
+    Agendador de manutenção baseado em ociosidade.
+
+    As requisições chamam ``request_started``/``request_finished``; enquanto
+    houver requisições em andamento, ou se a última terminou há menos de
+    ``idle_seconds``, nenhuma manutenção roda. Uma requisição que chega
+    durante uma fatia aborta a instrução em curso via progress handler.
+
+    Args:
+        config: Configuração (chaves de ``DEFAULT_MAINTENANCE``)
+        connect: Fábrica da conexão dedicada da manutenção
+    """
+
+    def __init__(
+        self,
+        config: Optional[Dict[str, Any]] = None,
+        connect: Callable[[], sqlite3.Connection] = get_connection,
+    ) -> None:
+        self.config = {**DEFAULT_MAINTENANCE, **(config or {})}
+        self._connect = connect
+        self._lock = threading.Lock()
+        self._wakeup = threading.Event()
+        self._stopping = threading.Event()
+        self._thread: Optional[threading.Thread] = None
+        self._active_requests = 0
+        self._activity_seq = 0
+        self._last_activity = time.monotonic()
+        self._last_run: Dict[str, float] = {}
+        # Rotinas adiadas: próxima tentativa e adiamentos seguidos
+        self._retry_at: Dict[str, float] = {}
+        self._deferrals: Dict[str, int] = {}
+        # Progresso das rotinas interrompidas (ver _analyze_slices)
+        self._progress: Dict[str, Any] = {}
+        self._stats: Dict[str, Dict[str, Any]] = {}
+
+        # Rotinas em ordem de prioridade:
+        # (nome, intervalo em segundos, gerador de fatias)
+        self._tasks: List[tuple] = [
+            (
+                "checkpoint",
+                self.config["checkpoint_interval_minutes"] * 60,
+                self._checkpoint_slices,
+            ),
+            (
+                "optimize",
+                self.config["optimize_interval_minutes"] * 60,
+                self._optimize_slices,
+            ),
+            (
+                "incremental_vacuum",
+                self.config["vacuum_interval_minutes"] * 60,
+                self._vacuum_slices,
+            ),
+            (
+                "analyze",
+                self.config["analyze_interval_hours"] * 3600,
+                self._analyze_slices,
+            ),
+        ]
+
+    # Sinais de atividade
+
+    def request_started(self) -> None:
+        """Marca o início de uma requisição (interrompe a manutenção em curso)."""
+        with self._lock:
+            self._active_requests += 1
+            self._activity_seq += 1
+            self._last_activity = time.monotonic()
+
+    def request_finished(self) -> None:
+        """Marca o fim de uma requisição."""
+        with self._lock:
+            self._active_requests = max(0, self._active_requests - 1)
+            self._last_activity = time.monotonic()
+
+    def is_idle(self) -> bool:
+        """Indica se o servidor está ocioso há pelo menos ``idle_seconds``."""
+        with self._lock:
+            return (
+                self._active_requests == 0
+                and time.monotonic() - self._last_activity
+                >= self.config["idle_seconds"]
+            )
+
+    # Ciclo de vida
+
+    def start(self) -> None:
+        """Inicia a thread de manutenção."""
+        if self._thread is not None:
+            return
+        self._stopping.clear()
+        self._thread = threading.Thread(
+            target=self._run, name="cortex-maintenance", daemon=True
+        )
+        self._thread.start()
+
+    def stop(self, timeout: float = 5.0) -> None:
+        """Para a thread de manutenção, interrompendo a fatia em curso."""
+        self._stopping.set()
+        self._wakeup.set()
+        with self._lock:
+            self._activity_seq += 1
+        if self._thread is not None:
+            self._thread.join(timeout)
+            self._thread = None
+
+    def stats(self) -> Dict[str, Any]:
+        """Estatísticas das rotinas: última execução, duração e interrupções."""
+        with self._lock:
+            return {name: dict(data) for name, data in self._stats.items()}
+
+    # Execução
+
+    def _run(self) -> None:
+        while not self._stopping.is_set():
+            self._wakeup.wait(self.config["check_interval_seconds"])
+            self._wakeup.clear()
+            if self._stopping.is_set() or not self.is_idle():
+                continue
+            try:
+                self.run_pending()
+            except Exception as e:
+                logger.error(f"Erro na manutenção do banco: {str(e)}")
+
+    def run_pending(self, force: bool = False) -> List[str]:
+        """
+        Executa as rotinas vencidas enquanto o servidor continuar ocioso.
+
+        Args:
+            force: Ignora intervalos e ociosidade (uso manual)
+
+        Returns:
+            Nomes das rotinas concluídas
+        """
+        # Interrompida por uma requisição, a passada termina; adiada por
+        # limite de tempo ou lock, segue para a próxima rotina
+        completed: List[str] = []
+        conn = self._connect()
+        try:
+            # A manutenção nunca espera por locks: se houver disputa, tenta depois
+            conn.execute("PRAGMA busy_timeout = 0")
+            for name, interval, slices in self._tasks:
+                if not force and not self._is_due(name, interval, conn):
+                    continue
+                if not force and not self.is_idle():
+                    break
+                if self._run_task(name, interval, conn, slices, force):
+                    completed.append(name)
+        finally:
+            conn.close()
+        return completed
+
+    def _is_due(self, name: str, interval: float, conn: sqlite3.Connection) -> bool:
+        if time.monotonic() < self._retry_at.get(name, 0.0):
+            return False
+        last = self._last_run.get(name)
+        if last is None or time.monotonic() - last >= interval:
+            return True
+        # WAL grande antecipa o checkpoint
+        if name == "checkpoint":
+            wal_path = get_db_path() + "-wal"
+            try:
+                size_mb = os.path.getsize(wal_path) / (1024 * 1024)
+            except OSError:
+                return False
+            return size_mb >= self.config["checkpoint_min_wal_mb"]
+        return False
+
+    def _run_task(
+        self,
+        name: str,
+        interval: float,
+        conn: sqlite3.Connection,
+        slices: Callable[[sqlite3.Connection], Iterator[str]],
+        force: bool,
+    ) -> bool:
+        """Executa uma rotina fatia a fatia; False se foi interrompida ou adiada."""
+        start = time.perf_counter()
+        count = 0
+        stats = self._stats.setdefault(
+            name, {"runs": 0, "interrupted": 0, "deferred": 0}
+        )
+        try:
+            for description in slices(conn):
+                count += 1
+                logger.debug(f"Manutenção {name}: {description}")
+                if not force:
+                    time.sleep(self.config["pause_ms"] / 1000)
+                    if not self.is_idle():
+                        raise MaintenanceInterrupted()
+        except MaintenanceDeferred as e:
+            # Espera crescente entre tentativas, limitada ao intervalo da rotina
+            deferrals = self._deferrals.get(name, 0) + 1
+            self._deferrals[name] = deferrals
+            delay = min(
+                interval, self.config["check_interval_seconds"] * 2**deferrals
+            )
+            self._retry_at[name] = time.monotonic() + delay
+            with self._lock:
+                stats["deferred"] += 1
+            logger.debug(
+                f"Manutenção {name} adiada por {delay:.0f}s após {count} fatias: {e}"
+            )
+            return False
+        except MaintenanceInterrupted:
+            with self._lock:
+                stats["interrupted"] += 1
+            logger.debug(f"Manutenção {name} interrompida após {count} fatias")
+            return False
+        finally:
+            conn.set_progress_handler(None, 0)
+            if conn.in_transaction:
+                conn.execute("ROLLBACK")
+
+        elapsed = time.perf_counter() - start
+        self._last_run[name] = time.monotonic()
+        self._retry_at.pop(name, None)
+        self._deferrals.pop(name, None)
+        self._progress.pop(name, None)
+        with self._lock:
+            stats["runs"] += 1
+            stats["slices"] = count
+            stats["last_duration_ms"] = round(elapsed * 1000, 1)
+            stats["last_run_at"] = time.strftime("%Y-%m-%d %H:%M:%S")
+        logger.info(
+            f"Manutenção {name} concluída em {elapsed * 1000:.0f} ms ({count} fatias)"
+        )
+        return True
+
+    def _execute_slice(
+        self, conn: sqlite3.Connection, sql: str, script: bool = False
+    ) -> List[Any]:
+        """
+        Executa uma fatia com teto de duração e preempção por atividade.
+
+        O progress handler aborta a instrução quando chega uma requisição ou
+        quando a fatia passa de ``max_slice_ms``. Com ``script``, a instrução
+        roda via ``executescript``, que a avança até o fim (necessário para
+        pragmas como ``incremental_vacuum``, que liberam uma página por passo).
+
+        Raises:
+            MaintenanceInterrupted: Se chegou uma requisição
+            MaintenanceDeferred: Se a fatia passou do teto ou o banco está ocupado
+        """
+        with self._lock:
+            seq = self._activity_seq
+        deadline = time.perf_counter() + self.config["max_slice_ms"] / 1000
+
+        def _check() -> int:
+            return int(self._activity_seq != seq or time.perf_counter() > deadline)
+
+        conn.set_progress_handler(_check, _PROGRESS_OPS)
+        try:
+            if script:
+                conn.executescript(sql)
+                return []
+            return conn.execute(sql).fetchall()
+        except sqlite3.OperationalError as e:
+            if "interrupt" in str(e):
+                if self._activity_seq != seq:
+                    raise MaintenanceInterrupted() from e
+                raise MaintenanceDeferred(
+                    f"fatia passou de {self.config['max_slice_ms']} ms"
+                ) from e
+            if "busy" in str(e) or "locked" in str(e):
+                raise MaintenanceDeferred(str(e)) from e
+            raise
+        finally:
+            conn.set_progress_handler(None, 0)
+
+    # Rotinas (cada item produzido corresponde a uma fatia concluída)
+
+    def _checkpoint_slices(self, conn: sqlite3.Connection) -> Iterator[str]:
+        # PASSIVE copia o que puder sem bloquear; TRUNCATE zera o arquivo WAL
+        busy, log, copied = self._execute_slice(conn, "PRAGMA wal_checkpoint(PASSIVE)")[
+            0
+        ]
+        yield f"passive ({copied}/{log} páginas)"
+        busy, log, copied = self._execute_slice(
+            conn, "PRAGMA wal_checkpoint(TRUNCATE)"
+        )[0]
+        if busy:
+            raise MaintenanceDeferred("checkpoint bloqueado por leitores")
+        yield "truncate"
+
+    def _optimize_slices(self, conn: sqlite3.Connection) -> Iterator[str]:
+        self._execute_slice(
+            conn, f"PRAGMA analysis_limit = {int(self.config['analysis_limit'])}"
+        )
+        self._execute_slice(conn, "PRAGMA optimize")
+        yield "optimize"
+
+    def _analyze_slices(self, conn: sqlite3.Connection) -> Iterator[str]:
+        # Uma tabela por fatia, com amostragem limitada. As tabelas feitas
+        # nesta rodada ficam em _progress e a rotina retoma da seguinte; uma
+        # tabela adiada (passou do teto da fatia) também conta como feita,
+        # para não travar as demais
+        attempted = self._progress.setdefault("analyze", set())
+        self._execute_slice(
+            conn, f"PRAGMA analysis_limit = {int(self.config['analysis_limit'])}"
+        )
+        tables = [
+            row[0]
+            for row in conn.execute(
+                """
+                SELECT name FROM sqlite_master
+                WHERE type = 'table' AND name NOT LIKE 'sqlite_%'
+                  AND sql NOT LIKE 'CREATE VIRTUAL TABLE%'
+                """
+            )
+        ]
+        for table in tables:
+            if table in attempted:
+                continue
+            quoted = '"' + table.replace('"', '""') + '"'
+            try:
+                self._execute_slice(conn, f"ANALYZE {quoted}")
+            except MaintenanceDeferred:
+                attempted.add(table)
+                raise
+            attempted.add(table)
+            yield f"analyze {table}"
+
+    def _vacuum_slices(self, conn: sqlite3.Connection) -> Iterator[str]:
+        # Só tem efeito em bancos com auto_vacuum = INCREMENTAL (2)
+        if conn.execute("PRAGMA auto_vacuum").fetchone()[0] != 2:
+            return
+        pages = int(self.config["vacuum_pages_per_slice"])
+        free = conn.execute("PRAGMA freelist_count").fetchone()[0]
+        while free > 0:
+            self._execute_slice(
+                conn, f"PRAGMA incremental_vacuum({pages});", script=True
+            )
+            remaining = conn.execute("PRAGMA freelist_count").fetchone()[0]
+            yield f"incremental_vacuum({pages}): {free - remaining} páginas liberadas"
+            if remaining >= free:
+                break
+            free = remaining
+
+
+_scheduler: Optional[MaintenanceScheduler] = None
+
+
+def start_maintenance(
+    config: Optional[Dict[str, Any]] = None
+) -> Optional[MaintenanceScheduler]:
+    """
+    Inicia o agendador de manutenção do processo, se habilitado.
+
+    Args:
+        config: Configuração (padrão a chave "maintenance" da configuração)
+
+    Returns:
+        Agendador iniciado ou None se desabilitado
+    """
+    global _scheduler
+
+    if config is None:
+        from cortex.core.config import get_config_value
+
+        config = get_config_value("maintenance", {}) or {}
+    if not {**DEFAULT_MAINTENANCE, **config}["enabled"]:
+        return None
+    if _scheduler is None:
+        _scheduler = MaintenanceScheduler(config)
+        _scheduler.start()
+    return _scheduler
+
+
+def stop_maintenance() -> None:
+    """Para o agendador de manutenção do processo."""
+    global _scheduler
+
+    if _scheduler is not None:
+        _scheduler.stop()
+        _scheduler = None
+
+
+def request_started() -> None:
+    """Sinaliza o início de uma requisição ao agendador, se ativo."""
+    if _scheduler is not None:
+        _scheduler.request_started()
+
+
+def request_finished() -> None:
+    """Sinaliza o fim de uma requisição ao agendador, se ativo."""
+    if _scheduler is not None:
+        _scheduler.request_finished()
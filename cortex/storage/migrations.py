@@ -0,0 +1,838 @@
+#!/usr/bin/env python3
+"""
+CORTEX Migrations - Migrações versionadas do esquema SQLite.
+
+Este módulo aplica, em ordem e numa única transação, as migrações ainda não
+aplicadas ao banco. A versão do esquema é guardada em ``PRAGMA user_version``;
+quando o esquema já está atualizado nenhum trabalho é feito.
+"""
+import logging
+import sqlite3
+from typing import List, NamedTuple, Optional
+
+from cortex.storage.database import pooled_connection
+
+logger = logging.getLogger("cortex.storage.migrations")
+
+
+class Migration(NamedTuple):
+    """Uma alteração de esquema identificada por uma versão crescente."""
+
+    version: int
+    description: str
+    script: str
+
+
+# Migrações em ordem de versão. Nunca altere uma migração já publicada:
+# acrescente uma nova com a versão seguinte.
+MIGRATIONS: List[Migration] = [
+    Migration(
+        1,
+        "Esquema inicial",
+        """
+    -- Tabela de projetos
+    CREATE TABLE IF NOT EXISTS projects (
+        id INTEGER PRIMARY KEY AUTOINCREMENT,
+        name TEXT NOT NULL,
+        workspace_path TEXT UNIQUE,
+        description TEXT,
+        jira_project_key TEXT,
+        created_at TIMESTAMP NOT NULL DEFAULT CURRENT_TIMESTAMP,
+        updated_at TIMESTAMP NOT NULL DEFAULT CURRENT_TIMESTAMP,
+        active BOOLEAN NOT NULL DEFAULT 1
+    );
+
+    -- Tabela de sessões
+    CREATE TABLE IF NOT EXISTS sessions (
+        id INTEGER PRIMARY KEY AUTOINCREMENT,
+        project_id INTEGER,
+        title TEXT NOT NULL,
+        objective TEXT,
+        start_time TIMESTAMP NOT NULL DEFAULT CURRENT_TIMESTAMP,
+        end_time TIMESTAMP,
+        summary TEXT,
+        next_session_context TEXT,
+        FOREIGN KEY (project_id) REFERENCES projects(id)
+    );
+
+    -- Tabela de mensagens
+    CREATE TABLE IF NOT EXISTS messages (
+        id INTEGER PRIMARY KEY AUTOINCREMENT,
+        session_id INTEGER NOT NULL,
+        role TEXT NOT NULL, -- 'user', 'assistant', 'system', 'summary'
+        content TEXT NOT NULL,
+        token_count INTEGER,
+        timestamp TIMESTAMP NOT NULL DEFAULT CURRENT_TIMESTAMP,
+        FOREIGN KEY (session_id) REFERENCES sessions(id)
+    );
+
+    -- Tabela de tarefas
+    CREATE TABLE IF NOT EXISTS tasks (
+        id INTEGER PRIMARY KEY AUTOINCREMENT,
+        project_id INTEGER NOT NULL,
+        parent_id INTEGER,
+        title TEXT NOT NULL,
+        description TEXT,
+        level TEXT NOT NULL, -- 'phase', 'stage', 'task', 'activity'
+        status TEXT NOT NULL, -- 'not_started', 'in_progress', 'blocked', 'completed'
+        progress INTEGER NOT NULL DEFAULT 0, -- 0-100
+        jira_id TEXT,
+        created_at TIMESTAMP NOT NULL DEFAULT CURRENT_TIMESTAMP,
+        updated_at TIMESTAMP NOT NULL DEFAULT CURRENT_TIMESTAMP,
+        started_at TIMESTAMP,
+        completed_at TIMESTAMP,
+        estimated_hours REAL,
+        actual_hours REAL,
+        order_index INTEGER NOT NULL DEFAULT 0,
+        FOREIGN KEY (project_id) REFERENCES projects(id),
+        FOREIGN KEY (parent_id) REFERENCES tasks(id)
+    );
+
+    -- Tabela de relações entre tarefas
+    CREATE TABLE IF NOT EXISTS task_relations (
+        id INTEGER PRIMARY KEY AUTOINCREMENT,
+        source_task_id INTEGER NOT NULL,
+        target_task_id INTEGER NOT NULL,
+        -- 'blocks', 'depends_on', 'related_to', 'duplicates'
+        relation_type TEXT NOT NULL,
+        created_at TIMESTAMP NOT NULL DEFAULT CURRENT_TIMESTAMP,
+        FOREIGN KEY (source_task_id) REFERENCES tasks(id),
+        FOREIGN KEY (target_task_id) REFERENCES tasks(id)
+    );
+
+    -- Tabela de marcadores
+    CREATE TABLE IF NOT EXISTS markers (
+        id INTEGER PRIMARY KEY AUTOINCREMENT,
+        project_id INTEGER NOT NULL,
+        task_id INTEGER,
+        marker_type TEXT NOT NULL, -- 'TODO', 'FIXME', 'NOTE'
+        content TEXT NOT NULL,
+        file_path TEXT NOT NULL,
+        line_number INTEGER NOT NULL,
+        context TEXT,
+        detected_at TIMESTAMP NOT NULL DEFAULT CURRENT_TIMESTAMP,
+        resolved_at TIMESTAMP,
+        FOREIGN KEY (project_id) REFERENCES projects(id),
+        FOREIGN KEY (task_id) REFERENCES tasks(id)
+    );
+
+    -- Tabela de contextos
+    CREATE TABLE IF NOT EXISTS contexts (
+        id INTEGER PRIMARY KEY AUTOINCREMENT,
+        project_id INTEGER,
+        task_id INTEGER,
+        name TEXT NOT NULL,
+        content TEXT NOT NULL,
+        created_at TIMESTAMP NOT NULL DEFAULT CURRENT_TIMESTAMP,
+        updated_at TIMESTAMP NOT NULL DEFAULT CURRENT_TIMESTAMP,
+        FOREIGN KEY (project_id) REFERENCES projects(id),
+        FOREIGN KEY (task_id) REFERENCES tasks(id)
+    );
+
+    -- Tabela de regras
+    CREATE TABLE IF NOT EXISTS rules (
+        id INTEGER PRIMARY KEY AUTOINCREMENT,
+        project_id INTEGER,
+        name TEXT NOT NULL,
+        description TEXT,
+        condition TEXT NOT NULL, -- JSON condition
+        action TEXT NOT NULL, -- JSON action
+        priority INTEGER NOT NULL DEFAULT 0,
+        is_active BOOLEAN NOT NULL DEFAULT 1,
+        created_at TIMESTAMP NOT NULL DEFAULT CURRENT_TIMESTAMP,
+        updated_at TIMESTAMP NOT NULL DEFAULT CURRENT_TIMESTAMP,
+        FOREIGN KEY (project_id) REFERENCES projects(id)
+    );
+
+    -- Índices para performance
+    CREATE INDEX IF NOT EXISTS idx_sessions_project ON sessions(project_id);
+    CREATE INDEX IF NOT EXISTS idx_messages_session ON messages(session_id);
+    CREATE INDEX IF NOT EXISTS idx_tasks_project ON tasks(project_id);
+    CREATE INDEX IF NOT EXISTS idx_tasks_parent ON tasks(parent_id);
+    CREATE INDEX IF NOT EXISTS idx_tasks_status ON tasks(status);
+    CREATE INDEX IF NOT EXISTS idx_markers_project ON markers(project_id);
+    CREATE INDEX IF NOT EXISTS idx_markers_task ON markers(task_id);
+    CREATE INDEX IF NOT EXISTS idx_contexts_project ON contexts(project_id);
+    CREATE INDEX IF NOT EXISTS idx_contexts_task ON contexts(task_id);
+    """,
+    ),
+    Migration(
+        2,
+        "Tabelas de sincronização Markdown, automação, análise, métricas e cache",
+        """
+    -- Tabela de sincronização Markdown
+    CREATE TABLE IF NOT EXISTS markdown_sync (
+        id INTEGER PRIMARY KEY AUTOINCREMENT,
+        project_id INTEGER NOT NULL,
+        file_path TEXT NOT NULL,
+        file_hash TEXT NOT NULL,
+        last_sync_time TIMESTAMP NOT NULL DEFAULT CURRENT_TIMESTAMP,
+        -- 'in_sync', 'sqlite_ahead', 'markdown_ahead', 'conflict'
+        sync_status TEXT NOT NULL,
+        last_error TEXT,
+        FOREIGN KEY (project_id) REFERENCES projects(id),
+        UNIQUE(project_id, file_path)
+    );
+
+    -- Tabela de regras de automação
+    CREATE TABLE IF NOT EXISTS automation_rules (
+        id INTEGER PRIMARY KEY AUTOINCREMENT,
+        project_id INTEGER,
+        name TEXT NOT NULL,
+        description TEXT,
+        trigger_event TEXT NOT NULL,
+        condition TEXT NOT NULL, -- JSON condition
+        action TEXT NOT NULL, -- JSON action
+        priority INTEGER NOT NULL DEFAULT 0,
+        is_active BOOLEAN NOT NULL DEFAULT 1,
+        created_at TIMESTAMP NOT NULL DEFAULT CURRENT_TIMESTAMP,
+        updated_at TIMESTAMP NOT NULL DEFAULT CURRENT_TIMESTAMP,
+        last_triggered_at TIMESTAMP,
+        trigger_count INTEGER NOT NULL DEFAULT 0,
+        FOREIGN KEY (project_id) REFERENCES projects(id)
+    );
+
+    -- Tabela de análise de código
+    CREATE TABLE IF NOT EXISTS code_analysis (
+        id INTEGER PRIMARY KEY AUTOINCREMENT,
+        project_id INTEGER NOT NULL,
+        file_path TEXT NOT NULL,
+        analysis_type TEXT NOT NULL, -- 'complexity', 'pattern', 'metrics'
+        analysis_data TEXT NOT NULL, -- JSON data
+        score REAL,
+        analyzed_at TIMESTAMP NOT NULL DEFAULT CURRENT_TIMESTAMP,
+        FOREIGN KEY (project_id) REFERENCES projects(id)
+    );
+
+    -- Tabela de sugestões
+    CREATE TABLE IF NOT EXISTS suggestions (
+        id INTEGER PRIMARY KEY AUTOINCREMENT,
+        project_id INTEGER NOT NULL,
+        task_id INTEGER,
+        session_id INTEGER,
+        suggestion_type TEXT NOT NULL, -- 'task', 'refactoring', 'optimization'
+        content TEXT NOT NULL,
+        context TEXT,
+        impact_score INTEGER NOT NULL DEFAULT 50,
+        effort_score INTEGER NOT NULL DEFAULT 50,
+        is_applied BOOLEAN NOT NULL DEFAULT 0,
+        created_at TIMESTAMP NOT NULL DEFAULT CURRENT_TIMESTAMP,
+        applied_at TIMESTAMP,
+        FOREIGN KEY (project_id) REFERENCES projects(id),
+        FOREIGN KEY (task_id) REFERENCES tasks(id),
+        FOREIGN KEY (session_id) REFERENCES sessions(id)
+    );
+
+    -- Tabela de métricas de produtividade
+    CREATE TABLE IF NOT EXISTS productivity (
+        id INTEGER PRIMARY KEY AUTOINCREMENT,
+        project_id INTEGER NOT NULL,
+        session_id INTEGER,
+        task_id INTEGER,
+        metric_type TEXT NOT NULL, -- 'task_completion', 'focus_time', 'efficiency'
+        value REAL NOT NULL,
+        recorded_at TIMESTAMP NOT NULL DEFAULT CURRENT_TIMESTAMP,
+        metadata TEXT, -- JSON additional data
+        FOREIGN KEY (project_id) REFERENCES projects(id),
+        FOREIGN KEY (session_id) REFERENCES sessions(id),
+        FOREIGN KEY (task_id) REFERENCES tasks(id)
+    );
+
+    -- Tabela de métricas do sistema
+    CREATE TABLE IF NOT EXISTS system_metrics (
+        id INTEGER PRIMARY KEY AUTOINCREMENT,
+        cpu_usage REAL NOT NULL,
+        memory_usage REAL NOT NULL,
+        disk_usage REAL NOT NULL,
+        battery_level REAL,
+        is_on_battery BOOLEAN,
+        db_size INTEGER NOT NULL, -- bytes
+        recorded_at TIMESTAMP NOT NULL DEFAULT CURRENT_TIMESTAMP
+    );
+
+    -- Tabela de cache persistente
+    CREATE TABLE IF NOT EXISTS cache_entries (
+        id INTEGER PRIMARY KEY AUTOINCREMENT,
+        cache_key TEXT UNIQUE NOT NULL,
+        cache_value TEXT NOT NULL,
+        use_count INTEGER NOT NULL DEFAULT 1,
+        last_used_at TIMESTAMP NOT NULL DEFAULT CURRENT_TIMESTAMP,
+        created_at TIMESTAMP NOT NULL DEFAULT CURRENT_TIMESTAMP,
+        expires_at TIMESTAMP
+    );
+
+    -- Índices das novas tabelas
+    CREATE INDEX IF NOT EXISTS idx_markdown_sync_project_status
+        ON markdown_sync(project_id, sync_status);
+    CREATE INDEX IF NOT EXISTS idx_automation_rules_project
+        ON automation_rules(project_id);
+    CREATE INDEX IF NOT EXISTS idx_automation_rules_event
+        ON automation_rules(trigger_event);
+    CREATE INDEX IF NOT EXISTS idx_code_analysis_project
+        ON code_analysis(project_id, analyzed_at);
+    CREATE INDEX IF NOT EXISTS idx_code_analysis_file ON code_analysis(file_path);
+    CREATE INDEX IF NOT EXISTS idx_suggestions_project
+        ON suggestions(project_id, is_applied);
+    CREATE INDEX IF NOT EXISTS idx_suggestions_task ON suggestions(task_id);
+    CREATE INDEX IF NOT EXISTS idx_suggestions_session ON suggestions(session_id);
+    CREATE INDEX IF NOT EXISTS idx_productivity_project
+        ON productivity(project_id, recorded_at);
+    CREATE INDEX IF NOT EXISTS idx_productivity_session ON productivity(session_id);
+    CREATE INDEX IF NOT EXISTS idx_productivity_task ON productivity(task_id);
+    CREATE INDEX IF NOT EXISTS idx_system_metrics_recorded
+        ON system_metrics(recorded_at);
+    CREATE INDEX IF NOT EXISTS idx_cache_entries_used ON cache_entries(last_used_at);
+    CREATE INDEX IF NOT EXISTS idx_cache_entries_expires ON cache_entries(expires_at);
+    """,
+    ),
+    Migration(
+        3,
+        "Índice de mensagens por sessão e horário (get_context)",
+        """
+    CREATE INDEX IF NOT EXISTS idx_messages_session_time
+        ON messages(session_id, timestamp, id);
+    DROP INDEX IF EXISTS idx_messages_session;
+    """,
+    ),
+    Migration(
+        4,
+        "Índices de texto completo (FTS5) para mensagens, contextos e tarefas",
+        """
+    -- Índices externos: o texto fica só nas tabelas originais
+    CREATE VIRTUAL TABLE IF NOT EXISTS messages_fts USING fts5(
+        content,
+        content='messages', content_rowid='id',
+        tokenize='unicode61 remove_diacritics 2', prefix='2 3'
+    );
+    CREATE VIRTUAL TABLE IF NOT EXISTS contexts_fts USING fts5(
+        name, content,
+        content='contexts', content_rowid='id',
+        tokenize='unicode61 remove_diacritics 2', prefix='2 3'
+    );
+    CREATE VIRTUAL TABLE IF NOT EXISTS tasks_fts USING fts5(
+        title, description,
+        content='tasks', content_rowid='id',
+        tokenize='unicode61 remove_diacritics 2', prefix='2 3'
+    );
+
+    -- Triggers de sincronização: mensagens
+    CREATE TRIGGER IF NOT EXISTS messages_fts_ai AFTER INSERT ON messages BEGIN
+        INSERT INTO messages_fts(rowid, content) VALUES (new.id, new.content);
+    END;
+    CREATE TRIGGER IF NOT EXISTS messages_fts_ad AFTER DELETE ON messages BEGIN
+        INSERT INTO messages_fts(messages_fts, rowid, content)
+        VALUES ('delete', old.id, old.content);
+    END;
+    CREATE TRIGGER IF NOT EXISTS messages_fts_au
+    AFTER UPDATE OF content ON messages BEGIN
+        INSERT INTO messages_fts(messages_fts, rowid, content)
+        VALUES ('delete', old.id, old.content);
+        INSERT INTO messages_fts(rowid, content) VALUES (new.id, new.content);
+    END;
+
+    -- Triggers de sincronização: contextos
+    CREATE TRIGGER IF NOT EXISTS contexts_fts_ai AFTER INSERT ON contexts BEGIN
+        INSERT INTO contexts_fts(rowid, name, content)
+        VALUES (new.id, new.name, new.content);
+    END;
+    CREATE TRIGGER IF NOT EXISTS contexts_fts_ad AFTER DELETE ON contexts BEGIN
+        INSERT INTO contexts_fts(contexts_fts, rowid, name, content)
+        VALUES ('delete', old.id, old.name, old.content);
+    END;
+    CREATE TRIGGER IF NOT EXISTS contexts_fts_au
+    AFTER UPDATE OF name, content ON contexts BEGIN
+        INSERT INTO contexts_fts(contexts_fts, rowid, name, content)
+        VALUES ('delete', old.id, old.name, old.content);
+        INSERT INTO contexts_fts(rowid, name, content)
+        VALUES (new.id, new.name, new.content);
+    END;
+
+    -- Triggers de sincronização: tarefas
+    CREATE TRIGGER IF NOT EXISTS tasks_fts_ai AFTER INSERT ON tasks BEGIN
+        INSERT INTO tasks_fts(rowid, title, description)
+        VALUES (new.id, new.title, new.description);
+    END;
+    CREATE TRIGGER IF NOT EXISTS tasks_fts_ad AFTER DELETE ON tasks BEGIN
+        INSERT INTO tasks_fts(tasks_fts, rowid, title, description)
+        VALUES ('delete', old.id, old.title, old.description);
+    END;
+    CREATE TRIGGER IF NOT EXISTS tasks_fts_au
+    AFTER UPDATE OF title, description ON tasks BEGIN
+        INSERT INTO tasks_fts(tasks_fts, rowid, title, description)
+        VALUES ('delete', old.id, old.title, old.description);
+        INSERT INTO tasks_fts(rowid, title, description)
+        VALUES (new.id, new.title, new.description);
+    END;
+
+    -- Indexa o conteúdo já existente
+    INSERT INTO messages_fts(messages_fts) VALUES ('rebuild');
+    INSERT INTO contexts_fts(contexts_fts) VALUES ('rebuild');
+    INSERT INTO tasks_fts(tasks_fts) VALUES ('rebuild');
+    """,
+    ),
+    Migration(
+        5,
+        "Índice de sessões com mensagens arquivadas",
+        """
+    -- Stub das sessões cujas mensagens foram movidas para arquivos mensais
+    CREATE TABLE IF NOT EXISTS archived_sessions (
+        session_id INTEGER PRIMARY KEY,
+        archive_month TEXT NOT NULL, -- 'YYYY_MM', nome do arquivo de arquivo
+        message_count INTEGER NOT NULL,
+        first_message_at TIMESTAMP,
+        last_message_at TIMESTAMP,
+        archived_at TIMESTAMP NOT NULL DEFAULT CURRENT_TIMESTAMP,
+        FOREIGN KEY (session_id) REFERENCES sessions(id)
+    );
+    CREATE INDEX IF NOT EXISTS idx_archived_sessions_month
+        ON archived_sessions(archive_month);
+    CREATE INDEX IF NOT EXISTS idx_sessions_end_time ON sessions(end_time);
+    """,
+    ),
+    Migration(
+        6,
+        "Tabela de fechamento da hierarquia de tarefas",
+        """
+    -- Um par (ancestral, descendente) por caminho na árvore, incluindo a
+    -- própria tarefa com profundidade 0
+    CREATE TABLE IF NOT EXISTS task_closure (
+        ancestor_id INTEGER NOT NULL,
+        descendant_id INTEGER NOT NULL,
+        depth INTEGER NOT NULL,
+        PRIMARY KEY (ancestor_id, descendant_id)
+    ) WITHOUT ROWID;
+    CREATE INDEX IF NOT EXISTS idx_task_closure_descendant
+        ON task_closure(descendant_id, depth);
+
+    CREATE TRIGGER IF NOT EXISTS tasks_closure_ai AFTER INSERT ON tasks BEGIN
+        INSERT INTO task_closure(ancestor_id, descendant_id, depth)
+        SELECT new.id, new.id, 0
+        UNION ALL
+        SELECT ancestor_id, new.id, depth + 1 FROM task_closure
+        WHERE descendant_id = new.parent_id;
+    END;
+
+    -- Impede ciclos: o novo pai não pode estar na subárvore da tarefa
+    CREATE TRIGGER IF NOT EXISTS tasks_closure_bu BEFORE UPDATE OF parent_id ON tasks
+    WHEN new.parent_id IS NOT NULL AND EXISTS (
+        SELECT 1 FROM task_closure
+        WHERE ancestor_id = new.id AND descendant_id = new.parent_id
+    ) BEGIN
+        SELECT RAISE(ABORT, 'task hierarchy cycle');
+    END;
+
+    -- Move a subárvore: remove os caminhos vindos dos antigos ancestrais e
+    -- liga a subárvore aos ancestrais do novo pai
+    CREATE TRIGGER IF NOT EXISTS tasks_closure_au AFTER UPDATE OF parent_id ON tasks
+    WHEN old.parent_id IS NOT new.parent_id BEGIN
+        DELETE FROM task_closure
+        WHERE descendant_id IN (
+            SELECT descendant_id FROM task_closure WHERE ancestor_id = new.id
+        ) AND ancestor_id IN (
+            SELECT ancestor_id FROM task_closure
+            WHERE descendant_id = new.id AND depth > 0
+        );
+        INSERT INTO task_closure(ancestor_id, descendant_id, depth)
+        SELECT super.ancestor_id, sub.descendant_id, super.depth + sub.depth + 1
+        FROM task_closure super, task_closure sub
+        WHERE super.descendant_id = new.parent_id AND sub.ancestor_id = new.id;
+    END;
+
+    CREATE TRIGGER IF NOT EXISTS tasks_closure_ad AFTER DELETE ON tasks BEGIN
+        DELETE FROM task_closure WHERE descendant_id = old.id;
+    END;
+
+    -- Preenche a tabela para as tarefas já existentes
+    INSERT OR IGNORE INTO task_closure(ancestor_id, descendant_id, depth)
+    WITH RECURSIVE closure(ancestor_id, descendant_id, depth) AS (
+        SELECT id, id, 0 FROM tasks
+        UNION ALL
+        SELECT c.ancestor_id, t.id, c.depth + 1
+        FROM closure c JOIN tasks t ON t.parent_id = c.descendant_id
+    )
+    SELECT ancestor_id, descendant_id, depth FROM closure;
+    """,
+    ),
+    Migration(
+        7,
+        "Agregados de progresso por tarefa pai",
+        """
+    -- Agregados dos filhos diretos (contagens e progresso ponderado) e totais
+    -- de horas da subárvore, sem a própria tarefa. O peso de cada filho é
+    -- estimated_hours quando positivo, senão 1.
+    CREATE TABLE IF NOT EXISTS task_rollups (
+        task_id INTEGER PRIMARY KEY,
+        child_count INTEGER NOT NULL DEFAULT 0,
+        completed_count INTEGER NOT NULL DEFAULT 0,
+        weight_sum REAL NOT NULL DEFAULT 0,
+        weighted_progress REAL NOT NULL DEFAULT 0,
+        estimated_hours REAL NOT NULL DEFAULT 0,
+        actual_hours REAL NOT NULL DEFAULT 0,
+        FOREIGN KEY (task_id) REFERENCES tasks(id) ON DELETE CASCADE
+    );
+
+    CREATE TRIGGER IF NOT EXISTS tasks_rollup_ai AFTER INSERT ON tasks BEGIN
+        INSERT INTO task_rollups(task_id) VALUES (new.id);
+        UPDATE task_rollups SET
+            child_count = child_count + 1,
+            completed_count = completed_count + (new.status = 'completed'),
+            weight_sum = weight_sum
+                + (CASE WHEN new.estimated_hours > 0 THEN new.estimated_hours
+                   ELSE 1 END),
+            weighted_progress = weighted_progress
+                + (CASE WHEN new.estimated_hours > 0 THEN new.estimated_hours
+                   ELSE 1 END) * new.progress
+        WHERE task_id = new.parent_id;
+        UPDATE task_rollups SET
+            estimated_hours = estimated_hours + COALESCE(new.estimated_hours, 0),
+            actual_hours = actual_hours + COALESCE(new.actual_hours, 0)
+        WHERE task_id IN (
+            SELECT ancestor_id FROM task_closure WHERE descendant_id = new.parent_id
+        );
+    END;
+
+    CREATE TRIGGER IF NOT EXISTS tasks_rollup_au
+    AFTER UPDATE OF status, progress, estimated_hours, actual_hours ON tasks
+    WHEN old.parent_id IS new.parent_id BEGIN
+        UPDATE task_rollups SET
+            completed_count = completed_count
+                + (new.status = 'completed') - (old.status = 'completed'),
+            weight_sum = weight_sum
+                + (CASE WHEN new.estimated_hours > 0 THEN new.estimated_hours
+                   ELSE 1 END)
+                - (CASE WHEN old.estimated_hours > 0 THEN old.estimated_hours
+                   ELSE 1 END),
+            weighted_progress = weighted_progress
+                + (CASE WHEN new.estimated_hours > 0 THEN new.estimated_hours
+                   ELSE 1 END) * new.progress
+                - (CASE WHEN old.estimated_hours > 0 THEN old.estimated_hours
+                   ELSE 1 END) * old.progress
+        WHERE task_id = new.parent_id;
+        UPDATE task_rollups SET
+            estimated_hours = estimated_hours
+                + COALESCE(new.estimated_hours, 0) - COALESCE(old.estimated_hours, 0),
+            actual_hours = actual_hours
+                + COALESCE(new.actual_hours, 0) - COALESCE(old.actual_hours, 0)
+        WHERE task_id IN (
+            SELECT ancestor_id FROM task_closure WHERE descendant_id = new.parent_id
+        );
+    END;
+
+    -- Mudança de pai: retira a contribuição completa (tarefa e subárvore) da
+    -- cadeia antiga e a soma à nova
+    CREATE TRIGGER IF NOT EXISTS tasks_rollup_move AFTER UPDATE OF parent_id ON tasks
+    WHEN old.parent_id IS NOT new.parent_id BEGIN
+        UPDATE task_rollups SET
+            child_count = child_count - 1,
+            completed_count = completed_count - (old.status = 'completed'),
+            weight_sum = weight_sum
+                - (CASE WHEN old.estimated_hours > 0 THEN old.estimated_hours
+                   ELSE 1 END),
+            weighted_progress = weighted_progress
+                - (CASE WHEN old.estimated_hours > 0 THEN old.estimated_hours
+                   ELSE 1 END) * old.progress
+        WHERE task_id = old.parent_id;
+        UPDATE task_rollups SET
+            estimated_hours = estimated_hours - COALESCE(old.estimated_hours, 0)
+                - (SELECT estimated_hours FROM task_rollups WHERE task_id = new.id),
+            actual_hours = actual_hours - COALESCE(old.actual_hours, 0)
+                - (SELECT actual_hours FROM task_rollups WHERE task_id = new.id)
+        WHERE task_id IN (
+            SELECT ancestor_id FROM task_closure WHERE descendant_id = old.parent_id
+        );
+        UPDATE task_rollups SET
+            child_count = child_count + 1,
+            completed_count = completed_count + (new.status = 'completed'),
+            weight_sum = weight_sum
+                + (CASE WHEN new.estimated_hours > 0 THEN new.estimated_hours
+                   ELSE 1 END),
+            weighted_progress = weighted_progress
+                + (CASE WHEN new.estimated_hours > 0 THEN new.estimated_hours
+                   ELSE 1 END) * new.progress
+        WHERE task_id = new.parent_id;
+        UPDATE task_rollups SET
+            estimated_hours = estimated_hours + COALESCE(new.estimated_hours, 0)
+                + (SELECT estimated_hours FROM task_rollups WHERE task_id = new.id),
+            actual_hours = actual_hours + COALESCE(new.actual_hours, 0)
+                + (SELECT actual_hours FROM task_rollups WHERE task_id = new.id)
+        WHERE task_id IN (
+            SELECT ancestor_id FROM task_closure WHERE descendant_id = new.parent_id
+        );
+    END;
+
+    CREATE TRIGGER IF NOT EXISTS tasks_rollup_ad AFTER DELETE ON tasks BEGIN
+        UPDATE task_rollups SET
+            child_count = child_count - 1,
+            completed_count = completed_count - (old.status = 'completed'),
+            weight_sum = weight_sum
+                - (CASE WHEN old.estimated_hours > 0 THEN old.estimated_hours
+                   ELSE 1 END),
+            weighted_progress = weighted_progress
+                - (CASE WHEN old.estimated_hours > 0 THEN old.estimated_hours
+                   ELSE 1 END) * old.progress
+        WHERE task_id = old.parent_id;
+        UPDATE task_rollups SET
+            estimated_hours = estimated_hours - COALESCE(old.estimated_hours, 0),
+            actual_hours = actual_hours - COALESCE(old.actual_hours, 0)
+        WHERE task_id IN (
+            SELECT ancestor_id FROM task_closure WHERE descendant_id = old.parent_id
+        );
+        DELETE FROM task_rollups WHERE task_id = old.id;
+    END;
+
+    -- Preenche os agregados para as tarefas já existentes
+    INSERT OR REPLACE INTO task_rollups
+        (task_id, child_count, completed_count, weight_sum, weighted_progress,
+         estimated_hours, actual_hours)
+    SELECT t.id,
+           COUNT(c.id),
+           COALESCE(SUM(c.status = 'completed'), 0),
+           COALESCE(SUM(CASE WHEN c.estimated_hours > 0 THEN c.estimated_hours
+                             WHEN c.id IS NOT NULL THEN 1 END), 0),
+           COALESCE(SUM((CASE WHEN c.estimated_hours > 0 THEN c.estimated_hours
+                         ELSE 1 END) * c.progress), 0),
+           (SELECT COALESCE(SUM(d.estimated_hours), 0) FROM task_closure cl
+            JOIN tasks d ON d.id = cl.descendant_id
+            WHERE cl.ancestor_id = t.id AND cl.depth > 0),
+           (SELECT COALESCE(SUM(d.actual_hours), 0) FROM task_closure cl
+            JOIN tasks d ON d.id = cl.descendant_id
+            WHERE cl.ancestor_id = t.id AND cl.depth > 0)
+    FROM tasks t LEFT JOIN tasks c ON c.parent_id = t.id
+    GROUP BY t.id;
+    """,
+    ),
+    Migration(
+        8,
+        "Índices nas extremidades de task_relations",
+        """
+    CREATE INDEX IF NOT EXISTS idx_task_relations_source
+        ON task_relations(source_task_id, relation_type, target_task_id);
+    CREATE INDEX IF NOT EXISTS idx_task_relations_target
+        ON task_relations(target_task_id, relation_type, source_task_id);
+    """,
+    ),
+    Migration(
+        9,
+        "Índices de paginação e contadores de tarefas",
+        """
+    -- Índices na ordem de listagem (order_index, id) para os filtros comuns:
+    -- a página é lida em ordem a partir do cursor, sem ordenação
+    CREATE INDEX IF NOT EXISTS idx_tasks_project_order
+        ON tasks(project_id, order_index, id);
+    CREATE INDEX IF NOT EXISTS idx_tasks_project_status_order
+        ON tasks(project_id, status, order_index, id);
+    CREATE INDEX IF NOT EXISTS idx_tasks_project_level_order
+        ON tasks(project_id, level, order_index, id);
+    CREATE INDEX IF NOT EXISTS idx_tasks_parent_order
+        ON tasks(parent_id, order_index, id);
+    CREATE INDEX IF NOT EXISTS idx_tasks_order ON tasks(order_index, id);
+
+    -- Contagem de tarefas por projeto, status e nível, mantida por triggers
+    CREATE TABLE IF NOT EXISTS task_counts (
+        project_id INTEGER NOT NULL,
+        status TEXT NOT NULL,
+        level TEXT NOT NULL,
+        task_count INTEGER NOT NULL DEFAULT 0,
+        PRIMARY KEY (project_id, status, level)
+    ) WITHOUT ROWID;
+
+    CREATE TRIGGER IF NOT EXISTS tasks_counts_ai AFTER INSERT ON tasks BEGIN
+        INSERT INTO task_counts(project_id, status, level, task_count)
+        VALUES (new.project_id, new.status, new.level, 1)
+        ON CONFLICT(project_id, status, level)
+        DO UPDATE SET task_count = task_count + 1;
+    END;
+
+    CREATE TRIGGER IF NOT EXISTS tasks_counts_au
+    AFTER UPDATE OF project_id, status, level ON tasks
+    WHEN old.project_id IS NOT new.project_id OR old.status IS NOT new.status
+      OR old.level IS NOT new.level
+    BEGIN
+        UPDATE task_counts SET task_count = task_count - 1
+        WHERE project_id = old.project_id AND status = old.status AND level = old.level;
+        INSERT INTO task_counts(project_id, status, level, task_count)
+        VALUES (new.project_id, new.status, new.level, 1)
+        ON CONFLICT(project_id, status, level)
+        DO UPDATE SET task_count = task_count + 1;
+    END;
+
+    CREATE TRIGGER IF NOT EXISTS tasks_counts_ad AFTER DELETE ON tasks BEGIN
+        UPDATE task_counts SET task_count = task_count - 1
+        WHERE project_id = old.project_id AND status = old.status AND level = old.level;
+    END;
+
+    INSERT OR REPLACE INTO task_counts(project_id, status, level, task_count)
+    SELECT project_id, status, level, COUNT(*) FROM tasks
+    GROUP BY project_id, status, level;
+    """,
+    ),
+    Migration(
+        10,
+        "Versão do grafo de dependências por projeto",
+        """
+    -- Incrementada (por triggers, em qualquer processo) a cada escrita que
+    -- muda o grafo de dependências do projeto: tarefas criadas, removidas ou
+    -- com status/estimativa alterados e relações entre tarefas
+    CREATE TABLE IF NOT EXISTS task_graph_versions (
+        project_id INTEGER PRIMARY KEY,
+        version INTEGER NOT NULL DEFAULT 0
+    );
+
+    CREATE TRIGGER IF NOT EXISTS tasks_graph_ai AFTER INSERT ON tasks BEGIN
+        INSERT INTO task_graph_versions(project_id, version) VALUES (new.project_id, 1)
+        ON CONFLICT(project_id) DO UPDATE SET version = version + 1;
+    END;
+
+    CREATE TRIGGER IF NOT EXISTS tasks_graph_au
+    AFTER UPDATE OF project_id, status, estimated_hours ON tasks
+    WHEN old.project_id IS NOT new.project_id OR old.status IS NOT new.status
+      OR old.estimated_hours IS NOT new.estimated_hours
+    BEGIN
+        INSERT INTO task_graph_versions(project_id, version) VALUES (old.project_id, 1)
+        ON CONFLICT(project_id) DO UPDATE SET version = version + 1;
+        INSERT INTO task_graph_versions(project_id, version)
+        SELECT new.project_id, 1 WHERE new.project_id IS NOT old.project_id
+        ON CONFLICT(project_id) DO UPDATE SET version = version + 1;
+    END;
+
+    CREATE TRIGGER IF NOT EXISTS tasks_graph_ad AFTER DELETE ON tasks BEGIN
+        INSERT INTO task_graph_versions(project_id, version) VALUES (old.project_id, 1)
+        ON CONFLICT(project_id) DO UPDATE SET version = version + 1;
+    END;
+
+    CREATE TRIGGER IF NOT EXISTS task_relations_graph_ai
+    AFTER INSERT ON task_relations BEGIN
+        INSERT INTO task_graph_versions(project_id, version)
+        SELECT project_id, 1 FROM tasks WHERE id = new.source_task_id
+        ON CONFLICT(project_id) DO UPDATE SET version = version + 1;
+    END;
+
+    CREATE TRIGGER IF NOT EXISTS task_relations_graph_au
+    AFTER UPDATE ON task_relations BEGIN
+        INSERT INTO task_graph_versions(project_id, version)
+        SELECT project_id, 1 FROM tasks
+        WHERE id IN (old.source_task_id, new.source_task_id)
+        ON CONFLICT(project_id) DO UPDATE SET version = version + 1;
+    END;
+
+    CREATE TRIGGER IF NOT EXISTS task_relations_graph_ad
+    AFTER DELETE ON task_relations BEGIN
+        INSERT INTO task_graph_versions(project_id, version)
+        SELECT project_id, 1 FROM tasks WHERE id = old.source_task_id
+        ON CONFLICT(project_id) DO UPDATE SET version = version + 1;
+    END;
+    """,
+    ),
+]
+
+# Versão mais recente do esquema
+LATEST_VERSION = MIGRATIONS[-1].version
+
+
+def split_statements(script: str) -> List[str]:
+    """
+    Divide um script SQL em instruções completas.
+
+    Usa ``sqlite3.complete_statement`` para não partir corpos de triggers,
+    que contêm ';' entre BEGIN e END.
+
+    Args:
+        script: Script SQL
+
+    Returns:
+        Lista de instruções, sem as vazias
+    """
+    statements = []
+    buffer = ""
+    for part in script.split(";"):
+        buffer += part + ";"
+        if sqlite3.complete_statement(buffer):
+            statement = buffer.strip()
+            if statement.strip(";").strip():
+                statements.append(statement)
+            buffer = ""
+    return statements
+
+
+def get_schema_version(conn: sqlite3.Connection) -> int:
+    """
+    Lê a versão do esquema do banco.
+
+    Args:
+        conn: Conexão SQLite
+
+    Returns:
+        Valor de ``PRAGMA user_version``
+    """
+    return conn.execute("PRAGMA user_version").fetchone()[0]
+
+
+def get_pending_migrations(version: int) -> List[Migration]:
+    """
+    Lista as migrações posteriores a uma versão.
+
+    Args:
+        version: Versão atual do esquema
+
+    Returns:
+        Migrações pendentes, em ordem
+    """
+    return [m for m in MIGRATIONS if m.version > version]
+
+
+def migrate(
+    target: Optional[int] = None, conn: Optional[sqlite3.Connection] = None
+) -> int:
+    """
+    Aplica as migrações pendentes numa única transação.
+
+    Args:
+        target: Versão alvo (opcional, padrão a mais recente)
+        conn: Conexão do banco a migrar (padrão a do pool, no banco do CORTEX)
+
+    Returns:
+        Versão do esquema após a execução
+    """
+    target = LATEST_VERSION if target is None else target
+
+    if conn is None:
+        with pooled_connection() as pooled:
+            return migrate(target, pooled)
+
+    # Caminho rápido: esquema atualizado, nenhuma transação necessária
+    version = get_schema_version(conn)
+    if version >= target:
+        return version
+
+    # Bancos novos usam auto_vacuum incremental, para que a manutenção
+    # devolva páginas livres sem VACUUM completo. Com o WAL já ativo a
+    # mudança só vale após um VACUUM, instantâneo num banco vazio.
+    if (
+        version == 0
+        and not conn.execute("SELECT 1 FROM sqlite_master LIMIT 1").fetchone()
+    ):
+        conn.execute("PRAGMA auto_vacuum = INCREMENTAL")
+        conn.execute("VACUUM")
+
+    # BEGIN IMMEDIATE serializa migrações concorrentes de vários processos
+    conn.execute("BEGIN IMMEDIATE")
+    try:
+        version = get_schema_version(conn)
+        pending = [m for m in get_pending_migrations(version) if m.version <= target]
+        for migration in pending:
+            logger.info(
+                f"Aplicando migração {migration.version}: {migration.description}"
+            )
+            for statement in split_statements(migration.script):
+                conn.execute(statement)
+            version = migration.version
+        # PRAGMA não aceita parâmetros; a versão é sempre um inteiro
+        conn.execute(f"PRAGMA user_version = {int(version)}")
+        conn.execute("COMMIT")
+    except BaseException:
+        if conn.in_transaction:
+            conn.execute("ROLLBACK")
+        raise
+
+    logger.info(f"Esquema migrado para a versão {version}")
+    return version
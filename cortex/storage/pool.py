@@ -0,0 +1,198 @@
+#!/usr/bin/env python3
+"""
+CORTEX Pool - Pool de conexões SQLite persistentes.
+
+Este módulo mantém uma conexão de longa duração por thread, configurada
+uma única vez, evitando abrir e reconfigurar conexões a cada consulta.
+"""
+import logging
+import sqlite3
+import threading
+import time
+from contextlib import contextmanager
+from typing import Any, Callable, Dict, Iterator, List, Optional
+
+logger = logging.getLogger("cortex.storage.pool")
+
+# Intervalo (segundos) após o qual uma conexão ociosa é verificada antes do uso
+DEFAULT_HEALTH_CHECK_INTERVAL = 30.0
+
+
+class _PooledConnection:
+    """Estado associado a uma conexão do pool."""
+
+    __slots__ = ("conn", "generation", "last_used", "depth", "thread")
+
+    def __init__(self, conn: sqlite3.Connection, generation: int) -> None:
+        self.conn = conn
+        self.generation = generation
+        self.last_used = time.monotonic()
+        self.depth = 0
+        self.thread = threading.current_thread()
+
+    @property
+    def thread_name(self) -> str:
+        return self.thread.name
+
+
+class ConnectionPool:
+    """
+    Pool de conexões SQLite com uma conexão persistente por thread.
+
+    As conexões são criadas sob demanda pela função ``factory`` e reutilizadas
+    pela mesma thread até o fechamento do pool. Empréstimos aninhados na mesma
+    thread devolvem a mesma conexão.
+    """
+
+    def __init__(
+        self,
+        db_path: str,
+        factory: Callable[[str], sqlite3.Connection],
+        health_check_interval: float = DEFAULT_HEALTH_CHECK_INTERVAL,
+    ) -> None:
+        self.db_path = db_path
+        self._factory = factory
+        self._health_check_interval = health_check_interval
+        self._local = threading.local()
+        self._lock = threading.Lock()
+        self._connections: List[_PooledConnection] = []
+        self._generation = 0
+        self._closed = False
+        self._created = 0
+        self._reconnects = 0
+
+    def _open(self) -> _PooledConnection:
+        """Abre uma nova conexão e a regista no pool."""
+        self._prune_dead_threads()
+        conn = self._factory(self.db_path)
+        entry = _PooledConnection(conn, self._generation)
+        with self._lock:
+            self._connections.append(entry)
+            self._created += 1
+        self._local.entry = entry
+        logger.debug("Nova conexão no pool para a thread %s", entry.thread_name)
+        return entry
+
+    def _prune_dead_threads(self) -> None:
+        """Fecha conexões de threads que já terminaram."""
+        with self._lock:
+            dead = [e for e in self._connections if not e.thread.is_alive()]
+            for entry in dead:
+                self._connections.remove(entry)
+        for entry in dead:
+            try:
+                entry.conn.close()
+            except sqlite3.Error:
+                pass
+
+    def _discard(self, entry: _PooledConnection) -> None:
+        """Fecha e remove uma conexão do pool."""
+        with self._lock:
+            if entry in self._connections:
+                self._connections.remove(entry)
+        try:
+            entry.conn.close()
+        except sqlite3.Error:
+            pass
+        if getattr(self._local, "entry", None) is entry:
+            self._local.entry = None
+
+    def check_health(self, conn: sqlite3.Connection) -> bool:
+        """
+        Verifica se uma conexão continua utilizável.
+
+        Args:
+            conn: Conexão a verificar
+
+        Returns:
+            True se a conexão responder, False caso contrário
+        """
+        try:
+            conn.execute("SELECT 1").fetchone()
+            return True
+        except sqlite3.Error:
+            return False
+
+    def _acquire(self) -> _PooledConnection:
+        """Obtém a conexão da thread atual, criando ou recuperando se necessário."""
+        if self._closed:
+            raise sqlite3.ProgrammingError("Pool de conexões encerrado")
+
+        entry: Optional[_PooledConnection] = getattr(self._local, "entry", None)
+
+        # Conexões de uma geração anterior (pool reiniciado) são descartadas
+        if entry is not None and entry.generation != self._generation:
+            self._local.entry = None
+            entry = None
+
+        if entry is None:
+            return self._open()
+
+        # Verificação de saúde apenas para conexões ociosas há algum tempo
+        idle = time.monotonic() - entry.last_used
+        if entry.depth == 0 and idle > self._health_check_interval:
+            if not self.check_health(entry.conn):
+                logger.warning("Conexão inválida descartada; reconectando")
+                self._discard(entry)
+                with self._lock:
+                    self._reconnects += 1
+                return self._open()
+
+        return entry
+
+    @contextmanager
+    def connection(self) -> Iterator[sqlite3.Connection]:
+        """
+        Empresta a conexão persistente da thread atual.
+
+        Yields:
+            Conexão SQLite configurada
+        """
+        entry = self._acquire()
+        entry.depth += 1
+        try:
+            yield entry.conn
+        finally:
+            entry.depth -= 1
+            entry.last_used = time.monotonic()
+
+    def close_all(self) -> None:
+        """
+        Fecha todas as conexões do pool.
+
+        Threads que voltarem a usar o pool recebem novas conexões.
+        """
+        with self._lock:
+            entries = list(self._connections)
+            self._connections.clear()
+            self._generation += 1
+
+        for entry in entries:
+            try:
+                entry.conn.close()
+            except sqlite3.Error as e:
+                logger.warning("Erro ao fechar conexão do pool: %s", e)
+
+        if entries:
+            logger.info("Pool de conexões encerrado (%d conexões)", len(entries))
+
+    def shutdown(self) -> None:
+        """Fecha todas as conexões e impede novos empréstimos."""
+        self._closed = True
+        self.close_all()
+
+    def stats(self) -> Dict[str, Any]:
+        """
+        Retorna estatísticas do pool.
+
+        Returns:
+            Dicionário com número de conexões abertas, criadas e reconexões
+        """
+        with self._lock:
+            return {
+                "db_path": self.db_path,
+                "open_connections": len(self._connections),
+                "created": self._created,
+                "reconnects": self._reconnects,
+                "threads": [entry.thread_name for entry in self._connections],
+            }
@@ -0,0 +1,85 @@
+#!/usr/bin/env python3
+"""
+CORTEX Rows - Tipos leves de linha para resultados de consultas.
+
+Este módulo gera classes de linha com ``__slots__``, uma por conjunto de
+colunas, para iterar resultados sem criar um dicionário por linha.
+"""
+import keyword
+from functools import lru_cache
+from typing import Any, Dict, Iterator, Tuple, Type
+
+
+class Row:
+    """
+    Linha imutável com acesso por índice, por nome de coluna e por atributo.
+
+    As subclasses geradas por ``row_type`` partilham o mapeamento de colunas;
+    cada instância guarda apenas a tupla de valores.
+    """
+
+    __slots__ = ("_values",)
+
+    _columns: Tuple[str, ...] = ()
+    _index: Dict[str, int] = {}
+
+    def __init__(self, values: Tuple[Any, ...]) -> None:
+        self._values = values
+
+    def __getitem__(self, key: Any) -> Any:
+        if isinstance(key, str):
+            return self._values[self._index[key]]
+        return self._values[key]
+
+    def __getattr__(self, name: str) -> Any:
+        try:
+            return self._values[self._index[name]]
+        except KeyError:
+            raise AttributeError(name) from None
+
+    def __len__(self) -> int:
+        return len(self._values)
+
+    def __iter__(self) -> Iterator[Any]:
+        return iter(self._values)
+
+    def __eq__(self, other: object) -> bool:
+        if isinstance(other, Row):
+            return self._columns == other._columns and self._values == other._values
+        return NotImplemented
+
+    def __hash__(self) -> int:
+        return hash((self._columns, self._values))
+
+    def __repr__(self) -> str:
+        fields = ", ".join(f"{c}={v!r}" for c, v in zip(self._columns, self._values))
+        return f"Row({fields})"
+
+    def keys(self) -> Tuple[str, ...]:
+        """Retorna os nomes das colunas."""
+        return self._columns
+
+    def as_dict(self) -> Dict[str, Any]:
+        """Converte a linha num dicionário."""
+        return dict(zip(self._columns, self._values))
+
+
+@lru_cache(maxsize=256)
+def row_type(columns: Tuple[str, ...]) -> Type[Row]:
+    """
+    Obtém (ou cria) a classe de linha para um conjunto de colunas.
+
+    Args:
+        columns: Nomes das colunas, na ordem do resultado
+
+    Returns:
+        Subclasse de ``Row`` com o mapeamento de colunas
+    """
+    index = {name: i for i, name in enumerate(columns)}
+    name = "Row_" + "_".join(
+        c if c.isidentifier() and not keyword.iskeyword(c) else f"c{i}"
+        for i, c in enumerate(columns)
+    )
+    return type(
+        name[:64], (Row,), {"__slots__": (), "_columns": columns, "_index": index}
+    )
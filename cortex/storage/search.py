@@ -0,0 +1,205 @@
+#!/usr/bin/env python3
+"""
+CORTEX Search - Busca de texto completo (FTS5) no histórico.
+
+Este módulo consulta os índices FTS5 de mensagens, contextos e tarefas,
+ordenando os resultados por relevância (BM25) e extraindo trechos.
+
+Os valores de BM25 de índices diferentes (cada escopo tem seu índice, pesos
+e estatísticas; o arquivo de mensagens, os seus) não são comparáveis entre
+si. Por isso cada escopo é ordenado pelo próprio BM25 e recebe uma
+relevância normalizada (1.0 para o melhor resultado do escopo), e a lista
+final é ordenada por essa relevância.
+"""
+import itertools
+import logging
+import re
+from typing import Any, Dict, Iterable, List, Optional, Sequence
+
+from cortex.storage.database import MAX_SQL_VARIABLES, execute_query, iter_query
+
+logger = logging.getLogger("cortex.storage.search")
+
+# Escopos de busca disponíveis
+SEARCH_SCOPES = ("messages", "contexts", "tasks")
+
+# Marcadores de destaque nos trechos
+HIGHLIGHT_START = "["
+HIGHLIGHT_END = "]"
+SNIPPET_TOKENS = 12
+
+# Consultas por escopo. bm25() retorna valores menores para resultados mais
+# relevantes; os pesos priorizam títulos e nomes sobre o corpo do texto.
+_SCOPE_QUERIES = {
+    "messages": f"""
+        SELECT 'messages' AS scope, m.id AS id, m.session_id AS session_id,
+               s.project_id AS project_id, m.role AS title, m.timestamp AS timestamp,
+               bm25(messages_fts) AS rank,
+               snippet(messages_fts, 0, '{HIGHLIGHT_START}', '{HIGHLIGHT_END}', '…',
+                       {SNIPPET_TOKENS}) AS snippet
+        FROM messages_fts
+        JOIN messages m ON m.id = messages_fts.rowid
+        JOIN sessions s ON s.id = m.session_id
+        WHERE messages_fts MATCH ? {{project_filter}}
+        ORDER BY rank
+        LIMIT ?
+    """,
+    "contexts": f"""
+        SELECT 'contexts' AS scope, c.id AS id, NULL AS session_id,
+               c.project_id AS project_id, c.name AS title, c.updated_at AS timestamp,
+               bm25(contexts_fts, 5.0, 1.0) AS rank,
+               snippet(contexts_fts, 1, '{HIGHLIGHT_START}', '{HIGHLIGHT_END}', '…',
+                       {SNIPPET_TOKENS}) AS snippet
+        FROM contexts_fts
+        JOIN contexts c ON c.id = contexts_fts.rowid
+        WHERE contexts_fts MATCH ? {{project_filter}}
+        ORDER BY rank
+        LIMIT ?
+    """,
+    "tasks": f"""
+        SELECT 'tasks' AS scope, t.id AS id, NULL AS session_id,
+               t.project_id AS project_id, t.title AS title, t.updated_at AS timestamp,
+               bm25(tasks_fts, 10.0, 1.0) AS rank,
+               snippet(tasks_fts, -1, '{HIGHLIGHT_START}', '{HIGHLIGHT_END}', '…',
+                       {SNIPPET_TOKENS}) AS snippet
+        FROM tasks_fts
+        JOIN tasks t ON t.id = tasks_fts.rowid
+        WHERE tasks_fts MATCH ? {{project_filter}}
+        ORDER BY rank
+        LIMIT ?
+    """,
+}
+
+_PROJECT_COLUMN = {
+    "messages": "s.project_id",
+    "contexts": "c.project_id",
+    "tasks": "t.project_id",
+}
+
+_TERM_PATTERN = re.compile(r"\w+", re.UNICODE)
+
+
+def build_match_query(text: str, prefix: bool = True) -> str:
+    """
+    Converte texto livre numa expressão MATCH do FTS5.
+
+    Cada palavra vira um termo entre aspas (evitando erros de sintaxe com
+    caracteres especiais); com ``prefix`` a última palavra casa por prefixo.
+
+    Args:
+        text: Texto digitado pelo usuário
+        prefix: Se a última palavra deve casar por prefixo
+
+    Returns:
+        Expressão MATCH (vazia se não houver palavras)
+    """
+    terms = [f'"{term}"' for term in _TERM_PATTERN.findall(text)]
+    if terms and prefix:
+        terms[-1] += "*"
+    return " ".join(terms)
+
+
+def _session_projects(session_ids: Iterable[int]) -> Dict[int, Optional[int]]:
+    """Projeto de cada sessão, em uma consulta por bloco de IDs."""
+    ids = sorted(set(session_ids))
+    projects: Dict[int, Optional[int]] = {}
+    for start in range(0, len(ids), MAX_SQL_VARIABLES):
+        chunk = ids[start : start + MAX_SQL_VARIABLES]
+        placeholders = ", ".join("?" * len(chunk))
+        for row in execute_query(
+            f"SELECT id, project_id FROM sessions WHERE id IN ({placeholders})",
+            tuple(chunk),
+        ):
+            projects[row["id"]] = row["project_id"]
+    return projects
+
+
+def _search_archive(
+    match: str, project_id: Optional[int], limit: int
+) -> List[Dict[str, Any]]:
+    """Completa a busca de mensagens com os bancos de arquivo."""
+    from cortex.storage.archive import iter_archive_search
+
+    results: List[Dict[str, Any]] = []
+    found = iter_archive_search(match, limit)
+    while len(results) < limit:
+        # Projetos das sessões resolvidos por lote, não por resultado
+        batch = list(itertools.islice(found, limit - len(results)))
+        if not batch:
+            break
+        projects = _session_projects(r["session_id"] for r in batch)
+        for result in batch:
+            result["project_id"] = projects.get(result["session_id"])
+            if project_id is None or result["project_id"] == project_id:
+                results.append(result)
+    return results
+
+
+def _add_relevance(results: List[Dict[str, Any]]) -> None:
+    """
+    Normaliza o BM25 de resultados do mesmo índice, já ordenados por ``rank``:
+    ``relevance`` é 1.0 no melhor resultado e proporcional ao BM25 nos demais.
+    """
+    best = results[0]["rank"] if results else 0
+    for result in results:
+        # bm25() é negativo; um melhor resultado nulo torna todos equivalentes
+        result["relevance"] = result["rank"] / best if best < 0 else 1.0
+
+
+def search(
+    text: str,
+    scopes: Optional[Sequence[str]] = None,
+    project_id: Optional[int] = None,
+    limit: int = 20,
+    prefix: bool = True,
+    raw: bool = False,
+    include_archive: bool = True,
+) -> List[Dict[str, Any]]:
+    """
+    Busca texto nos índices FTS5.
+
+    Args:
+        text: Texto a buscar (ou expressão FTS5 se ``raw``)
+        scopes: Escopos a consultar (padrão todos)
+        project_id: Restringe a um projeto (opcional)
+        limit: Número máximo de resultados no total
+        prefix: Se a última palavra casa por prefixo
+        raw: Se ``text`` já é uma expressão MATCH do FTS5
+        include_archive: Se consulta as mensagens arquivadas quando o banco
+            principal não tem resultados suficientes
+
+    Returns:
+        Resultados ordenados pela relevância normalizada por escopo, com
+        escopo, ID, título, trecho, ``rank`` (BM25 do índice de origem) e
+        ``relevance``
+    """
+    scopes = list(scopes or SEARCH_SCOPES)
+    invalid = [s for s in scopes if s not in _SCOPE_QUERIES]
+    if invalid:
+        raise ValueError(f"Escopo de busca inválido: {', '.join(invalid)}")
+
+    match = text if raw else build_match_query(text, prefix)
+    if not match:
+        return []
+
+    results: List[Dict[str, Any]] = []
+    for scope in scopes:
+        params: List[Any] = [match]
+        project_filter = ""
+        if project_id is not None:
+            project_filter = f"AND {_PROJECT_COLUMN[scope]} = ?"
+            params.append(project_id)
+        params.append(limit)
+
+        query = _SCOPE_QUERIES[scope].replace("{project_filter}", project_filter)
+        found = list(iter_query(query, tuple(params)))
+        _add_relevance(found)
+        results.extend(found)
+        if scope == "messages" and include_archive and len(found) < limit:
+            archived = _search_archive(match, project_id, limit - len(found))
+            _add_relevance(archived)
+            results.extend(archived)
+
+    # Ordenação estável: empates seguem a ordem dos escopos e a do BM25
+    results.sort(key=lambda r: -r["relevance"])
+    return results[:limit]
@@ -0,0 +1,338 @@
+#!/usr/bin/env python3
+"""
+CORTEX Tuning - Escolha do perfil de desempenho do armazenamento.
+
+Este módulo mede cada perfil de ``PERFORMANCE_PROFILES`` com a carga típica
+do CORTEX (mensagens avulsas, criação e atualização de tarefas com os
+gatilhos de hierarquia, leitura de contexto, listagem paginada e busca) num
+banco temporário no mesmo disco do banco real, e recomenda o perfil mais
+seguro cujo ganho sobre os mais seguros compense a durabilidade perdida.
+
+A medição usa uma conexão própria, aberta no banco temporário com os PRAGMAs
+do perfil medido: o banco, o pool e o perfil do processo não são alterados.
+"""
+import logging
+import math
+import os
+import random
+import shutil
+import sqlite3
+import tempfile
+import time
+from typing import Any, Callable, Dict, List, Optional
+
+from cortex.core.config import PERFORMANCE_PROFILES
+from cortex.storage import database
+from cortex.storage.migrations import migrate
+
+logger = logging.getLogger("cortex.storage.tuning")
+
+# Perfis do mais seguro para o mais rápido
+PROFILE_ORDER = ("safe", "balanced", "throughput")
+
+# Ganho mínimo de latência para trocar por um perfil menos durável
+DEFAULT_MIN_GAIN = 0.10
+
+# Proporção de cada operação na carga simulada
+WORKLOAD_MIX = (
+    ("record_message", 0.40),
+    ("get_context", 0.20),
+    ("list_tasks", 0.12),
+    ("create_task", 0.10),
+    ("update_task_status", 0.10),
+    ("search", 0.08),
+)
+
+_WORDS = tuple(
+    f"{word}{i}"
+    for word in (
+        "banco",
+        "consulta",
+        "tarefa",
+        "sessao",
+        "indice",
+        "cache",
+        "servidor",
+        "mensagem",
+        "contexto",
+        "projeto",
+        "erro",
+        "teste",
+        "refatorar",
+        "migracao",
+    )
+    for i in range(50)
+)
+
+
+def _text(rng: random.Random, words: int) -> str:
+    return " ".join(rng.choice(_WORDS) for _ in range(words))
+
+
+def _seed(
+    conn: sqlite3.Connection,
+    rng: random.Random,
+    sessions: int,
+    tasks: int,
+    messages: int,
+) -> Dict[str, List[int]]:
+    """Popula o banco temporário com um histórico de tamanho realista."""
+    conn.execute("BEGIN IMMEDIATE")
+    conn.execute(
+        "INSERT INTO projects(name, workspace_path) VALUES ('tune', '/tmp/tune')"
+    )
+    conn.executemany(
+        "INSERT INTO sessions(project_id, title) VALUES (1, ?)",
+        [(f"sessão {i}",) for i in range(sessions)],
+    )
+    session_ids = [row[0] for row in conn.execute("SELECT id FROM sessions")]
+    conn.executemany(
+        "INSERT INTO messages(session_id, role, content) VALUES (?, 'user', ?)",
+        [(rng.choice(session_ids), _text(rng, 30)) for _ in range(messages)],
+    )
+    conn.executemany(
+        "INSERT INTO tasks(project_id, title, level, status) "
+        "VALUES (1, ?, 'phase', 'not_started')",
+        [(f"fase {i}",) for i in range(10)],
+    )
+    phase_ids = [
+        row[0] for row in conn.execute("SELECT id FROM tasks WHERE level = 'phase'")
+    ]
+    conn.executemany(
+        "INSERT INTO tasks(project_id, parent_id, title, level, status) "
+        "VALUES (1, ?, ?, 'stage', 'not_started')",
+        [(rng.choice(phase_ids), _text(rng, 4)) for _ in range(tasks)],
+    )
+    task_ids = [
+        row[0] for row in conn.execute("SELECT id FROM tasks WHERE level = 'stage'")
+    ]
+    conn.execute("COMMIT")
+    return {"sessions": session_ids, "phases": phase_ids, "tasks": task_ids}
+
+
+def _operations(
+    conn: sqlite3.Connection, rng: random.Random, ids: Dict[str, List[int]]
+) -> Dict[str, Callable[[], Any]]:
+    """
+    Operações da carga, com as mesmas consultas das ferramentas MCP.
+
+    As escritas em tarefas disparam os mesmos gatilhos (hierarquia, agregados,
+    contadores, FTS) e recalculam o progresso do pai numa transação, como
+    ``cortex.core.task``.
+    """
+    from cortex.core.task import TASK_STATUSES
+    from cortex.storage.search import build_match_query
+
+    def record_message() -> None:
+        conn.execute(
+            "INSERT INTO messages(session_id, role, content) "
+            "VALUES (?, 'assistant', ?)",
+            (rng.choice(ids["sessions"]), _text(rng, 40)),
+        )
+
+    def get_context() -> None:
+        conn.execute(
+            "SELECT role, content, timestamp FROM messages WHERE session_id = ? "
+            "ORDER BY timestamp DESC, id DESC LIMIT 50",
+            (rng.choice(ids["sessions"]),),
+        ).fetchall()
+
+    def list_tasks() -> None:
+        conn.execute(
+            "SELECT id, title, status, progress FROM tasks "
+            "WHERE project_id = 1 AND status = ? ORDER BY order_index, id LIMIT 50",
+            (rng.choice(TASK_STATUSES),),
+        ).fetchall()
+
+    def update_parent(parent_id: int) -> None:
+        conn.execute(
+            """
+            UPDATE tasks SET progress = (
+                SELECT CASE WHEN weight_sum > 0
+                            THEN CAST(ROUND(weighted_progress / weight_sum) AS INTEGER)
+                            ELSE 0 END
+                FROM task_rollups WHERE task_id = ?
+            ) WHERE id = ?
+            """,
+            (parent_id, parent_id),
+        )
+
+    def create_task() -> None:
+        parent_id = rng.choice(ids["phases"])
+        conn.execute("BEGIN IMMEDIATE")
+        task_id = conn.execute(
+            "INSERT INTO tasks(project_id, parent_id, title, level, status) "
+            "VALUES (1, ?, ?, 'stage', 'not_started')",
+            (parent_id, _text(rng, 4)),
+        ).lastrowid
+        update_parent(parent_id)
+        conn.execute("COMMIT")
+        ids["tasks"].append(task_id)
+
+    def update_task_status() -> None:
+        task_id = rng.choice(ids["tasks"])
+        status = rng.choice(TASK_STATUSES)
+        conn.execute("BEGIN IMMEDIATE")
+        conn.execute(
+            "UPDATE tasks SET status = ?, progress = ?, "
+            "updated_at = CURRENT_TIMESTAMP WHERE id = ?",
+            (status, 100 if status == "completed" else 0, task_id),
+        )
+        parent = conn.execute(
+            "SELECT parent_id FROM tasks WHERE id = ?", (task_id,)
+        ).fetchone()
+        if parent and parent[0]:
+            update_parent(parent[0])
+        conn.execute("COMMIT")
+
+    def run_search() -> None:
+        match = build_match_query(rng.choice(_WORDS))
+        conn.execute(
+            "SELECT m.id, bm25(messages_fts) AS rank, "
+            "snippet(messages_fts, 0, '[', ']', '…', 12) "
+            "FROM messages_fts JOIN messages m ON m.id = messages_fts.rowid "
+            "WHERE messages_fts MATCH ? ORDER BY rank LIMIT 20",
+            (match,),
+        ).fetchall()
+        conn.execute(
+            "SELECT t.id, bm25(tasks_fts, 10.0, 1.0) AS rank, "
+            "snippet(tasks_fts, -1, '[', ']', '…', 12) "
+            "FROM tasks_fts JOIN tasks t ON t.id = tasks_fts.rowid "
+            "WHERE tasks_fts MATCH ? ORDER BY rank LIMIT 20",
+            (match,),
+        ).fetchall()
+
+    return {
+        "record_message": record_message,
+        "get_context": get_context,
+        "list_tasks": list_tasks,
+        "create_task": create_task,
+        "update_task_status": update_task_status,
+        "search": run_search,
+    }
+
+
+def benchmark_profile(
+    profile: str,
+    operations: int = 2000,
+    directory: Optional[str] = None,
+    seed: int = 42,
+) -> Dict[str, Any]:
+    """
+    Mede um perfil de desempenho com a carga simulada.
+
+    Args:
+        profile: Nome do perfil
+        operations: Número de operações da carga
+        directory: Diretório do banco temporário (padrão o do banco real)
+        seed: Semente do gerador de carga
+
+    Returns:
+        Vazão total e latência média por tipo de operação
+    """
+    if profile not in PERFORMANCE_PROFILES:
+        raise ValueError(f"Perfil de desempenho desconhecido: {profile}")
+
+    directory = directory or os.path.dirname(database.get_db_path())
+    tmp_dir = tempfile.mkdtemp(prefix="cortex_tune_", dir=directory)
+    rng = random.Random(seed)
+    conn = None
+    try:
+        conn = database.get_connection(os.path.join(tmp_dir, "tune.db"), profile)
+        migrate(conn=conn)
+        ids = _seed(conn, rng, sessions=200, tasks=2000, messages=20000)
+        ops = _operations(conn, rng, ids)
+        names = [name for name, _ in WORKLOAD_MIX]
+        weights = [weight for _, weight in WORKLOAD_MIX]
+
+        timings: Dict[str, List[float]] = {name: [] for name in names}
+        start = time.perf_counter()
+        for name in rng.choices(names, weights, k=operations):
+            op_start = time.perf_counter()
+            ops[name]()
+            timings[name].append((time.perf_counter() - op_start) * 1000)
+        elapsed = time.perf_counter() - start
+    finally:
+        if conn is not None:
+            conn.close()
+        shutil.rmtree(tmp_dir, ignore_errors=True)
+
+    avg_ms = {
+        name: sum(samples) / len(samples)
+        for name, samples in timings.items()
+        if samples
+    }
+    return {
+        "profile": profile,
+        "operations": operations,
+        "duration_seconds": round(elapsed, 3),
+        "ops_per_second": round(operations / elapsed, 1),
+        "avg_ms": {name: round(ms, 3) for name, ms in avg_ms.items()},
+        # Média geométrica: cada tipo de operação pesa igual, sem que as mais
+        # caras (busca) escondam diferenças nas escritas
+        "score_ms": round(
+            math.exp(sum(math.log(ms) for ms in avg_ms.values()) / len(avg_ms)), 4
+        ),
+    }
+
+
+def recommend_profile(
+    results: List[Dict[str, Any]], min_gain: float = DEFAULT_MIN_GAIN
+) -> str:
+    """
+    Escolhe o perfil a partir das medições.
+
+    Parte do perfil mais seguro e só avança para um menos durável quando a
+    latência típica dele (``score_ms``) é menor que a do escolhido em pelo
+    menos ``min_gain``. Perfis com synchronous=OFF, que podem corromper o
+    banco numa queda do sistema, nunca são recomendados.
+
+    Args:
+        results: Resultados de ``benchmark_profile``
+        min_gain: Ganho relativo mínimo (0.10 = 10%)
+
+    Returns:
+        Nome do perfil recomendado
+    """
+    by_name = {r["profile"]: r for r in results}
+    ordered = [
+        name
+        for name in PROFILE_ORDER
+        if name in by_name
+        and str(PERFORMANCE_PROFILES[name]["synchronous"]).upper() != "OFF"
+    ]
+    if not ordered:
+        raise ValueError("Nenhum resultado de perfil conhecido")
+
+    choice = ordered[0]
+    for name in ordered[1:]:
+        if by_name[name]["score_ms"] * (1 + min_gain) <= by_name[choice]["score_ms"]:
+            choice = name
+    return choice
+
+
+def tune(
+    operations: int = 2000,
+    profiles: Optional[List[str]] = None,
+    min_gain: float = DEFAULT_MIN_GAIN,
+) -> Dict[str, Any]:
+    """
+    Mede os perfis no disco local e recomenda um.
+
+    Args:
+        operations: Operações da carga por perfil
+        profiles: Perfis a medir (padrão todos)
+        min_gain: Ganho relativo mínimo para trocar por um perfil menos durável
+
+    Returns:
+        Resultados por perfil, recomendação e perfil atual
+    """
+    results = []
+    for profile in profiles or list(PROFILE_ORDER):
+        logger.info(f"Medindo perfil de desempenho {profile}")
+        results.append(benchmark_profile(profile, operations))
+    return {
+        "results": results,
+        "recommended": recommend_profile(results, min_gain),
+        "current": database.get_storage_profile()[0],
+    }
@@ -0,0 +1,390 @@
+#!/usr/bin/env python3
+"""
+CORTEX Write-Behind - Fila de escrita em segundo plano com group commit.
+
+Este módulo acumula inserções numa fila limitada e as grava em lote, numa
+única transação, a partir de uma thread dedicada. Quem produz as linhas não
+espera pela sincronização com o disco.
+
+Uma transação aberta com ``transaction()`` segura o lock de escrita até o
+COMMIT, e a thread de escrita não consegue gravar nesse intervalo. Por isso
+as filas são gravadas antes de cada transação externa (``before_transaction``)
+e ``flush()`` dentro de uma transação não espera: retorna False na hora.
+"""
+import logging
+import queue
+import random
+import sqlite3
+import threading
+import time
+from typing import Any, Dict, List, Optional, Sequence
+
+from cortex.storage import generations
+from cortex.storage.database import (
+    before_transaction,
+    bulk_insert,
+    get_busy_policy,
+    in_transaction,
+    is_busy_error,
+)
+
+logger = logging.getLogger("cortex.storage.write_behind")
+
+# Filas ativas no processo, para flush/encerramento conjunto
+_queues: List["WriteBehindQueue"] = []
+_queues_lock = threading.Lock()
+
+# Marca as threads de escrita (que não gravam as filas antes das próprias transações)
+_writer_thread = threading.local()
+
+# Pedido de gravação imediata, posto na fila por flush()
+_FLUSH = object()
+
+# Espera máxima pelas filas antes de abrir uma transação (segundos)
+FLUSH_BEFORE_TRANSACTION_TIMEOUT = 10.0
+
+# Erros causados pelos valores da linha: só essas linhas são descartadas.
+# Banco ocupado (SQLITE_BUSY/LOCKED) é transitório e o lote é repetido
+# inteiro; os demais (disco cheio, somente leitura, esquema) descartam o lote.
+_ROW_ERRORS = (
+    sqlite3.IntegrityError,
+    sqlite3.DataError,
+    sqlite3.InterfaceError,
+    sqlite3.ProgrammingError,
+)
+
+
+class WriteBehindQueue:
+    """
+    Fila de inserções gravadas em lote por uma thread de escrita.
+
+    Um lote é gravado quando atinge ``max_batch`` linhas ou quando a linha mais
+    antiga espera há ``flush_interval`` segundos. A fila é limitada a
+    ``max_queue`` linhas; quando cheia, quem submete espera até
+    ``enqueue_timeout`` segundos e, persistindo a falta de espaço, grava a
+    linha diretamente (backpressure).
+
+    Com o banco ocupado por outro processo, um lote é repetido até
+    ``max_retries`` vezes; depois disso, ou diante de um erro que não passa
+    sozinho (disco cheio, banco somente leitura, tabela inexistente), o lote
+    é descartado com um erro no log e contado em ``failed_rows``.
+    """
+
+    def __init__(
+        self,
+        table: str,
+        columns: Sequence[str],
+        max_batch: int = 100,
+        flush_interval: float = 0.05,
+        max_queue: int = 10000,
+        enqueue_timeout: float = 1.0,
+        max_retries: int = 10,
+    ) -> None:
+        self.table = table
+        self.columns = list(columns)
+        self.max_batch = max(1, max_batch)
+        self.flush_interval = flush_interval
+        self.enqueue_timeout = enqueue_timeout
+        self.max_retries = max(0, max_retries)
+        self._queue: "queue.Queue[Optional[Sequence[Any]]]" = queue.Queue(
+            maxsize=max_queue
+        )
+        self._cond = threading.Condition()
+        self._submitted = 0
+        self._completed = 0
+        self._thread: Optional[threading.Thread] = None
+        self._stopping = False
+        self._stats = {
+            "batches": 0,
+            "rows": 0,
+            "direct_writes": 0,
+            "failed_rows": 0,
+            "retries": 0,
+        }
+
+        with _queues_lock:
+            _queues.append(self)
+
+    def _ensure_started(self) -> None:
+        """Inicia a thread de escrita no primeiro uso."""
+        if self._thread is not None and self._thread.is_alive():
+            return
+        with self._cond:
+            if self._thread is None or not self._thread.is_alive():
+                self._thread = threading.Thread(
+                    target=self._run,
+                    name=f"cortex-writer-{self.table}",
+                    daemon=True,
+                )
+                self._thread.start()
+
+    def _write_direct(self, row: Sequence[Any]) -> None:
+        """Grava uma linha de forma síncrona, na thread de quem chamou."""
+        bulk_insert(self.table, self.columns, [row])
+        self._stats["direct_writes"] += 1
+
+    def submit(self, row: Sequence[Any]) -> bool:
+        """
+        Enfileira uma linha para gravação.
+
+        Dentro de uma transação aberta na thread atual a linha é gravada
+        diretamente, para fazer parte dessa transação.
+
+        Args:
+            row: Valores na ordem de ``columns``
+
+        Returns:
+            True se a linha foi enfileirada, False se foi gravada diretamente
+        """
+        if in_transaction() or self._stopping:
+            self._write_direct(row)
+            return False
+
+        self._ensure_started()
+        # A linha ainda não está no banco, mas respostas em cache que leem a
+        # tabela já não são atuais: quem lê faz o flush antes de consultar
+        generations.bump((self.table,))
+        with self._cond:
+            self._submitted += 1
+        try:
+            self._queue.put(row, timeout=self.enqueue_timeout)
+            return True
+        except queue.Full:
+            logger.warning(
+                f"Fila de escrita de {self.table} cheia; gravando diretamente"
+            )
+            with self._cond:
+                self._submitted -= 1
+            self._write_direct(row)
+            return False
+
+    def _collect_batch(self, first: Sequence[Any]) -> List[Sequence[Any]]:
+        """Acumula linhas até completar o lote ou esgotar o intervalo de flush."""
+        batch = [first]
+        deadline = time.monotonic() + self.flush_interval
+        while len(batch) < self.max_batch:
+            remaining = deadline - time.monotonic()
+            try:
+                item = (
+                    self._queue.get(timeout=remaining)
+                    if remaining > 0
+                    else self._queue.get_nowait()
+                )
+            except queue.Empty:
+                break
+            if item is None:
+                # Sentinela de encerramento: grava o que já foi acumulado
+                self._queue.put_nowait(None)
+                break
+            if item is _FLUSH:
+                # Alguém espera o flush: grava sem esperar o intervalo
+                break
+            batch.append(item)
+        return batch
+
+    def _insert(self, rows: List[Sequence[Any]]) -> None:
+        """
+        Grava linhas numa transação, repetindo enquanto o banco estiver ocupado.
+
+        ``bulk_insert`` já repete o BEGIN com o banco ocupado; se ainda assim
+        falhar (outro processo segurando o lock), espera com backoff
+        exponencial e tenta de novo, até ``max_retries`` vezes.
+
+        Raises:
+            sqlite3.IntegrityError, sqlite3.DataError, sqlite3.InterfaceError,
+            sqlite3.ProgrammingError:
+                Se alguma linha é inválida
+            sqlite3.Error: Se o banco continua ocupado após ``max_retries``
+                tentativas, ou em qualquer outro erro do banco
+        """
+        policy = get_busy_policy()
+        base = policy["retry_base_delay_ms"] / 1000
+        cap = policy["retry_max_delay_ms"] / 1000
+        attempt = 0
+        while True:
+            try:
+                bulk_insert(self.table, self.columns, rows)
+                return
+            except _ROW_ERRORS:
+                raise
+            except sqlite3.Error as e:
+                if not is_busy_error(e) or attempt >= self.max_retries:
+                    raise
+                attempt += 1
+                self._stats["retries"] += 1
+                if attempt == 1:
+                    logger.warning(
+                        f"Banco ocupado ao gravar {len(rows)} linhas em {self.table}: "
+                        f"{str(e)}; repetindo"
+                    )
+                time.sleep(random.uniform(0, min(cap, base * (2 ** min(attempt, 16)))))
+
+    def _write_batch(self, batch: List[Sequence[Any]]) -> None:
+        """Grava um lote numa única transação, isolando linhas inválidas."""
+        try:
+            self._insert(batch)
+            self._stats["batches"] += 1
+            self._stats["rows"] += len(batch)
+            return
+        except _ROW_ERRORS as e:
+            logger.error(
+                f"Erro ao gravar lote em {self.table}: {str(e)}; tentando linha a linha"
+            )
+        except sqlite3.Error as e:
+            self._discard(batch, e)
+            return
+
+        for index, row in enumerate(batch):
+            try:
+                self._insert([row])
+                self._stats["rows"] += 1
+            except _ROW_ERRORS as e:
+                self._stats["failed_rows"] += 1
+                logger.error(f"Linha descartada em {self.table}: {str(e)}")
+            except sqlite3.Error as e:
+                self._discard(batch[index:], e)
+                return
+
+    def _discard(self, rows: List[Sequence[Any]], error: sqlite3.Error) -> None:
+        """Descarta linhas que o banco não aceitou por um erro que não é delas."""
+        self._stats["failed_rows"] += len(rows)
+        logger.error(f"{len(rows)} linhas descartadas em {self.table}: {str(error)}")
+
+    def _run(self) -> None:
+        """Loop da thread de escrita."""
+        _writer_thread.active = True
+        while True:
+            item = self._queue.get()
+            if item is None:
+                break
+            if item is _FLUSH:
+                continue
+            batch = self._collect_batch(item)
+            try:
+                self._write_batch(batch)
+            finally:
+                with self._cond:
+                    self._completed += len(batch)
+                    self._cond.notify_all()
+
+    @property
+    def pending(self) -> int:
+        """Número de linhas submetidas e ainda não gravadas."""
+        with self._cond:
+            return self._submitted - self._completed
+
+    def flush(self, timeout: Optional[float] = None) -> bool:
+        """
+        Espera até que todas as linhas submetidas até agora estejam gravadas.
+
+        Dentro de uma transação aberta na thread atual não espera: a thread de
+        escrita só conseguiria gravar depois do COMMIT dessa mesma transação.
+
+        Args:
+            timeout: Tempo máximo de espera em segundos (None espera sem limite)
+
+        Returns:
+            True se tudo foi gravado, False se o tempo esgotou ou se há linhas
+            pendentes e a thread atual está numa transação
+        """
+        with self._cond:
+            target = self._submitted
+            if self._completed >= target:
+                return True
+        if in_transaction():
+            logger.warning(
+                f"Flush de {self.table} dentro de uma transação: "
+                f"{target - self._completed} linhas ficam para depois do COMMIT"
+            )
+            return False
+        try:
+            self._queue.put_nowait(_FLUSH)
+        except queue.Full:
+            pass  # Fila cheia: o lote sai sem esperar o intervalo de qualquer forma
+        with self._cond:
+            return self._cond.wait_for(lambda: self._completed >= target, timeout)
+
+    def shutdown(self, timeout: Optional[float] = 10.0) -> None:
+        """
+        Grava as linhas pendentes e encerra a thread de escrita.
+
+        Args:
+            timeout: Tempo máximo de espera em segundos
+        """
+        self._stopping = True
+        thread = self._thread
+        if thread is None or not thread.is_alive():
+            return
+        self._queue.put(None)
+        thread.join(timeout)
+        if thread.is_alive():
+            logger.warning(f"Thread de escrita de {self.table} não terminou a tempo")
+        self._thread = None
+        self._stopping = False
+
+    def stats(self) -> Dict[str, Any]:
+        """
+        Retorna estatísticas da fila.
+
+        Returns:
+            Dicionário com lotes e linhas gravados, linhas pendentes e falhas
+        """
+        return {"table": self.table, "pending": self.pending, **self._stats}
+
+
+def write_queue_stats() -> List[Dict[str, Any]]:
+    """
+    Estatísticas de todas as filas de escrita do processo.
+
+    Returns:
+        Lista com o resultado de ``WriteBehindQueue.stats`` de cada fila
+    """
+    with _queues_lock:
+        queues = list(_queues)
+    return [q.stats() for q in queues]
+
+
+def flush_write_queues(timeout: Optional[float] = None) -> bool:
+    """
+    Espera que todas as filas de escrita do processo sejam gravadas.
+
+    Args:
+        timeout: Tempo máximo de espera por fila, em segundos
+
+    Returns:
+        True se todas as filas foram gravadas
+    """
+    with _queues_lock:
+        queues = list(_queues)
+    return all([q.flush(timeout) for q in queues])
+
+
+def _flush_before_transaction() -> None:
+    """Grava as filas antes de uma transação externa (ver ``before_transaction``)."""
+    if getattr(_writer_thread, "active", False):
+        return
+    with _queues_lock:
+        queues = [q for q in _queues if q.pending]
+    for q in queues:
+        if not q.flush(FLUSH_BEFORE_TRANSACTION_TIMEOUT):
+            logger.warning(
+                f"Fila de escrita de {q.table} não foi gravada em "
+                f"{FLUSH_BEFORE_TRANSACTION_TIMEOUT:g}s; "
+                "abrindo a transação mesmo assim"
+            )
+
+
+before_transaction(_flush_before_transaction)
+
+
+def shutdown_write_queues(timeout: Optional[float] = 10.0) -> None:
+    """
+    Grava as linhas pendentes e encerra todas as filas de escrita do processo.
+
+    Args:
+        timeout: Tempo máximo de espera por fila, em segundos
+    """
+    with _queues_lock:
+        queues = list(_queues)
+    for q in queues:
+        q.shutdown(timeout)
@@ -0,0 +1,39 @@
+"""
+Configuração dos testes do CORTEX.
+
+O diretório do CORTEX (~/.cortex) é calculado na importação dos módulos, por
+isso HOME aponta para um diretório temporário antes de qualquer importação de
+``cortex``. Cada teste recebe um banco novo (fixture ``db``).
+"""
+import os
+import sys
+import tempfile
+
+_HOME = tempfile.mkdtemp(prefix="cortex-tests-")
+os.environ["HOME"] = _HOME
+sys.path.insert(0, os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+
+import pytest  # noqa: E402
+
+from cortex.core import session, task_graph  # noqa: E402
+from cortex.storage import cache, database, generations, write_behind  # noqa: E402
+
+
+@pytest.fixture
+def db(tmp_path, monkeypatch):
+    """Banco inicializado num diretório temporário, com os singletons zerados."""
+    monkeypatch.setattr(database, "CORTEX_DB_PATH", str(tmp_path / "cortex.db"))
+    monkeypatch.setattr(session, "_message_writer", None)
+    monkeypatch.setattr(cache, "_cache", None)
+    monkeypatch.setattr(database, "_busy_policy", None)
+    task_graph.invalidate_graph()
+    generations.bump()
+    # Antes do init_db: o busy_timeout vale para as conexões abertas depois
+    database.set_busy_policy(busy_timeout_ms=200, retry_attempts=2)
+    database.init_db()
+    yield database.CORTEX_DB_PATH
+    write_behind.shutdown_write_queues()
+    with write_behind._queues_lock:
+        write_behind._queues.clear()
+    task_graph.invalidate_graph()
+    database.close_pool()
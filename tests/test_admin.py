@@ -0,0 +1,118 @@
+"""Métricas e servidor HTTP de administração (cortex/mcp/metrics.py, admin.py)."""
+import json
+import threading
+import urllib.error
+import urllib.request
+
+import pytest
+
+from cortex.mcp import admin, metrics
+from cortex.mcp.metrics import ToolMetrics, render_prometheus
+
+
+@pytest.fixture
+def tool_metrics(monkeypatch):
+    fresh = ToolMetrics()
+    monkeypatch.setattr(metrics, "_tool_metrics", fresh)
+    return fresh
+
+
+@pytest.fixture
+def admin_url(db, tool_metrics):
+    server = admin.create_admin_server(0)
+    thread = threading.Thread(target=server.serve_forever, daemon=True)
+    thread.start()
+    host, port = server.server_address[:2]
+    yield f"http://{host}:{port}"
+    server.shutdown()
+    server.server_close()
+
+
+def _get(url):
+    """GET devolvendo (status, tipo de conteúdo, corpo), inclusive em erros HTTP."""
+    try:
+        with urllib.request.urlopen(url, timeout=5) as response:
+            return response.status, response.headers["Content-Type"], response.read()
+    except urllib.error.HTTPError as e:
+        return e.code, e.headers["Content-Type"], e.read()
+
+
+def test_tool_metrics_accumulate_calls_and_latency(tool_metrics):
+    tool_metrics.record("get_context", 0.002)
+    tool_metrics.record("get_context", 120, error=True)
+    tool_metrics.record_wait("interactive", 0.01)
+    tool_metrics.record_shed("background")
+
+    stats = tool_metrics.snapshot()["get_context"]
+    assert (stats["calls"], stats["errors"]) == (2, 1)
+    assert sum(stats["buckets"]) == 2
+    # Acima do maior limite: intervalo +Inf
+    assert stats["buckets"][-1] == 1
+    queue = tool_metrics.queue_snapshot()
+    assert (queue["interactive"]["count"], queue["background"]["shed"]) == (1, 1)
+
+
+def test_render_prometheus_exposition(tool_metrics, tmp_path):
+    tool_metrics.record("search", 0.004)
+    tool_metrics.record("search", 0.5, error=True)
+    db_path = tmp_path / "metricas.db"
+    db_path.write_bytes(b"x" * 100)
+    cache = {
+        "hits": 3,
+        "misses": 1,
+        "stale": 0,
+        "evictions": 0,
+        "entries": 2,
+        "bytes": 10,
+        "hit_rate": 0.75,
+    }
+
+    lines = render_prometheus(cache=cache, db_path=str(db_path)).splitlines()
+
+    assert "# TYPE cortex_tool_calls_total counter" in lines
+    assert 'cortex_tool_calls_total{tool="search"} 2' in lines
+    assert 'cortex_tool_errors_total{tool="search"} 1' in lines
+    # Histograma cumulativo, terminando em +Inf com o total de chamadas
+    assert 'cortex_tool_duration_seconds_bucket{tool="search",le="+Inf"} 2' in lines
+    assert 'cortex_tool_duration_seconds_count{tool="search"} 2' in lines
+    assert 'cortex_cache_lookups_total{result="hit"} 3' in lines
+    assert "cortex_cache_hit_ratio 0.75" in lines
+    assert "cortex_db_size_bytes 100" in lines
+    assert "cortex_wal_size_bytes 0" in lines
+    # Sem transporte em execução a família não aparece
+    assert not any(line.startswith("cortex_inflight_requests") for line in lines)
+
+
+def test_metrics_endpoint(admin_url, tool_metrics):
+    tool_metrics.record("create_task", 0.01)
+
+    status, content_type, body = _get(admin_url + "/metrics")
+
+    assert status == 200
+    assert content_type == admin.METRICS_CONTENT_TYPE
+    assert 'cortex_tool_calls_total{tool="create_task"} 1' in body.decode()
+
+    status, _, body = _get(admin_url + "/inexistente")
+    assert status == 404
+    assert json.loads(body) == {"error": "Not found"}
+
+
+def test_health_endpoint(admin_url, monkeypatch, tmp_path):
+    # Fora do servidor stdio não há transporte: indisponível, mas o banco responde
+    status, content_type, body = _get(admin_url + "/health")
+    details = json.loads(body)
+    assert (status, content_type) == (503, "application/json")
+    assert details["checks"]["database"]["ok"] is True
+    assert details["checks"]["transport"] == {"ok": False}
+
+    monkeypatch.setattr(admin, "transport_stats", lambda: {"inflight": 2})
+    status, _, body = _get(admin_url + "/health")
+    details = json.loads(body)
+    assert (status, details["status"]) == (200, "ok")
+    assert details["checks"]["transport"] == {"ok": True, "inflight": 2}
+
+    missing = str(tmp_path / "ausente" / "cortex.db")
+    monkeypatch.setattr(admin, "get_db_path", lambda: missing)
+    status, _, body = _get(admin_url + "/health")
+    assert status == 503
+    assert json.loads(body)["checks"]["database"]["ok"] is False
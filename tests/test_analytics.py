@@ -0,0 +1,29 @@
+"""Caminho de leitura analítico (cortex/storage/analytics.py)."""
+import time
+from concurrent.futures import TimeoutError as FutureTimeoutError
+
+import pytest
+
+from cortex.storage.analytics import AnalyticsReader
+
+# Varredura longa o bastante para nunca terminar dentro do teste
+ENDLESS = """
+    WITH RECURSIVE n(i) AS (
+        SELECT 1 UNION ALL SELECT i + 1 FROM n WHERE i < 1000000000000
+    )
+    SELECT COUNT(*) FROM n
+"""
+
+
+def test_timed_out_query_is_interrupted(db):
+    reader = AnalyticsReader(db)
+    try:
+        with pytest.raises(FutureTimeoutError):
+            reader.query(ENDLESS, timeout=0.2)
+
+        # A thread analítica foi liberada: a próxima consulta não espera a varredura
+        started = time.monotonic()
+        assert reader.query("SELECT 1 AS one", timeout=5) == [{"one": 1}]
+        assert time.monotonic() - started < 2
+    finally:
+        reader.close()
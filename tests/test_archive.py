@@ -0,0 +1,83 @@
+"""Arquivamento de sessões antigas (cortex/storage/archive.py)."""
+import pytest
+
+from cortex.core.session import create_session, flush_messages
+from cortex.storage import archive
+from cortex.storage.database import execute_query, execute_update
+
+
+@pytest.fixture
+def archived(db, tmp_path, monkeypatch):
+    monkeypatch.setattr(archive, "ARCHIVE_DIR", str(tmp_path / "archive"))
+    execute_update("INSERT INTO projects(name, workspace_path) VALUES ('p', '/tmp/p')")
+    return tmp_path
+
+
+def _session(title, ended, *messages):
+    """Cria uma sessão finalizada em ``ended`` com mensagens (papel, conteúdo)."""
+    session_id = create_session(title, project_id=1)["id"]
+    for role, content in messages:
+        execute_update(
+            "INSERT INTO messages (session_id, role, content, timestamp) "
+            "VALUES (?, ?, ?, ?)",
+            (session_id, role, content, ended),
+        )
+    flush_messages()
+    execute_update("UPDATE sessions SET end_time = ? WHERE id = ?", (ended, session_id))
+    return session_id
+
+
+def test_archive_session_moves_messages(archived):
+    sid = _session(
+        "antiga",
+        "2026-01-10 12:00:00",
+        ("system", "instruções iniciais"),
+        ("user", "como configurar o banco de dados"),
+        ("assistant", "use o modo WAL para leituras concorrentes"),
+    )
+
+    result = archive.archive_session(sid, "2026_01")
+
+    assert result["messages"] == 3
+    assert result["stored_bytes"] > 0
+    assert not execute_query("SELECT id FROM messages WHERE session_id = ?", (sid,))
+    stub = archive.get_archived_session(sid)
+    assert (stub["archive_month"], stub["message_count"]) == ("2026_01", 3)
+
+    messages = archive.get_archived_messages(sid)
+    assert [m["role"] for m in messages] == ["system", "user", "assistant"]
+    assert messages[2]["content"] == "use o modo WAL para leituras concorrentes"
+    assert [
+        m["role"] for m in archive.get_archived_messages(sid, include_system=False)
+    ] == ["user", "assistant"]
+
+
+def test_archive_search_highlights_archived_messages(archived):
+    sid = _session(
+        "antiga", "2026-01-10 12:00:00", ("user", "erro de concorrência no sqlite")
+    )
+    archive.archive_session(sid, "2026_01")
+
+    results = list(archive.iter_archive_search("sqlite", 10))
+
+    assert len(results) == 1
+    assert results[0]["session_id"] == sid
+    assert results[0]["archived"] is True
+    assert "[sqlite]" in results[0]["snippet"]
+
+
+def test_archive_old_sessions_selects_by_age(archived):
+    old = _session("antiga", "2020-03-01 08:00:00", ("user", "a"), ("user", "b"))
+    recent = _session("recente", "2999-01-01 00:00:00", ("user", "c"))
+
+    preview = archive.archive_old_sessions(older_than_days=90, dry_run=True)
+    assert (preview["sessions"], preview["months"]) == (1, ["2020_03"])
+    assert archive.get_archived_session(old) is None
+
+    summary = archive.archive_old_sessions(older_than_days=90)
+
+    assert (summary["sessions"], summary["messages"]) == (1, 2)
+    assert archive.get_archived_session(old)["archive_month"] == "2020_03"
+    assert archive.get_archived_session(recent) is None
+    # Sessões já arquivadas não voltam a ser elegíveis
+    assert archive.find_archivable_sessions(90) == []
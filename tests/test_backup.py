@@ -0,0 +1,101 @@
+"""Backups incrementais (cortex/storage/backup.py) e backup_db."""
+import os
+import sqlite3
+
+import pytest
+
+from cortex.core.session import create_session, flush_messages
+from cortex.storage import archive, backup, database
+from cortex.storage.database import execute_query, execute_update
+
+TIMESTAMP = "2026-01-01 00:00:00"
+
+
+@pytest.fixture
+def backups(db, tmp_path, monkeypatch):
+    monkeypatch.setattr(backup, "BACKUP_DIR", str(tmp_path / "backups"))
+    monkeypatch.setattr(
+        backup, "MANIFEST_FILE", str(tmp_path / "backups" / "manifest.json")
+    )
+    monkeypatch.setattr(archive, "ARCHIVE_DIR", str(tmp_path / "archive"))
+    execute_update("INSERT INTO projects(name, workspace_path) VALUES ('p', '/tmp/p')")
+    return tmp_path
+
+
+def _add_messages(session_id, *contents):
+    for content in contents:
+        execute_update(
+            "INSERT INTO messages (session_id, role, content, timestamp) "
+            "VALUES (?, 'user', ?, ?)",
+            (session_id, content, TIMESTAMP),
+        )
+
+
+def _messages():
+    return [
+        r["content"] for r in execute_query("SELECT content FROM messages ORDER BY id")
+    ]
+
+
+def test_delta_restores_deletions_and_archive_moves(backups):
+    kept = create_session("mantida", project_id=1)["id"]
+    moved = create_session("arquivada", project_id=1)["id"]
+    _add_messages(kept, "a", "b", "c")
+    _add_messages(moved, "x", "y")
+    flush_messages()
+    assert backup.create_backup()["kind"] == "full"
+
+    execute_update("DELETE FROM messages WHERE content = 'b'")
+    archive.archive_session(moved, "2026_01")
+    delta = backup.create_backup()
+    assert delta["kind"] == "delta"
+    assert delta["verified"]
+    assert delta["rows"]["archived_sessions"] == 1
+
+    # Estado posterior ao delta, que a restauração deve desfazer
+    _add_messages(kept, "depois")
+    execute_update("DELETE FROM archived_sessions")
+
+    backup.restore_backup(delta["path"])
+
+    assert _messages() == ["a", "c"]
+    archived = execute_query("SELECT session_id, message_count FROM archived_sessions")
+    assert [(r["session_id"], r["message_count"]) for r in archived] == [(moved, 2)]
+    # Os triggers do índice de busca acompanham as exclusões
+    assert not execute_query(
+        "SELECT rowid FROM messages_fts WHERE messages_fts MATCH 'b'"
+    )
+
+
+def test_backup_db_bounds_restarts_under_concurrent_writes(db, tmp_path):
+    execute_update("CREATE TABLE carga (id INTEGER PRIMARY KEY, v TEXT)")
+    database.execute_many(
+        "INSERT INTO carga (v) VALUES (?)", [("x" * 500,) for _ in range(500)]
+    )
+    other = sqlite3.connect(db, isolation_level=None)
+    steps = []
+
+    def write_between_steps(status, remaining, total):
+        # Cada escrita de outra conexão faz a cópia em passos recomeçar
+        steps.append(remaining)
+        other.execute("INSERT INTO carga (v) VALUES ('y')")
+
+    try:
+        path = database.backup_db(
+            str(tmp_path / "copia.db"),
+            pages=1,
+            sleep=0,
+            progress=write_between_steps,
+            max_restarts=2,
+        )
+    finally:
+        other.close()
+
+    assert len(steps) < 20
+    conn = sqlite3.connect(path)
+    try:
+        assert conn.execute("PRAGMA integrity_check").fetchone()[0] == "ok"
+        assert conn.execute("SELECT COUNT(*) FROM carga").fetchone()[0] >= 500
+    finally:
+        conn.close()
+    assert os.path.getsize(path) > 0
@@ -0,0 +1,85 @@
+"""Lotes MCP numa transação (handle_mcp_batch)."""
+import threading
+import time
+
+from cortex.core.session import get_message_writer
+from cortex.mcp.server import handle_mcp_batch, handle_mcp_request
+from cortex.storage.database import execute_query, execute_update, transaction
+
+
+def _contents():
+    return [
+        r["content"] for r in execute_query("SELECT content FROM messages ORDER BY id")
+    ]
+
+
+def test_batch_flushes_queued_messages_before_transaction(db):
+    handle_mcp_request({"name": "start_session", "parameters": {"title": "s"}})
+    handle_mcp_request(
+        {"name": "record_message", "parameters": {"role": "user", "content": "hello"}}
+    )
+
+    started = time.monotonic()
+    results = handle_mcp_batch(
+        [
+            {"name": "record_message", "parameters": {"role": "user", "content": "x"}},
+            {"name": "end_session", "parameters": {}},
+        ]
+    )
+
+    assert time.monotonic() - started < 5
+    assert all("error" not in r for r in results), results
+    assert _contents() == ["hello", "x"]
+
+
+def test_flush_inside_transaction_fails_fast(db):
+    handle_mcp_request({"name": "start_session", "parameters": {"title": "s"}})
+    writer = get_message_writer()
+
+    with transaction():
+        # Outra thread enfileira uma linha que só pode ser gravada após o COMMIT
+        producer = threading.Thread(
+            target=writer.submit, args=((1, "user", "a", 0, "2026-01-01 00:00:00"),)
+        )
+        producer.start()
+        producer.join()
+        started = time.monotonic()
+        assert writer.flush(timeout=30) is False
+        assert time.monotonic() - started < 1
+
+    assert writer.flush(timeout=5)
+    assert _contents() == ["a"]
+
+
+def test_failed_item_is_rolled_back_alone(db):
+    execute_update("INSERT INTO projects(name, workspace_path) VALUES ('p', '/tmp/p')")
+
+    results = handle_mcp_batch(
+        [
+            {"name": "create_task", "parameters": {"project_id": 1, "title": "a"}},
+            {"name": "create_task", "parameters": {"project_id": 999999, "title": "b"}},
+            {"name": "create_task", "parameters": {"project_id": 1, "title": "c"}},
+        ]
+    )
+
+    assert "error" not in results[0] and "error" not in results[2]
+    assert "error" in results[1]
+    titles = [r["title"] for r in execute_query("SELECT title FROM tasks ORDER BY id")]
+    assert titles == ["a", "c"]
+
+
+def test_heavy_tool_is_rejected_in_write_batch(db, tmp_path):
+    execute_update(
+        "INSERT INTO projects(name, workspace_path) VALUES ('p', ?)", (str(tmp_path),)
+    )
+
+    results = handle_mcp_batch(
+        [
+            {"name": "create_task", "parameters": {"project_id": 1, "title": "a"}},
+            {"name": "scan_markers", "parameters": {"project_id": 1}},
+        ]
+    )
+
+    assert "error" not in results[0]
+    assert "scan_markers" in results[1]["error"]
+    assert execute_query("SELECT COUNT(*) AS n FROM markers")[0]["n"] == 0
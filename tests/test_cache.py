@@ -0,0 +1,140 @@
+"""Cache de respostas e gerações por tabela (storage/cache.py, generations.py)."""
+import sqlite3
+
+import pytest
+
+from cortex.core.task import create_task
+from cortex.mcp.server import handle_mcp_batch, handle_mcp_request
+from cortex.storage import database, generations
+from cortex.storage.cache import ResponseCache
+from cortex.storage.database import execute_update, transaction
+
+
+class CountingTool:
+    """Ferramenta de teste que conta as execuções."""
+
+    def __init__(self):
+        self.calls = 0
+
+    def __call__(self, project_id: int = 1):
+        self.calls += 1
+        return {"project_id": project_id, "calls": self.calls, "items": [1, 2]}
+
+
+@pytest.fixture
+def project(db):
+    execute_update("INSERT INTO projects(name, workspace_path) VALUES ('p', '/tmp/p')")
+    return 1
+
+
+def _cached_call(cache, tool, tables):
+    return cache.call("tool", tool, {}, tables)
+
+
+def test_hit_until_table_changes(project):
+    cache, tool = ResponseCache(), CountingTool()
+
+    _cached_call(cache, tool, ("tasks",))
+    _cached_call(cache, tool, ("tasks",))
+    assert tool.calls == 1
+
+    create_task("a", project)
+    _cached_call(cache, tool, ("tasks",))
+    assert tool.calls == 2
+
+
+def test_trigger_written_table_is_invalidated(project):
+    cache, tool = ResponseCache(), CountingTool()
+    parent = create_task("pai", project, level="phase")["id"]
+
+    for table in ("task_closure", "task_rollups", "task_counts"):
+        _cached_call(cache, tool, (table,))
+        calls = tool.calls
+        # O INSERT em tasks só escreve nas demais tabelas pelos triggers
+        create_task("filha", project, level="stage", parent_id=parent)
+        _cached_call(cache, tool, (table,))
+        assert tool.calls == calls + 1, table
+
+
+def test_generations_advance_only_on_commit(project):
+    before = generations.snapshot(("tasks",))
+
+    with pytest.raises(RuntimeError):
+        with transaction():
+            create_task("a", project)
+            assert generations.snapshot(("tasks",)) == before
+            raise RuntimeError("reverte")
+    assert generations.snapshot(("tasks",)) == before
+
+    with transaction():
+        with pytest.raises(RuntimeError):
+            with transaction():
+                create_task("b", project)
+                raise RuntimeError("reverte só o savepoint")
+        assert generations.snapshot(("tasks",)) == before
+        create_task("c", project)
+    assert generations.snapshot(("tasks",)) != before
+
+
+def test_cached_response_is_a_copy(project):
+    cache, tool = ResponseCache(), CountingTool()
+
+    first = _cached_call(cache, tool, ("tasks",))
+    first["items"].append(3)
+    second = _cached_call(cache, tool, ("tasks",))
+    second["items"].append(4)
+
+    assert _cached_call(cache, tool, ("tasks",))["items"] == [1, 2]
+    assert tool.calls == 1
+
+
+def test_queued_message_invalidates_context(db):
+    handle_mcp_request({"name": "start_session", "parameters": {"title": "s"}})
+    handle_mcp_request(
+        {"name": "record_message", "parameters": {"role": "user", "content": "a"}}
+    )
+    handle_mcp_request({"name": "get_context", "parameters": {}})
+
+    handle_mcp_request(
+        {"name": "record_message", "parameters": {"role": "user", "content": "b"}}
+    )
+    context = handle_mcp_request({"name": "get_context", "parameters": {}})
+
+    assert [m["content"] for m in context["messages"]] == ["a", "b"]
+
+
+def test_batch_with_failed_item_invalidates_list(project):
+    listing = {"name": "list_tasks", "parameters": {"project_id": project}}
+    assert handle_mcp_request(listing)["tasks"] == []
+
+    results = handle_mcp_batch(
+        [
+            {
+                "name": "create_task",
+                "parameters": {"project_id": project, "title": "a"},
+            },
+            {"name": "create_task", "parameters": {"project_id": 999999, "title": "b"}},
+        ]
+    )
+    assert "error" in results[1]
+
+    assert [t["title"] for t in handle_mcp_request(listing)["tasks"]] == ["a"]
+
+
+def test_write_from_another_process_invalidates(project):
+    cache, tool = ResponseCache({"max_age_seconds": 3600}), CountingTool()
+    _cached_call(cache, tool, ("projects",))
+
+    # Escrita local numa transação: não é confundida com escrita externa
+    create_task("a", project)
+    _cached_call(cache, tool, ("projects",))
+    assert tool.calls == 1
+
+    # Conexão fora do processo (como a CLI): nenhuma geração local avança
+    other = sqlite3.connect(database.get_db_path(), isolation_level=None)
+    try:
+        other.execute("UPDATE projects SET name = 'q' WHERE id = ?", (project,))
+    finally:
+        other.close()
+    _cached_call(cache, tool, ("projects",))
+    assert tool.calls == 2
@@ -0,0 +1,205 @@
+"""Transações, escritas em lote e leitura incremental (cortex/storage/database.py)."""
+import sqlite3
+import threading
+
+import pytest
+
+from cortex.storage import database
+from cortex.storage.database import (
+    after_commit,
+    bulk_insert,
+    bulk_upsert,
+    execute_many,
+    execute_query,
+    execute_script,
+    execute_update,
+    in_transaction,
+    is_busy_error,
+    iter_query,
+    retry_on_busy,
+    set_busy_policy,
+    transaction,
+)
+
+
+@pytest.fixture
+def items(db):
+    execute_script(
+        "CREATE TABLE itens (id INTEGER PRIMARY KEY, nome TEXT UNIQUE, valor INTEGER)"
+    )
+    return "itens"
+
+
+def _names():
+    return [r["nome"] for r in execute_query("SELECT nome FROM itens ORDER BY id")]
+
+
+def test_transaction_commits_and_rolls_back(items):
+    with transaction():
+        execute_update("INSERT INTO itens (nome) VALUES ('a')")
+        assert in_transaction()
+    assert not in_transaction()
+
+    with pytest.raises(RuntimeError):
+        with transaction():
+            execute_update("INSERT INTO itens (nome) VALUES ('b')")
+            raise RuntimeError("reverte")
+
+    assert _names() == ["a"]
+
+
+def test_nested_transaction_rolls_back_only_its_savepoint(items):
+    done = []
+    with transaction():
+        execute_update("INSERT INTO itens (nome) VALUES ('a')")
+        after_commit(lambda: done.append("externa"))
+        with pytest.raises(sqlite3.IntegrityError):
+            with transaction():
+                after_commit(lambda: done.append("revertida"))
+                execute_update("INSERT INTO itens (nome) VALUES ('b')")
+                execute_update("INSERT INTO itens (nome) VALUES ('a')")
+        execute_update("INSERT INTO itens (nome) VALUES ('c')")
+        # As funções de after_commit só rodam após o COMMIT externo
+        assert done == []
+
+    assert _names() == ["a", "c"]
+    assert done == ["externa"]
+
+
+def test_bulk_insert_splits_statements_and_returns_ids(items, monkeypatch):
+    monkeypatch.setattr(database, "MAX_SQL_VARIABLES", 6)
+    rows = [(f"n{i}", i) for i in range(10)]
+
+    ids = bulk_insert("itens", ("nome", "valor"), rows, return_ids=True)
+
+    stored = execute_query("SELECT id, nome FROM itens ORDER BY id")
+    assert ids == [r["id"] for r in stored]
+    assert [r["nome"] for r in stored] == [name for name, _ in rows]
+
+
+def test_failed_bulk_insert_writes_nothing(items):
+    with pytest.raises(sqlite3.IntegrityError):
+        bulk_insert("itens", ("nome",), [("a",), ("b",), ("a",)], chunk_size=1)
+    assert _names() == []
+
+
+def test_bulk_upsert_updates_conflicting_rows(items):
+    bulk_insert("itens", ("nome", "valor"), [("a", 1), ("b", 2)])
+
+    affected = bulk_upsert(
+        "itens", ("nome", "valor"), [("a", 10), ("c", 3)], conflict_columns=("nome",)
+    )
+    bulk_upsert(
+        "itens",
+        ("nome", "valor"),
+        [("b", 20)],
+        conflict_columns=("nome",),
+        update_columns=(),
+    )
+
+    assert affected == 2
+    rows = execute_query("SELECT nome, valor FROM itens ORDER BY nome")
+    assert [(r["nome"], r["valor"]) for r in rows] == [("a", 10), ("b", 2), ("c", 3)]
+
+
+def test_execute_many_is_atomic(items):
+    assert execute_many("INSERT INTO itens (nome) VALUES (?)", [("a",), ("b",)]) == 2
+
+    with pytest.raises(sqlite3.IntegrityError):
+        execute_many("INSERT INTO itens (nome) VALUES (?)", [("c",), ("a",)])
+
+    assert _names() == ["a", "b"]
+
+
+EXPECTED = [("a", 1), ("b", 2), ("c", 3)]
+
+
+@pytest.mark.parametrize("row_format", ["dict", "tuple", "row"])
+def test_iter_query_formats(items, row_format):
+    bulk_insert("itens", ("nome", "valor"), EXPECTED)
+    query = "SELECT nome, valor FROM itens ORDER BY id"
+
+    rows = list(iter_query(query, batch_size=2, row_format=row_format))
+
+    if row_format == "dict":
+        assert rows == [{"nome": n, "valor": v} for n, v in EXPECTED]
+    elif row_format == "tuple":
+        assert rows == EXPECTED
+    else:
+        assert [(r.nome, r["valor"]) for r in rows] == EXPECTED
+        assert rows[0].keys() == ("nome", "valor")
+
+
+def test_iter_query_reads_lazily_and_rejects_unknown_format(items):
+    bulk_insert("itens", ("nome",), [(f"n{i}",) for i in range(5)])
+
+    rows = iter_query("SELECT nome FROM itens ORDER BY id", batch_size=2)
+    assert next(rows) == {"nome": "n0"}
+    rows.close()
+    # Gerador fechado: a conexão volta a aceitar escritas
+    execute_update("INSERT INTO itens (nome) VALUES ('x')")
+
+    with pytest.raises(ValueError):
+        list(iter_query("SELECT 1", row_format="json"))
+
+
+def _flaky(failures, error=None):
+    """Operação que falha ``failures`` vezes antes de retornar o número de chamadas."""
+    calls = []
+
+    def operation():
+        calls.append(1)
+        if len(calls) <= failures:
+            raise error or sqlite3.OperationalError("database is locked")
+        return len(calls)
+
+    return operation, calls
+
+
+def test_busy_errors_are_classified():
+    assert is_busy_error(sqlite3.OperationalError("database is locked"))
+    assert is_busy_error(sqlite3.OperationalError("database table is locked"))
+    assert not is_busy_error(sqlite3.OperationalError("no such table: x"))
+    assert not is_busy_error(sqlite3.IntegrityError("database is locked"))
+
+
+def test_retry_on_busy_backs_off_until_attempts_run_out(db):
+    set_busy_policy(retry_attempts=3, retry_base_delay_ms=0)
+
+    operation, calls = _flaky(2)
+    assert retry_on_busy(operation) == 3
+
+    operation, calls = _flaky(3)
+    with pytest.raises(sqlite3.OperationalError):
+        retry_on_busy(operation)
+    assert len(calls) == 3
+
+    # Outros erros não são repetidos
+    operation, calls = _flaky(1, sqlite3.OperationalError("no such table: x"))
+    with pytest.raises(sqlite3.OperationalError):
+        retry_on_busy(operation)
+    assert len(calls) == 1
+
+    with pytest.raises(ValueError):
+        set_busy_policy(retry_forever=True)
+
+
+def test_transaction_waits_for_another_process_lock(items, db):
+    other = sqlite3.connect(db, isolation_level=None, check_same_thread=False)
+    try:
+        other.execute("BEGIN IMMEDIATE")
+        set_busy_policy(retry_attempts=1)
+        with pytest.raises(sqlite3.OperationalError) as error:
+            with transaction():
+                pass
+        assert is_busy_error(error.value)
+
+        # O lock é liberado durante as retentativas: a escrita passa
+        set_busy_policy(retry_attempts=10, retry_base_delay_ms=50)
+        threading.Timer(0.3, other.execute, ("COMMIT",)).start()
+        with transaction():
+            execute_update("INSERT INTO itens (nome) VALUES ('a')")
+    finally:
+        other.close()
+
+    assert _names() == ["a"]
@@ -0,0 +1,50 @@
+"""Métricas de consultas (cortex/storage/instrumentation.py)."""
+import json
+import os
+import threading
+import time
+
+from cortex.storage.instrumentation import Instrumentation
+
+
+def test_record_does_not_write_the_summary(tmp_path):
+    path = str(tmp_path / "query_stats.json")
+    instrumentation = Instrumentation()
+    instrumentation._stats_path = path  # gravação configurada, sem a thread
+
+    instrumentation.record("SELECT 1", 1.0)
+
+    assert not os.path.exists(path)
+
+
+def test_summary_is_written_in_background(tmp_path):
+    path = str(tmp_path / "query_stats.json")
+    instrumentation = Instrumentation()
+    instrumentation.record("SELECT * FROM tasks WHERE id = 1", 2.0)
+
+    instrumentation.persist_to(path, interval=0.05)
+    try:
+        deadline = time.monotonic() + 5
+        while not os.path.exists(path) and time.monotonic() < deadline:
+            time.sleep(0.01)
+        with open(path) as f:
+            assert "SELECT * FROM tasks WHERE id = ?" in json.load(f)["statements"]
+    finally:
+        instrumentation.stop_persisting()
+
+
+def test_concurrent_saves_do_not_collide(tmp_path):
+    path = str(tmp_path / "query_stats.json")
+    instrumentation = Instrumentation()
+    instrumentation._stats_path = path
+    instrumentation.record("SELECT 1", 1.0)
+
+    threads = [threading.Thread(target=instrumentation.save) for _ in range(8)]
+    for thread in threads:
+        thread.start()
+    for thread in threads:
+        thread.join()
+
+    with open(path) as f:
+        json.load(f)
+    assert os.listdir(tmp_path) == ["query_stats.json"]
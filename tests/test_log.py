@@ -0,0 +1,91 @@
+"""Logs estruturados, redação e amostragem (cortex/core/log.py)."""
+import json
+import logging
+import queue
+
+import pytest
+
+from cortex.core import log
+from cortex.core.log import REDACTED, SamplingFilter, redact, request_context
+
+
+@pytest.fixture
+def log_file(tmp_path, monkeypatch):
+    """Pipeline de logs configurado em HOME temporário; devolve o arquivo."""
+    monkeypatch.setenv("HOME", str(tmp_path))
+    root = logging.getLogger()
+    level = root.level
+    log.configure_logging(config={"file": "teste.log", "sample_rates": {}})
+    yield tmp_path / ".cortex" / "logs" / "teste.log"
+    log.stop_logging()
+    root.setLevel(level)
+
+
+def _record(name, level=logging.INFO, msg="m", args=None):
+    return logging.LogRecord(name, level, __file__, 1, msg, args, None)
+
+
+def test_redact_removes_credentials():
+    value = {
+        "api_key": "k1",
+        "jira_api_key": "k2",
+        "token_count": 12,
+        "headers": [{"Authorization": "Bearer abc.def"}],
+        "url": "https://x?access_token=segredo&page=2",
+        "note": 'password: "hunter2", user: ana',
+    }
+
+    cleaned = redact(value)
+
+    assert cleaned["api_key"] == cleaned["jira_api_key"] == REDACTED
+    assert cleaned["token_count"] == 12
+    assert cleaned["headers"] == [{"Authorization": REDACTED}]
+    assert cleaned["url"] == f"https://x?access_token={REDACTED}&page=2"
+    assert cleaned["note"] == f'password: "{REDACTED}", user: ana'
+    assert redact("chamada com Bearer abc.def") == f"chamada com Bearer {REDACTED}"
+    assert "abc" not in redact("Authorization: Bearer abc.def")
+
+
+def test_sampling_keeps_a_fraction_below_warning():
+    sampling = SamplingFilter({"cortex.calls": 0.25, "cortex.off": 0, "cortex.all": 1})
+
+    kept = [sampling.filter(_record("cortex.calls.search")) for _ in range(8)]
+
+    assert kept.count(True) == 2
+    assert sampling.filter(_record("cortex.calls.search", logging.WARNING))
+    assert sampling.filter(_record("cortex.other"))
+    assert sampling.filter(_record("cortex.all"))
+    assert not sampling.filter(_record("cortex.off"))
+    assert sampling.dropped == 7
+
+
+def test_full_queue_drops_instead_of_blocking():
+    handler = log._NonBlockingQueueHandler(queue.Queue(maxsize=1))
+    args = ["antes"]
+
+    handler.handle(_record("cortex.x", msg="valor=%s", args=(args,)))
+    handler.handle(_record("cortex.x"))
+    args[0] = "depois"
+
+    assert handler.dropped == 1
+    # A mensagem é fixada ao enfileirar, antes de os argumentos mudarem
+    assert handler.queue.get_nowait().msg == "valor=['antes']"
+
+
+def test_records_are_written_as_redacted_json(log_file):
+    logger = logging.getLogger("cortex.mcp.calls.search")
+    with request_context(7, "search"):
+        logger.info("consulta token=%s", "abc123", extra={"api_key": "k", "n": 1})
+    logger.debug("abaixo do nível configurado")
+    log.stop_logging()
+
+    entries = [json.loads(line) for line in log_file.read_text().splitlines()]
+
+    assert len(entries) == 1
+    entry = entries[0]
+    assert entry["logger"] == "cortex.mcp.calls.search"
+    assert entry["level"] == "INFO"
+    assert entry["message"] == f"consulta token={REDACTED}"
+    assert (entry["request_id"], entry["tool"]) == (7, "search")
+    assert (entry["api_key"], entry["n"]) == (REDACTED, 1)
+    assert log.logging_stats() is None
@@ -0,0 +1,54 @@
+"""Manutenção em períodos ociosos (cortex/storage/maintenance.py)."""
+from cortex.storage.database import execute_update
+from cortex.storage.maintenance import MaintenanceDeferred, MaintenanceScheduler
+
+
+def _scheduler(**config):
+    return MaintenanceScheduler({"idle_seconds": 0, "pause_ms": 0, **config})
+
+
+def test_deferred_routine_does_not_block_the_next(db):
+    scheduler = _scheduler()
+    calls = []
+
+    def slow(conn):
+        calls.append("slow")
+        raise MaintenanceDeferred("teto")
+        yield  # pragma: no cover
+
+    def quick(conn):
+        calls.append("quick")
+        yield "ok"
+
+    scheduler._tasks = [("slow", 3600, slow), ("quick", 3600, quick)]
+
+    assert scheduler.run_pending() == ["quick"]
+    # Adiada: não roda de novo a cada verificação
+    assert scheduler.run_pending() == []
+    assert calls == ["slow", "quick"]
+    assert scheduler.stats()["slow"]["deferred"] == 1
+
+
+def test_analyze_resumes_after_deadline(db):
+    for table in ("tarefas_a", "tarefas_b"):
+        execute_update(f"CREATE TABLE {table} (id INTEGER PRIMARY KEY, v TEXT)")
+    scheduler = _scheduler()
+    scheduler._tasks = [("analyze", 3600, scheduler._analyze_slices)]
+    analyzed = []
+    execute_slice = scheduler._execute_slice
+
+    def fake_slice(conn, sql, script=False):
+        if sql.startswith("ANALYZE"):
+            analyzed.append(sql)
+            if len(analyzed) == 2:
+                raise MaintenanceDeferred("teto")
+        return execute_slice(conn, sql, script)
+
+    scheduler._execute_slice = fake_slice
+    assert scheduler.run_pending() == []
+    scheduler._retry_at.clear()
+    assert scheduler.run_pending() == ["analyze"]
+
+    # Nenhuma tabela é analisada duas vezes na mesma rodada
+    assert len(analyzed) == len(set(analyzed))
+    assert scheduler._progress == {}
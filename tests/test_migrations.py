@@ -0,0 +1,73 @@
+"""Migrações de esquema (cortex/storage/migrations.py)."""
+import sqlite3
+
+import pytest
+
+from cortex.mcp import server
+from cortex.storage import database
+from cortex.storage.migrations import LATEST_VERSION, get_schema_version, migrate
+
+
+@pytest.fixture
+def old_db(db, monkeypatch, tmp_path):
+    """Banco parado na versão 1, como os criados antes das migrações novas."""
+    path = str(tmp_path / "antigo.db")
+    conn = sqlite3.connect(path, isolation_level=None)
+    assert migrate(target=1, conn=conn) == 1
+    conn.close()
+    database.close_pool()
+    monkeypatch.setattr(database, "CORTEX_DB_PATH", path)
+    return path
+
+
+def _version(path):
+    conn = sqlite3.connect(path)
+    try:
+        return get_schema_version(conn)
+    finally:
+        conn.close()
+
+
+def test_migrate_is_incremental_and_idempotent(tmp_path):
+    conn = sqlite3.connect(str(tmp_path / "novo.db"), isolation_level=None)
+    try:
+        assert migrate(target=1, conn=conn) == 1
+        assert migrate(conn=conn) == LATEST_VERSION
+        assert migrate(conn=conn) == LATEST_VERSION
+        tables = {
+            row[0]
+            for row in conn.execute(
+                "SELECT name FROM sqlite_master WHERE type = 'table'"
+            )
+        }
+        assert {"task_closure", "task_graph_versions"} <= tables
+    finally:
+        conn.close()
+
+
+def test_start_server_migrates_before_serving(old_db, monkeypatch):
+    seen = []
+    monkeypatch.setattr(server, "configure_logging", lambda debug=False: None)
+    monkeypatch.setattr(server, "stop_logging", lambda: None)
+    monkeypatch.setattr(server, "start_maintenance", lambda: None)
+    monkeypatch.setattr(server, "stop_maintenance", lambda: None)
+    monkeypatch.setattr(
+        server, "mcp_server_loop", lambda: seen.append(_version(old_db))
+    )
+
+    server.start_server()
+
+    assert seen == [LATEST_VERSION]
+    assert _version(old_db) == LATEST_VERSION
+
+
+def test_cli_migrates_before_db_commands(old_db):
+    pytest.importorskip("rich")
+    from click.testing import CliRunner
+
+    from cortex.cli.main import cli
+
+    result = CliRunner().invoke(cli, ["list-projects"])
+
+    assert result.exit_code == 0, result.output
+    assert _version(old_db) == LATEST_VERSION
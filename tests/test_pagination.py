@@ -0,0 +1,78 @@
+"""Paginação por cursor de list_tasks (cortex/mcp/tools/task_tools.py)."""
+import pytest
+
+from cortex.mcp.tools.task_tools import MAX_LIST_LIMIT, list_tasks
+from cortex.storage.database import bulk_insert, execute_query, execute_update
+
+
+@pytest.fixture
+def tasks(db):
+    execute_update("INSERT INTO projects(name, workspace_path) VALUES ('p', '/tmp/p')")
+    # order_index com empates: a ordem de desempate é o id
+    bulk_insert(
+        "tasks",
+        ["project_id", "title", "level", "status", "order_index"],
+        [
+            (1, f"t{i}", "task", "completed" if i % 3 == 0 else "not_started", i // 4)
+            for i in range(25)
+        ],
+    )
+    return execute_query("SELECT id, status FROM tasks ORDER BY order_index, id")
+
+
+def _all_pages(limit, **filters):
+    ids, cursor, pages = [], None, 0
+    while True:
+        page = list_tasks(limit=limit, cursor=cursor, **filters)
+        assert "error" not in page, page
+        ids.extend(t["task_id"] for t in page["tasks"])
+        pages += 1
+        cursor = page["next_cursor"]
+        if cursor is None:
+            return ids, pages, page["total_count"]
+
+
+@pytest.mark.parametrize("limit", [1, 4, 7, 25, 100])
+def test_pages_cover_every_task_once_in_order(tasks, limit):
+    ids, pages, total = _all_pages(limit, project_id=1)
+
+    assert ids == [t["id"] for t in tasks]
+    assert total == 25
+    assert pages == max(1, -(-25 // limit))
+
+
+def test_cursor_keeps_filters(tasks):
+    ids, _, total = _all_pages(3, project_id=1, status="completed")
+
+    assert ids == [t["id"] for t in tasks if t["status"] == "completed"]
+    assert total == len(ids)
+
+
+def test_cursor_rejects_other_filters_and_garbage(tasks):
+    cursor = list_tasks(project_id=1, limit=5)["next_cursor"]
+
+    assert "error" in list_tasks(
+        project_id=1, status="completed", limit=5, cursor=cursor
+    )
+    assert "error" in list_tasks(project_id=1, limit=5, cursor="não é um cursor")
+
+
+def test_insert_between_pages_does_not_repeat_rows(tasks):
+    first = list_tasks(project_id=1, limit=10)
+    # Nova tarefa antes do cursor: não aparece nem desloca a próxima página
+    execute_update(
+        "INSERT INTO tasks(project_id, title, level, status, order_index) "
+        "VALUES (1, 'nova', 'task', 'not_started', 0)"
+    )
+    second = list_tasks(project_id=1, limit=10, cursor=first["next_cursor"])
+
+    seen = [t["task_id"] for t in first["tasks"]]
+    assert [t["task_id"] for t in second["tasks"]] == [t["id"] for t in tasks][10:20]
+    assert not set(seen) & {t["task_id"] for t in second["tasks"]}
+
+
+@pytest.mark.parametrize("limit", [0, -1, MAX_LIST_LIMIT + 1, "10", 2.5, True])
+def test_invalid_limit_is_rejected(tasks, limit):
+    page = list_tasks(project_id=1, limit=limit)
+
+    assert "limit must be an integer" in page["error"]
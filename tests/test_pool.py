@@ -0,0 +1,81 @@
+"""Pool de conexões por thread (cortex/storage/pool.py)."""
+import sqlite3
+import threading
+
+import pytest
+
+from cortex.storage.pool import ConnectionPool
+
+
+def _factory(path):
+    return sqlite3.connect(path, check_same_thread=False)
+
+
+@pytest.fixture
+def pool(tmp_path):
+    pool = ConnectionPool(str(tmp_path / "pool.db"), _factory)
+    yield pool
+    pool.shutdown()
+
+
+def _borrow(pool):
+    with pool.connection() as conn:
+        return conn
+
+
+def _borrow_in_thread(pool, name):
+    thread = threading.Thread(target=_borrow, args=(pool,), name=name)
+    thread.start()
+    thread.join()
+
+
+def test_connection_is_reused_per_thread(pool):
+    with pool.connection() as outer:
+        with pool.connection() as inner:
+            assert inner is outer
+    assert _borrow(pool) is outer
+
+    others = []
+    thread = threading.Thread(target=lambda: others.append(_borrow(pool)))
+    thread.start()
+    thread.join()
+
+    assert others[0] is not outer
+    assert pool.stats()["created"] == 2
+
+
+def test_close_all_and_dead_threads(pool):
+    first = _borrow(pool)
+    pool.close_all()
+    # Conexões de antes do fechamento não voltam a ser emprestadas
+    assert _borrow(pool) is not first
+    assert pool.stats()["open_connections"] == 1
+
+    _borrow_in_thread(pool, "encerrada")
+    assert "encerrada" in pool.stats()["threads"]
+    # A conexão da thread que terminou é fechada na próxima abertura
+    _borrow_in_thread(pool, "seguinte")
+    assert "encerrada" not in pool.stats()["threads"]
+    assert pool.stats()["open_connections"] == 2
+
+
+def test_idle_broken_connection_is_replaced(tmp_path):
+    pool = ConnectionPool(str(tmp_path / "pool.db"), _factory, health_check_interval=0)
+    try:
+        broken = _borrow(pool)
+        broken.close()
+
+        with pool.connection() as conn:
+            assert conn is not broken
+            assert conn.execute("SELECT 1").fetchone() == (1,)
+        assert pool.stats()["reconnects"] == 1
+    finally:
+        pool.shutdown()
+
+
+def test_shutdown_rejects_new_loans(pool):
+    _borrow(pool)
+    pool.shutdown()
+
+    with pytest.raises(sqlite3.ProgrammingError):
+        _borrow(pool)
@@ -0,0 +1,65 @@
+"""Registro declarativo e carga sob demanda das ferramentas (cortex/mcp/registry.py)."""
+import os
+import subprocess
+import sys
+
+import pytest
+
+from cortex.mcp.registry import TOOL_SPECS, ToolRegistry
+
+ROOT = os.path.dirname(os.path.dirname(os.path.abspath(__file__)))
+
+
+def test_metadata_does_not_load_tools():
+    registry = ToolRegistry(TOOL_SPECS)
+
+    assert "get_context" in registry
+    assert "desconhecida" not in registry
+    assert list(registry) == [spec.name for spec in TOOL_SPECS]
+    assert "get_context" in registry.read_only_tools()
+    assert "create_task" not in registry.read_only_tools()
+    assert "scan_markers" in registry.heavy_tools()
+    described = {tool["name"]: tool for tool in registry.describe()}
+    assert described["scan_markers"]["priority"] == "background"
+    assert described["search"]["read_only"] is True
+
+    assert not any(registry.is_loaded(name) for name in registry)
+
+
+def test_tools_are_loaded_on_first_lookup():
+    registry = ToolRegistry(TOOL_SPECS)
+
+    func = registry["create_task"]
+
+    assert func.__module__ == "cortex.mcp.tools.task_tools"
+    assert registry.is_loaded("create_task")
+    assert not registry.is_loaded("get_context")
+    assert registry["create_task"] is func
+    with pytest.raises(KeyError):
+        registry["desconhecida"]
+
+
+def test_every_spec_resolves_to_a_function():
+    registry = ToolRegistry(TOOL_SPECS)
+
+    for name in registry:
+        assert callable(registry[name]), name
+
+
+def test_server_import_does_not_import_tool_modules(tmp_path):
+    code = (
+        "import sys\n"
+        "import cortex.mcp.server\n"
+        "print(sorted(m for m in sys.modules if m.startswith('cortex.mcp.tools.')"
+        " or m in ('asyncio', 'cortex.mcp.transport')))\n"
+    )
+    result = subprocess.run(
+        [sys.executable, "-c", code],
+        cwd=ROOT,
+        env={**os.environ, "HOME": str(tmp_path)},
+        capture_output=True,
+        text=True,
+        check=True,
+    )
+
+    assert result.stdout.strip() == "[]"
@@ -0,0 +1,76 @@
+"""Busca de texto completo (cortex/mcp/tools/search_tools.py)."""
+from cortex.core.session import create_session
+from cortex.core.task import create_task
+from cortex.mcp.server import handle_mcp_request
+from cortex.storage import archive
+from cortex.storage import search as search_module
+from cortex.storage.database import execute_update
+from cortex.storage.search import search
+
+
+def test_search_sees_queued_messages(db):
+    handle_mcp_request({"name": "start_session", "parameters": {"title": "s"}})
+    recorded = handle_mcp_request(
+        {
+            "name": "record_message",
+            "parameters": {"role": "user", "content": "migração do esquema"},
+        }
+    )
+    assert recorded.get("queued")
+
+    result = handle_mcp_request({"name": "search", "parameters": {"query": "esquema"}})
+
+    assert [r["scope"] for r in result["results"]] == ["messages"]
+    assert isinstance(result["results"][0]["score"], float)
+
+
+def _seed_scopes():
+    execute_update("INSERT INTO projects(name, workspace_path) VALUES ('p', '/tmp/p')")
+    session_id = create_session("s", project_id=1)["id"]
+    for title in ("deploy do servidor", "deploy da api", "deploy noturno"):
+        create_task(title, 1)
+    for content in ("falhou o deploy", "deploy ok depois do ajuste", "sem relação"):
+        execute_update(
+            "INSERT INTO messages (session_id, role, content, timestamp) "
+            "VALUES (?, 'user', ?, '2026-01-01 00:00:00')",
+            (session_id, content),
+        )
+    return session_id
+
+
+def test_scopes_are_ranked_separately_and_interleaved(db):
+    _seed_scopes()
+
+    results = search("deploy", limit=2)
+
+    # Os pesos de tasks_fts dariam às tarefas todo o topo se os BM25 fossem comparados
+    assert sorted(r["scope"] for r in results) == ["messages", "tasks"]
+    assert [r["relevance"] for r in results] == [1.0, 1.0]
+    every = search("deploy", limit=10)
+    assert len(every) == 5
+    assert all(0 < r["relevance"] <= 1.0 for r in every)
+    assert [r["relevance"] for r in every] == sorted(
+        (r["relevance"] for r in every), reverse=True
+    )
+
+
+def test_archived_messages_resolve_projects_in_batch(db, tmp_path, monkeypatch):
+    monkeypatch.setattr(archive, "ARCHIVE_DIR", str(tmp_path / "archive"))
+    session_id = _seed_scopes()
+    archive.archive_session(session_id, "2026_01")
+    queries = []
+    execute = search_module.execute_query
+
+    def counting(query, params=()):
+        queries.append(query)
+        return execute(query, params)
+
+    monkeypatch.setattr(search_module, "execute_query", counting)
+
+    results = search("deploy", scopes=["messages"], project_id=1)
+
+    assert [r.get("archived") for r in results] == [True, True]
+    assert {r["project_id"] for r in results} == {1}
+    assert results[0]["relevance"] == 1.0
+    assert len(queries) == 1
+    assert search("deploy", scopes=["messages"], project_id=2) == []
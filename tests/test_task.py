@@ -0,0 +1,168 @@
+"""Hierarquia de tarefas (cortex/core/task.py)."""
+import sqlite3
+
+import pytest
+
+from cortex.core import task
+from cortex.core.task import create_task
+from cortex.storage.database import execute_query, execute_update
+
+
+@pytest.fixture
+def tree(db):
+    """Fase ``a`` com etapa ``b`` e tarefa ``c``; fase ``d`` sem filhos."""
+    execute_update("INSERT INTO projects(name, workspace_path) VALUES ('p', '/tmp/p')")
+    a = create_task("a", 1, level="phase")["id"]
+    b = create_task("b", 1, level="stage", parent_id=a)["id"]
+    c = create_task("c", 1, parent_id=b)["id"]
+    d = create_task("d", 1, level="phase")["id"]
+    return a, b, c, d
+
+
+def _ids(tasks):
+    return [t["id"] for t in tasks]
+
+
+def _closure():
+    rows = execute_query("SELECT * FROM task_closure")
+    return {(r["ancestor_id"], r["descendant_id"], r["depth"]) for r in rows}
+
+
+def _closure_from_parents():
+    """Fechamento recalculado por CTE recursiva, para comparar com os triggers."""
+    rows = execute_query(
+        """
+        WITH RECURSIVE closure(ancestor_id, descendant_id, depth) AS (
+            SELECT id, id, 0 FROM tasks
+            UNION ALL
+            SELECT c.ancestor_id, t.id, c.depth + 1
+            FROM closure c JOIN tasks t ON t.parent_id = c.descendant_id
+        )
+        SELECT * FROM closure
+        """
+    )
+    return {(r["ancestor_id"], r["descendant_id"], r["depth"]) for r in rows}
+
+
+def test_hierarchy_queries(tree):
+    a, b, c, d = tree
+
+    assert _ids(task.get_subtree(a)) == [b, c]
+    assert _ids(task.get_subtree(a, max_depth=1, include_self=True)) == [a, b]
+    assert _ids(task.get_ancestors(c)) == [b, a]
+    assert task.get_ancestor_ids(c) == [b, a]
+    assert task.count_descendants(a) == 2
+    assert task.count_descendants(a, status="completed") == 0
+    assert task.is_descendant(c, a)
+    assert not task.is_descendant(a, c)
+    assert not task.is_descendant(c, d)
+
+
+def test_reparent_moves_the_subtree(tree):
+    a, b, c, d = tree
+
+    execute_update("UPDATE tasks SET parent_id = ? WHERE id = ?", (d, b))
+
+    assert task.get_ancestor_ids(c) == [b, d]
+    assert task.get_subtree(a) == []
+    assert _ids(task.get_subtree(d)) == [b, c]
+    assert _closure() == _closure_from_parents()
+
+    # Tarefa promovida a raiz
+    execute_update("UPDATE tasks SET parent_id = NULL WHERE id = ?", (b,))
+    assert task.get_ancestor_ids(c) == [b]
+    assert _closure() == _closure_from_parents()
+
+
+def test_cycles_are_rejected(tree):
+    a, b, c, _ = tree
+    before = _closure()
+
+    with pytest.raises(sqlite3.IntegrityError, match="cycle"):
+        execute_update("UPDATE tasks SET parent_id = ? WHERE id = ?", (c, a))
+
+    assert _closure() == before
+    assert execute_query("SELECT parent_id FROM tasks WHERE id = ?", (a,)) == [
+        {"parent_id": None}
+    ]
+
+
+def test_deleted_task_leaves_the_closure(tree):
+    a, b, c, _ = tree
+
+    execute_update("DELETE FROM tasks WHERE id = ?", (c,))
+
+    assert task.count_descendants(a) == 1
+    assert not any(c in row[:2] for row in _closure())
+
+
+def _progress(task_id):
+    row = task.get_task(task_id)
+    return row["status"], row["progress"]
+
+
+def test_progress_is_weighted_by_estimated_hours(db):
+    execute_update("INSERT INTO projects(name, workspace_path) VALUES ('p', '/tmp/p')")
+    phase = create_task("fase", 1, level="phase")["id"]
+    stage = create_task("etapa", 1, level="stage", parent_id=phase)["id"]
+    big = create_task("grande", 1, parent_id=stage, estimated_hours=3)["id"]
+    small = create_task("pequena", 1, parent_id=stage)["id"]
+
+    result = task.update_task_statuses(
+        [{"task_id": big, "status": "completed", "actual_hours": 4}]
+    )
+
+    # Peso 3 para a concluída e 1 (padrão) para a outra: 300 / 4
+    assert _progress(stage) == ("in_progress", 75)
+    assert _progress(phase) == ("in_progress", 75)
+    assert [a["task_id"] for a in result["ancestors_updated"]] == [stage, phase]
+    rollup = task.get_task_rollup(phase)
+    assert (rollup["estimated_hours"], rollup["actual_hours"]) == (3, 4)
+
+    task.update_task_statuses([{"task_id": small, "status": "completed"}])
+    assert _progress(stage) == ("completed", 100)
+    assert _progress(phase) == ("completed", 100)
+
+    # Um filho novo reabre os ancestrais
+    create_task("nova", 1, parent_id=stage)
+    assert _progress(stage) == ("in_progress", 80)
+
+
+def test_batch_recalculates_shared_ancestors_once(db):
+    execute_update("INSERT INTO projects(name, workspace_path) VALUES ('p', '/tmp/p')")
+    parent = create_task("pai", 1, level="stage")["id"]
+    children = [create_task(f"f{i}", 1, parent_id=parent)["id"] for i in range(4)]
+
+    result = task.update_task_statuses(
+        [
+            {"task_id": child, "status": "in_progress", "progress": 50}
+            for child in children
+        ]
+    )
+
+    assert result["ancestors_updated"] == [
+        {"task_id": parent, "status": "in_progress", "progress": 50}
+    ]
+    with pytest.raises(ValueError):
+        task.update_task_statuses(
+            [
+                {"task_id": children[0], "status": "completed"},
+                {"task_id": children[1], "status": "desconhecido"},
+            ]
+        )
+    # O lote inválido é revertido por inteiro
+    assert _progress(children[0]) == ("in_progress", 50)
+
+
+def test_rollups_follow_moved_subtrees(tree):
+    a, b, c, d = tree
+    execute_update(
+        "UPDATE tasks SET estimated_hours = 5, actual_hours = 2 WHERE id = ?", (c,)
+    )
+    assert task.get_task_rollup(a)["estimated_hours"] == 5
+
+    execute_update("UPDATE tasks SET parent_id = ? WHERE id = ?", (d, b))
+
+    hours = ("child_count", "estimated_hours", "actual_hours")
+    assert [task.get_task_rollup(a)[k] for k in hours] == [0, 0, 0]
+    assert [task.get_task_rollup(d)[k] for k in hours] == [1, 5, 2]
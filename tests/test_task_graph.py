@@ -0,0 +1,99 @@
+"""Grafo de dependências em memória (cortex/core/task_graph.py)."""
+import sqlite3
+
+import pytest
+
+from cortex.core import task_graph
+from cortex.core.task import create_task
+from cortex.core.task_graph import add_relation, get_graph, remove_relation
+from cortex.storage import database
+from cortex.storage.database import execute_update, transaction
+
+
+@pytest.fixture
+def tasks(db):
+    execute_update("INSERT INTO projects(name, workspace_path) VALUES ('p', '/tmp/p')")
+    return [create_task(title, 1)["id"] for title in ("a", "b", "c")]
+
+
+def test_own_relation_updates_cached_graph(tasks):
+    a, b, _ = tasks
+    graph = get_graph(1)
+
+    relation = add_relation(a, b, "blocks")
+    assert get_graph(1) is graph
+    assert b in graph.successors[a]
+
+    remove_relation(relation["relation_id"])
+    assert get_graph(1) is graph
+    assert not graph.successors[a]
+
+
+def test_other_process_writes_reload_graph(tasks, db):
+    a, b, c = tasks
+    assert not get_graph(1).predecessors[c]
+
+    other = sqlite3.connect(db, isolation_level=None)
+    other.execute(
+        "INSERT INTO task_relations (source_task_id, target_task_id, relation_type) "
+        "VALUES (?, ?, 'blocks')",
+        (a, c),
+    )
+    other.execute("UPDATE tasks SET status = 'completed' WHERE id = ?", (a,))
+    other.close()
+
+    graph = get_graph(1)
+    assert a in graph.predecessors[c]
+    assert graph.status[a] == "completed"
+
+
+def test_rolled_back_relation_leaves_graph_untouched(tasks):
+    a, b, _ = tasks
+    graph = get_graph(1)
+
+    with pytest.raises(RuntimeError):
+        with transaction():
+            with transaction():
+                add_relation(a, b, "blocks")
+            raise RuntimeError("falha depois do savepoint")
+
+    assert get_graph(1) is graph
+    assert not graph.successors[a]
+    assert not task_graph.get_blockers(b)
+
+
+def test_relation_in_rolled_back_savepoint_is_discarded(tasks):
+    a, b, c = tasks
+
+    with transaction():
+        add_relation(a, b, "blocks")
+        with pytest.raises(RuntimeError):
+            with transaction():
+                add_relation(b, c, "blocks")
+                raise RuntimeError("savepoint revertido")
+
+    graph = get_graph(1)
+    assert b in graph.successors[a]
+    assert not graph.successors[b]
+
+
+def test_cycle_check_sees_relation_committed_before_begin(tasks, db, monkeypatch):
+    a, b, _ = tasks
+    get_graph(1)
+
+    def other_process():
+        # Outro processo grava a relação inversa logo antes do BEGIN
+        monkeypatch.setattr(database, "_before_transaction_hooks", [])
+        other = sqlite3.connect(db, isolation_level=None)
+        other.execute(
+            "INSERT INTO task_relations "
+            "(source_task_id, target_task_id, relation_type) VALUES (?, ?, 'blocks')",
+            (b, a),
+        )
+        other.close()
+
+    monkeypatch.setattr(database, "_before_transaction_hooks", [other_process])
+
+    with pytest.raises(task_graph.DependencyCycleError):
+        add_relation(a, b, "blocks")
+    assert not get_graph(1).successors[a]
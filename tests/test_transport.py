@@ -0,0 +1,191 @@
+"""Transporte stdio assíncrono (cortex/mcp/transport.py)."""
+import asyncio
+import io
+import json
+import threading
+import time
+
+from cortex.mcp.jobs import check_cancelled
+from cortex.mcp.registry import TOOL_SPECS, ToolRegistry
+from cortex.mcp.transport import StdioTransport
+
+_SPECS = ToolRegistry(TOOL_SPECS).specs
+
+
+class _Transport(StdioTransport):
+    """Transporte que lê as requisições de uma lista e grava as respostas em memória."""
+
+    def __init__(self, requests, handler, config=None):
+        super().__init__(handler, _SPECS.get, config)
+        self._requests = requests
+        self._stdout = io.StringIO()
+
+    async def _lines(self):
+        for request in self._requests:
+            if callable(request):
+                # Pausa entre as linhas (o servidor continua despachando)
+                await request()
+                continue
+            yield (json.dumps(request) + "\n").encode()
+
+    def responses(self):
+        return [json.loads(line) for line in self._stdout.getvalue().splitlines()]
+
+
+def _serve(requests, handler, config=None):
+    transport = _Transport(requests, handler, config)
+    asyncio.run(transport.serve())
+    return transport.responses()
+
+
+def _pause(seconds):
+    async def pause():
+        await asyncio.sleep(seconds)
+
+    return pause
+
+
+def _slow_scan(seconds, calls):
+    def handler(request):
+        calls.append(request["name"])
+        if request["name"] == "scan_markers":
+            deadline = time.monotonic() + seconds
+            while time.monotonic() < deadline:
+                check_cancelled()
+                time.sleep(0.01)
+        return {"tool": request["name"]}
+
+    return handler
+
+
+def test_interactive_call_not_delayed_by_unrelated_heavy_write():
+    calls = []
+    responses = _serve(
+        [
+            {"id": 1, "name": "scan_markers", "parameters": {}},
+            {"id": 2, "name": "get_context", "parameters": {}},
+            {"id": 3, "name": "record_message", "parameters": {}},
+        ],
+        _slow_scan(0.5, calls),
+    )
+
+    assert [r["id"] for r in responses] == [2, 3, 1]
+    for response in responses[:2]:
+        assert response["timing"]["wait_ms"] < 100
+        assert response["timing"]["queue_ms"] < 100
+
+
+def test_conflicting_requests_keep_arrival_order():
+    log = []
+
+    def handler(request):
+        if request["name"] == "record_message":
+            time.sleep(0.2)
+        log.append(request["name"])
+        return {}
+
+    responses = _serve(
+        [
+            {"id": 1, "name": "record_message", "parameters": {}},
+            {"id": 2, "name": "get_context", "parameters": {}},
+            # Desconhecida: ordenada contra todas
+            {"id": 3, "name": "create_task", "parameters": {}},
+        ],
+        handler,
+    )
+
+    assert log == ["record_message", "get_context", "create_task"]
+    get_context = next(r for r in responses if r["id"] == 2)
+    # A espera pela escrita aparece como dependência, não como fila
+    assert get_context["timing"]["wait_ms"] >= 150
+    assert get_context["timing"]["queue_ms"] < 100
+
+
+def test_cancel_request_waiting_for_dependencies():
+    calls = []
+    responses = _serve(
+        [
+            {"id": 1, "name": "scan_markers", "parameters": {}},
+            {"id": 2, "name": "create_task", "parameters": {}},
+            _pause(0.05),
+            {"cancel": 2},
+            {"cancel": None},
+        ],
+        _slow_scan(0.3, calls),
+    )
+
+    assert calls == ["scan_markers"]
+    assert {"cancel": 2, "cancelled": True} in responses
+    assert {"cancel": None, "error": "cancel requires the id of a request"} in responses
+    cancelled = next(r for r in responses if r.get("id") == 2)
+    assert "cancelled" in cancelled["result"]["error"]
+
+
+def test_cancel_running_heavy_request():
+    calls = []
+    responses = _serve(
+        [
+            {"id": 1, "name": "scan_markers", "parameters": {}},
+            _pause(0.1),
+            {"cancel": 1},
+        ],
+        _slow_scan(5, calls),
+    )
+
+    assert {"cancel": 1, "cancelled": True} in responses
+    result = next(r for r in responses if r.get("id") == 1)["result"]
+    assert "cancelled" in result["error"]
+
+
+def test_eof_waits_for_pending_requests():
+    finished = threading.Event()
+
+    def handler(request):
+        time.sleep(0.2)
+        finished.set()
+        return {"ok": True}
+
+    responses = _serve([{"id": 1, "name": "get_context", "parameters": {}}], handler)
+
+    assert finished.is_set()
+    assert responses == [
+        {"id": 1, "result": {"ok": True}, "timing": responses[0]["timing"]}
+    ]
+
+
+def test_requests_without_id_are_answered_in_arrival_order():
+    calls = []
+    responses = _serve(
+        [
+            {"name": "scan_markers", "parameters": {}},
+            {"name": "get_context", "parameters": {}},
+        ],
+        _slow_scan(0.3, calls),
+    )
+
+    assert responses == [{"tool": "scan_markers"}, {"tool": "get_context"}]
+
+
+def test_ordered_responses_option():
+    calls = []
+    responses = _serve(
+        [
+            {"id": 1, "name": "scan_markers", "parameters": {}},
+            {"id": 2, "name": "get_context", "parameters": {}},
+        ],
+        _slow_scan(0.3, calls),
+        {"ordered_responses": True},
+    )
+
+    assert [r["id"] for r in responses] == [1, 2]
+
+
+def test_non_object_request_gets_an_error():
+    transport = _Transport([], lambda request: {})
+
+    async def run():
+        transport._dispatch("não é um objeto")
+        await asyncio.wait(set(transport._inflight))
+
+    asyncio.run(run())
+    assert transport.responses() == [{"error": "Invalid request"}]
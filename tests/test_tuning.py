@@ -0,0 +1,47 @@
+"""Medição dos perfis de desempenho (cortex/storage/tuning.py)."""
+from cortex.core import config
+from cortex.core.config import DEFAULT_PERFORMANCE_PROFILE
+from cortex.storage import database, tuning
+from cortex.storage.tuning import benchmark_profile, recommend_profile
+
+
+def test_default_profile_is_durable():
+    assert DEFAULT_PERFORMANCE_PROFILE == "safe"
+
+
+def test_benchmark_leaves_process_database_alone(db, tmp_path):
+    profile = database.get_storage_profile()
+    with database.pooled_connection() as conn:
+        pool = database._pool
+
+        result = benchmark_profile("throughput", operations=50, directory=str(tmp_path))
+
+        assert result["operations"] == 50
+        assert database.get_db_path() == db
+        assert database.get_storage_profile() == profile
+        assert database._pool is pool
+        assert conn.execute("SELECT COUNT(*) FROM projects").fetchone()[0] == 0
+
+
+def _result(profile, score_ms):
+    return {"profile": profile, "score_ms": score_ms}
+
+
+def test_no_profile_disables_synchronous_writes():
+    assert all(
+        str(pragmas["synchronous"]).upper() != "OFF"
+        for pragmas in config.PERFORMANCE_PROFILES.values()
+    )
+
+
+def test_recommendation_never_picks_synchronous_off(monkeypatch):
+    results = [
+        _result("safe", 1.0),
+        _result("balanced", 0.95),
+        _result("throughput", 0.5),
+    ]
+    assert recommend_profile(results) == "throughput"
+
+    unsafe = {**config.PERFORMANCE_PROFILES["throughput"], "synchronous": "OFF"}
+    monkeypatch.setitem(tuning.PERFORMANCE_PROFILES, "throughput", unsafe)
+    assert recommend_profile(results) == "safe"
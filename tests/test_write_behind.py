@@ -0,0 +1,104 @@
+"""Fila de escrita (cortex/storage/write_behind.py) e sessão ativa."""
+import sqlite3
+import time
+
+from cortex.core.session import (
+    create_session,
+    get_active_session_id,
+    get_message_writer,
+)
+from cortex.storage.database import execute_query
+from cortex.storage.write_behind import WriteBehindQueue
+
+TIMESTAMP = "2026-01-01 00:00:00"
+
+
+def _contents():
+    return [
+        r["content"] for r in execute_query("SELECT content FROM messages ORDER BY id")
+    ]
+
+
+def test_busy_database_keeps_rows(db):
+    session_id = create_session("s")["id"]
+    writer = get_message_writer()
+
+    # Outro processo segura o lock de escrita por mais que o busy_timeout
+    other = sqlite3.connect(db, isolation_level=None)
+    other.execute("BEGIN IMMEDIATE")
+    writer.submit((session_id, "user", "a", 0, TIMESTAMP))
+    writer.submit((session_id, "user", "b", 0, TIMESTAMP))
+    time.sleep(1.0)
+    assert writer.pending == 2
+    other.execute("COMMIT")
+    other.close()
+
+    assert writer.flush(timeout=10)
+    assert _contents() == ["a", "b"]
+    stats = writer.stats()
+    assert stats["failed_rows"] == 0
+    assert stats["retries"] > 0
+
+
+def test_invalid_row_is_dropped_alone(db):
+    session_id = create_session("s")["id"]
+    writer = get_message_writer()
+
+    writer.submit((session_id, "user", "a", 0, TIMESTAMP))
+    writer.submit((session_id, "user", "b", 0, None))  # timestamp NOT NULL
+    writer.submit((session_id, "user", "c", 0, TIMESTAMP))
+
+    assert writer.flush(timeout=10)
+    assert _contents() == ["a", "c"]
+    assert writer.stats()["failed_rows"] == 1
+
+
+def test_permanent_error_discards_batch_without_retrying(db):
+    writer = WriteBehindQueue("tabela_inexistente", ["v"], flush_interval=0.01)
+
+    writer.submit(("a",))
+    writer.submit(("b",))
+
+    started = time.monotonic()
+    assert writer.flush(timeout=10)
+    assert time.monotonic() - started < 1
+    stats = writer.stats()
+    assert stats["failed_rows"] == 2
+    assert stats["retries"] == 0
+
+
+def test_busy_retries_are_capped(db):
+    session_id = create_session("s")["id"]
+    writer = WriteBehindQueue(
+        "messages",
+        ["session_id", "role", "content", "timestamp"],
+        flush_interval=0.01,
+        max_retries=1,
+    )
+
+    other = sqlite3.connect(db, isolation_level=None)
+    other.execute("BEGIN IMMEDIATE")
+    try:
+        writer.submit((session_id, "user", "a", TIMESTAMP))
+        assert writer.flush(timeout=10)
+    finally:
+        other.execute("COMMIT")
+        other.close()
+
+    assert _contents() == []
+    stats = writer.stats()
+    assert stats["retries"] == 1
+    assert stats["failed_rows"] == 1
+
+
+def test_active_session_follows_other_processes(db):
+    session_id = create_session("s")["id"]
+    assert get_active_session_id() == session_id
+
+    other = sqlite3.connect(db, isolation_level=None)
+    other.execute(
+        "UPDATE sessions SET end_time = CURRENT_TIMESTAMP WHERE id = ?", (session_id,)
+    )
+    other.close()
+
+    assert get_active_session_id() is None